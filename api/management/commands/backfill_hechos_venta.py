@@ -0,0 +1,61 @@
+"""
+Reconstruye la tabla de hechos HechoVentaDiaria a partir de VentaRuta y del cargue.
+
+Recorre cada par (vendedor, fecha) que tenga ventas de ruta o cargue y lo
+regenera con el mismo refresco que usan las ventas en línea.
+
+Uso:
+    python manage.py backfill_hechos_venta                                   # Todo el histórico
+    python manage.py backfill_hechos_venta --desde 2026-01-01 --hasta 2026-01-31
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models.functions import TruncDate
+from django.utils.dateparse import parse_date
+
+from api.models import Cargue, VentaRuta
+from api.services.hechos_venta_service import refrescar_hechos_venta
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye HechoVentaDiaria por vendedor y fecha'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Fecha inicial YYYY-MM-DD (opcional)')
+        parser.add_argument('--hasta', help='Fecha final YYYY-MM-DD (opcional)')
+
+    def handle(self, *args, **options):
+        desde = self._fecha(options.get('desde'), '--desde')
+        hasta = self._fecha(options.get('hasta'), '--hasta')
+
+        ventas = VentaRuta.objects.annotate(dia_venta=TruncDate('fecha'))
+        cargues = Cargue.objects.all()
+        if desde:
+            ventas = ventas.filter(dia_venta__gte=desde)
+            cargues = cargues.filter(fecha__gte=desde)
+        if hasta:
+            ventas = ventas.filter(dia_venta__lte=hasta)
+            cargues = cargues.filter(fecha__lte=hasta)
+
+        pares = set(ventas.values_list('vendedor_id', 'dia_venta').distinct())
+        pares |= set(cargues.values_list('vendedor_id', 'fecha').distinct())
+        pares = sorted(p for p in pares if p[0] and p[1])
+
+        self.stdout.write(f'Pares vendedor/fecha a procesar: {len(pares)}')
+
+        total_filas = 0
+        for vendedor_id, fecha in pares:
+            filas = refrescar_hechos_venta(vendedor_id, fecha)
+            total_filas += filas
+            self.stdout.write(f'  ✅ {vendedor_id} {fecha}: {filas} filas')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Hechos reconstruidos: {total_filas} filas en {len(pares)} pares'
+        ))
+
+    def _fecha(self, valor, opcion):
+        if not valor:
+            return None
+        fecha = parse_date(valor)
+        if not fecha:
+            raise CommandError(f'{opcion} inválida: {valor} (use YYYY-MM-DD)')
+        return fecha
@@ -0,0 +1,53 @@
+"""
+Genera DetalleVentaRuta / VencidaVentaRuta para las ventas de ruta existentes
+a partir de sus JSON `detalles` y `productos_vencidos`.
+
+Uso:
+    python manage.py backfill_lineas_venta_ruta                 # Solo ventas sin líneas
+    python manage.py backfill_lineas_venta_ruta --todas         # Reescribe todas
+    python manage.py backfill_lineas_venta_ruta --lote 1000
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.models import VentaRuta
+
+
+class Command(BaseCommand):
+    help = 'Genera las líneas relacionales de VentaRuta desde los JSON de detalles y vencidas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--todas',
+            action='store_true',
+            help='Reescribir también las ventas que ya tienen líneas',
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=500,
+            help='Ventas por transacción (por defecto 500)',
+        )
+
+    def handle(self, *args, **options):
+        ventas = VentaRuta.objects.order_by('id')
+        if not options['todas']:
+            ventas = ventas.filter(
+                items_detalle__isnull=True,
+                items_vencidos__isnull=True,
+            )
+
+        ids = list(ventas.values_list('id', flat=True).distinct())
+        total = len(ids)
+        self.stdout.write(f'Ventas a procesar: {total}')
+
+        lote = max(options['lote'], 1)
+        procesadas = 0
+        for inicio in range(0, total, lote):
+            with transaction.atomic():
+                for venta in VentaRuta.objects.filter(id__in=ids[inicio:inicio + lote]):
+                    venta.sincronizar_lineas()
+                    procesadas += 1
+            self.stdout.write(f'  ✅ {procesadas}/{total}')
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Líneas generadas para {procesadas} ventas'))
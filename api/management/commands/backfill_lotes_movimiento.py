@@ -0,0 +1,59 @@
+"""
+Llena LoteMovimiento (índice de trazabilidad de lotes) a partir de los
+campos `lotes_produccion` y `lotes_vencidos` de los cargues existentes.
+Es idempotente: cada registro de cargue se reescribe completo.
+
+Uso:
+    python manage.py backfill_lotes_movimiento
+    python manage.py backfill_lotes_movimiento --desde 2026-01-01
+    python manage.py backfill_lotes_movimiento --lote 2000
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from api.models import Cargue, sincronizar_lotes_cargue
+from api.services.rangos_fecha import a_fecha
+
+
+class Command(BaseCommand):
+    help = 'Genera LoteMovimiento desde los lotes JSON de la tabla de cargue'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--desde',
+            help='Solo cargues con fecha >= YYYY-MM-DD',
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Registros de cargue por transacción (por defecto 1000)',
+        )
+
+    def handle(self, *args, **options):
+        registros = Cargue.objects.exclude(
+            Q(lotes_produccion='') & Q(lotes_vencidos='')
+        )
+        if options['desde']:
+            try:
+                registros = registros.filter(fecha__gte=a_fecha(options['desde']))
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        ids = list(registros.order_by('id').values_list('id', flat=True))
+        total = len(ids)
+        self.stdout.write(f'Registros de cargue con lotes: {total}')
+
+        lote = max(options['lote'], 1)
+        procesados = 0
+        movimientos = 0
+        campos = ('id', 'vendedor_id', 'dia', 'fecha', 'producto', 'lotes_produccion', 'lotes_vencidos')
+        for inicio in range(0, total, lote):
+            bloque = list(Cargue.objects.filter(id__in=ids[inicio:inicio + lote]).only(*campos))
+            movimientos += sincronizar_lotes_cargue(bloque)
+            procesados += len(bloque)
+            self.stdout.write(f'  ✅ {procesados}/{total}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {movimientos} movimientos de lote generados para {procesados} registros de cargue'
+        ))
@@ -0,0 +1,47 @@
+"""
+Crea por adelantado las particiones mensuales de la tabla unificada api_cargue.
+
+La migración 0104 deja creadas las particiones de los meses con datos y de los
+12 meses siguientes; este comando se corre periódicamente (cron) para que las
+fechas nuevas nunca caigan en la partición DEFAULT.
+
+Uso:
+    python manage.py crear_particiones_cargue              # Mes actual + 12 meses
+    python manage.py crear_particiones_cargue --meses 24
+"""
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+
+class Command(BaseCommand):
+    help = 'Crea las particiones mensuales de api_cargue para los próximos meses'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--meses',
+            type=int,
+            default=12,
+            help='Cantidad de meses futuros a asegurar (por defecto 12)',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            self.stdout.write(self.style.WARNING('⚠️ Particionado solo disponible en PostgreSQL'))
+            return
+
+        hoy = date.today()
+        anio, mes = hoy.year, hoy.month
+
+        with connection.cursor() as cursor:
+            for _ in range(options['meses'] + 1):
+                cursor.execute('SELECT api_cargue_crear_particion(%s)', [date(anio, mes, 1)])
+                nombre = cursor.fetchone()[0]
+                self.stdout.write(f'  ✅ {nombre}')
+
+                mes += 1
+                if mes > 12:
+                    anio, mes = anio + 1, 1
+
+        self.stdout.write(self.style.SUCCESS('✅ Particiones de cargue al día'))
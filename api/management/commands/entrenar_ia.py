@@ -1,16 +1,31 @@
+"""
+Entrena el modelo de pronóstico de producción (uno solo para todos los
+productos) con todo el histórico de ReportePlaneacion.
+
+Uso:
+    python manage.py entrenar_ia
+"""
 from django.core.management.base import BaseCommand
 from api.services.ia_service import IAService
 
 
 class Command(BaseCommand):
-    help = 'Entrena redes neuronales para todos los productos con datos históricos'
+    help = 'Entrena el modelo de pronóstico de producción con todos los datos históricos'
 
     def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS('\n🧠 =========================================='))
-        self.stdout.write(self.style.SUCCESS('   ENTRENAMIENTO DE REDES NEURONALES'))
+        self.stdout.write(self.style.SUCCESS('   ENTRENAMIENTO DE RED NEURONAL'))
         self.stdout.write(self.style.SUCCESS('==========================================\n'))
         
         ia_service = IAService()
-        ia_service.entrenar_todos_los_modelos()
-        
+        resumen = ia_service.entrenar_todos_los_modelos()
+
+        if not resumen:
+            self.stdout.write(self.style.WARNING('⚠️ No hay suficientes reportes de planeación para entrenar'))
+            return
+
+        self.stdout.write(f"   Muestras:    {resumen['muestras']}")
+        self.stdout.write(f"   Productos:   {resumen['productos']}")
+        self.stdout.write(f"   Iteraciones: {resumen['iteraciones']}")
+        self.stdout.write(f"   Pérdida:     {resumen['perdida']:.4f}")
         self.stdout.write(self.style.SUCCESS('\n✅ Proceso de entrenamiento finalizado\n'))
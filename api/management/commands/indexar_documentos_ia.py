@@ -0,0 +1,144 @@
+"""
+Reconstruye el índice BM25 de la documentación que usan el asistente y el
+agente IA (ia_models/indice_docs.npz) y opcionalmente compara el tamaño del
+contexto y la latencia contra el método anterior (primeros N caracteres).
+
+Uso:
+    python manage.py indexar_documentos_ia
+    python manage.py indexar_documentos_ia --benchmark
+    python manage.py indexar_documentos_ia --benchmark --llm            # también mide Ollama
+    python manage.py indexar_documentos_ia --benchmark --consulta "¿cómo cierro el turno?"
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.services import indice_docs_service
+
+CONSULTAS_BENCHMARK = [
+    '¿Cómo cierro el turno de un vendedor?',
+    'Ventas de ayer del vendedor ID1',
+    'Crea un cliente llamado Juan Perez con celular 3001234567',
+    '¿Por qué el cargue aparece en estado ALISTAMIENTO?',
+    'Busca si hay pedidos de Pollo Feliz',
+    '¿Cómo se calculan las devoluciones y vencidas en el cargue?',
+]
+
+# Presupuesto de contexto anterior (AIAgentService) y nuevo (contexto_para)
+CONTEXTO_ANTERIOR = 2500
+CONTEXTO_NUEVO = 1500
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el índice BM25 de documentación para la IA (con benchmark opcional)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--benchmark',
+            action='store_true',
+            help='Comparar tamaño de contexto y latencia antes/después',
+        )
+        parser.add_argument(
+            '--llm',
+            action='store_true',
+            help='En el benchmark, medir también la latencia de punta a punta con Ollama',
+        )
+        parser.add_argument(
+            '--consulta',
+            action='append',
+            help='Consulta a usar en el benchmark (repetible)',
+        )
+        parser.add_argument(
+            '--modelo',
+            default='qwen2.5:3b',
+            help='Modelo de Ollama para --llm (por defecto qwen2.5:3b)',
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        indice = indice_docs_service.reconstruir_indice()
+        duracion = time.perf_counter() - inicio
+
+        fuentes = sorted(set(indice.fuentes))
+        self.stdout.write(f'Fuentes indexadas: {len(fuentes)}')
+        for fuente in fuentes:
+            self.stdout.write(f'  - {fuente}')
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Índice: {len(indice.fragmentos)} fragmentos, {len(indice.vocabulario)} términos '
+            f'en {duracion:.2f}s -> {indice_docs_service.RUTA_INDICE}'
+        ))
+
+        if options['benchmark']:
+            self._benchmark(options['consulta'] or CONSULTAS_BENCHMARK, options['llm'], options['modelo'])
+
+    def _benchmark(self, consultas, con_llm, modelo):
+        from api.services.ai_agent_service import AIAgentService
+
+        agente = AIAgentService(model=modelo)
+
+        inicio = time.perf_counter()
+        documentacion = agente._load_documentation()
+        carga_docs_ms = (time.perf_counter() - inicio) * 1000
+
+        self.stdout.write('\n📏 Benchmark de contexto')
+        self.stdout.write(f'  Documentación completa: {len(documentacion)} caracteres (carga {carga_docs_ms:.1f} ms)')
+        self.stdout.write(f'  {"Consulta":<55} {"antes":>7} {"después":>8} {"búsqueda":>10}')
+
+        total_antes = total_despues = 0
+        filas = []
+        for consulta in consultas:
+            antes = documentacion[:CONTEXTO_ANTERIOR]
+            inicio = time.perf_counter()
+            despues = indice_docs_service.contexto_relevante(consulta, max_caracteres=CONTEXTO_NUEVO)
+            busqueda_ms = (time.perf_counter() - inicio) * 1000
+
+            total_antes += len(antes)
+            total_despues += len(despues)
+            filas.append((consulta, antes, despues))
+            self.stdout.write(
+                f'  {consulta[:55]:<55} {len(antes):>7} {len(despues):>8} {busqueda_ms:>8.2f}ms'
+            )
+
+        if total_antes:
+            ahorro = 100 * (1 - total_despues / total_antes)
+            self.stdout.write(self.style.SUCCESS(
+                f'  Total: {total_antes} -> {total_despues} caracteres ({ahorro:.0f}% menos)'
+            ))
+
+        if con_llm:
+            self._benchmark_llm(agente, filas)
+
+    def _benchmark_llm(self, agente, filas):
+        from api.services.ai_runtime import obtener_sesion_http
+
+        self.stdout.write(f'\n⏱️  Latencia de punta a punta ({agente.model} en {agente.base_url})')
+        sesion = obtener_sesion_http()
+        tiempos = {'antes': [], 'después': []}
+
+        for consulta, antes, despues in filas:
+            for etiqueta, contexto in (('antes', antes), ('después', despues)):
+                payload = {
+                    'model': agente.model,
+                    'prompt': f'CONTEXTO FUNCIONAL DEL CRM:\n{contexto}\n\nUsuario: {consulta}\nJSON:',
+                    'stream': False,
+                    'keep_alive': '60m',
+                    'options': {'temperature': 0.0, 'num_predict': 100, 'num_ctx': 2048},
+                }
+                inicio = time.perf_counter()
+                try:
+                    respuesta = sesion.post(f'{agente.base_url}/generate', json=payload, timeout=120)
+                    respuesta.raise_for_status()
+                except Exception as e:
+                    self.stdout.write(self.style.WARNING(f'  Ollama no disponible: {e}'))
+                    return
+                tiempos[etiqueta].append(time.perf_counter() - inicio)
+
+            self.stdout.write(
+                f'  {consulta[:55]:<55} {tiempos["antes"][-1]:>6.2f}s {tiempos["después"][-1]:>7.2f}s'
+            )
+
+        promedio_antes = sum(tiempos['antes']) / len(tiempos['antes'])
+        promedio_despues = sum(tiempos['después']) / len(tiempos['después'])
+        self.stdout.write(self.style.SUCCESS(
+            f'  Promedio: {promedio_antes:.2f}s -> {promedio_despues:.2f}s'
+        ))
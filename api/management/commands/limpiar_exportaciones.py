@@ -0,0 +1,19 @@
+"""
+Borra los archivos vencidos de media/exports/ (exportaciones en segundo
+plano) y marca sus trabajos como EXPIRADO. El pool ya lo hace después de
+cada tanda; este comando es para cron cuando no se exporta por días.
+
+Uso:
+    python manage.py limpiar_exportaciones
+"""
+from django.core.management.base import BaseCommand
+
+from api.services import exportaciones_service
+
+
+class Command(BaseCommand):
+    help = 'Elimina exportaciones Excel vencidas de media/exports/'
+
+    def handle(self, *args, **options):
+        borrados = exportaciones_service.limpiar_vencidos()
+        self.stdout.write(self.style.SUCCESS(f'✅ Archivos de exportación eliminados: {borrados}'))
@@ -0,0 +1,106 @@
+"""
+Compara memoria pico (RSS) y tiempo de generar un .xlsx con el método
+anterior (Workbook completo en memoria + BytesIO) contra el motor en
+streaming de api/services/exportacion_excel_service.py, con filas
+sintéticas (no toca la BD). Cada medición corre en un proceso hijo para que
+el pico de RSS de una no contamine la siguiente (solo Linux).
+
+Uso:
+    python manage.py medir_exportacion_excel
+    python manage.py medir_exportacion_excel --filas 10000 50000 200000
+"""
+import io
+import multiprocessing
+import resource
+import time
+
+from django.core.management.base import BaseCommand
+from openpyxl import Workbook
+from openpyxl.styles import Alignment, Font
+
+from api.services.exportacion_excel_service import BORDE_FINO, CENTRO, LibroExcel, estilo, relleno
+
+COLUMNAS = ['FECHA', 'VENDEDOR', 'CLIENTE', 'PRODUCTO', 'CANTIDAD', 'VALOR', 'TOTAL']
+
+
+def _filas(n):
+    for i in range(n):
+        yield [
+            f'2026-04-{i % 28 + 1:02d}', f'ID{i % 6 + 1}', f'Cliente {i % 900}',
+            f'AREPA TIPO {i % 40}', i % 50, 1500, f'=E{i + 2}*F{i + 2}',
+        ]
+
+
+def _en_memoria(n):
+    """Como los reportes anteriores: estilos por celda, Workbook completo y BytesIO."""
+    wb = Workbook()
+    ws = wb.active
+    ws.append(COLUMNAS)
+    for cell in ws[1]:
+        cell.font = Font(bold=True, color='FFFFFF')
+        cell.fill = relleno('1E3A5F')
+        cell.alignment = CENTRO
+    for i, fila in enumerate(_filas(n)):
+        ws.append(fila)
+        for cell in ws[ws.max_row]:
+            cell.border = BORDE_FINO
+            cell.alignment = Alignment(horizontal='center')
+            if i % 2:
+                cell.fill = relleno('F8F9FA')
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return len(buffer.getvalue())
+
+
+def _streaming(n):
+    libro = LibroExcel({
+        'encabezado': estilo(font=Font(bold=True, color='FFFFFF'), fill=relleno('1E3A5F'), alignment=CENTRO),
+        'dato': estilo(border=BORDE_FINO, alignment=Alignment(horizontal='center')),
+        'dato_par': estilo(border=BORDE_FINO, alignment=Alignment(horizontal='center'), fill=relleno('F8F9FA')),
+    })
+    ws = libro.hoja('Datos', anchos=[12, 10, 16, 18, 10, 10, 12])
+    ws.fila(COLUMNAS, estilo='encabezado')
+    for i, fila in enumerate(_filas(n)):
+        ws.fila(fila, estilo='dato_par' if i % 2 else 'dato')
+    respuesta = libro.respuesta('medicion.xlsx')
+    tamano = sum(len(parte) for parte in respuesta.streaming_content)
+    respuesta.close()
+    return tamano
+
+
+def _medir_en_hijo(funcion, n, cola):
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    inicio = time.perf_counter()
+    tamano = funcion(n)
+    duracion = time.perf_counter() - inicio
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base  # ru_maxrss en KB (Linux)
+    cola.put((pico / 1024, duracion, tamano / 1024))
+
+
+class Command(BaseCommand):
+    help = 'Mide memoria pico (RSS) de la exportación Excel en memoria vs streaming'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--filas',
+            type=int,
+            nargs='+',
+            default=[2000, 10000, 40000],
+            help='Cantidades de filas a medir',
+        )
+
+    def _medir(self, funcion, n):
+        cola = multiprocessing.Queue()
+        proceso = multiprocessing.Process(target=_medir_en_hijo, args=(funcion, n, cola))
+        proceso.start()
+        resultado = cola.get()
+        proceso.join()
+        return resultado
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'  {"Filas":>8} {"Método":<11} {"+RSS MB":>9} {"Tiempo":>8} {"Archivo KB":>11}')
+        for n in options['filas']:
+            for nombre, funcion in (('memoria', _en_memoria), ('streaming', _streaming)):
+                pico, duracion, tamano = self._medir(funcion, n)
+                self.stdout.write(f'  {n:>8} {nombre:<11} {pico:>9.1f} {duracion:>7.2f}s {tamano:>11.0f}')
+        self.stdout.write(self.style.SUCCESS('✅ Medición terminada'))
@@ -0,0 +1,86 @@
+"""
+Genera las variantes (miniatura/mediana) de las imágenes pendientes y,
+opcionalmente, pasa las fotos anteriores (vencidos/, evidencias_pedidos/)
+al almacenamiento por contenido de media/imagenes/. El pool del servidor ya
+procesa lo nuevo al subirlo; esto es para pendientes de un proceso que se
+reinició y para el histórico.
+
+Uso:
+    python manage.py procesar_imagenes                          # Solo pendientes
+    python manage.py procesar_imagenes --existentes             # + migrar fotos anteriores
+    python manage.py procesar_imagenes --existentes --borrar-originales
+"""
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.core.management.base import BaseCommand
+
+from api.models import EvidenciaPedido, EvidenciaVenta, VentaRuta
+from api.services import imagenes_service
+from api.services.imagenes_service import almacenamiento_imagenes, es_direccionada
+
+# (modelo, campo) de los ImageField que usan AlmacenamientoImagenes
+CAMPOS_IMAGEN = [
+    (EvidenciaPedido, 'imagen'),
+    (EvidenciaVenta, 'imagen'),
+    (VentaRuta, 'foto_vencidos'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Genera miniaturas de imágenes pendientes y migra fotos anteriores a media/imagenes/'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--existentes',
+            action='store_true',
+            help='Pasar al almacenamiento por contenido las fotos guardadas con el esquema anterior',
+        )
+        parser.add_argument(
+            '--borrar-originales',
+            action='store_true',
+            help='Con --existentes: borrar el archivo anterior una vez migrado',
+        )
+
+    def handle(self, *args, **options):
+        if options['existentes']:
+            self._migrar_existentes(options['borrar_originales'])
+
+        procesadas = imagenes_service.procesar_pendientes()
+        self.stdout.write(self.style.SUCCESS(f'✅ Imágenes procesadas: {procesadas}'))
+
+    def _migrar_existentes(self, borrar_originales):
+        por_ruta = {}  # ruta anterior -> ruta nueva (la misma foto en venta y evidencia)
+        for modelo, campo in CAMPOS_IMAGEN:
+            filas = (
+                modelo.objects.exclude(**{campo: ''}).exclude(**{f'{campo}__isnull': True})
+                .exclude(**{f'{campo}__startswith': f'{imagenes_service.SUBDIRECTORIO}/'})
+                .values_list('pk', campo)
+            )
+            migradas = 0
+            for pk, nombre in filas.iterator():
+                nuevo = por_ruta.get(nombre)
+                if nuevo is None:
+                    ruta = os.path.join(settings.MEDIA_ROOT, nombre)
+                    if not os.path.exists(ruta):
+                        continue
+                    with open(ruta, 'rb') as archivo:
+                        nuevo = almacenamiento_imagenes.save(nombre, File(archivo, name=nombre))
+                    por_ruta[nombre] = nuevo
+                # update(): sin save() ni señales, solo cambia la ruta
+                modelo.objects.filter(pk=pk).update(**{campo: nuevo})
+                migradas += 1
+            self.stdout.write(f'  ✅ {modelo.__name__}.{campo}: {migradas} fotos migradas')
+
+        if borrar_originales:
+            borrados = 0
+            for nombre in por_ruta:
+                if es_direccionada(nombre):
+                    continue
+                try:
+                    os.remove(os.path.join(settings.MEDIA_ROOT, nombre))
+                    borrados += 1
+                except OSError:
+                    continue
+            self.stdout.write(f'  🗑️ Archivos anteriores borrados: {borrados}')
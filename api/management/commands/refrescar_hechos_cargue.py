@@ -0,0 +1,31 @@
+"""
+Pone al día HechoVentaDiaria (cargado/devoluciones) para los cargues
+editados en los últimos minutos. Las ventas y el cierre de turno ya refrescan
+sus hechos al momento; los cambios hechos directo en el cargue (planilla,
+sugerido) solo llegan por aquí. Se corre por cron con una ventana mayor al
+intervalo, así un fallo puntual no deja pares sin refrescar.
+
+Uso:
+    python manage.py refrescar_hechos_cargue                # Últimos 15 minutos (cron cada 5)
+    python manage.py refrescar_hechos_cargue --minutos 1440
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.services.hechos_venta_service import refrescar_hechos_cargue_modificado
+
+
+class Command(BaseCommand):
+    help = 'Refresca HechoVentaDiaria de los cargues modificados recientemente'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--minutos', type=int, default=15, help='Ventana hacia atrás (default 15)')
+
+    def handle(self, *args, **options):
+        desde = timezone.now() - timedelta(minutes=options['minutos'])
+        pares = refrescar_hechos_cargue_modificado(desde)
+        for vendedor_id, fecha in pares:
+            self.stdout.write(f'  ✅ {vendedor_id} {fecha}')
+        self.stdout.write(self.style.SUCCESS(f'✅ Hechos refrescados: {len(pares)} pares vendedor/fecha'))
@@ -0,0 +1,256 @@
+# Generated by Django 4.2.2 on 2026-10-18 09:03
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+# Columnas comunes a CargueID1..6 (sin id ni ruta, que solo existe en ID1 e ID2)
+COLUMNAS_CARGUE = [
+    'dia', 'fecha', 'v', 'd', 'producto', 'cantidad', 'dctos', 'adicional',
+    'devoluciones', 'vendidas', 'vencidas', 'lotes_vencidos', 'lotes_produccion',
+    'total', 'valor', 'neto', 'concepto', 'descuentos', 'nequi', 'daviplata',
+    'base_caja', 'total_despacho', 'total_pedidos', 'total_dctos', 'venta',
+    'total_efectivo', 'licencia_transporte', 'soat', 'uniforme', 'no_locion',
+    'no_accesorios', 'capacitacion_carnet', 'higiene', 'estibas', 'desinfeccion',
+    'usuario', 'responsable', 'activo', 'fecha_creacion', 'fecha_actualizacion',
+]
+VENDEDORES_CON_RUTA = {'ID1', 'ID2'}
+VENDEDORES = ['ID1', 'ID2', 'ID3', 'ID4', 'ID5', 'ID6']
+
+
+def _columnas(vendedor_id):
+    columnas = list(COLUMNAS_CARGUE)
+    if vendedor_id in VENDEDORES_CON_RUTA:
+        columnas.append('ruta')
+    return columnas
+
+
+CREAR_TABLA_SQL = """
+CREATE TABLE api_cargue (
+    id bigserial NOT NULL,
+    vendedor_id varchar(10) NOT NULL,
+    dia varchar(10) NOT NULL,
+    fecha date NOT NULL,
+    v boolean NOT NULL DEFAULT false,
+    d boolean NOT NULL DEFAULT false,
+    producto varchar(255) NOT NULL DEFAULT '',
+    cantidad integer NOT NULL DEFAULT 0,
+    dctos integer NOT NULL DEFAULT 0,
+    adicional integer NOT NULL DEFAULT 0,
+    devoluciones integer NOT NULL DEFAULT 0,
+    vendidas integer NOT NULL DEFAULT 0,
+    vencidas integer NOT NULL DEFAULT 0,
+    lotes_vencidos text NOT NULL DEFAULT '',
+    lotes_produccion text NOT NULL DEFAULT '',
+    total integer NOT NULL DEFAULT 0,
+    valor numeric(10, 2) NOT NULL DEFAULT 0,
+    neto numeric(12, 2) NOT NULL DEFAULT 0,
+    concepto varchar(255) NOT NULL DEFAULT '',
+    descuentos numeric(10, 2) NOT NULL DEFAULT 0,
+    nequi numeric(10, 2) NOT NULL DEFAULT 0,
+    daviplata numeric(10, 2) NOT NULL DEFAULT 0,
+    base_caja numeric(10, 2) NOT NULL DEFAULT 0,
+    total_despacho numeric(12, 2) NOT NULL DEFAULT 0,
+    total_pedidos numeric(10, 2) NOT NULL DEFAULT 0,
+    total_dctos numeric(10, 2) NOT NULL DEFAULT 0,
+    venta numeric(12, 2) NOT NULL DEFAULT 0,
+    total_efectivo numeric(12, 2) NOT NULL DEFAULT 0,
+    licencia_transporte varchar(2) NULL,
+    soat varchar(2) NULL,
+    uniforme varchar(2) NULL,
+    no_locion varchar(2) NULL,
+    no_accesorios varchar(2) NULL,
+    capacitacion_carnet varchar(2) NULL,
+    higiene varchar(2) NULL,
+    estibas varchar(2) NULL,
+    desinfeccion varchar(2) NULL,
+    usuario varchar(100) NOT NULL DEFAULT 'Sistema',
+    responsable varchar(100) NOT NULL DEFAULT 'RESPONSABLE',
+    ruta varchar(100) NOT NULL DEFAULT '',
+    activo boolean NOT NULL DEFAULT true,
+    fecha_creacion timestamp with time zone NOT NULL DEFAULT now(),
+    fecha_actualizacion timestamp with time zone NOT NULL DEFAULT now(),
+    -- La llave de partición debe formar parte de PK y UNIQUE
+    CONSTRAINT api_cargue_pkey PRIMARY KEY (id, fecha),
+    CONSTRAINT api_cargue_vendedor_dia_fecha_producto_uniq UNIQUE (vendedor_id, dia, fecha, producto)
+) PARTITION BY RANGE (fecha);
+
+CREATE TABLE api_cargue_default PARTITION OF api_cargue DEFAULT;
+
+CREATE INDEX api_cargue_vend_fecha_idx ON api_cargue (vendedor_id, fecha);
+CREATE INDEX api_cargue_fecha_idx ON api_cargue (fecha);
+
+-- Crea (si no existe) la partición mensual que contiene p_fecha.
+-- Si la partición DEFAULT ya tiene filas de ese mes, se mueven a la nueva.
+CREATE OR REPLACE FUNCTION api_cargue_crear_particion(p_fecha date) RETURNS text AS $$
+DECLARE
+    inicio date := date_trunc('month', p_fecha)::date;
+    fin date := (date_trunc('month', p_fecha) + interval '1 month')::date;
+    nombre text := 'api_cargue_p' || to_char(date_trunc('month', p_fecha), 'YYYY_MM');
+BEGIN
+    IF to_regclass(nombre) IS NOT NULL THEN
+        RETURN nombre;
+    END IF;
+
+    CREATE TEMP TABLE IF NOT EXISTS api_cargue_mover (LIKE api_cargue) ON COMMIT DROP;
+    TRUNCATE api_cargue_mover;
+    WITH movidas AS (
+        DELETE FROM api_cargue_default WHERE fecha >= inicio AND fecha < fin RETURNING *
+    )
+    INSERT INTO api_cargue_mover SELECT * FROM movidas;
+
+    EXECUTE format(
+        'CREATE TABLE %I PARTITION OF api_cargue FOR VALUES FROM (%L) TO (%L)',
+        nombre, inicio, fin
+    );
+
+    INSERT INTO api_cargue SELECT * FROM api_cargue_mover;
+    TRUNCATE api_cargue_mover;
+    RETURN nombre;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def _sql_particiones_iniciales():
+    """Particiones para cada mes con datos históricos y los próximos 12 meses."""
+    meses_legacy = ' UNION '.join(
+        f"SELECT date_trunc('month', fecha)::date AS mes FROM api_cargue{v.lower()}"
+        for v in VENDEDORES
+    )
+    return f"""
+DO $$
+DECLARE
+    mes date;
+BEGIN
+    FOR mes IN
+        {meses_legacy}
+        UNION
+        SELECT generate_series(
+            date_trunc('month', CURRENT_DATE),
+            date_trunc('month', CURRENT_DATE) + interval '12 months',
+            interval '1 month'
+        )::date
+    LOOP
+        PERFORM api_cargue_crear_particion(mes);
+    END LOOP;
+END $$;
+"""
+
+
+def _sql_migrar_y_crear_vistas():
+    sentencias = []
+    for vendedor_id in VENDEDORES:
+        tabla = f'api_cargue{vendedor_id.lower()}'
+        columnas = ', '.join(_columnas(vendedor_id))
+        sentencias.append(
+            f"INSERT INTO api_cargue (vendedor_id, {columnas}) "
+            f"SELECT '{vendedor_id}', {columnas} FROM {tabla} ORDER BY id;"
+        )
+        sentencias.append(f"ALTER TABLE {tabla} RENAME TO {tabla}_legacy;")
+        # Vista simple => actualizable automáticamente por PostgreSQL
+        sentencias.append(
+            f"CREATE VIEW {tabla} AS SELECT id, {columnas}, vendedor_id "
+            f"FROM api_cargue WHERE vendedor_id = '{vendedor_id}' WITH CASCADED CHECK OPTION;"
+        )
+        sentencias.append(
+            f"ALTER VIEW {tabla} ALTER COLUMN vendedor_id SET DEFAULT '{vendedor_id}';"
+        )
+    return '\n'.join(sentencias)
+
+
+def _sql_revertir():
+    """Devuelve las filas a las tablas legacy y elimina la tabla unificada."""
+    sentencias = []
+    for vendedor_id in VENDEDORES:
+        tabla = f'api_cargue{vendedor_id.lower()}'
+        columnas = ', '.join(_columnas(vendedor_id))
+        sentencias.append(f"DROP VIEW IF EXISTS {tabla};")
+        sentencias.append(f"ALTER TABLE {tabla}_legacy RENAME TO {tabla};")
+        sentencias.append(f"DELETE FROM {tabla};")
+        sentencias.append(
+            f"INSERT INTO {tabla} (id, {columnas}) "
+            f"SELECT id, {columnas} FROM api_cargue WHERE vendedor_id = '{vendedor_id}';"
+        )
+        sentencias.append(
+            f"SELECT setval(pg_get_serial_sequence('{tabla}', 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {tabla}), 1));"
+        )
+    sentencias.append("DROP TABLE IF EXISTS api_cargue CASCADE;")
+    sentencias.append("DROP FUNCTION IF EXISTS api_cargue_crear_particion(date);")
+    return '\n'.join(sentencias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0103_add_tipo_origen_to_lote'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    CREAR_TABLA_SQL + _sql_particiones_iniciales() + _sql_migrar_y_crear_vistas(),
+                    reverse_sql=_sql_revertir(),
+                ),
+            ],
+            state_operations=[
+                migrations.CreateModel(
+                    name='Cargue',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('vendedor_id', models.CharField(max_length=10)),
+                        ('dia', models.CharField(choices=[('LUNES', 'Lunes'), ('MARTES', 'Martes'), ('MIERCOLES', 'Miércoles'), ('JUEVES', 'Jueves'), ('VIERNES', 'Viernes'), ('SABADO', 'Sábado'), ('DOMINGO', 'Domingo')], max_length=10)),
+                        ('fecha', models.DateField()),
+                        ('v', models.BooleanField(default=False)),
+                        ('d', models.BooleanField(default=False)),
+                        ('producto', models.CharField(blank=True, max_length=255)),
+                        ('cantidad', models.IntegerField(default=0)),
+                        ('dctos', models.IntegerField(default=0)),
+                        ('adicional', models.IntegerField(default=0)),
+                        ('devoluciones', models.IntegerField(default=0)),
+                        ('vendidas', models.IntegerField(default=0)),
+                        ('vencidas', models.IntegerField(default=0)),
+                        ('lotes_vencidos', models.TextField(blank=True)),
+                        ('lotes_produccion', models.TextField(blank=True)),
+                        ('total', models.IntegerField(default=0)),
+                        ('valor', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                        ('neto', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                        ('concepto', models.CharField(blank=True, max_length=255)),
+                        ('descuentos', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                        ('nequi', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                        ('daviplata', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                        ('base_caja', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                        ('total_despacho', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                        ('total_pedidos', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                        ('total_dctos', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                        ('venta', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                        ('total_efectivo', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                        ('licencia_transporte', models.CharField(blank=True, choices=[('C', 'Cumple'), ('NC', 'No Cumple')], max_length=2, null=True)),
+                        ('soat', models.CharField(blank=True, choices=[('C', 'Cumple'), ('NC', 'No Cumple')], max_length=2, null=True)),
+                        ('uniforme', models.CharField(blank=True, choices=[('C', 'Cumple'), ('NC', 'No Cumple')], max_length=2, null=True)),
+                        ('no_locion', models.CharField(blank=True, choices=[('C', 'Cumple'), ('NC', 'No Cumple')], max_length=2, null=True)),
+                        ('no_accesorios', models.CharField(blank=True, choices=[('C', 'Cumple'), ('NC', 'No Cumple')], max_length=2, null=True)),
+                        ('capacitacion_carnet', models.CharField(blank=True, choices=[('C', 'Cumple'), ('NC', 'No Cumple')], max_length=2, null=True)),
+                        ('higiene', models.CharField(blank=True, choices=[('C', 'Cumple'), ('NC', 'No Cumple')], max_length=2, null=True)),
+                        ('estibas', models.CharField(blank=True, choices=[('C', 'Cumple'), ('NC', 'No Cumple')], max_length=2, null=True)),
+                        ('desinfeccion', models.CharField(blank=True, choices=[('C', 'Cumple'), ('NC', 'No Cumple')], max_length=2, null=True)),
+                        ('usuario', models.CharField(default='Sistema', max_length=100)),
+                        ('responsable', models.CharField(blank=True, default='RESPONSABLE', max_length=100)),
+                        ('ruta', models.CharField(blank=True, default='', max_length=100)),
+                        ('activo', models.BooleanField(default=True)),
+                        ('fecha_creacion', models.DateTimeField(default=django.utils.timezone.now)),
+                        ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+                    ],
+                    options={
+                        'verbose_name': 'Cargue',
+                        'verbose_name_plural': 'Cargues',
+                        'db_table': 'api_cargue',
+                        'indexes': [models.Index(fields=['vendedor_id', 'fecha'], name='api_cargue_vend_fecha_idx'), models.Index(fields=['fecha'], name='api_cargue_fecha_idx')],
+                        'unique_together': {('vendedor_id', 'dia', 'fecha', 'producto')},
+                    },
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.2 on 2026-10-18 09:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0104_cargue_unificado_particionado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HechoVentaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('vendedor_id', models.CharField(max_length=10)),
+                ('producto', models.CharField(max_length=255)),
+                ('cliente', models.CharField(blank=True, default='', max_length=255)),
+                ('cargado', models.IntegerField(default=0)),
+                ('vendidas', models.IntegerField(default=0)),
+                ('vencidas', models.IntegerField(default=0)),
+                ('devoluciones', models.IntegerField(default=0)),
+                ('monto', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Hecho Venta Diaria',
+                'verbose_name_plural': 'Hechos Ventas Diarias',
+                'db_table': 'api_hecho_venta_diaria',
+                'indexes': [models.Index(fields=['vendedor_id', 'fecha'], name='api_hecho_vend_fecha_idx'), models.Index(fields=['fecha', 'producto'], name='api_hecho_fecha_prod_idx')],
+                'unique_together': {('fecha', 'vendedor_id', 'producto', 'cliente')},
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.2 on 2026-10-18 09:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0105_hecho_venta_diaria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VencidaVentaRuta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('producto_nombre', models.CharField(max_length=255)),
+                ('cantidad', models.IntegerField(default=0)),
+                ('motivo', models.CharField(blank=True, default='', max_length=255)),
+                ('producto', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='api.producto')),
+                ('venta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items_vencidos', to='api.ventaruta')),
+            ],
+            options={
+                'verbose_name': 'Vencida Venta Ruta',
+                'verbose_name_plural': 'Vencidas Venta Ruta',
+                'db_table': 'api_vencida_venta_ruta',
+                'indexes': [models.Index(fields=['producto_nombre'], name='api_vencvr_producto_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DetalleVentaRuta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('producto_nombre', models.CharField(max_length=255)),
+                ('cantidad', models.IntegerField(default=0)),
+                ('precio', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('subtotal', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('producto', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='api.producto')),
+                ('venta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items_detalle', to='api.ventaruta')),
+            ],
+            options={
+                'verbose_name': 'Detalle Venta Ruta',
+                'verbose_name_plural': 'Detalles Venta Ruta',
+                'db_table': 'api_detalle_venta_ruta',
+                'indexes': [models.Index(fields=['producto_nombre'], name='api_detvr_producto_idx')],
+            },
+        ),
+    ]
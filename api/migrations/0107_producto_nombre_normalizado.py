@@ -0,0 +1,30 @@
+# Generated by Django 4.2.2 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+def poblar_nombre_normalizado(apps, schema_editor):
+    """Calcular nombre_normalizado para los productos existentes"""
+    from api.models import normalizar_nombre_producto
+
+    Producto = apps.get_model('api', 'Producto')
+    productos = list(Producto.objects.only('id', 'nombre'))
+    for producto in productos:
+        producto.nombre_normalizado = normalizar_nombre_producto(producto.nombre)
+    Producto.objects.bulk_update(productos, ['nombre_normalizado'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0106_lineas_venta_ruta'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='nombre_normalizado',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(poblar_nombre_normalizado, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 4.2.2 on 2026-10-18 10:05
+
+from django.db import migrations
+
+
+# Un solo canal para todo el CRM; el payload dice qué cambió y de quién.
+# pg_notify es transaccional (solo se entrega al hacer commit) y descarta payloads
+# idénticos dentro de la misma transacción, así un UPDATE de 40 filas del mismo
+# vendedor/fecha produce un único aviso.
+CREAR_TRIGGERS_SQL = """
+CREATE OR REPLACE FUNCTION api_notificar_cambio() RETURNS trigger AS $$
+DECLARE
+    fila record;
+    vendedor text;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        fila := OLD;
+    ELSE
+        fila := NEW;
+    END IF;
+
+    vendedor := fila.vendedor_id::text;
+    IF TG_ARGV[0] = 'turno' THEN
+        vendedor := 'ID' || vendedor;  -- TurnoVendedor guarda el número (1..6)
+    END IF;
+
+    PERFORM pg_notify('crm_cambios', json_build_object(
+        'tipo', TG_ARGV[0],
+        'vendedor_id', vendedor,
+        'fecha', fila.fecha
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER api_cargue_notificar
+    AFTER INSERT OR UPDATE OR DELETE ON api_cargue
+    FOR EACH ROW EXECUTE FUNCTION api_notificar_cambio('cargue');
+
+CREATE TRIGGER api_cargue_resumen_notificar
+    AFTER INSERT OR UPDATE OR DELETE ON api_cargue_resumen
+    FOR EACH ROW EXECUTE FUNCTION api_notificar_cambio('estado');
+
+CREATE TRIGGER api_turno_vendedor_notificar
+    AFTER INSERT OR UPDATE OR DELETE ON api_turno_vendedor
+    FOR EACH ROW EXECUTE FUNCTION api_notificar_cambio('turno');
+"""
+
+ELIMINAR_TRIGGERS_SQL = """
+DROP TRIGGER IF EXISTS api_turno_vendedor_notificar ON api_turno_vendedor;
+DROP TRIGGER IF EXISTS api_cargue_resumen_notificar ON api_cargue_resumen;
+DROP TRIGGER IF EXISTS api_cargue_notificar ON api_cargue;
+DROP FUNCTION IF EXISTS api_notificar_cambio();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0107_producto_nombre_normalizado'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREAR_TRIGGERS_SQL, reverse_sql=ELIMINAR_TRIGGERS_SQL),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.2 on 2026-10-18 10:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+# Los .update() de Django no tocan auto_now, y el cargue/pagos se mueven casi siempre
+# con update(F(...)). Para que MAX(fecha_actualizacion) sirva como versión (ETag) la
+# marca se pone en la BD en cada UPDATE, venga de save() o de update().
+CREAR_TRIGGERS_SQL = """
+CREATE OR REPLACE FUNCTION api_marcar_fecha_actualizacion() RETURNS trigger AS $$
+BEGIN
+    NEW.fecha_actualizacion := now();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER api_cargue_fecha_actualizacion
+    BEFORE UPDATE ON api_cargue
+    FOR EACH ROW EXECUTE FUNCTION api_marcar_fecha_actualizacion();
+
+CREATE TRIGGER api_cargue_pagos_fecha_actualizacion
+    BEFORE UPDATE ON api_cargue_pagos
+    FOR EACH ROW EXECUTE FUNCTION api_marcar_fecha_actualizacion();
+"""
+
+ELIMINAR_TRIGGERS_SQL = """
+DROP TRIGGER IF EXISTS api_cargue_pagos_fecha_actualizacion ON api_cargue_pagos;
+DROP TRIGGER IF EXISTS api_cargue_fecha_actualizacion ON api_cargue;
+DROP FUNCTION IF EXISTS api_marcar_fecha_actualizacion();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0108_notificar_cambios_cargue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunSQL(CREAR_TRIGGERS_SQL, reverse_sql=ELIMINAR_TRIGGERS_SQL),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.2 on 2026-10-18 09:26
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0109_versionado_get_condicional'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoIA',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('CHAT', 'Chat asistente'), ('ANALISIS', 'Análisis de datos'), ('AGENTE', 'Comando de agente'), ('PREDICCION', 'Predicción de producción')], max_length=20)),
+                ('parametros', models.JSONField(default=dict)),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('EN_PROCESO', 'En proceso'), ('COMPLETADO', 'Completado'), ('ERROR', 'Error')], default='PENDIENTE', max_length=20)),
+                ('resultado', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('intentos', models.IntegerField(default=0)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Trabajo IA',
+                'verbose_name_plural': 'Trabajos IA',
+                'db_table': 'api_trabajo_ia',
+                'ordering': ['-fecha_creacion'],
+                'indexes': [models.Index(fields=['estado', 'fecha_creacion'], name='api_trab_ia_estado_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.2 on 2026-10-18 09:36
+
+import re
+
+from django.db import migrations, models
+
+
+def _maximo(numeros, patron):
+    maximo = 0
+    for numero in numeros:
+        coincidencia = re.fullmatch(patron, numero or '')
+        if coincidencia:
+            maximo = max(maximo, int(coincidencia.group(1)))
+    return maximo
+
+
+def sembrar_consecutivos(apps, schema_editor):
+    """Arrancar los contadores en el mayor número ya emitido"""
+    Consecutivo = apps.get_model('api', 'Consecutivo')
+    Pedido = apps.get_model('api', 'Pedido')
+    Venta = apps.get_model('api', 'Venta')
+
+    pedidos = Pedido.objects.filter(numero_pedido__startswith='PED-').values_list('numero_pedido', flat=True)
+    facturas = Venta.objects.filter(numero_factura__startswith='FV-').values_list('numero_factura', flat=True)
+    Consecutivo.objects.create(clave='PEDIDO', ultimo=_maximo(pedidos.iterator(), r'PED-(\d+)'))
+    Consecutivo.objects.create(clave='FACTURA', ultimo=_maximo(facturas.iterator(), r'FV-(\d+)'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0110_trabajos_ia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Consecutivo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=30, unique=True)),
+                ('ultimo', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Consecutivo',
+                'verbose_name_plural': 'Consecutivos',
+                'db_table': 'api_consecutivo',
+            },
+        ),
+        migrations.RunPython(sembrar_consecutivos, migrations.RunPython.noop),
+    ]
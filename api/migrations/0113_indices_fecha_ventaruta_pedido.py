@@ -0,0 +1,25 @@
+# Generated by Django 4.2.2 on 2026-10-18 10:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0112_trabajos_exportacion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['fecha_entrega', 'asignado_a_id', 'estado'], name='api_pedido_entrega_asig_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ventaruta',
+            index=models.Index(fields=['vendedor', 'fecha'], name='api_ventaruta_vend_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ventaruta',
+            index=models.Index(fields=['estado', 'fecha'], name='api_ventaruta_estado_fecha_idx'),
+        ),
+    ]
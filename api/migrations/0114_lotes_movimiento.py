@@ -0,0 +1,34 @@
+# Generated by Django 4.2.2 on 2026-10-18 10:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0113_indices_fecha_ventaruta_pedido'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoteMovimiento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cargue_id', models.BigIntegerField(db_index=True)),
+                ('lote', models.CharField(max_length=100)),
+                ('tipo', models.CharField(choices=[('PRODUCCION', 'Producción'), ('VENCIDO', 'Vencido')], max_length=10)),
+                ('fecha', models.DateField()),
+                ('dia', models.CharField(blank=True, max_length=10)),
+                ('vendedor_id', models.CharField(max_length=10)),
+                ('producto', models.CharField(blank=True, max_length=255)),
+                ('motivo', models.CharField(blank=True, max_length=50)),
+                ('cantidad', models.IntegerField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Movimiento de Lote',
+                'verbose_name_plural': 'Movimientos de Lotes',
+                'db_table': 'api_lote_movimiento',
+                'indexes': [models.Index(fields=['lote'], name='api_lotemov_lote_idx', opclasses=['varchar_pattern_ops']), models.Index(fields=['tipo', 'fecha'], name='api_lotemov_tipo_fecha_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.2 on 2026-10-18 10:27
+
+import api.services.imagenes_service
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0114_lotes_movimiento'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='evidenciapedido',
+            name='imagen',
+            field=models.ImageField(storage=api.services.imagenes_service.AlmacenamientoImagenes(), upload_to='evidencias_pedidos/%Y/%m/%d/'),
+        ),
+        migrations.AlterField(
+            model_name='evidenciaventa',
+            name='imagen',
+            field=models.ImageField(storage=api.services.imagenes_service.AlmacenamientoImagenes(), upload_to='vencidos/%Y/%m/%d/'),
+        ),
+        migrations.AlterField(
+            model_name='ventaruta',
+            name='foto_vencidos',
+            field=models.ImageField(blank=True, null=True, storage=api.services.imagenes_service.AlmacenamientoImagenes(), upload_to='vencidos/%Y/%m/%d/'),
+        ),
+        migrations.CreateModel(
+            name='ImagenContenido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('archivo', models.CharField(max_length=255)),
+                ('tamano', models.BigIntegerField(default=0)),
+                ('ancho', models.IntegerField(blank=True, null=True)),
+                ('alto', models.IntegerField(blank=True, null=True)),
+                ('variantes', models.JSONField(blank=True, default=dict)),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('EN_PROCESO', 'En proceso'), ('LISTO', 'Listo'), ('ERROR', 'Error')], default='PENDIENTE', max_length=20)),
+                ('error', models.TextField(blank=True, default='')),
+                ('intentos', models.IntegerField(default=0)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Imagen (contenido)',
+                'verbose_name_plural': 'Imágenes (contenido)',
+                'db_table': 'api_imagen_contenido',
+                'indexes': [models.Index(fields=['estado', 'fecha_creacion'], name='api_img_cont_estado_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.2 on 2026-10-18 10:37
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0115_imagenes_contenido'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='cargueid1',
+            options={'managed': False, 'verbose_name': 'Cargue ID1', 'verbose_name_plural': 'Cargues ID1'},
+        ),
+        migrations.AlterModelOptions(
+            name='cargueid2',
+            options={'managed': False, 'verbose_name': 'Cargue ID2', 'verbose_name_plural': 'Cargues ID2'},
+        ),
+        migrations.AlterModelOptions(
+            name='cargueid3',
+            options={'managed': False, 'verbose_name': 'Cargue ID3', 'verbose_name_plural': 'Cargues ID3'},
+        ),
+        migrations.AlterModelOptions(
+            name='cargueid4',
+            options={'managed': False, 'verbose_name': 'Cargue ID4', 'verbose_name_plural': 'Cargues ID4'},
+        ),
+        migrations.AlterModelOptions(
+            name='cargueid5',
+            options={'managed': False, 'verbose_name': 'Cargue ID5', 'verbose_name_plural': 'Cargues ID5'},
+        ),
+        migrations.AlterModelOptions(
+            name='cargueid6',
+            options={'managed': False, 'verbose_name': 'Cargue ID6', 'verbose_name_plural': 'Cargues ID6'},
+        ),
+    ]
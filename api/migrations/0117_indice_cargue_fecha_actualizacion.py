@@ -0,0 +1,17 @@
+# Generated by Django 4.2.2 on 2026-10-18 10:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0116_cargueidx_no_gestionados'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cargue',
+            index=models.Index(fields=['fecha_actualizacion'], name='api_cargue_fecha_act_idx'),
+        ),
+    ]
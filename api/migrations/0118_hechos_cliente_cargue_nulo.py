@@ -0,0 +1,30 @@
+# Generated by Django 4.2.2 on 2026-10-18 10:46
+
+from django.db import migrations, models
+
+
+def separar_filas_cargue(apps, schema_editor):
+    # Las filas puras de cargue pasan a cliente NULL; las que quedaron mezcladas
+    # con una venta sin cliente se corrigen con backfill_hechos_venta
+    HechoVentaDiaria = apps.get_model('api', 'HechoVentaDiaria')
+    HechoVentaDiaria.objects.filter(cliente='', vendidas=0, vencidas=0, monto=0).update(cliente=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0117_indice_cargue_fecha_actualizacion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='hechoventadiaria',
+            name='cliente',
+            field=models.CharField(blank=True, default='', max_length=255, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='hechoventadiaria',
+            constraint=models.UniqueConstraint(condition=models.Q(('cliente__isnull', True)), fields=('fecha', 'vendedor_id', 'producto'), name='api_hecho_cargue_unico'),
+        ),
+        migrations.RunPython(separar_filas_cargue, migrations.RunPython.noop),
+    ]
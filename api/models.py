@@ -1,6 +1,41 @@
-from django.db import models
+import json
+import re
+import unicodedata
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
 from django.utils import timezone
 
+from api.services.imagenes_service import almacenamiento_imagenes
+
+
+@lru_cache(maxsize=4096)
+def normalizar_nombre_producto(nombre_producto):
+    """
+    Clave canónica de un nombre de producto para comparar cargue vs ventas:
+    sin tildes, en mayúsculas, solo alfanuméricos/# y sin plural final
+    ("Arepas Tipo Oblea" == "AREPA TIPO OBLEA").
+    """
+    texto = str(nombre_producto or '').strip()
+    if not texto:
+        return ''
+
+    texto = unicodedata.normalize('NFD', texto)
+    texto = ''.join(ch for ch in texto if unicodedata.category(ch) != 'Mn')
+    texto = texto.upper()
+    texto = re.sub(r'[^A-Z0-9#]+', ' ', texto)
+    texto = re.sub(r'\s+', ' ', texto).strip()
+
+    tokens = []
+    for token in texto.split():
+        if len(token) > 3 and token.endswith('S'):
+            token = token[:-1]
+        tokens.append(token)
+
+    return ' '.join(tokens)
+
 
 def recalcular_totales_cargue_queryset(queryset):
     """
@@ -39,6 +74,7 @@ class Producto(models.Model):
     ]
     
     nombre = models.CharField(max_length=255, unique=True)
+    nombre_normalizado = models.CharField(max_length=255, blank=True, default='', db_index=True, editable=False)  # normalizar_nombre_producto(nombre)
     descripcion = models.TextField(blank=True, null=True)
     precio = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     precio_compra = models.DecimalField(max_digits=10, decimal_places=2, default=0)
@@ -52,6 +88,7 @@ class Producto(models.Model):
     orden = models.IntegerField(default=0, db_index=True)  # Campo para ordenamiento personalizado
     ubicacion_inventario = models.CharField(max_length=20, choices=UBICACION_INVENTARIO_CHOICES, default='PRODUCCION', db_index=True)  # Para filtrar en Inventario
     fecha_creacion = models.DateTimeField(default=timezone.now)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)  # Versión del catálogo (ETag)
     
     # 🆕 DISPONIBILIDAD POR MÓDULO (CRM Web)
     disponible_pos = models.BooleanField(default=True, verbose_name="Disponible en POS")
@@ -75,6 +112,15 @@ class Producto(models.Model):
         es_nuevo = self.pk is None
         skip_stock_sync = kwargs.pop('skip_stock_sync', False)  # Flag para evitar loops
         
+        self.nombre_normalizado = normalizar_nombre_producto(self.nombre)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            # auto_now solo se escribe si está en update_fields
+            update_fields = set(update_fields) | {'fecha_actualizacion'}
+            if 'nombre' in update_fields:
+                update_fields.add('nombre_normalizado')
+            kwargs['update_fields'] = update_fields
+        
         if self.pk:  # Solo si es actualización
             try:
                 old_producto = Producto.objects.get(pk=self.pk)
@@ -157,6 +203,18 @@ class Producto(models.Model):
     def __str__(self):
         return f"{self.nombre} - Stock: {self.stock_total}"
 
+
+def buscar_producto_por_nombre(nombre_producto):
+    """
+    Resuelve un nombre libre (app, cargue) al Producto del catálogo con una
+    consulta sobre el índice de `nombre_normalizado`.
+    """
+    nombre_norm = normalizar_nombre_producto(nombre_producto)
+    if not nombre_norm:
+        return None
+    return Producto.objects.filter(nombre_normalizado=nombre_norm).order_by('id').first()
+
+
 class Stock(models.Model):
     """Modelo para almacenar stock actual de productos"""
     producto = models.OneToOneField(
@@ -359,11 +417,13 @@ class Venta(models.Model):
         return f"Venta #{self.numero_factura} - {self.cliente} - ${self.total}"
     
     def save(self, *args, **kwargs):
-        # Generar número de factura si no existe
-        if not self.numero_factura:
-            import uuid
-            self.numero_factura = f"F{str(uuid.uuid4().int)[:8]}"
-        super().save(*args, **kwargs)
+        # Generar número de factura si no existe (consecutivo sin huecos)
+        if self.numero_factura:
+            return super().save(*args, **kwargs)
+        with transaction.atomic(using=kwargs.get('using')):
+            numero = siguiente_consecutivo(Consecutivo.FACTURA, using=kwargs.get('using'))
+            self.numero_factura = f'FV-{numero:06d}'
+            super().save(*args, **kwargs)
 
 class DetalleVenta(models.Model):
     """Modelo para los items de cada venta"""
@@ -633,6 +693,7 @@ class CargueID1(models.Model):
     class Meta:
         # 🚀 Evitar duplicados: solo un registro por día+fecha+producto
         unique_together = ['dia', 'fecha', 'producto']
+        managed = False  # Vista actualizable sobre api_cargue (migración 0104)
         verbose_name = 'Cargue ID1'
         verbose_name_plural = 'Cargues ID1'
 
@@ -715,6 +776,7 @@ class CargueID2(models.Model):
     
     class Meta:
         unique_together = ['dia', 'fecha', 'producto']
+        managed = False  # Vista actualizable sobre api_cargue (migración 0104)
         verbose_name = 'Cargue ID2'
         verbose_name_plural = 'Cargues ID2'
 
@@ -796,6 +858,7 @@ class CargueID3(models.Model):
     
     class Meta:
         unique_together = ['dia', 'fecha', 'producto']
+        managed = False  # Vista actualizable sobre api_cargue (migración 0104)
         verbose_name = 'Cargue ID3'
         verbose_name_plural = 'Cargues ID3'
 
@@ -945,6 +1008,7 @@ class CargueID4(models.Model):
     
     class Meta:
         unique_together = ['dia', 'fecha', 'producto']
+        managed = False  # Vista actualizable sobre api_cargue (migración 0104)
         verbose_name = 'Cargue ID4'
         verbose_name_plural = 'Cargues ID4'
 
@@ -1026,6 +1090,7 @@ class CargueID5(models.Model):
     
     class Meta:
         unique_together = ['dia', 'fecha', 'producto']
+        managed = False  # Vista actualizable sobre api_cargue (migración 0104)
         verbose_name = 'Cargue ID5'
         verbose_name_plural = 'Cargues ID5'
 
@@ -1107,9 +1172,242 @@ class CargueID6(models.Model):
     
     class Meta:
         unique_together = ['dia', 'fecha', 'producto']
+        managed = False  # Vista actualizable sobre api_cargue (migración 0104)
         verbose_name = 'Cargue ID6'
         verbose_name_plural = 'Cargues ID6'
 
+# ========================================
+# TABLA UNIFICADA DE CARGUE (particionada por mes)
+# ========================================
+
+class Cargue(models.Model):
+    """
+    Tabla única de cargue para todos los vendedores.
+    En PostgreSQL `api_cargue` está particionada por rango mensual de `fecha`
+    (ver migración 0104). Las tablas `api_cargueid1..6` ahora son vistas
+    actualizables sobre esta tabla filtradas por `vendedor_id`, así que los
+    modelos CargueIDx y sus endpoints siguen funcionando sin cambios.
+    """
+    DIAS_CHOICES = CargueID1.DIAS_CHOICES
+    CUMPLIMIENTO_CHOICES = CargueID1.CUMPLIMIENTO_CHOICES
+
+    # ===== IDENTIFICACIÓN =====
+    vendedor_id = models.CharField(max_length=10)  # ID1, ID2, ... (mismo formato que Vendedor.id_vendedor)
+    dia = models.CharField(max_length=10, choices=DIAS_CHOICES)
+    fecha = models.DateField()
+
+    # ===== CHECKBOXES =====
+    v = models.BooleanField(default=False)  # vendedor
+    d = models.BooleanField(default=False)  # despachador
+
+    # ===== PRODUCTOS =====
+    producto = models.CharField(max_length=255, blank=True)
+    cantidad = models.IntegerField(default=0)
+    dctos = models.IntegerField(default=0)
+    adicional = models.IntegerField(default=0)
+    devoluciones = models.IntegerField(default=0)
+    vendidas = models.IntegerField(default=0)
+    vencidas = models.IntegerField(default=0)
+    lotes_vencidos = models.TextField(blank=True)  # JSON string con lotes y motivos
+    lotes_produccion = models.TextField(blank=True)  # JSON string con lotes del día
+    total = models.IntegerField(default=0)
+    valor = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    neto = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    # ===== PAGOS =====
+    concepto = models.CharField(max_length=255, blank=True)
+    descuentos = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    nequi = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    daviplata = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    # ===== RESUMEN =====
+    base_caja = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    total_despacho = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_pedidos = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    total_dctos = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    venta = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_efectivo = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    # ===== CONTROL DE CUMPLIMIENTO =====
+    licencia_transporte = models.CharField(max_length=2, choices=CUMPLIMIENTO_CHOICES, blank=True, null=True)
+    soat = models.CharField(max_length=2, choices=CUMPLIMIENTO_CHOICES, blank=True, null=True)
+    uniforme = models.CharField(max_length=2, choices=CUMPLIMIENTO_CHOICES, blank=True, null=True)
+    no_locion = models.CharField(max_length=2, choices=CUMPLIMIENTO_CHOICES, blank=True, null=True)
+    no_accesorios = models.CharField(max_length=2, choices=CUMPLIMIENTO_CHOICES, blank=True, null=True)
+    capacitacion_carnet = models.CharField(max_length=2, choices=CUMPLIMIENTO_CHOICES, blank=True, null=True)
+    higiene = models.CharField(max_length=2, choices=CUMPLIMIENTO_CHOICES, blank=True, null=True)
+    estibas = models.CharField(max_length=2, choices=CUMPLIMIENTO_CHOICES, blank=True, null=True)
+    desinfeccion = models.CharField(max_length=2, choices=CUMPLIMIENTO_CHOICES, blank=True, null=True)
+
+    # ===== METADATOS =====
+    usuario = models.CharField(max_length=100, default='Sistema')
+    responsable = models.CharField(max_length=100, default='RESPONSABLE', blank=True)
+    ruta = models.CharField(max_length=100, default='', blank=True)
+    activo = models.BooleanField(default=True)
+    fecha_creacion = models.DateTimeField(default=timezone.now)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    def save(self, *args, **kwargs):
+        # Calcular total y neto igual que CargueIDx
+        self.total = self.cantidad - self.dctos + self.adicional - self.devoluciones - self.vencidas
+        self.neto = self.total * self.valor
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.vendedor_id} - {self.dia} - {self.fecha} - {self.producto} - {self.responsable}"
+
+    class Meta:
+        db_table = 'api_cargue'
+        unique_together = ['vendedor_id', 'dia', 'fecha', 'producto']
+        indexes = [
+            models.Index(fields=['vendedor_id', 'fecha'], name='api_cargue_vend_fecha_idx'),
+            models.Index(fields=['fecha'], name='api_cargue_fecha_idx'),
+            # Filas cambiadas desde la última sincronización (caché del historial IA)
+            models.Index(fields=['fecha_actualizacion'], name='api_cargue_fecha_act_idx'),
+        ]
+        verbose_name = 'Cargue'
+        verbose_name_plural = 'Cargues'
+
+
+# Mapa vendedor → modelo de compatibilidad (vistas api_cargueidX).
+# Para lecturas que cruzan vendedores usar directamente `Cargue`.
+MODELOS_CARGUE = {
+    'ID1': CargueID1,
+    'ID2': CargueID2,
+    'ID3': CargueID3,
+    'ID4': CargueID4,
+    'ID5': CargueID5,
+    'ID6': CargueID6,
+}
+
+
+def obtener_modelo_cargue(vendedor_id):
+    """Retorna el modelo CargueIDx para un vendedor ('ID1', 'id1', ...) o None."""
+    return MODELOS_CARGUE.get(str(vendedor_id or '').strip().upper())
+
+
+def _parsear_lotes(texto, tipo):
+    """
+    Lotes de un campo `lotes_produccion` / `lotes_vencidos` como
+    (lote, motivo, cantidad). Acepta JSON (lista de strings o de dicts
+    {lote, motivo, cantidad}) y el texto plano histórico: en producción el
+    texto completo es un lote; en vencidas viene separado por comas.
+    """
+    texto = (texto or '').strip()
+    if not texto or texto == 'undefined':
+        return []
+    try:
+        datos = json.loads(texto)
+    except (TypeError, ValueError):
+        datos = [texto] if tipo == LoteMovimiento.PRODUCCION else texto.split(',')
+    if not isinstance(datos, list):
+        datos = [datos]
+
+    lotes = []
+    for item in datos:
+        motivo, cantidad = '', None
+        if isinstance(item, dict):
+            codigo = item.get('lote')
+            motivo = str(item.get('motivo') or '')[:50]
+            try:
+                cantidad = int(item['cantidad']) if item.get('cantidad') not in (None, '') else None
+            except (TypeError, ValueError):
+                cantidad = None
+        else:
+            codigo = item
+        codigo = normalizar_lote(codigo)
+        if codigo:
+            lotes.append((codigo, motivo, cantidad))
+    return lotes
+
+
+def normalizar_lote(codigo):
+    """Código de lote tal como se indexa y se busca: sin espacios y en mayúsculas."""
+    return str(codigo or '').strip().upper()[:100]
+
+
+class LoteMovimiento(models.Model):
+    """
+    Índice de trazabilidad: una fila por lote mencionado en `lotes_produccion`
+    o `lotes_vencidos` de cada registro de cargue. Permite buscar un lote por
+    igualdad o prefijo con índice en vez de `icontains` sobre el texto JSON.
+
+    Se reescribe con `sincronizar_lotes_cargue` al guardar Cargue/CargueIDx
+    (ver signals.py); el histórico se llena con
+    `manage.py backfill_lotes_movimiento`. `cargue_id` no es FK porque
+    `api_cargue` está particionada. Cantidades y responsable se leen del
+    cargue al consultar: los cierres los ajustan con UPDATE masivos.
+    """
+    PRODUCCION = 'PRODUCCION'
+    VENCIDO = 'VENCIDO'
+    TIPO_CHOICES = [
+        (PRODUCCION, 'Producción'),
+        (VENCIDO, 'Vencido'),
+    ]
+
+    cargue_id = models.BigIntegerField(db_index=True)
+    lote = models.CharField(max_length=100)  # normalizado con normalizar_lote()
+    tipo = models.CharField(max_length=10, choices=TIPO_CHOICES)
+    fecha = models.DateField()
+    dia = models.CharField(max_length=10, blank=True)
+    vendedor_id = models.CharField(max_length=10)
+    producto = models.CharField(max_length=255, blank=True)
+    motivo = models.CharField(max_length=50, blank=True)
+    cantidad = models.IntegerField(null=True, blank=True)  # Solo si el JSON del lote la trae
+
+    def __str__(self):
+        return f"{self.lote} - {self.tipo} - {self.fecha} - {self.vendedor_id} - {self.producto}"
+
+    class Meta:
+        db_table = 'api_lote_movimiento'
+        indexes = [
+            # varchar_pattern_ops sirve igualdad y LIKE 'ABC%' (búsqueda por prefijo)
+            models.Index(fields=['lote'], name='api_lotemov_lote_idx', opclasses=['varchar_pattern_ops']),
+            models.Index(fields=['tipo', 'fecha'], name='api_lotemov_tipo_fecha_idx'),
+        ]
+        verbose_name = 'Movimiento de Lote'
+        verbose_name_plural = 'Movimientos de Lotes'
+
+
+def _movimientos_de_cargue(registro, vendedor_id):
+    movimientos = []
+    for tipo, texto in (
+        (LoteMovimiento.PRODUCCION, registro.lotes_produccion),
+        (LoteMovimiento.VENCIDO, registro.lotes_vencidos),
+    ):
+        for codigo, motivo, cantidad in _parsear_lotes(texto, tipo):
+            movimientos.append(LoteMovimiento(
+                cargue_id=registro.pk,
+                lote=codigo,
+                tipo=tipo,
+                fecha=registro.fecha,
+                dia=registro.dia or '',
+                vendedor_id=vendedor_id,
+                producto=registro.producto or '',
+                motivo=motivo,
+                cantidad=cantidad,
+            ))
+    return movimientos
+
+
+def sincronizar_lotes_cargue(registros, vendedor_id=None):
+    """
+    Reescribe los LoteMovimiento de uno o varios registros de cargue
+    (Cargue o CargueIDx). `vendedor_id` solo hace falta para CargueIDx, que
+    no tiene la columna. Un DELETE y un bulk_create para todo el lote.
+    """
+    if isinstance(registros, models.Model):
+        registros = [registros]
+    movimientos = []
+    for registro in registros:
+        movimientos.extend(_movimientos_de_cargue(
+            registro, getattr(registro, 'vendedor_id', None) or vendedor_id
+        ))
+    with transaction.atomic():
+        LoteMovimiento.objects.filter(cargue_id__in=[r.pk for r in registros]).delete()
+        LoteMovimiento.objects.bulk_create(movimientos, batch_size=1000)
+    return len(movimientos)
+
 # ========================================
 # TABLAS NORMALIZADAS DE CARGUE (Nuevas)
 # ========================================
@@ -1722,6 +2020,10 @@ class Pedido(models.Model):
         db_table = 'api_pedido'
         verbose_name = 'Pedido'
         verbose_name_plural = 'Pedidos'
+        indexes = [
+            # Pedidos del día por vendedor/ruta (cargue, reportes de vendedores)
+            models.Index(fields=['fecha_entrega', 'asignado_a_id', 'estado'], name='api_pedido_entrega_asig_idx'),
+        ]
     
     ESTADO_CHOICES = [
         ('PENDIENTE', 'Pendiente'),
@@ -1801,24 +2103,14 @@ class Pedido(models.Model):
     
     def save(self, *args, **kwargs):
         # Generar número de pedido automáticamente si no existe
-        if not self.numero_pedido:
-            # Obtener el último número
-            ultimo_pedido = Pedido.objects.filter(
-                numero_pedido__startswith='PED-'
-            ).order_by('-id').first()
-            
-            if ultimo_pedido:
-                try:
-                    ultimo_numero = int(ultimo_pedido.numero_pedido.split('-')[1])
-                    nuevo_numero = ultimo_numero + 1
-                except (ValueError, IndexError):
-                    nuevo_numero = 1
-            else:
-                nuevo_numero = 1
-            
-            self.numero_pedido = f'PED-{nuevo_numero:06d}'
-        
-        super().save(*args, **kwargs)
+        if self.numero_pedido:
+            return super().save(*args, **kwargs)
+        # El número y el INSERT van en la misma transacción: si el insert falla
+        # el consecutivo se revierte con él y no quedan huecos
+        with transaction.atomic(using=kwargs.get('using')):
+            numero = siguiente_consecutivo(Consecutivo.PEDIDO, using=kwargs.get('using'))
+            self.numero_pedido = f'PED-{numero:06d}'
+            super().save(*args, **kwargs)
     
     def __str__(self):
         return f"{self.numero_pedido} - {self.destinatario} - ${self.total}"
@@ -2056,7 +2348,7 @@ class VentaRuta(models.Model):
     metodo_pago = models.CharField(max_length=50, default='EFECTIVO')
     detalles = models.JSONField(default=list) # [{producto: "Arepa", cantidad: 10, precio: 2000, subtotal: 20000}, ...]
     productos_vencidos = models.JSONField(default=list, blank=True) # [{producto: "Arepa", cantidad: 5, motivo: "Hongo"}, ...]
-    foto_vencidos = models.ImageField(upload_to='vencidos/%Y/%m/%d/', null=True, blank=True)
+    foto_vencidos = models.ImageField(upload_to='vencidos/%Y/%m/%d/', storage=almacenamiento_imagenes, null=True, blank=True)
     sincronizado = models.BooleanField(default=False)
     editada = models.BooleanField(default=False)  # True si los productos/cantidades fueron modificados
     fecha_ultima_edicion = models.DateTimeField(null=True, blank=True, help_text="Fecha y hora de la última edición de productos/vencidas")
@@ -2082,26 +2374,131 @@ class VentaRuta(models.Model):
         help_text='Si la venta fue a un cliente ocasional'
     )
 
+    class Meta:
+        # Rangos semiabiertos sobre fecha (api/services/rangos_fecha.py);
+        # id_local ya tiene índice por ser unique
+        indexes = [
+            models.Index(fields=['vendedor', 'fecha'], name='api_ventaruta_vend_fecha_idx'),
+            models.Index(fields=['estado', 'fecha'], name='api_ventaruta_estado_fecha_idx'),
+        ]
     
     def __str__(self):
         return f"Venta {self.vendedor} - {self.cliente_nombre} - {self.fecha.strftime('%Y-%m-%d')}"
 
+    def sincronizar_lineas(self):
+        """
+        Reescribe DetalleVentaRuta / VencidaVentaRuta a partir de los JSON
+        `detalles` y `productos_vencidos`. Llamar dentro de la misma transacción
+        que guarda la venta para que las líneas nunca queden desfasadas.
+        """
+        def _items(raw):
+            for item in (raw or []):
+                if not isinstance(item, dict):
+                    continue
+                nombre = str(item.get('producto') or item.get('nombre') or '').strip()
+                try:
+                    cantidad = int(item.get('cantidad') or 0)
+                except (TypeError, ValueError):
+                    cantidad = 0
+                if nombre and cantidad > 0:
+                    yield nombre[:255], cantidad, item
+
+        detalles = list(_items(self.detalles))
+        vencidas = list(_items(self.productos_vencidos))
+
+        nombres = {nombre for nombre, _, _ in detalles + vencidas}
+        productos = dict(
+            Producto.objects.filter(nombre__in=nombres).values_list('nombre', 'id')
+        ) if nombres else {}
+
+        def _decimal(valor):
+            try:
+                return Decimal(str(valor or 0))
+            except (InvalidOperation, ValueError):
+                return Decimal('0')
+
+        self.items_detalle.all().delete()
+        self.items_vencidos.all().delete()
+
+        DetalleVentaRuta.objects.bulk_create([
+            DetalleVentaRuta(
+                venta=self,
+                producto_id=productos.get(nombre),
+                producto_nombre=nombre,
+                cantidad=cantidad,
+                precio=_decimal(item.get('precio')),
+                subtotal=_decimal(item.get('subtotal')),
+            )
+            for nombre, cantidad, item in detalles
+        ])
+        VencidaVentaRuta.objects.bulk_create([
+            VencidaVentaRuta(
+                venta=self,
+                producto_id=productos.get(nombre),
+                producto_nombre=nombre,
+                cantidad=cantidad,
+                motivo=str(item.get('motivo') or '')[:255],
+            )
+            for nombre, cantidad, item in vencidas
+        ])
+
 class EvidenciaVenta(models.Model):
     """Modelo para guardar fotos de evidencia (vencidos) asociadas a una venta"""
     venta = models.ForeignKey(VentaRuta, on_delete=models.CASCADE, related_name='evidencias')
     producto_id = models.IntegerField(help_text="ID del producto al que corresponde la foto", null=True, blank=True)
-    imagen = models.ImageField(upload_to='vencidos/%Y/%m/%d/')
+    imagen = models.ImageField(upload_to='vencidos/%Y/%m/%d/', storage=almacenamiento_imagenes)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"Evidencia Venta {self.venta.id} - Prod {self.producto_id}"
 
 
+class DetalleVentaRuta(models.Model):
+    """Línea de producto vendido en una VentaRuta (espejo relacional de `detalles`)"""
+    venta = models.ForeignKey(VentaRuta, on_delete=models.CASCADE, related_name='items_detalle')
+    producto = models.ForeignKey(Producto, on_delete=models.SET_NULL, null=True, blank=True)
+    producto_nombre = models.CharField(max_length=255)  # Nombre tal como llegó en la venta
+    cantidad = models.IntegerField(default=0)
+    precio = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'api_detalle_venta_ruta'
+        verbose_name = 'Detalle Venta Ruta'
+        verbose_name_plural = 'Detalles Venta Ruta'
+        indexes = [
+            models.Index(fields=['producto_nombre'], name='api_detvr_producto_idx'),
+        ]
+
+    def __str__(self):
+        return f"Venta {self.venta_id} - {self.producto_nombre} x{self.cantidad}"
+
+
+class VencidaVentaRuta(models.Model):
+    """Producto vencido reportado en una VentaRuta (espejo relacional de `productos_vencidos`)"""
+    venta = models.ForeignKey(VentaRuta, on_delete=models.CASCADE, related_name='items_vencidos')
+    producto = models.ForeignKey(Producto, on_delete=models.SET_NULL, null=True, blank=True)
+    producto_nombre = models.CharField(max_length=255)
+    cantidad = models.IntegerField(default=0)
+    motivo = models.CharField(max_length=255, blank=True, default='')
+
+    class Meta:
+        db_table = 'api_vencida_venta_ruta'
+        verbose_name = 'Vencida Venta Ruta'
+        verbose_name_plural = 'Vencidas Venta Ruta'
+        indexes = [
+            models.Index(fields=['producto_nombre'], name='api_vencvr_producto_idx'),
+        ]
+
+    def __str__(self):
+        return f"Venta {self.venta_id} - {self.producto_nombre} vencidas x{self.cantidad}"
+
+
 class EvidenciaPedido(models.Model):
     """Modelo para guardar fotos de evidencia (vencidos/novedades) asociadas a un pedido"""
     pedido = models.ForeignKey(Pedido, on_delete=models.CASCADE, related_name='evidencias')
     producto_nombre = models.CharField(max_length=200, blank=True, help_text="Nombre del producto")
-    imagen = models.ImageField(upload_to='evidencias_pedidos/%Y/%m/%d/')
+    imagen = models.ImageField(upload_to='evidencias_pedidos/%Y/%m/%d/', storage=almacenamiento_imagenes)
     motivo = models.CharField(max_length=255, blank=True, default='Devolución en entrega')
     fecha_creacion = models.DateTimeField(auto_now_add=True)
 
@@ -2396,3 +2793,228 @@ class SyncLog(models.Model):
     def __str__(self):
         status_emoji = '✅' if self.exito else '❌'
         return f"{status_emoji} {self.accion} - {self.dispositivo_id} - {self.timestamp.strftime('%Y-%m-%d %H:%M:%S')}"
+
+
+# ========================================
+# TABLA DE HECHOS: VENTAS DIARIAS (REPORTES)
+# ========================================
+
+class HechoVentaDiaria(models.Model):
+    """
+    Hechos pre-agregados por día / vendedor / producto / cliente para reportes.
+    Se regenera por (vendedor, fecha) cada vez que se crea, edita o anula una
+    VentaRuta y al cerrar turno (ver api/services/hechos_venta_service.py).
+
+    - Filas con cliente: vendidas, vencidas y monto salen de VentaRuta (ACTIVA);
+      las ventas sin nombre de cliente van con cliente=''.
+    - Filas con cliente NULL: cargado y devoluciones salen del cargue del día.
+    """
+    fecha = models.DateField()
+    vendedor_id = models.CharField(max_length=10)  # ID1, ID2, ...
+    producto = models.CharField(max_length=255)
+    # nombre_negocio / cliente_nombre; NULL = fila del cargue
+    cliente = models.CharField(max_length=255, null=True, blank=True, default='')
+    cargado = models.IntegerField(default=0)
+    vendidas = models.IntegerField(default=0)
+    vencidas = models.IntegerField(default=0)
+    devoluciones = models.IntegerField(default=0)
+    monto = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'api_hecho_venta_diaria'
+        unique_together = ['fecha', 'vendedor_id', 'producto', 'cliente']
+        constraints = [
+            # unique_together no compara NULLs: una sola fila de cargue por producto
+            models.UniqueConstraint(
+                fields=['fecha', 'vendedor_id', 'producto'],
+                condition=models.Q(cliente__isnull=True),
+                name='api_hecho_cargue_unico',
+            ),
+        ]
+        verbose_name = 'Hecho Venta Diaria'
+        verbose_name_plural = 'Hechos Ventas Diarias'
+        indexes = [
+            models.Index(fields=['vendedor_id', 'fecha'], name='api_hecho_vend_fecha_idx'),
+            models.Index(fields=['fecha', 'producto'], name='api_hecho_fecha_prod_idx'),
+        ]
+
+    def __str__(self):
+        cliente = 'CARGUE' if self.cliente is None else (self.cliente or 'SIN CLIENTE')
+        return f"{self.fecha} - {self.vendedor_id} - {self.producto} - {cliente}"
+
+
+# ========================================
+# COLA DE TRABAJOS DE IA
+# ========================================
+
+class TrabajoIA(models.Model):
+    """
+    Petición a Ollama/Gemini encolada para no bloquear los workers de gunicorn.
+    La crea el endpoint de IA y la ejecuta un hilo del pool acotado de
+    api/services/trabajos_ia_service.py; el cliente consulta el resultado
+    en /api/ai/trabajos/<id>/.
+    """
+    TIPO_CHOICES = [
+        ('CHAT', 'Chat asistente'),
+        ('ANALISIS', 'Análisis de datos'),
+        ('AGENTE', 'Comando de agente'),
+        ('PREDICCION', 'Predicción de producción'),
+    ]
+
+    ESTADO_CHOICES = [
+        ('PENDIENTE', 'Pendiente'),
+        ('EN_PROCESO', 'En proceso'),
+        ('COMPLETADO', 'Completado'),
+        ('ERROR', 'Error'),
+    ]
+
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
+    parametros = models.JSONField(default=dict)
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='PENDIENTE')
+    resultado = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True, default='')
+    intentos = models.IntegerField(default=0)
+
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'api_trabajo_ia'
+        verbose_name = 'Trabajo IA'
+        verbose_name_plural = 'Trabajos IA'
+        ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['estado', 'fecha_creacion'], name='api_trab_ia_estado_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} {self.tipo} - {self.estado}"
+
+
+class TrabajoExportacion(models.Model):
+    """
+    Exportación a Excel generada fuera de la petición HTTP (planeación
+    mensual, ventas POS en rangos amplios). La crea POST /api/exportaciones/,
+    la ejecuta el pool de api/services/exportaciones_service.py y el archivo
+    queda en media/exports/ hasta `expira_en`. `huella` identifica el tipo +
+    parámetros normalizados: pedidos idénticos reutilizan el mismo archivo.
+    """
+    TIPO_CHOICES = [
+        ('PLANEACION_MENSUAL', 'Planeación mensual'),
+        ('VENTAS_POS', 'Ventas productos POS'),
+    ]
+
+    ESTADO_CHOICES = [
+        ('PENDIENTE', 'Pendiente'),
+        ('EN_PROCESO', 'En proceso'),
+        ('COMPLETADO', 'Completado'),
+        ('ERROR', 'Error'),
+        ('EXPIRADO', 'Expirado'),
+    ]
+
+    tipo = models.CharField(max_length=30, choices=TIPO_CHOICES)
+    parametros = models.JSONField(default=dict)
+    huella = models.CharField(max_length=64, db_index=True)
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='PENDIENTE')
+    progreso = models.PositiveSmallIntegerField(default=0)
+    archivo = models.CharField(max_length=255, blank=True, default='')  # relativo a media/exports/
+    nombre_archivo = models.CharField(max_length=255, blank=True, default='')
+    error = models.TextField(blank=True, default='')
+    intentos = models.IntegerField(default=0)
+
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+    expira_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'api_trabajo_exportacion'
+        verbose_name = 'Trabajo de exportación'
+        verbose_name_plural = 'Trabajos de exportación'
+        ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['estado', 'fecha_creacion'], name='api_trab_exp_estado_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} {self.tipo} - {self.estado}"
+
+
+class ImagenContenido(models.Model):
+    """
+    Imagen guardada una sola vez por contenido (SHA-256) en media/imagenes/
+    por AlmacenamientoImagenes (fotos de vencidos, evidencias de pedidos,
+    imágenes de producto). La fila es también la cola del pool de
+    api/services/imagenes_service.py que genera las variantes redimensionadas
+    (miniatura/mediana) fuera de la petición.
+    """
+    ESTADO_CHOICES = [
+        ('PENDIENTE', 'Pendiente'),
+        ('EN_PROCESO', 'En proceso'),
+        ('LISTO', 'Listo'),
+        ('ERROR', 'Error'),
+    ]
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    archivo = models.CharField(max_length=255)  # original, relativo a MEDIA_ROOT
+    tamano = models.BigIntegerField(default=0)  # bytes del original
+    ancho = models.IntegerField(null=True, blank=True)
+    alto = models.IntegerField(null=True, blank=True)
+    variantes = models.JSONField(default=dict, blank=True)  # {'miniatura': 'imagenes/ab/...webp', ...}
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='PENDIENTE')
+    error = models.TextField(blank=True, default='')
+    intentos = models.IntegerField(default=0)
+
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'api_imagen_contenido'
+        verbose_name = 'Imagen (contenido)'
+        verbose_name_plural = 'Imágenes (contenido)'
+        indexes = [
+            models.Index(fields=['estado', 'fecha_creacion'], name='api_img_cont_estado_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.sha256[:12]} - {self.estado}"
+
+
+class Consecutivo(models.Model):
+    """
+    Contador por tipo de documento (PED-000123, FV-000123). La fila se
+    bloquea con el UPDATE hasta que termina la transacción que crea el
+    documento, así dos pedidos simultáneos (web + app) nunca reciben el
+    mismo número y un rollback no deja huecos.
+    """
+    PEDIDO = 'PEDIDO'
+    FACTURA = 'FACTURA'
+
+    clave = models.CharField(max_length=30, unique=True)
+    ultimo = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'api_consecutivo'
+        verbose_name = 'Consecutivo'
+        verbose_name_plural = 'Consecutivos'
+
+    def __str__(self):
+        return f"{self.clave}: {self.ultimo}"
+
+
+def siguiente_consecutivo(clave, using=None):
+    """
+    Reserva el siguiente número de `clave`. Debe llamarse dentro de la
+    transacción que guarda el documento: el bloqueo de la fila se libera
+    con su COMMIT/ROLLBACK.
+    """
+    consecutivos = Consecutivo.objects.db_manager(using)
+    with transaction.atomic(using=using):
+        if not consecutivos.filter(clave=clave).update(ultimo=models.F('ultimo') + 1):
+            # Primera vez (la migración ya siembra PEDIDO y FACTURA)
+            consecutivos.get_or_create(clave=clave)
+            consecutivos.filter(clave=clave).update(ultimo=models.F('ultimo') + 1)
+        return consecutivos.filter(clave=clave).values_list('ultimo', flat=True).get()
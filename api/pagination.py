@@ -0,0 +1,35 @@
+"""
+Paginación por cursor opcional para los listados grandes (ventas, pedidos,
+movimientos, cargues, clientes).
+
+Es opt-in para no romper a los clientes actuales, que esperan la lista
+completa: solo se pagina si la petición trae `?cursor=` o `?page_size=`.
+
+    GET /api/ventas-ruta/?page_size=200            -> {next, previous, results}
+    GET /api/ventas-ruta/?cursor=cD0yMDI2LTEw...   -> siguiente página
+
+El cursor se ancla en (fecha, id), así que no se repiten ni se saltan filas
+aunque entren ventas nuevas mientras el celular va paginando.
+"""
+from rest_framework.pagination import CursorPagination
+
+
+class PaginacionCursorOpcional(CursorPagination):
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    # El id desempata filas con la misma fecha para que el cursor sea estable
+    ordering = ('-fecha', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_ordering(self, request, queryset, view):
+        # Cada ViewSet puede declarar su propio orden con `orden_paginacion`
+        ordering = getattr(view, 'orden_paginacion', None) or self.ordering
+        if isinstance(ordering, str):
+            return (ordering,)
+        return tuple(ordering)
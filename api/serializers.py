@@ -1,9 +1,10 @@
 from rest_framework import serializers
 from django.db import models
+from .services.imagenes_service import url_variante
 from .models import (
     Planeacion, Registro, Producto, Categoria, Stock, Lote, MovimientoInventario, 
     RegistroInventario, Venta, DetalleVenta, Cliente, ProductosFrecuentes, ListaPrecio, PrecioProducto, 
-    CargueID1, CargueID2, CargueID3, CargueID4, CargueID5, CargueID6,
+    CargueID1, CargueID2, CargueID3, CargueID4, CargueID5, CargueID6, Cargue,
     CargueProductos, CargueResumen, CarguePagos, CargueCumplimiento,  # Nuevos modelos normalizados
     Produccion, ProduccionSolicitada, Sucursal, Cajero, Turno, VentaCajero, 
     ArqueoCaja, MovimientoCaja, Pedido, DetallePedido, Vendedor, Domiciliario, 
@@ -12,6 +13,28 @@ from .models import (
 )
 
 
+class CamposDinamicosMixin:
+    """
+    Proyección de campos con `?fields=id,fecha,total` en los listados (GET).
+
+    Solo aplica al serializer raíz que crea el ViewSet (el que recibe el
+    request en el contexto); los anidados y las escrituras no se tocan.
+    """
+    parametro_campos = 'fields'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method != 'GET':
+            return
+        campos = request.query_params.get(self.parametro_campos)
+        if not campos:
+            return
+        pedidos = {c.strip() for c in campos.split(',') if c.strip()}
+        for nombre in set(self.fields) - pedidos:
+            self.fields.pop(nombre)
+
+
 class CategoriaSerializer(serializers.ModelSerializer):
     """Serializer para categorías"""
     class Meta:
@@ -58,7 +81,7 @@ class LoteSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ('fecha_creacion',)
 
-class MovimientoInventarioSerializer(serializers.ModelSerializer):
+class MovimientoInventarioSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """Serializer para movimientos de inventario"""
     producto_nombre = serializers.ReadOnlyField(source='producto.nombre')
     lote_codigo = serializers.ReadOnlyField(source='lote.lote', allow_null=True)
@@ -112,7 +135,7 @@ class DetalleVentaSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ('subtotal',)
 
-class VentaSerializer(serializers.ModelSerializer):
+class VentaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """Serializer para ventas"""
     detalles = DetalleVentaSerializer(many=True, read_only=True)
     
@@ -132,7 +155,7 @@ class TipoNegocioSerializer(serializers.ModelSerializer):
         model = TipoNegocio
         fields = ['id', 'nombre', 'activo']
 
-class ClienteSerializer(serializers.ModelSerializer):
+class ClienteSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """Serializer para clientes"""
     
     class Meta:
@@ -191,7 +214,7 @@ class PrecioProductoSerializer(serializers.ModelSerializer):
 # NUEVOS SERIALIZERS SIMPLIFICADOS
 # ========================================
 
-class CargueID1Serializer(serializers.ModelSerializer):
+class CargueID1Serializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """Serializer para CargueID1 - Tabla simplificada"""
     
     class Meta:
@@ -216,7 +239,7 @@ class CargueID1Serializer(serializers.ModelSerializer):
         return value
 
 
-class CargueID2Serializer(serializers.ModelSerializer):
+class CargueID2Serializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """Serializer para CargueID2 - Tabla simplificada"""
     
     class Meta:
@@ -233,7 +256,7 @@ class CargueID2Serializer(serializers.ModelSerializer):
         ]
         read_only_fields = ('total', 'neto', 'fecha_creacion', 'fecha_actualizacion')
 
-class CargueID3Serializer(serializers.ModelSerializer):
+class CargueID3Serializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """Serializer para CargueID3 - Tabla simplificada"""
     
     class Meta:
@@ -250,7 +273,7 @@ class CargueID3Serializer(serializers.ModelSerializer):
         ]
         read_only_fields = ('total', 'neto', 'fecha_creacion', 'fecha_actualizacion')
 
-class CargueID4Serializer(serializers.ModelSerializer):
+class CargueID4Serializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """Serializer para CargueID4 - Tabla simplificada"""
     
     class Meta:
@@ -267,7 +290,7 @@ class CargueID4Serializer(serializers.ModelSerializer):
         ]
         read_only_fields = ('total', 'neto', 'fecha_creacion', 'fecha_actualizacion')
 
-class CargueID5Serializer(serializers.ModelSerializer):
+class CargueID5Serializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """Serializer para CargueID5 - Tabla simplificada"""
     
     class Meta:
@@ -284,7 +307,7 @@ class CargueID5Serializer(serializers.ModelSerializer):
         ]
         read_only_fields = ('total', 'neto', 'fecha_creacion', 'fecha_actualizacion')
 
-class CargueID6Serializer(serializers.ModelSerializer):
+class CargueID6Serializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """Serializer para CargueID6 - Tabla simplificada"""
     
     class Meta:
@@ -301,6 +324,33 @@ class CargueID6Serializer(serializers.ModelSerializer):
         ]
         read_only_fields = ('total', 'neto', 'fecha_creacion', 'fecha_actualizacion')
 
+class CargueSerializer(serializers.ModelSerializer):
+    """Serializer para la tabla unificada Cargue (todos los vendedores)"""
+
+    class Meta:
+        model = Cargue
+        fields = [
+            'id', 'vendedor_id', 'dia', 'fecha', 'v', 'd', 'producto', 'cantidad', 'dctos',
+            'adicional', 'devoluciones', 'vendidas', 'vencidas', 'lotes_vencidos', 'lotes_produccion', 'total',
+            'valor', 'neto', 'concepto', 'descuentos', 'nequi', 'daviplata',
+            'base_caja', 'total_despacho', 'total_pedidos', 'total_dctos',
+            'venta', 'total_efectivo', 'licencia_transporte', 'soat', 'uniforme',
+            'no_locion', 'no_accesorios', 'capacitacion_carnet', 'higiene',
+            'estibas', 'desinfeccion', 'usuario', 'responsable', 'ruta', 'activo', 'fecha_creacion',
+            'fecha_actualizacion'
+        ]
+        read_only_fields = ('total', 'neto', 'fecha_creacion', 'fecha_actualizacion')
+
+    def validate_vendedor_id(self, value):
+        return str(value or '').strip().upper()
+
+    def validate_producto(self, value):
+        """Normalizar nombre del producto: eliminar espacios dobles y espacios al inicio/final"""
+        import re
+        if value:
+            return re.sub(r'\s+', ' ', value).strip()
+        return value
+
 # ========================================
 # SERIALIZERS PARA MODELOS NORMALIZADOS (Nuevos)
 # ========================================
@@ -657,15 +707,19 @@ class DetallePedidoSerializer(serializers.ModelSerializer):
 class EvidenciaPedidoSerializer(serializers.ModelSerializer):
     """Serializer para fotos de evidencia de pedidos"""
     from .models import EvidenciaPedido
+    miniatura = serializers.SerializerMethodField()
     
     class Meta:
         from .models import EvidenciaPedido
         model = EvidenciaPedido
-        fields = ['id', 'producto_nombre', 'imagen', 'motivo', 'fecha_creacion']
+        fields = ['id', 'producto_nombre', 'imagen', 'miniatura', 'motivo', 'fecha_creacion']
         read_only_fields = ('fecha_creacion',)
 
+    def get_miniatura(self, obj):
+        return url_variante(obj.imagen, request=self.context.get('request')) if obj.imagen else None
 
-class PedidoSerializer(serializers.ModelSerializer):
+
+class PedidoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """Serializer para pedidos"""
     detalles = DetallePedidoSerializer(many=True, read_only=True)
     detalles_info = DetallePedidoSerializer(source='detalles', many=True, read_only=True)  # Alias para frontend
@@ -690,9 +744,12 @@ class PedidoSerializer(serializers.ModelSerializer):
 
     
     def create(self, validated_data):
+        from collections import defaultdict
+        from decimal import Decimal
         from django.db import transaction
         from django.db import models
-        from .models import Planeacion, Producto, MovimientoInventario, CargueID1, CargueID2, CargueID3, CargueID4, CargueID5, CargueID6
+        from django.utils import timezone
+        from .models import Planeacion, Producto, MovimientoInventario
         
         # Extraer detalles si vienen en los datos
         detalles_data = self.context['request'].data.get('detalles', [])
@@ -723,22 +780,39 @@ class PedidoSerializer(serializers.ModelSerializer):
             print(f"⚡ Afectar inventario inmediato: {'SÍ' if pedido.afectar_inventario_inmediato else 'NO'}")
             
             # ===== 2. CREAR LOS DETALLES =====
-            from .models import Producto as ProductoModel
+            # Una sola consulta para todos los IDs y otra para los fallbacks por nombre
+            nombres_por_id = {
+                str(pk): nombre for pk, nombre in Producto.objects.filter(
+                    id__in=[d.get('producto') for d in detalles_data if str(d.get('producto') or '').isdigit()]
+                ).values_list('id', 'nombre')
+            }
+            nombres_fallback = {
+                (d.get('producto_nombre') or '').strip()
+                for d in detalles_data
+                if str(d.get('producto')) not in nombres_por_id and (d.get('producto_nombre') or '').strip()
+            }
+            ids_por_nombre = {}
+            if nombres_fallback:
+                filtro_nombres = models.Q()
+                for nombre in nombres_fallback:
+                    filtro_nombres |= models.Q(nombre__iexact=nombre)
+                # Mismo orden que el .first() anterior (Meta.ordering de Producto)
+                for pk, nombre in Producto.objects.filter(filtro_nombres).values_list('id', 'nombre'):
+                    ids_por_nombre.setdefault(nombre.lower(), pk)
+
+            detalles = []
             for detalle_data in detalles_data:
                 producto_id = detalle_data.get('producto')
                 producto_nombre = detalle_data.get('producto_nombre', '')
 
                 # Verificar que el producto existe por ID
-                if not ProductoModel.objects.filter(id=producto_id).exists():
+                if str(producto_id) not in nombres_por_id:
                     print(f"⚠️ producto_id={producto_id} no existe en BD. Intentando resolver por nombre: '{producto_nombre}'")
-                    # Fallback: buscar por nombre exacto o parcial
+                    # Fallback: buscar por nombre exacto
                     if producto_nombre:
-                        producto_obj = ProductoModel.objects.filter(
-                            nombre__iexact=producto_nombre.strip()
-                        ).first()
-                        if producto_obj:
-                            producto_id = producto_obj.id
-                            print(f"✅ Resuelto por nombre: {producto_obj.nombre} → ID {producto_id}")
+                        producto_id = ids_por_nombre.get(producto_nombre.strip().lower())
+                        if producto_id:
+                            print(f"✅ Resuelto por nombre: {producto_nombre} → ID {producto_id}")
                         else:
                             print(f"❌ No encontrado por nombre '{producto_nombre}', omitiendo detalle.")
                             continue
@@ -746,19 +820,23 @@ class PedidoSerializer(serializers.ModelSerializer):
                         print(f"❌ Sin nombre para fallback, omitiendo detalle con producto_id={producto_id}.")
                         continue
 
-                DetallePedido.objects.create(
+                cantidad = int(detalle_data['cantidad'])
+                precio_unitario = Decimal(str(detalle_data['precio_unitario']))
+                detalles.append(DetallePedido(
                     pedido=pedido,
                     producto_id=producto_id,
-                    cantidad=detalle_data['cantidad'],
-                    precio_unitario=detalle_data['precio_unitario']
-                )
+                    cantidad=cantidad,
+                    precio_unitario=precio_unitario,
+                    subtotal=cantidad * precio_unitario  # bulk_create no pasa por save()
+                ))
+            DetallePedido.objects.bulk_create(detalles)
             
             # ===== 3. AFECTAR INVENTARIO SI CHECKBOX ESTÁ MARCADO =====
             if pedido.afectar_inventario_inmediato and not pedido.inventario_afectado:
                 print(f"\n⚡ AFECTANDO INVENTARIO INMEDIATAMENTE")
                 print(f"{'='*60}")
                 
-                for detalle in pedido.detalles.all():
+                for detalle in pedido.detalles.select_related('producto'):
                     try:
                         producto = detalle.producto
                         cantidad_a_descontar = detalle.cantidad
@@ -792,36 +870,48 @@ class PedidoSerializer(serializers.ModelSerializer):
                 print(f"\n📊 ACTUALIZANDO PLANEACIÓN")
                 print(f"{'='*60}")
                 
+                # Como antes, la planeación usa el ID enviado (sin el fallback por nombre)
+                pedidos_por_nombre = defaultdict(int)
                 for detalle_data in detalles_data:
-                    try:
-                        producto = Producto.objects.get(id=detalle_data['producto'])
-                        
-                        # Buscar o crear registro en Planeación
-                        planeacion, created = Planeacion.objects.get_or_create(
-                            fecha=pedido.fecha_entrega,
-                            producto_nombre=producto.nombre,
-                            defaults={
-                                'existencias': 0,
-                                'solicitadas': 0,
-                                'pedidos': 0,
-                                'orden': 0,
-                                'ia': 0,
-                                'usuario': 'Sistema'
-                            }
-                        )
-                        
-                        # Sumar la cantidad del pedido
-                        planeacion.pedidos += detalle_data['cantidad']
-                        planeacion.save()  # El total se calcula automáticamente
-                        
-                        print(f"✅ {producto.nombre}: +{detalle_data['cantidad']} = {planeacion.pedidos}")
-                        
-                    except Producto.DoesNotExist:
-                        print(f"⚠️ Producto {detalle_data['producto']} no encontrado")
+                    nombre = nombres_por_id.get(str(detalle_data.get('producto')))
+                    if nombre is None:
+                        print(f"⚠️ Producto {detalle_data.get('producto')} no encontrado")
                         continue
-                    except Exception as e:
+                    try:
+                        pedidos_por_nombre[nombre] += int(detalle_data['cantidad'])
+                    except (KeyError, TypeError, ValueError) as e:
                         print(f"⚠️ Error actualizando Planeación: {str(e)}")
-                        continue
+
+                if pedidos_por_nombre:
+                    # Upsert: crear las filas que falten en ceros y sumar con un solo UPDATE
+                    Planeacion.objects.bulk_create(
+                        [
+                            Planeacion(
+                                fecha=pedido.fecha_entrega,
+                                producto_nombre=nombre,
+                                usuario='Sistema'
+                            )
+                            for nombre in pedidos_por_nombre
+                        ],
+                        ignore_conflicts=True
+                    )
+                    incremento = models.Case(
+                        *[models.When(producto_nombre=nombre, then=models.Value(cantidad))
+                          for nombre, cantidad in pedidos_por_nombre.items()],
+                        default=models.Value(0),
+                        output_field=models.IntegerField(),
+                    )
+                    Planeacion.objects.filter(
+                        fecha=pedido.fecha_entrega,
+                        producto_nombre__in=pedidos_por_nombre
+                    ).update(
+                        pedidos=models.F('pedidos') + incremento,
+                        # El total se calcula igual que Planeacion.save()
+                        total=models.F('solicitadas') + models.F('pedidos') + incremento,
+                        fecha_actualizacion=timezone.now()
+                    )
+                    for nombre, cantidad in pedidos_por_nombre.items():
+                        print(f"✅ {nombre}: +{cantidad}")
             
             # ===== 5. CREAR CLIENTE EN RUTA SI ESTÁ ASIGNADO A VENDEDOR =====
             if pedido.asignado_a_tipo == 'VENDEDOR' and pedido.asignado_a_id and pedido.fecha_entrega:
@@ -905,42 +995,33 @@ class PedidoSerializer(serializers.ModelSerializer):
                 print(f"\n💼 ACTUALIZANDO CARGUE DEL VENDEDOR")
                 print(f"{'='*60}")
                 
-                # Mapear ID del vendedor al modelo de cargue
-                cargue_models_map = {
-                    'ID1': CargueID1,
-                    'ID2': CargueID2,
-                    'ID3': CargueID3,
-                    'ID4': CargueID4,
-                    'ID5': CargueID5,
-                    'ID6': CargueID6
-                }
-                
-                CargueModel = cargue_models_map.get(pedido.asignado_a_id)
-                
-                if CargueModel:
-                    try:
-                        # Buscar registros de cargue por fecha
-                        cargues = CargueModel.objects.filter(fecha=pedido.fecha_entrega)
-                        
-                        if cargues.exists():
-                            for cargue in cargues:
-                                # Sumar al total_pedidos
-                                total_anterior = float(cargue.total_pedidos or 0)
-                                cargue.total_pedidos = total_anterior + float(pedido.total)
-                                
-                                # Recalcular total_efectivo
-                                if cargue.venta:
-                                    cargue.total_efectivo = float(cargue.venta) - float(cargue.total_pedidos)
-                                
-                                cargue.save()
-                                print(f"✅ {pedido.asignado_a_id}: Total pedidos ${total_anterior} → ${cargue.total_pedidos}")
-                        else:
-                            print(f"⚠️ No se encontró cargue para {pedido.asignado_a_id} en fecha {pedido.fecha_entrega}")
-                    
-                    except Exception as e:
-                        print(f"❌ Error actualizando Cargue {pedido.asignado_a_id}: {str(e)}")
-                else:
-                    print(f"⚠️ Modelo de cargue no encontrado para {pedido.asignado_a_id}")
+                try:
+                    # Un solo UPDATE sobre la tabla unificada (cualquier IDx; la
+                    # fecha poda las particiones). En el SET, F('total_pedidos')
+                    # es el valor anterior. Savepoint propio: si falla no aborta
+                    # la transacción del pedido.
+                    with transaction.atomic():
+                        actualizados = Cargue.objects.filter(
+                            vendedor_id=pedido.asignado_a_id,
+                            fecha=pedido.fecha_entrega
+                        ).update(
+                            total_pedidos=models.F('total_pedidos') + pedido.total,
+                            # Recalcular total_efectivo solo donde hay venta
+                            total_efectivo=models.Case(
+                                models.When(venta=0, then=models.F('total_efectivo')),
+                                default=models.F('venta') - models.F('total_pedidos') - pedido.total,
+                                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+                            ),
+                            fecha_actualizacion=timezone.now()
+                        )
+
+                    if actualizados:
+                        print(f"✅ {pedido.asignado_a_id}: Total pedidos +${pedido.total} en {actualizados} registros")
+                    else:
+                        print(f"⚠️ No se encontró cargue para {pedido.asignado_a_id} en fecha {pedido.fecha_entrega}")
+
+                except Exception as e:
+                    print(f"❌ Error actualizando Cargue {pedido.asignado_a_id}: {str(e)}")
             
             # ===== 6. REGISTRO PARA DOMICILIARIO =====
             if pedido.asignado_a_tipo == 'DOMICILIARIO' and pedido.asignado_a_id:
@@ -956,9 +1037,8 @@ class PedidoSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         from django.db import transaction
         from .models import DetallePedido, EvidenciaPedido, CargueID1, CargueID2, CargueID3, CargueID4, CargueID5, CargueID6
-        import base64
         import uuid
-        from django.core.files.base import ContentFile
+        from .services.imagenes_service import archivo_desde_base64
         
         # Extraer datos adicionales del request
         detalles_data = self.context['request'].data.get('detalles')
@@ -1039,9 +1119,7 @@ class PedidoSerializer(serializers.ModelSerializer):
                     for pic_base64 in pics:
                         if ',' in pic_base64:
                             try:
-                                format, imgstr = pic_base64.split(';base64,')
-                                ext = format.split('/')[-1]
-                                data = ContentFile(base64.b64decode(imgstr), name=f"pedido_{instance.id}_{uuid.uuid4().hex[:6]}.{ext}")
+                                data = archivo_desde_base64(pic_base64, f"pedido_{instance.id}_{uuid.uuid4().hex[:6]}")
                                 
                                 # Buscar nombre del producto si el ID es numérico
                                 prod_nombre = ""
@@ -1200,20 +1278,29 @@ class ClienteRutaSerializer(serializers.ModelSerializer):
         return None
 
 class EvidenciaVentaSerializer(serializers.ModelSerializer):
+    miniatura = serializers.SerializerMethodField()
+
     class Meta:
         model = EvidenciaVenta
-        fields = ['id', 'producto_id', 'imagen', 'fecha_creacion']
+        fields = ['id', 'producto_id', 'imagen', 'miniatura', 'fecha_creacion']
+
+    def get_miniatura(self, obj):
+        return url_variante(obj.imagen, request=self.context.get('request')) if obj.imagen else None
 
-class VentaRutaSerializer(serializers.ModelSerializer):
+class VentaRutaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     vendedor_nombre = serializers.CharField(source='vendedor.nombre', read_only=True)
     ruta_nombre = serializers.CharField(source='ruta.nombre', read_only=True)
     evidencias = EvidenciaVentaSerializer(many=True, read_only=True)
+    foto_vencidos_miniatura = serializers.SerializerMethodField()
     
     class Meta:
         model = VentaRuta
         fields = '__all__'  # Incluye automáticamente dispositivo_id e ip_origen
         # read_only_fields = ('fecha',)  # FECHA debe ser editable para permitir simular días anteriores
 
+    def get_foto_vencidos_miniatura(self, obj):
+        return url_variante(obj.foto_vencidos, request=self.context.get('request')) if obj.foto_vencidos else None
+
 class ClienteOcasionalSerializer(serializers.ModelSerializer):
     """Serializer para clientes ocasionales (ventas en calle)"""
     vendedor_nombre = serializers.CharField(source='vendedor.nombre', read_only=True)
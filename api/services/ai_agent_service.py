@@ -1,13 +1,18 @@
 """
 Servicio de Agente IA con Herramientas
 Permite a la IA ejecutar acciones reales en el CRM
+
+Usar obtener_agente(model): una instancia por proceso y modelo; las
+herramientas se definen una vez y los documentos se releen solo si cambian.
 """
 import json
+import threading
 import requests
 from datetime import datetime, timedelta
-from pathlib import Path
 from typing import Dict, List, Any
-from api.services.rag_context_loader import load_shared_rag_context
+from api.services.ai_runtime import cache_respuestas, clave_prompt, obtener_sesion_http
+from api.services.rag_context_loader import load_project_doc, load_shared_rag_context
+from api.services.rangos_fecha import filtro_dia, rango_fechas
 
 
 class AIAgentService:
@@ -19,12 +24,23 @@ class AIAgentService:
         self.model = model
         self.base_url = "http://localhost:11434/api"
         self.tools = self._define_tools()
-        self.context = self._load_documentation()
+
+    @property
+    def context(self) -> str:
+        return self._load_documentation()
+
+    def contexto_para(self, consulta: str, max_caracteres: int = 1500) -> str:
+        """
+        Solo los fragmentos de documentación relevantes para `consulta`
+        (índice BM25); si el índice no encuentra nada, el inicio de la
+        documentación completa como antes.
+        """
+        from api.services.indice_docs_service import contexto_relevante
+        return contexto_relevante(consulta, max_caracteres=max_caracteres) or self.context[:2500]
         
     def _load_documentation(self) -> str:
         """Carga documentación del CRM para contexto del agente"""
         docs = []
-        base_path = Path(__file__).parent.parent.parent
 
         # Contexto compartido principal (steering)
         shared_rag = load_shared_rag_context()
@@ -39,15 +55,13 @@ class AIAgentService:
         ]
         
         for doc_file in doc_files:
-            file_path = base_path / doc_file
-            if file_path.exists():
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    # Manual completo para el conocimiento, otros resumidos
-                    if "MANUAL_CONOCIMIENTO" in doc_file:
-                        docs.append(f"## {doc_file}\n{content}")  # Completo
-                    else:
-                        docs.append(f"## {doc_file}\n{content[:2000]}")  # Resumido
+            content = load_project_doc(doc_file)
+            if content:
+                # Manual completo para el conocimiento, otros resumidos
+                if "MANUAL_CONOCIMIENTO" in doc_file:
+                    docs.append(f"## {doc_file}\n{content}")  # Completo
+                else:
+                    docs.append(f"## {doc_file}\n{content[:2000]}")  # Resumido
         
         return "\n\n".join(docs) if docs else ""
         
@@ -457,31 +471,16 @@ class AIAgentService:
                     fecha_inicio_str = parameters.get("fecha_inicio")
                     fecha_fin_str = parameters.get("fecha_fin")
                     
-                    # Función para hacer fechas conscientes
-                    def make_aware_safe(dt):
-                        if timezone.is_naive(dt):
-                            return timezone.make_aware(dt)
-                        return dt
-
                     now = timezone.now()
                     
                     # Si no vienen fechas en parámetros, intentar deducir o usar default
+                    # Rango semiabierto [start_date, end_date) en la zona del proyecto
                     if not fecha_inicio_str:
                          # Default: Mes actual
-                         start_date = now.replace(day=1, hour=0, minute=0, second=0)
-                         end_date = now
+                         start_date, end_date = rango_fechas(timezone.localdate(now).replace(day=1), now)
                     else:
                         try:
-                            start_date = datetime.strptime(fecha_inicio_str, "%Y-%m-%d")
-                            # Asegurar aware
-                            start_date = make_aware_safe(start_date)
-                            
-                            if fecha_fin_str:
-                                end_date = datetime.strptime(fecha_fin_str, "%Y-%m-%d")
-                                end_date = end_date.replace(hour=23, minute=59, second=59)
-                                end_date = make_aware_safe(end_date)
-                            else:
-                                end_date = start_date.replace(hour=23, minute=59, second=59)
+                            start_date, end_date = rango_fechas(fecha_inicio_str, fecha_fin_str or fecha_inicio_str)
                         except ValueError:
                              return {"success": False, "message": "Formato de fecha inválido. Usa YYYY-MM-DD."}
 
@@ -512,7 +511,7 @@ class AIAgentService:
                         es_vendedor_ruta = True
                         
                     if not es_vendedor_ruta:
-                        q_pos = Venta.objects.filter(fecha__range=[start_date, end_date], estado='PAGADO')
+                        q_pos = Venta.objects.filter(fecha__gte=start_date, fecha__lt=end_date, estado='PAGADO')
                         if vendedor_filtro: 
                             q_pos = q_pos.filter(vendedor__icontains=vendedor_filtro)
                                 
@@ -525,7 +524,7 @@ class AIAgentService:
                         count_pos = 0
                     
                     # 3. Consultar PEDIDOS
-                    q_ped = Pedido.objects.filter(fecha__range=[start_date, end_date])
+                    q_ped = Pedido.objects.filter(fecha__gte=start_date, fecha__lt=end_date)
                     if vendedor_filtro: 
                         # Para IDs de ruta, buscar también en campo asignado_a_id
                         if vendedor_filtro.upper().startswith("ID") and len(vendedor_filtro) <= 4:
@@ -563,7 +562,7 @@ class AIAgentService:
                     for m_name in modelos_a_consultar:
                         try:
                             ModelClass = getattr(api.models, m_name)
-                            q_ruta = ModelClass.objects.filter(fecha__range=[start_date, end_date])
+                            q_ruta = ModelClass.objects.filter(fecha__gte=start_date, fecha__lt=end_date)
                             
                             # LOGICA CORREGIDA:
                             # Solo filtrar por 'responsable' si estamos buscando por NOMBRE en todas las tablas.
@@ -626,10 +625,8 @@ class AIAgentService:
                 try:
                     # Configurar fecha de búsqueda
                     if fecha_str:
-                         dt = datetime.strptime(fecha_str, "%Y-%m-%d")
-                         # Rango de todo ese día
-                         start = timezone.make_aware(dt.replace(hour=0,minute=0))
-                         end = timezone.make_aware(dt.replace(hour=23,minute=59))
+                         # Rango de todo ese día: [00:00, 00:00 del día siguiente)
+                         start, end = rango_fechas(fecha_str, fecha_str)
                     else:
                          # Si no da fecha, buscar en los últimos 90 días (3 meses) por defecto
                          end = timezone.now()
@@ -638,7 +635,7 @@ class AIAgentService:
                     # 1. Búsqueda principal
                     pedidos = Pedido.objects.filter(
                         (Q(destinatario__icontains=nombre_cliente) | Q(numero_pedido__icontains=nombre_cliente)),
-                        fecha__range=[start, end]
+                        fecha__gte=start, fecha__lt=end
                     ).order_by('-fecha')[:5]
                     
                     # 2. Retry inteligente (si no encuentra y tiene espacios, probar unido)
@@ -646,14 +643,14 @@ class AIAgentService:
                         nombre_sin_espacios = nombre_cliente.replace(" ", "")
                         pedidos = Pedido.objects.filter(
                             (Q(destinatario__icontains=nombre_sin_espacios) | Q(numero_pedido__icontains=nombre_sin_espacios)),
-                            fecha__range=[start, end]
+                            fecha__gte=start, fecha__lt=end
                         ).order_by('-fecha')[:5]
 
                     if not pedidos.exists():
                         # Intentar buscar en Venta (POS) por si fue venta mostrador con nombre
                         ventas_pos = Venta.objects.filter(
                             cliente__icontains=nombre_cliente,
-                             fecha__range=[start, end]
+                             fecha__gte=start, fecha__lt=end
                         ).order_by('-fecha')[:5]
                         
                         if ventas_pos.exists():
@@ -736,7 +733,7 @@ class AIAgentService:
             elif tool_name == "generar_reporte_ventas":
                 fecha = parameters.get("fecha", timezone.now().strftime("%Y-%m-%d"))
                 
-                ventas = Venta.objects.filter(fecha=fecha).aggregate(
+                ventas = Venta.objects.filter(**filtro_dia('fecha', fecha)).aggregate(
                     total=Sum('total'),
                     cantidad=Count('codigo')
                 )
@@ -1079,7 +1076,7 @@ INFORMACIÓN DE CONTEXTO:
 - Modelos disponibles: Clientes, Ventas, Pedidos, Productos.
 
 CONTEXTO FUNCIONAL DEL CRM:
-{self.context[:2500]}
+{self.contexto_para(command)}
 
 HERRAMIENTAS DISPONIBLES:
 {tools_description}
@@ -1126,15 +1123,22 @@ JSON:"""
         }
         
         try:
-            response = requests.post(
-                f"{self.base_url}/generate",
-                json=payload,
-                timeout=120
-            )
-            response.raise_for_status()
-            
-            result = response.json()
-            ai_response = result.get("response", "").strip()
+            # temperature 0: el mismo prompt mapea siempre a la misma acción,
+            # así que comandos repetidos no vuelven a llamar a Ollama
+            clave = clave_prompt('ollama', self.base_url, payload)
+            ai_response = cache_respuestas.obtener(clave)
+            if ai_response is None:
+                response = obtener_sesion_http().post(
+                    f"{self.base_url}/generate",
+                    json=payload,
+                    timeout=120
+                )
+                response.raise_for_status()
+                
+                result = response.json()
+                ai_response = result.get("response", "").strip()
+                if ai_response:
+                    cache_respuestas.guardar(clave, ai_response)
             
             # Intentar parsear como JSON
             try:
@@ -1242,3 +1246,18 @@ JSON:"""
                 "action_taken": False,
                 "session_id": current_session_id
             }
+
+
+_agentes = {}
+_agentes_lock = threading.Lock()
+
+
+def obtener_agente(model="qwen2.5:7b"):
+    """AIAgentService compartido por proceso para cada modelo (inicialización perezosa)."""
+    agente = _agentes.get(model)
+    if agente is None:
+        with _agentes_lock:
+            agente = _agentes.get(model)
+            if agente is None:
+                agente = _agentes[model] = AIAgentService(model=model)
+    return agente
@@ -1,13 +1,20 @@
 """
 Servicio de Asistente IA usando Google Gemini (Cloud)
 Optimizado para VPS y respuestas rápidas.
+
+Usar obtener_asistente(): una instancia por proceso que recarga
+ia_config.json y la documentación solo cuando cambian en disco.
 """
 import requests
 import json
 import os
-from pathlib import Path
+import threading
 from django.conf import settings
-from api.services.rag_context_loader import load_shared_rag_context
+from api.services.ai_runtime import cache_respuestas, clave_prompt, obtener_sesion_http
+from api.services.rag_context_loader import load_project_doc, load_shared_rag_context
+
+CONFIG_FILE = 'ia_config.json'
+
 
 class AIAssistant:
     """
@@ -16,42 +23,55 @@ class AIAssistant:
     """
     
     def __init__(self, model="gemini-1.5-flash"):
-        # 1. Intentar leer CONFIGURACIÓN DINÁMICA (ia_config.json)
+        self.default_model = model
         self.api_key = None
-        self.model = model  # Default inicial
-        
-        CONFIG_FILE = 'ia_config.json'
-        
-        if os.path.exists(CONFIG_FILE):
+        self.model = model
+        self.base_url = ""
+        self._config_firma = object()  # fuerza la primera lectura
+        self._cargar_config()
+    
+    def _cargar_config(self):
+        """
+        Lee la CONFIGURACIÓN DINÁMICA (ia_config.json, editable desde
+        /api/ia/config/) solo si cambió desde la última lectura.
+        """
+        try:
+            stat = os.stat(CONFIG_FILE)
+            firma = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            firma = None
+        if firma == self._config_firma:
+            return
+        self._config_firma = firma
+
+        api_key = None
+        model = self.default_model  # Default inicial
+        if firma is not None:
             try:
-                import json
                 with open(CONFIG_FILE, 'r') as f:
                     config = json.load(f)
-                    self.api_key = config.get('gemini_api_key')
+                    api_key = config.get('gemini_api_key')
                     # Si hay un modelo personalizado guardado, usarlo
                     if config.get('gemini_model'):
-                        self.model = config.get('gemini_model')
+                        model = config.get('gemini_model')
             except:
                 pass
 
-        # 2. Si no hay API KEY en config, leer del entorno
-        if not self.api_key:
-            self.api_key = os.environ.get('GEMINI_API_KEY') or os.environ.get('GOOGLE_API_KEY')
-            
+        # Si no hay API KEY en config, leer del entorno
+        if not api_key:
+            api_key = os.environ.get('GEMINI_API_KEY') or os.environ.get('GOOGLE_API_KEY')
+
+        self.api_key = api_key
+        self.model = model
         # Endpoint REST oficial de Google
         self.base_url = f"https://generativelanguage.googleapis.com/v1beta/models/{self.model}:generateContent"
-        
-        self.docs_loaded = False
-        self.context = ""
     
     def load_documentation(self):
-        """Carga la documentación del proyecto para contexto"""
-        if self.docs_loaded:
-            return self.context
-        
+        """
+        Carga la documentación del proyecto para contexto. Los archivos se
+        leen de disco solo cuando cambia su mtime (ver rag_context_loader).
+        """
         try:
-            # Buscar documentos en el directorio raíz del proyecto
-            base_path = Path(__file__).parent.parent.parent
             docs = []
             
             # 1) Contexto compartido principal (steering)
@@ -63,24 +83,32 @@ class AIAssistant:
             doc_files = ["RESUMEN_ANALISIS.md"]
             
             for doc_file in doc_files:
-                file_path = base_path / doc_file
-                if file_path.exists():
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                        # Limitamos tamaño para no gastar tokens excesivos
-                        docs.append(content[:4000])
+                content = load_project_doc(doc_file)
+                if content:
+                    # Limitamos tamaño para no gastar tokens excesivos
+                    docs.append(content[:4000])
             
-            self.context = "\n\n---\n\n".join(docs)
-            self.docs_loaded = True
-            return self.context
+            return "\n\n---\n\n".join(docs)
         except Exception as e:
             print(f"⚠️ Error cargando documentación: {e}")
             return ""
     
+    def contexto_para(self, question, max_caracteres):
+        """
+        Fragmentos de documentación relevantes para la pregunta (índice BM25).
+        Si el índice no encuentra nada, el inicio de la documentación como antes.
+        """
+        from api.services.indice_docs_service import contexto_relevante
+        return (
+            contexto_relevante(question, max_caracteres=max_caracteres)
+            or self.load_documentation()[:max_caracteres]
+        )
+    
     def ask(self, question, include_docs=True, temperature=0.7):
         """
         Pregunta al asistente IA (Gemini)
         """
+        self._cargar_config()
         if not self.api_key:
             return "⚠️ Error de Configuración: No se encontró GOOGLE_API_KEY en el archivo .env. Por favor configúrala para usar la IA."
 
@@ -99,8 +127,7 @@ class AIAssistant:
             return f"🐛 Error consultando base de datos: {str(e)}"
 
         # 2. Preparar System Prompt
-        docs = self.load_documentation()
-        docs_slice = docs[:2200] if include_docs else docs[:900]
+        docs_slice = self.contexto_para(question, 2200 if include_docs else 900)
 
         if docs_slice:
             system_instruction = f"""Eres el Asistente IA experto del CRM Fábrica.
@@ -135,9 +162,17 @@ Sé directo y eficiente.
             }
         }
         
-        # 4. Llamar a Google API
+        # 4. Preguntas frecuentes: misma consulta sin datos en vivo -> misma respuesta
+        clave = None
+        if not tool_data:
+            clave = clave_prompt('gemini', self.model, payload)
+            cacheada = cache_respuestas.obtener(clave)
+            if cacheada is not None:
+                return cacheada
+
+        # 5. Llamar a Google API
         try:
-            response = requests.post(
+            response = obtener_sesion_http().post(
                 f"{self.base_url}?key={self.api_key}",
                 headers={'Content-Type': 'application/json'},
                 json=payload,
@@ -153,8 +188,10 @@ Sé directo y eficiente.
             
             # Extraer respuesta de Gemini
             try:
-                answer = data['candidates'][0]['content']['parts'][0]['text']
-                return answer.strip()
+                answer = data['candidates'][0]['content']['parts'][0]['text'].strip()
+                if clave:
+                    cache_respuestas.guardar(clave, answer)
+                return answer
             except (KeyError, IndexError):
                 return "La IA no devolvió una respuesta válida (Bloqueo de seguridad o error interno)."
                 
@@ -181,36 +218,31 @@ Sé directo y eficiente.
         
         # Importar modelos dentro de la función
         from api.models import Venta, Pedido
+        from api.services.rangos_fecha import filtro_fechas
 
-        now = timezone.now()
-        start_date = now.replace(day=1, hour=0, minute=0, second=0)
-        end_date = now
+        # Días en la zona del proyecto (timezone.now() viene en UTC)
+        hoy = timezone.localdate()
+        desde, hasta = hoy.replace(day=1), hoy
         
         q_lower = question.lower()
         
         # Lógica de fechas
         if 'ayer' in q_lower:
-            start_date = now - timedelta(days=1)
-            start_date = start_date.replace(hour=0, minute=0, second=0)
-            end_date = start_date.replace(hour=23, minute=59, second=59)
+            desde = hasta = hoy - timedelta(days=1)
         elif 'hoy' in q_lower:
-            start_date = now.replace(hour=0, minute=0, second=0)
+            desde = hoy
         elif 'mes pasado' in q_lower:
-            first = now.replace(day=1)
-            last_month = first - timedelta(days=1)
-            start_date = last_month.replace(day=1, hour=0, minute=0)
-            end_date = last_month.replace(hour=23, minute=59)
+            hasta = hoy.replace(day=1) - timedelta(days=1)
+            desde = hasta.replace(day=1)
 
-        # Consultas ORM
+        # Consultas ORM (rango semiabierto: usa el índice de fecha)
         ventas_pos = Venta.objects.filter(
-            fecha__gte=start_date, 
-            fecha__lte=end_date,
+            **filtro_fechas('fecha', desde, hasta),
             estado='PAGADO'
         ).aggregate(total=Sum('total'), count=Count('id'))
         
         ventas_pedidos = Pedido.objects.filter(
-            fecha__gte=start_date,
-            fecha__lte=end_date,
+            **filtro_fechas('fecha', desde, hasta),
             tipo_pedido='ENTREGA'
         ).aggregate(total=Sum('total'), count=Count('id'))
 
@@ -219,8 +251,8 @@ Sé directo y eficiente.
         
         return {
             "rango": {
-                "inicio": start_date.strftime("%Y-%m-%d %H:%M"),
-                "fin": end_date.strftime("%Y-%m-%d %H:%M")
+                "inicio": f"{desde:%Y-%m-%d} 00:00",
+                "fin": f"{hasta:%Y-%m-%d} 23:59"
             },
             "ventas": {
                 "pos_local": float(total_pos),
@@ -245,6 +277,7 @@ Sé directo y eficiente.
     
     def check_health(self):
         """Verifica conexión con Google"""
+        self._cargar_config()
         if not self.api_key:
              return {
                 'status': 'error',
@@ -254,7 +287,7 @@ Sé directo y eficiente.
 
         try:
             # Prueba simple de ping (generar 'Hola')
-            requests.post(
+            obtener_sesion_http().post(
                 f"{self.base_url}?key={self.api_key}",
                 headers={'Content-Type': 'application/json'},
                 json={"contents": [{"parts": [{"text": "Hola"}]}]},
@@ -272,3 +305,17 @@ Sé directo y eficiente.
                 'message': f'Error conectando a Gemini: {str(e)}',
                 'provider': 'Google Gemini (Error)'
             }
+
+
+_asistente = None
+_asistente_lock = threading.Lock()
+
+
+def obtener_asistente():
+    """AIAssistant compartido por todo el proceso (inicialización perezosa)."""
+    global _asistente
+    if _asistente is None:
+        with _asistente_lock:
+            if _asistente is None:
+                _asistente = AIAssistant()
+    return _asistente
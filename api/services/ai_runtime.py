@@ -0,0 +1,87 @@
+"""
+Recursos compartidos por los servicios de IA dentro de un proceso:
+
+- Sesión HTTP reutilizable (keep-alive) hacia Ollama / Gemini, una por hilo.
+- Caché LRU con TTL de respuestas del LLM (hash del prompt -> respuesta) para
+  las preguntas frecuentes que se repiten durante el día.
+
+Configuración (settings, opcionales):
+    IA_CACHE_MAX_ENTRADAS   respuestas guardadas por proceso (por defecto 256)
+    IA_CACHE_TTL            segundos que vive una respuesta (por defecto 600)
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from django.conf import settings
+
+_local = threading.local()
+
+
+def obtener_sesion_http():
+    """
+    requests.Session del hilo actual. Reutiliza las conexiones TCP/TLS entre
+    llamadas; los hilos del pool de trabajos IA viven todo el proceso, así
+    que cada uno arma su pool una sola vez.
+    """
+    sesion = getattr(_local, 'sesion', None)
+    if sesion is None:
+        sesion = requests.Session()
+        adaptador = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=4)
+        sesion.mount('http://', adaptador)
+        sesion.mount('https://', adaptador)
+        _local.sesion = sesion
+    return sesion
+
+
+def clave_prompt(*partes):
+    """Hash estable de todo lo que define la respuesta (modelo, prompt, opciones)."""
+    crudo = json.dumps(partes, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(crudo.encode('utf-8')).hexdigest()
+
+
+class CacheRespuestasIA:
+    """LRU acotado por tamaño con expiración por TTL. Seguro entre hilos."""
+
+    def __init__(self, max_entradas=256, ttl=600):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._datos = OrderedDict()  # clave -> (expira_en, valor)
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            expira_en, valor = entrada
+            if expira_en < time.monotonic():
+                del self._datos[clave]
+                return None
+            self._datos.move_to_end(clave)
+            return valor
+
+    def guardar(self, clave, valor):
+        if self.max_entradas <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._datos[clave] = (time.monotonic() + self.ttl, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def __len__(self):
+        return len(self._datos)
+
+
+cache_respuestas = CacheRespuestasIA(
+    max_entradas=int(getattr(settings, 'IA_CACHE_MAX_ENTRADAS', 256)),
+    ttl=int(getattr(settings, 'IA_CACHE_TTL', 600)),
+)
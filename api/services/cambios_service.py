@@ -0,0 +1,236 @@
+"""
+Feed de cambios de cargue, estado y turno por (vendedor, fecha).
+
+Los triggers de la migración 0108 publican cada cambio en el canal
+`crm_cambios` de PostgreSQL (LISTEN/NOTIFY). Cada proceso mantiene una sola
+conexión escuchando ese canal y reparte los avisos en memoria; los endpoints
+de long-poll y SSE solo despiertan al cliente cuando algo de su vendedor y
+fecha cambió, en vez de que cada navegador/celular consulte la BD cada pocos
+segundos.
+"""
+import json
+import logging
+import os
+import queue
+import select
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.dateparse import parse_date
+
+from api.models import Cargue, CargueResumen, TurnoVendedor
+
+logger = logging.getLogger(__name__)
+
+CANAL_CAMBIOS = 'crm_cambios'
+TIPOS_CAMBIO = ('cargue', 'estado', 'turno')
+
+
+def _parsear_aviso(payload):
+    try:
+        evento = json.loads(payload)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(evento, dict) or evento.get('tipo') not in TIPOS_CAMBIO:
+        return None
+    return {
+        'tipo': evento['tipo'],
+        'vendedor_id': str(evento.get('vendedor_id') or '').upper(),
+        'fecha': str(evento.get('fecha') or '')[:10],
+    }
+
+
+def _aplica(evento, vendedor_id, fecha):
+    if fecha and evento['fecha'] != str(fecha):
+        return False
+    # El estado del cargue es global del día (se guarda con ID1 como referencia)
+    if evento['tipo'] == 'estado':
+        return True
+    return not vendedor_id or evento['vendedor_id'] == vendedor_id
+
+
+def cambios_desde(vendedor_id, fecha, desde):
+    """
+    Eventos de lo que cambió después de `desde` (datetime). Cubre la ventana
+    entre la última consulta del cliente y el LISTEN de esta petición.
+    """
+    fecha = parse_date(str(fecha or '')[:10]) if fecha else None
+    if not desde or not fecha:
+        return []
+
+    eventos = []
+    cargue = Cargue.objects.filter(fecha=fecha, fecha_actualizacion__gt=desde)
+    turnos = TurnoVendedor.objects.filter(fecha=fecha, fecha_actualizacion__gt=desde)
+    if vendedor_id:
+        cargue = cargue.filter(vendedor_id=vendedor_id)
+        numero = vendedor_id.replace('ID', '')
+        turnos = turnos.filter(vendedor_id=int(numero)) if numero.isdigit() else turnos.none()
+
+    if cargue.exists():
+        eventos.append({'tipo': 'cargue', 'vendedor_id': vendedor_id or '', 'fecha': str(fecha)})
+    if CargueResumen.objects.filter(fecha=fecha, fecha_actualizacion__gt=desde).exists():
+        eventos.append({'tipo': 'estado', 'vendedor_id': vendedor_id or '', 'fecha': str(fecha)})
+    if turnos.exists():
+        eventos.append({'tipo': 'turno', 'vendedor_id': vendedor_id or '', 'fecha': str(fecha)})
+    return eventos
+
+
+def _max_oyentes():
+    # gthread 4x8: cada escucha ocupa un hilo de la petición; dejar hilos libres para el resto
+    return max(int(getattr(settings, 'CAMBIOS_MAX_OYENTES', 4)), 1)
+
+
+class OyentesAgotados(Exception):
+    """Este proceso ya tiene CAMBIOS_MAX_OYENTES escuchas abiertas: responder 503."""
+
+
+class _OyenteCompartido:
+    """
+    Una sola conexión con LISTEN por proceso. Un hilo recibe los avisos de
+    `crm_cambios` y los reparte en memoria a las escuchas suscritas, en vez de
+    que cada petición abierta tenga su propia conexión escuchando. Si no queda
+    ninguna escucha, el hilo cierra la conexión y termina.
+    """
+
+    ESPERA_SELECT = 5  # Segundos entre revisiones de suscripciones/conexión
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._escuchas = set()
+        self._hilo = None
+        self._listo = threading.Event()
+        self._cupos = None
+
+    def reservar(self):
+        with self._lock:
+            if self._cupos is None:
+                self._cupos = threading.BoundedSemaphore(_max_oyentes())
+        return self._cupos.acquire(blocking=False)
+
+    def liberar(self):
+        self._cupos.release()
+
+    def suscribir(self, escucha, espera_listo=2):
+        with self._lock:
+            self._escuchas.add(escucha)
+            if self._hilo is None or not self._hilo.is_alive():
+                self._listo.clear()
+                self._hilo = threading.Thread(target=self._escuchar, name='crm-cambios', daemon=True)
+                self._hilo.start()
+        # Con el LISTEN activo el llamador revisa lo pendiente (cambios_desde) sin dejar hueco
+        self._listo.wait(espera_listo)
+
+    def desuscribir(self, escucha):
+        with self._lock:
+            self._escuchas.discard(escucha)
+
+    def _repartir(self, evento):
+        with self._lock:
+            escuchas = list(self._escuchas)
+        for escucha in escuchas:
+            escucha.entregar(evento)
+
+    def _sin_escuchas(self):
+        with self._lock:
+            if not self._escuchas:
+                self._hilo = None
+                return True
+        return False
+
+    def _escuchar(self):
+        while not self._sin_escuchas():
+            conexion = connections.create_connection(DEFAULT_DB_ALIAS)
+            try:
+                conexion.ensure_connection()
+                conexion_pg = conexion.connection
+                with conexion.cursor() as cursor:
+                    cursor.execute(f'LISTEN {CANAL_CAMBIOS}')
+                self._listo.set()
+                logger.info(f"📡 LISTEN {CANAL_CAMBIOS} compartido (pid {os.getpid()})")
+
+                while not self._sin_escuchas():
+                    listos, _, _ = select.select([conexion_pg], [], [], self.ESPERA_SELECT)
+                    if not listos:
+                        continue
+                    conexion_pg.poll()
+                    while conexion_pg.notifies:
+                        evento = _parsear_aviso(conexion_pg.notifies.pop(0).payload)
+                        if evento:
+                            self._repartir(evento)
+                return
+            except Exception as e:
+                # Conexión caída: los clientes cubren el hueco con su cursor (`desde`)
+                self._listo.clear()
+                logger.warning(f"⚠️ LISTEN {CANAL_CAMBIOS} interrumpido, reconectando: {e}")
+                time.sleep(1)
+            finally:
+                try:
+                    conexion.close()
+                except Exception:
+                    pass
+
+
+_oyente = _OyenteCompartido()
+
+
+class EscuchaCambios:
+    """
+    Suscripción a `crm_cambios` filtrada por (vendedor_id, fecha).
+
+        with EscuchaCambios('ID1', '2026-10-18') as escucha:
+            eventos = escucha.esperar(25)
+
+    No abre conexión propia: se suscribe al oyente compartido del proceso.
+    Cada escucha sí ocupa el hilo de su petición, por eso hay un cupo de
+    CAMBIOS_MAX_OYENTES por proceso; sin cupo, abrir() lanza OyentesAgotados.
+    """
+
+    def __init__(self, vendedor_id=None, fecha=None):
+        self.vendedor_id = str(vendedor_id or '').strip().upper() or None
+        self.fecha = str(fecha or '')[:10] or None
+        self._eventos = queue.SimpleQueue()
+        self._abierta = False
+
+    def abrir(self):
+        if not _oyente.reservar():
+            raise OyentesAgotados()
+        self._abierta = True
+        _oyente.suscribir(self)
+        return self
+
+    def cerrar(self):
+        if self._abierta:
+            self._abierta = False
+            _oyente.desuscribir(self)
+            _oyente.liberar()
+
+    def __enter__(self):
+        return self.abrir()
+
+    def __exit__(self, *exc):
+        self.cerrar()
+        return False
+
+    def entregar(self, evento):
+        """Llamado desde el hilo del oyente compartido."""
+        if _aplica(evento, self.vendedor_id, self.fecha):
+            self._eventos.put(evento)
+
+    def esperar(self, segundos):
+        """
+        Bloquea hasta que llegue algún cambio que aplique o pasen `segundos`.
+        Retorna la lista de eventos (vacía si venció el tiempo).
+        """
+        try:
+            eventos = [self._eventos.get(timeout=max(segundos, 0))]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                evento = self._eventos.get_nowait()
+            except queue.Empty:
+                return eventos
+            if evento not in eventos:
+                eventos.append(evento)
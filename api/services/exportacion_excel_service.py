@@ -0,0 +1,160 @@
+"""
+Exportación a Excel en streaming (memoria constante).
+
+Los reportes armaban un Workbook completo de openpyxl en memoria (cada celda
+es un objeto Python con su estilo), lo guardaban en un BytesIO y copiaban
+los bytes al HttpResponse: un mes de planeación o de historial podía ocupar
+cientos de MB en un worker.
+
+Aquí:
+- Workbook(write_only=True): cada fila se serializa al XML temporal de la
+  hoja apenas se agrega, no queda en memoria.
+- Los estilos se registran una sola vez como NamedStyle por libro y las
+  celdas solo referencian el nombre.
+- El .xlsx final se escribe en un SpooledTemporaryFile (pasa a disco si
+  crece) y se envía por partes con FileResponse.
+
+Limitaciones del modo write_only: los anchos de columna y altos de fila se
+fijan antes de escribir (no hay autofit después) y las filas solo se
+agregan hacia abajo.
+
+Uso:
+    libro = LibroExcel({'titulo': estilo(font=Font(bold=True))})
+    hoja = libro.hoja('Resumen', anchos=[14, 30])
+    hoja.fila(['VENTAS'], estilo='titulo')
+    for fila in queryset.values_list(...).iterator(chunk_size=TAMANO_LOTE):
+        hoja.fila(fila)
+    return libro.respuesta('ventas.xlsx')
+"""
+import os
+import tempfile
+
+from django.http import FileResponse
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, NamedStyle, PatternFill, Side
+from openpyxl.utils import get_column_letter
+
+CONTENT_TYPE_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Filas por viaje a la BD en los .iterator() de los reportes
+TAMANO_LOTE = 500
+# Hasta este tamaño el .xlsx queda en memoria; por encima pasa a un archivo temporal
+MAX_ARCHIVO_EN_MEMORIA = 5 * 1024 * 1024
+
+BORDE_FINO = Border(
+    left=Side(style='thin'), right=Side(style='thin'),
+    top=Side(style='thin'), bottom=Side(style='thin')
+)
+CENTRO = Alignment(horizontal='center', vertical='center')
+IZQUIERDA = Alignment(horizontal='left', vertical='center')
+DERECHA = Alignment(horizontal='right')
+
+
+def relleno(color):
+    return PatternFill('solid', fgColor=color)
+
+
+def estilo(font=None, fill=None, alignment=None, border=None, number_format=None):
+    """Especificación de un estilo con nombre (ver LibroExcel)."""
+    return {
+        'font': font,
+        'fill': fill,
+        'alignment': alignment,
+        'border': border,
+        'number_format': number_format,
+    }
+
+
+class HojaExcel:
+    """Hoja write_only con contador de filas y estilos por nombre."""
+
+    def __init__(self, ws, anchos=None):
+        self.ws = ws
+        self.fila_actual = 0
+        if isinstance(anchos, dict):
+            anchos = anchos.items()
+        elif anchos:
+            anchos = ((get_column_letter(i), ancho) for i, ancho in enumerate(anchos, 1))
+        for letra, ancho in anchos or ():
+            ws.column_dimensions[letra].width = ancho
+
+    def fila(self, valores=(), estilo=None, estilos=None, alto=None):
+        """
+        Agrega una fila. `estilo` aplica a todas las celdas de `valores`
+        (incluidas las vacías) y `estilos` ({columna 1-based: nombre}) lo
+        reemplaza por columna. Retorna el número de la fila escrita.
+        """
+        self.fila_actual += 1
+        if alto:
+            self.ws.row_dimensions[self.fila_actual].height = alto
+
+        celdas = []
+        for columna, valor in enumerate(valores, 1):
+            nombre = estilos.get(columna, estilo) if estilos else estilo
+            if nombre is None:
+                celdas.append(valor)
+                continue
+            celda = WriteOnlyCell(self.ws, value=valor)
+            celda.style = nombre
+            celdas.append(celda)
+        self.ws.append(celdas)
+        return self.fila_actual
+
+    def combinar(self, rango):
+        """Combina celdas (p. ej. 'A1:K1'); se escribe al cerrar la hoja."""
+        self.ws.merged_cells.add(rango)
+
+
+class LibroExcel:
+    """Workbook write_only con los estilos del reporte precalculados."""
+
+    def __init__(self, estilos=None):
+        self.wb = Workbook(write_only=True)
+        for nombre, spec in (estilos or {}).items():
+            estilo_con_nombre = NamedStyle(name=nombre)
+            for atributo, valor in spec.items():
+                if valor is not None:
+                    setattr(estilo_con_nombre, atributo, valor)
+            self.wb.add_named_style(estilo_con_nombre)
+
+    def hoja(self, titulo, anchos=None, indice=None):
+        """
+        Crea una hoja. `indice` permite ponerla antes de otras ya escritas
+        (p. ej. el Resumen, que se arma al final pero va de primero).
+        """
+        return HojaExcel(self.wb.create_sheet(title=titulo[:31], index=indice), anchos)
+
+    @property
+    def vacio(self):
+        return not self.wb.sheetnames
+
+    def guardar(self, ruta):
+        """Guarda el libro en `ruta` (temporal + reemplazo atómico). Retorna el tamaño."""
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        temporal = f'{ruta}.{os.getpid()}.tmp'
+        try:
+            self.wb.save(temporal)
+            os.replace(temporal, ruta)
+        except Exception:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+        return os.path.getsize(ruta)
+
+    def respuesta(self, nombre_archivo):
+        """Guarda el libro en un archivo temporal y lo envía por partes."""
+        archivo = tempfile.SpooledTemporaryFile(max_size=MAX_ARCHIVO_EN_MEMORIA)
+        try:
+            self.wb.save(archivo)
+            archivo.seek(0)
+        except Exception:
+            archivo.close()
+            raise
+        # FileResponse cierra el archivo al terminar de enviarlo
+        return FileResponse(
+            archivo,
+            as_attachment=True,
+            filename=nombre_archivo,
+            content_type=CONTENT_TYPE_XLSX,
+        )
@@ -0,0 +1,359 @@
+"""
+Cola local de exportaciones Excel en segundo plano, sin broker externo.
+
+La planeación mensual o las ventas POS de un rango amplio pueden pasar el
+timeout de 120s de gunicorn (Dockerfile.prod) y ocupan un worker todo ese
+tiempo. POST /api/exportaciones/ crea un TrabajoExportacion y responde de
+inmediato; un pool de hilos acotado lo genera en media/exports/ y el
+cliente consulta /api/exportaciones/<id>/ (progreso) hasta poder descargar
+/api/exportaciones/<id>/descargar/.
+
+- Misma mecánica de cola que trabajos_ia_service: la tabla es la cola y un
+  candado de aviso de PostgreSQL hace global el tope de concurrencia.
+- Deduplicación: tipo + parámetros normalizados -> `huella`; si ya hay un
+  trabajo en curso o un archivo vigente con esa huella se reutiliza.
+- En producción la descarga la sirve nginx (X-Accel-Redirect a una location
+  `internal`); Django solo valida y responde los encabezados.
+- Los archivos expiran a las EXPORTACIONES_TTL_MINUTOS; limpiar_vencidos()
+  los borra (también: python manage.py limpiar_exportaciones).
+
+Configuración (settings, opcionales):
+    EXPORTACIONES_MAX_CONCURRENCIA  exportaciones simultáneas (por defecto 1)
+    EXPORTACIONES_TRABAJO_TIMEOUT   segundos para dar por muerto un EN_PROCESO (1800)
+    EXPORTACIONES_TTL_MINUTOS       vigencia del archivo generado (60)
+    EXPORTACIONES_X_ACCEL           servir la descarga vía nginx (False)
+    EXPORTACIONES_X_ACCEL_PREFIJO   location interna de nginx ('/exportaciones-internas/')
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.http import FileResponse, HttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.http import content_disposition_header
+
+from api.models import TrabajoExportacion
+from api.services.exportacion_excel_service import CONTENT_TYPE_XLSX
+
+logger = logging.getLogger(__name__)
+
+# Clave fija del candado de aviso que serializa el reclamo de exportaciones
+CANDADO_COLA_EXPORTACIONES = 734202
+MAX_INTENTOS = 2
+SUBDIRECTORIO = 'exports'
+ESTADOS_EN_CURSO = ('PENDIENTE', 'EN_PROCESO')
+
+
+def _max_concurrencia():
+    return max(int(getattr(settings, 'EXPORTACIONES_MAX_CONCURRENCIA', 1)), 1)
+
+
+def _timeout_trabajo():
+    return int(getattr(settings, 'EXPORTACIONES_TRABAJO_TIMEOUT', 1800))
+
+
+def _ttl():
+    return timedelta(minutes=int(getattr(settings, 'EXPORTACIONES_TTL_MINUTOS', 60)))
+
+
+def directorio():
+    return os.path.join(settings.MEDIA_ROOT, SUBDIRECTORIO)
+
+
+def ruta_archivo(trabajo):
+    return os.path.join(directorio(), trabajo.archivo)
+
+
+# ---------------------------------------------------------------------------
+# Tipos de exportación
+# ---------------------------------------------------------------------------
+
+def _parametros_ventas_pos(datos):
+    fecha_inicio, fecha_fin = datos.get('fecha_inicio'), datos.get('fecha_fin')
+    if not fecha_inicio or not fecha_fin:
+        raise ValueError('fecha_inicio y fecha_fin son requeridos')
+    try:
+        inicio, fin = parse_date(str(fecha_inicio)), parse_date(str(fecha_fin))
+    except ValueError:
+        inicio = fin = None
+    if inicio is None or fin is None:
+        raise ValueError('Formato de fecha inválido. Use YYYY-MM-DD')
+    if inicio > fin:
+        raise ValueError('fecha_inicio no puede ser posterior a fecha_fin')
+    return {'fecha_inicio': inicio.isoformat(), 'fecha_fin': fin.isoformat()}
+
+
+def _parametros_planeacion_mensual(datos):
+    from api.services.reportes_excel_service import parsear_mes
+
+    if not datos.get('mes'):
+        raise ValueError('Parámetro mes requerido (formato: YYYY-MM)')
+    anio, mes = parsear_mes(str(datos['mes']))
+    return {'mes': f'{anio:04d}-{mes:02d}'}
+
+
+def _tarea_ventas_pos(parametros, progreso):
+    from api.services.reportes_excel_service import libro_ventas_productos_pos
+    return libro_ventas_productos_pos(parametros['fecha_inicio'], parametros['fecha_fin'], progreso=progreso)
+
+
+def _tarea_planeacion_mensual(parametros, progreso):
+    from api.services.reportes_excel_service import libro_planeacion_mensual
+    return libro_planeacion_mensual(parametros['mes'], progreso=progreso)
+
+
+# tipo -> (normalizar parámetros, generar (libro, nombre_archivo))
+TIPOS = {
+    'VENTAS_POS': (_parametros_ventas_pos, _tarea_ventas_pos),
+    'PLANEACION_MENSUAL': (_parametros_planeacion_mensual, _tarea_planeacion_mensual),
+}
+
+
+def huella(tipo, parametros):
+    contenido = json.dumps({'tipo': tipo, 'parametros': parametros}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Cola
+# ---------------------------------------------------------------------------
+
+_ejecutor = None
+_ejecutor_lock = threading.Lock()
+
+
+def _obtener_ejecutor():
+    global _ejecutor
+    with _ejecutor_lock:
+        if _ejecutor is None:
+            _ejecutor = ThreadPoolExecutor(
+                max_workers=_max_concurrencia(),
+                thread_name_prefix='exportaciones',
+            )
+        return _ejecutor
+
+
+def _candado():
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [CANDADO_COLA_EXPORTACIONES])
+
+
+def encolar(tipo, datos, forzar=False):
+    """
+    Normaliza los parámetros y retorna (trabajo, creado). Si ya hay un
+    trabajo en curso con la misma huella, o uno COMPLETADO cuyo archivo sigue
+    vigente (salvo `forzar`), se retorna ese. ValueError si el tipo o los
+    parámetros no son válidos.
+    """
+    if tipo not in TIPOS:
+        raise ValueError(f'Tipo de exportación desconocido: {tipo}')
+    normalizar, _ = TIPOS[tipo]
+    parametros = normalizar(datos)
+    firma = huella(tipo, parametros)
+
+    with transaction.atomic():
+        # El mismo candado de la cola: dos POST idénticos simultáneos no duplican
+        _candado()
+        existentes = TrabajoExportacion.objects.filter(huella=firma)
+        trabajo = existentes.filter(estado__in=ESTADOS_EN_CURSO).order_by('-fecha_creacion').first()
+        if trabajo is None and not forzar:
+            trabajo = (
+                existentes.filter(estado='COMPLETADO', expira_en__gt=timezone.now())
+                .order_by('-fecha_creacion').first()
+            )
+            if trabajo is not None and not os.path.exists(ruta_archivo(trabajo)):
+                trabajo = None
+        if trabajo is not None:
+            return trabajo, False
+
+        trabajo = TrabajoExportacion.objects.create(tipo=tipo, parametros=parametros, huella=firma)
+        transaction.on_commit(despachar)
+        return trabajo, True
+
+
+def despachar():
+    """Pide al pool que procese lo pendiente (no bloquea)."""
+    _obtener_ejecutor().submit(_procesar_en_hilo)
+
+
+def _recuperar_colgados(limite):
+    """Trabajos EN_PROCESO de un proceso que murió: reintentar o marcar error."""
+    colgados = TrabajoExportacion.objects.filter(estado='EN_PROCESO', fecha_inicio__lt=limite)
+    colgados.filter(intentos__lt=MAX_INTENTOS).update(estado='PENDIENTE', progreso=0)
+    colgados.update(
+        estado='ERROR',
+        error='Tiempo de ejecución agotado',
+        fecha_fin=timezone.now(),
+    )
+
+
+def reclamar_siguiente():
+    """
+    Marca EN_PROCESO la exportación pendiente más antigua si hay cupo bajo
+    EXPORTACIONES_MAX_CONCURRENCIA. Retorna el trabajo o None.
+    """
+    with transaction.atomic():
+        _candado()
+
+        ahora = timezone.now()
+        _recuperar_colgados(ahora - timedelta(seconds=_timeout_trabajo()))
+
+        if TrabajoExportacion.objects.filter(estado='EN_PROCESO').count() >= _max_concurrencia():
+            return None
+
+        trabajo = (
+            TrabajoExportacion.objects.select_for_update(skip_locked=True)
+            .filter(estado='PENDIENTE')
+            .order_by('fecha_creacion', 'id')
+            .first()
+        )
+        if trabajo is None:
+            return None
+
+        trabajo.estado = 'EN_PROCESO'
+        trabajo.fecha_inicio = ahora
+        trabajo.intentos += 1
+        trabajo.save(update_fields=['estado', 'fecha_inicio', 'intentos'])
+        return trabajo
+
+
+def _reportar_progreso(trabajo):
+    ultimo = [trabajo.progreso]
+
+    def progreso(porcentaje):
+        porcentaje = min(max(int(porcentaje), 0), 99)
+        # Una escritura cada 5% basta para la barra de avance
+        if porcentaje - ultimo[0] >= 5:
+            ultimo[0] = porcentaje
+            TrabajoExportacion.objects.filter(pk=trabajo.pk).update(progreso=porcentaje)
+
+    return progreso
+
+
+def ejecutar(trabajo):
+    _, generar = TIPOS[trabajo.tipo]
+    try:
+        libro, nombre_archivo = generar(trabajo.parametros, _reportar_progreso(trabajo))
+        trabajo.archivo = f'{trabajo.huella}-{trabajo.id}.xlsx'
+        libro.guardar(ruta_archivo(trabajo))
+        trabajo.nombre_archivo = nombre_archivo
+        trabajo.estado = 'COMPLETADO'
+        trabajo.progreso = 100
+        trabajo.error = ''
+        trabajo.expira_en = timezone.now() + _ttl()
+    except Exception as e:
+        logger.exception(f"Error en exportación #{trabajo.id}")
+        trabajo.archivo = ''
+        trabajo.estado = 'ERROR'
+        trabajo.error = str(e)
+    trabajo.fecha_fin = timezone.now()
+    trabajo.save(update_fields=[
+        'archivo', 'nombre_archivo', 'estado', 'progreso', 'error', 'expira_en', 'fecha_fin',
+    ])
+
+
+def limpiar_vencidos():
+    """
+    Marca EXPIRADO los trabajos vencidos y borra sus archivos, junto con
+    los huérfanos de media/exports/ (p. ej. de un proceso que murió a mitad
+    de guardar). Retorna cuántos archivos borró.
+    """
+    ahora = timezone.now()
+    vencidos = TrabajoExportacion.objects.filter(estado='COMPLETADO', expira_en__lte=ahora)
+    vencidos.update(estado='EXPIRADO', archivo='')
+
+    vigentes = set(
+        TrabajoExportacion.objects.filter(estado='COMPLETADO')
+        .exclude(archivo='').values_list('archivo', flat=True)
+    )
+    limite = time.time() - _ttl().total_seconds()
+    borrados = 0
+    try:
+        nombres = os.listdir(directorio())
+    except FileNotFoundError:
+        return 0
+    for nombre in nombres:
+        ruta = os.path.join(directorio(), nombre)
+        try:
+            # Los que se están escribiendo aún no figuran como vigentes: respetar el TTL
+            if nombre in vigentes or os.path.getmtime(ruta) > limite:
+                continue
+            os.remove(ruta)
+            borrados += 1
+        except OSError:
+            continue
+    return borrados
+
+
+def procesar_pendientes():
+    """Ejecuta exportaciones mientras haya pendientes y cupo. Retorna cuántas corrió."""
+    procesados = 0
+    while True:
+        trabajo = reclamar_siguiente()
+        if trabajo is None:
+            break
+        ejecutar(trabajo)
+        procesados += 1
+    if procesados:
+        limpiar_vencidos()
+    return procesados
+
+
+def _procesar_en_hilo():
+    try:
+        procesar_pendientes()
+    except Exception as e:
+        logger.error(f"Error procesando cola de exportaciones: {e}")
+    finally:
+        # Cada hilo del pool abre su propia conexión; no dejarla colgada
+        connection.close()
+
+
+# ---------------------------------------------------------------------------
+# Respuestas
+# ---------------------------------------------------------------------------
+
+def serializar(trabajo):
+    return {
+        'trabajo_id': trabajo.id,
+        'tipo': trabajo.tipo,
+        'parametros': trabajo.parametros,
+        'estado': trabajo.estado,
+        'progreso': trabajo.progreso,
+        'error': trabajo.error or None,
+        'nombre_archivo': trabajo.nombre_archivo or None,
+        'url_descarga': f'/api/exportaciones/{trabajo.id}/descargar/' if trabajo.estado == 'COMPLETADO' else None,
+        'fecha_creacion': trabajo.fecha_creacion,
+        'fecha_inicio': trabajo.fecha_inicio,
+        'fecha_fin': trabajo.fecha_fin,
+        'expira_en': trabajo.expira_en,
+    }
+
+
+def respuesta_descarga(trabajo):
+    """
+    Con EXPORTACIONES_X_ACCEL la respuesta va vacía y nginx envía el archivo
+    desde su location interna; sin nginx (desarrollo) lo envía Django.
+    """
+    if getattr(settings, 'EXPORTACIONES_X_ACCEL', False):
+        prefijo = getattr(settings, 'EXPORTACIONES_X_ACCEL_PREFIJO', '/exportaciones-internas/')
+        respuesta = HttpResponse(content_type=CONTENT_TYPE_XLSX)
+        respuesta['X-Accel-Redirect'] = f"{prefijo.rstrip('/')}/{trabajo.archivo}"
+        respuesta['Content-Disposition'] = content_disposition_header(True, trabajo.nombre_archivo)
+        return respuesta
+
+    return FileResponse(
+        open(ruta_archivo(trabajo), 'rb'),
+        as_attachment=True,
+        filename=trabajo.nombre_archivo,
+        content_type=CONTENT_TYPE_XLSX,
+    )
@@ -11,6 +11,7 @@ from datetime import datetime
 from django.db.models import Sum, Count, Q
 from django.utils import timezone
 from api.services.rag_context_loader import load_shared_rag_context
+from api.services.rangos_fecha import rango_fechas
 
 
 class GeminiAgent:
@@ -121,35 +122,26 @@ class GeminiAgent:
         """Consulta ventas en múltiples fuentes"""
         from api.models import Venta, Pedido
         import api.models
-        from datetime import datetime
         
         fecha_inicio_str = params.get("fecha_inicio")
         fecha_fin_str = params.get("fecha_fin")
         vendedor_filtro = params.get("vendedor")
         
-        # Convertir fechas
-        start_date = datetime.strptime(fecha_inicio_str, "%Y-%m-%d")
-        end_date = datetime.strptime(fecha_fin_str, "%Y-%m-%d")
-        end_date = end_date.replace(hour=23, minute=59, second=59)
-        
-        # Hacer timezone-aware
-        if timezone.is_naive(start_date):
-            start_date = timezone.make_aware(start_date)
-        if timezone.is_naive(end_date):
-            end_date = timezone.make_aware(end_date)
+        # Convertir fechas: rango semiabierto [start_date, end_date) en la zona del proyecto
+        start_date, end_date = rango_fechas(fecha_inicio_str, fecha_fin_str)
         
         # 1. POS (solo si no es vendedor de ruta)
         total_pos = 0
         es_ruta = vendedor_filtro and vendedor_filtro.upper().startswith("ID")
         
         if not es_ruta:
-            q_pos = Venta.objects.filter(fecha__range=[start_date, end_date], estado='PAGADO')
+            q_pos = Venta.objects.filter(fecha__gte=start_date, fecha__lt=end_date, estado='PAGADO')
             if vendedor_filtro:
                 q_pos = q_pos.filter(vendedor__icontains=vendedor_filtro)
             total_pos = float(q_pos.aggregate(t=Sum('total'))['t'] or 0)
         
         # 2. Pedidos
-        q_ped = Pedido.objects.filter(fecha__range=[start_date, end_date])
+        q_ped = Pedido.objects.filter(fecha__gte=start_date, fecha__lt=end_date)
         if vendedor_filtro:
             if es_ruta:
                 q_ped = q_ped.filter(Q(asignado_a_id__iexact=vendedor_filtro) | Q(vendedor__icontains=vendedor_filtro))
@@ -169,7 +161,7 @@ class GeminiAgent:
                 try:
                     ModelClass = getattr(api.models, cargue_map[vid])
                     total_ruta = float(ModelClass.objects.filter(
-                        fecha__range=[start_date, end_date]
+                        fecha__gte=start_date, fecha__lt=end_date
                     ).aggregate(t=Sum('neto'))['t'] or 0)
                 except:
                     pass
@@ -201,9 +193,7 @@ class GeminiAgent:
         fecha_str = params.get("fecha")
         
         if fecha_str:
-            fecha = datetime.strptime(fecha_str, "%Y-%m-%d").date()
-            fecha_inicio = datetime.combine(fecha, datetime.min.time())
-            fecha_fin = datetime.combine(fecha, datetime.max.time())
+            fecha_inicio, fecha_fin = rango_fechas(fecha_str, fecha_str)
         else:
             # Últimos 90 días por defecto
             fecha_fin = timezone.now()
@@ -212,7 +202,7 @@ class GeminiAgent:
         # Buscar en Pedidos
         pedidos = Pedido.objects.filter(
             Q(destinatario__icontains=nombre) | Q(numero_pedido__icontains=nombre),
-            fecha__range=[fecha_inicio, fecha_fin]
+            fecha__gte=fecha_inicio, fecha__lt=fecha_fin
         )[:10]
         
         if not pedidos.exists():
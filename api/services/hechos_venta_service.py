@@ -0,0 +1,139 @@
+"""
+Refresco incremental de la tabla de hechos HechoVentaDiaria.
+
+La unidad de refresco es (vendedor, fecha): se recalculan solo las filas de
+ese vendedor en ese día a partir de las líneas de VentaRuta (ACTIVA) y del
+cargue unificado, así una venta creada/editada/anulada o un cierre de turno
+toca unas decenas de filas en vez de obligar a los reportes a recorrer el JSON
+de todas las ventas.
+"""
+import logging
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from api.models import Cargue, DetalleVentaRuta, HechoVentaDiaria, VencidaVentaRuta
+from api.services.rangos_fecha import filtro_dia
+
+logger = logging.getLogger(__name__)
+
+
+def _a_fecha(fecha):
+    """Acepta date, datetime (aware/naive) o 'YYYY-MM-DD'."""
+    if isinstance(fecha, datetime):
+        if timezone.is_aware(fecha):
+            return timezone.localtime(fecha).date()
+        return fecha.date()
+    if isinstance(fecha, date):
+        return fecha
+    return parse_date(str(fecha or '')[:10])
+
+
+def _cliente(fila):
+    return (fila['venta__nombre_negocio'] or fila['venta__cliente_nombre'] or '').strip()[:255]
+
+
+def refrescar_hechos_venta(vendedor_id, fecha):
+    """
+    Regenera los hechos de un vendedor en una fecha. Retorna filas escritas.
+    """
+    vendedor_id = str(vendedor_id or '').strip().upper()
+    fecha = _a_fecha(fecha)
+    if not vendedor_id or not fecha:
+        return 0
+
+    # (producto, cliente) -> acumulados
+    hechos = defaultdict(lambda: {
+        'cargado': 0, 'vendidas': 0, 'vencidas': 0, 'devoluciones': 0, 'monto': Decimal('0')
+    })
+
+    # Líneas relacionales de las ventas del día, agrupadas en SQL
+    filtro_ventas = {
+        'venta__vendedor_id': vendedor_id,
+        'venta__estado': 'ACTIVA',
+        **filtro_dia('venta__fecha', fecha),
+    }
+    campos = ('venta__nombre_negocio', 'venta__cliente_nombre', 'producto_nombre')
+
+    vendidas = DetalleVentaRuta.objects.filter(**filtro_ventas).values(*campos).annotate(
+        total_cantidad=Sum('cantidad'),
+        total_monto=Sum('subtotal'),
+    ).order_by()
+    for fila in vendidas:
+        hecho = hechos[(fila['producto_nombre'], _cliente(fila))]
+        hecho['vendidas'] += fila['total_cantidad'] or 0
+        hecho['monto'] += fila['total_monto'] or Decimal('0')
+
+    vencidas = VencidaVentaRuta.objects.filter(**filtro_ventas).values(*campos).annotate(
+        total_cantidad=Sum('cantidad'),
+    ).order_by()
+    for fila in vencidas:
+        hechos[(fila['producto_nombre'], _cliente(fila))]['vencidas'] += fila['total_cantidad'] or 0
+
+    cargues = Cargue.objects.filter(
+        vendedor_id=vendedor_id,
+        fecha=fecha,
+        activo=True
+    ).exclude(producto='').values_list('producto', 'cantidad', 'dctos', 'adicional', 'devoluciones')
+
+    # Clave de cliente None (NULL): no se mezcla con ventas sin nombre de cliente ('')
+    for producto, cantidad, dctos, adicional, devoluciones in cargues:
+        hecho = hechos[(producto.strip(), None)]
+        hecho['cargado'] += (cantidad or 0) - (dctos or 0) + (adicional or 0)
+        hecho['devoluciones'] += devoluciones or 0
+
+    filas = [
+        HechoVentaDiaria(
+            fecha=fecha,
+            vendedor_id=vendedor_id,
+            producto=producto,
+            cliente=cliente,
+            **valores
+        )
+        for (producto, cliente), valores in hechos.items()
+        if any(valores.values())
+    ]
+
+    with transaction.atomic():
+        HechoVentaDiaria.objects.filter(vendedor_id=vendedor_id, fecha=fecha).delete()
+        HechoVentaDiaria.objects.bulk_create(filas)
+
+    return len(filas)
+
+
+def refrescar_hechos_cargue_modificado(desde):
+    """
+    Regenera los pares (vendedor, fecha) cuyo cargue cambió después de
+    `desde` (datetime). El cargue se edita sin pasar por las ventas (planilla,
+    sugerido, devoluciones), así que `cargado` solo se pone al día aquí; los
+    triggers de 0109 marcan fecha_actualizacion en todo UPDATE y el índice
+    api_cargue_fecha_act_idx mantiene barata la búsqueda. Los borrados no
+    dejan marca: los cubre la señal post_delete de cargue. Retorna los pares.
+    """
+    pares = sorted(
+        Cargue.objects.filter(fecha_actualizacion__gt=desde)
+        .values_list('vendedor_id', 'fecha').distinct().order_by()
+    )
+    for vendedor_id, fecha in pares:
+        refrescar_hechos_venta(vendedor_id, fecha)
+    return pares
+
+
+def programar_refresco_hechos(vendedor_id, fecha):
+    """
+    Agenda el refresco para después del commit de la transacción actual, así
+    los hechos nunca reflejan una venta que terminó en rollback. Un fallo al
+    refrescar solo se registra: el reporte se recupera con el backfill.
+    """
+    def _refrescar():
+        try:
+            refrescar_hechos_venta(vendedor_id, fecha)
+        except Exception as e:
+            logger.error(f"Error refrescando hechos de venta {vendedor_id} {fecha}: {e}")
+
+    transaction.on_commit(_refrescar)
@@ -0,0 +1,233 @@
+"""
+Caché columnar e incremental del historial de ventas de cargue para la IA.
+
+IAService necesitaba en cada predicción todas las filas activas de cargue
+(años de datos) convertidas fila por fila a dicts y luego a DataFrame. Aquí:
+
+- Los días "cerrados" (más viejos que DIAS_ABIERTOS) se guardan en un único
+  .npy estructurado en ia_models/historial_ventas/ que se abre con mmap.
+- Cada actualización solo consulta las fechas posteriores a la marca de agua
+  (`hasta`) y las agrega al final.
+- Si alguna fila ya cacheada cambió (fecha_actualizacion posterior a la
+  última sincronización; los triggers de 0109 la marcan en todo UPDATE) se
+  reconstruye completo; también cada RECONSTRUIR_CADA por los borrados.
+- Los días abiertos se leen siempre en vivo: todavía reciben devoluciones y
+  vencidas.
+"""
+import json
+import logging
+import os
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from api.models import Cargue
+
+logger = logging.getLogger(__name__)
+
+DIRECTORIO = os.path.join('ia_models', 'historial_ventas')
+RUTA_DATOS = os.path.join(DIRECTORIO, 'cargue.npy')
+RUTA_META = os.path.join(DIRECTORIO, 'meta.json')
+VERSION_CACHE = 1
+
+# Días recientes que todavía pueden cambiar (cierre de turno, devoluciones)
+DIAS_ABIERTOS = 3
+# Los borrados no dejan rastro en fecha_actualizacion: reconstrucción periódica
+RECONSTRUIR_CADA = timedelta(days=7)
+
+DTYPE = np.dtype([
+    ('fecha', 'datetime64[D]'),
+    ('producto', np.int32),
+    ('dia', np.int8),
+    ('cantidad', np.int32),
+    ('devoluciones', np.int32),
+    ('vencidas', np.int32),
+])
+
+CAMPOS = ('fecha', 'dia', 'producto', 'cantidad', 'devoluciones', 'vencidas')
+
+_lock = threading.Lock()
+
+
+def _filas_cargue(**filtros):
+    return (
+        Cargue.objects.filter(activo=True, **filtros)
+        .exclude(producto__isnull=True)
+        .exclude(producto='')
+        .values_list(*CAMPOS)
+    )
+
+
+def _a_arreglo(filas, productos, dias):
+    """Tuplas de _filas_cargue -> arreglo estructurado, ampliando los vocabularios."""
+    indice_productos = {p: i for i, p in enumerate(productos)}
+    indice_dias = {d: i for i, d in enumerate(dias)}
+    arreglo = np.empty(len(filas), dtype=DTYPE)
+    for i, (fecha, dia, producto, cantidad, devoluciones, vencidas) in enumerate(filas):
+        if producto not in indice_productos:
+            indice_productos[producto] = len(productos)
+            productos.append(producto)
+        if dia not in indice_dias:
+            indice_dias[dia] = len(dias)
+            dias.append(dia)
+        arreglo[i] = (fecha, indice_productos[producto], indice_dias[dia],
+                      cantidad or 0, devoluciones or 0, vencidas or 0)
+    return arreglo
+
+
+def _leer_meta():
+    try:
+        with open(RUTA_META, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get('version') == VERSION_CACHE else None
+
+
+def _reemplazar(ruta, escribir):
+    # Archivo temporal por proceso + reemplazo atómico (varios workers de gunicorn)
+    temporal = f'{ruta}.{os.getpid()}.tmp'
+    with open(temporal, 'wb') as f:
+        escribir(f)
+    os.replace(temporal, ruta)
+
+
+def _escribir(datos, meta):
+    os.makedirs(DIRECTORIO, exist_ok=True)
+    _reemplazar(RUTA_DATOS, lambda f: np.save(f, datos))
+    # La meta va de última: si el proceso muere antes, n_filas no cuadra y se reconstruye
+    _reemplazar(RUTA_META, lambda f: f.write(json.dumps(meta, ensure_ascii=False).encode('utf-8')))
+
+
+def _cargar_datos(meta):
+    try:
+        datos = np.load(RUTA_DATOS, mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+    if datos.dtype != DTYPE or len(datos) != meta['n_filas']:
+        return None
+    return datos
+
+
+def _reconstruir(hasta, sincronizado_en):
+    productos, dias = [], []
+    datos = _a_arreglo(list(_filas_cargue(fecha__lte=hasta)), productos, dias)
+    meta = {
+        'version': VERSION_CACHE,
+        'hasta': hasta.isoformat(),
+        'sincronizado_en': sincronizado_en.isoformat(),
+        'reconstruido_en': sincronizado_en.isoformat(),
+        'n_filas': len(datos),
+        'productos': productos,
+        'dias': dias,
+    }
+    _escribir(datos, meta)
+    logger.info(f"🧠 Caché de historial reconstruida: {len(datos)} filas hasta {hasta}")
+    return datos, meta
+
+
+def actualizar_cache(forzar=False):
+    """
+    Lleva la caché hasta hoy - DIAS_ABIERTOS. Retorna (datos, meta), con
+    `datos` como arreglo estructurado (mmap) y meta con los vocabularios.
+    """
+    with _lock:
+        sincronizado_en = timezone.now()
+        hasta = timezone.localdate() - timedelta(days=DIAS_ABIERTOS)
+
+        meta = None if forzar else _leer_meta()
+        datos = _cargar_datos(meta) if meta else None
+        if meta is None or datos is None:
+            datos, meta = _reconstruir(hasta, sincronizado_en)
+        else:
+            hasta_cache = date.fromisoformat(meta['hasta'])
+            # Sin filtrar por activo: desactivar una fila también la cambia.
+            # Usa api_cargue_fecha_act_idx (rango sobre fecha_actualizacion).
+            cambiadas = Cargue.objects.filter(
+                fecha__lte=hasta_cache,
+                fecha_actualizacion__gt=parse_datetime(meta['sincronizado_en']),
+            ).exists()
+            reconstruido_en = parse_datetime(meta['reconstruido_en'])
+            if cambiadas or sincronizado_en - reconstruido_en > RECONSTRUIR_CADA:
+                datos, meta = _reconstruir(hasta, sincronizado_en)
+            elif hasta > hasta_cache:
+                nuevas = _a_arreglo(
+                    list(_filas_cargue(fecha__gt=hasta_cache, fecha__lte=hasta)),
+                    meta['productos'], meta['dias'],
+                )
+                datos = np.concatenate([np.asarray(datos), nuevas])
+                meta.update(
+                    hasta=hasta.isoformat(),
+                    sincronizado_en=sincronizado_en.isoformat(),
+                    n_filas=len(datos),
+                )
+                _escribir(datos, meta)
+                datos = np.load(RUTA_DATOS, mmap_mode='r')
+
+        return datos, meta
+
+
+def _dataframe(datos, productos, dias):
+    productos = np.array(productos or [''], dtype=object)
+    dias = np.array(dias or [''], dtype=object)
+    return pd.DataFrame({
+        'fecha': pd.to_datetime(np.asarray(datos['fecha'])),
+        'dia_nombre': dias[np.asarray(datos['dia'], dtype=np.intp)],
+        'producto': productos[np.asarray(datos['producto'], dtype=np.intp)],
+        'cantidad_cargada': np.asarray(datos['cantidad'], dtype=np.int64),
+        'devoluciones': np.asarray(datos['devoluciones'], dtype=np.int64),
+        'vencidas': np.asarray(datos['vencidas'], dtype=np.int64),
+    })
+
+
+def historial_ventas():
+    """
+    DataFrame con las columnas de IAService.obtener_historial_ventas: caché de
+    días cerrados + días abiertos en vivo.
+    """
+    datos, meta = actualizar_cache()
+    hasta = date.fromisoformat(meta['hasta'])
+
+    productos, dias = list(meta['productos']), list(meta['dias'])
+    recientes = _a_arreglo(list(_filas_cargue(fecha__gt=hasta)), productos, dias)
+    df = _dataframe(np.concatenate([np.asarray(datos), recientes]), productos, dias)
+
+    # 🧠 VENTA NETA = Lo que realmente se vendió
+    df['venta'] = (df['cantidad_cargada'] - df['devoluciones'] - df['vencidas']).clip(lower=0)
+    # Agregar día de la semana (0=Lunes, 6=Domingo)
+    df['dia_semana'] = df['fecha'].dt.dayofweek
+    return df
+
+
+def estadisticas_por_producto(df, ultimos=30):
+    """
+    Estadísticas de los últimos `ultimos` registros de cada producto en una
+    sola pasada (groupby) en vez de filtrar y ordenar el frame por producto.
+    """
+    if df.empty:
+        return {}
+
+    recientes = df.sort_values('fecha', kind='stable').groupby('producto', sort=False).tail(ultimos)
+    agregados = recientes.groupby('producto').agg(
+        total_cargado=('cantidad_cargada', 'sum'),
+        total_devoluciones=('devoluciones', 'sum'),
+        total_vencidas=('vencidas', 'sum'),
+        promedio_venta=('venta', 'mean'),
+        promedio_solicitado=('cantidad_cargada', 'mean'),
+    )
+    retorno = (agregados['total_devoluciones'] + agregados['total_vencidas']) / agregados['total_cargado']
+    agregados['tasa_retorno'] = retorno.where(agregados['total_cargado'] > 0, 0)
+
+    return {
+        producto: {
+            'tasa_retorno_pct': round(float(fila.tasa_retorno) * 100, 1),
+            'promedio_venta_diaria': round(float(fila.promedio_venta), 1),
+            'promedio_solicitado_diario': round(float(fila.promedio_solicitado), 1),
+            'tendencia': 'Estable'  # Simplificado por ahora
+        }
+        for producto, fila in agregados.iterrows()
+    }
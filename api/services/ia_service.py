@@ -3,8 +3,8 @@ import numpy as np
 from datetime import datetime
 import json
 import logging
-from api.models import CargueID1, CargueID2, CargueID3, CargueID4, CargueID5, CargueID6
-from api.services.ai_assistant_service import AIAssistant
+from api.services.ai_assistant_service import obtener_asistente
+from api.services.historial_ventas_service import estadisticas_por_producto, historial_ventas
 
 logger = logging.getLogger(__name__)
 
@@ -12,7 +12,7 @@ from api.services.neural_network_service import NeuralNetworkService
 
 class IAService:
     def __init__(self):
-        self.ai = AIAssistant()
+        self.ai = obtener_asistente()
         self.nn_service = NeuralNetworkService()
 
     def train_with_report(self, reporte):
@@ -23,78 +23,21 @@ class IAService:
         """
         Obtiene el historial de ventas NETAS desde todos los cargues.
         VENTA NETA = cantidad - devoluciones - vencidas
+
+        Los días cerrados salen de la caché columnar incremental
+        (historial_ventas_service); solo los días abiertos van a la BD.
         """
-        registros = []
-        
-        # Obtener de todos los IDs
-        for modelo in [CargueID1, CargueID2, CargueID3, CargueID4, CargueID5, CargueID6]:
-            try:
-                cargues = modelo.objects.filter(activo=True).values(
-                    'fecha', 'dia', 'producto', 'cantidad', 'devoluciones', 'vencidas'
-                )
-                
-                for c in cargues:
-                    if c['producto']:  # Solo si tiene producto
-                        # 🧠 VENTA NETA = Lo que realmente se vendió
-                        venta_neta = c['cantidad'] - c['devoluciones'] - c['vencidas']
-                        
-                        registros.append({
-                            'fecha': c['fecha'],
-                            'dia_nombre': c['dia'],
-                            'producto': c['producto'],
-                            'cantidad_cargada': c['cantidad'],
-                            'devoluciones': c['devoluciones'],
-                            'vencidas': c['vencidas'],
-                            'venta': max(0, venta_neta)
-                        })
-            except Exception as e:
-                logger.error(f"Error leyendo modelo {modelo}: {e}")
-                continue
-        
-        if not registros:
+        try:
+            return historial_ventas()
+        except Exception as e:
+            logger.error(f"Error leyendo historial de cargues: {e}")
             return pd.DataFrame()
-        
-        df = pd.DataFrame(registros)
-        
-        # Convertir fecha a datetime
-        # Asegurar conversión segura
-        df['fecha'] = pd.to_datetime(df['fecha'], errors='coerce')
-        df = df.dropna(subset=['fecha'])
-        
-        # Agregar día de la semana (0=Lunes, 6=Domingo)
-        df['dia_semana'] = df['fecha'].dt.dayofweek
-        
-        return df
 
     def calcular_estadisticas_producto(self, df, producto_nombre):
         """Calcula estadísticas básicas históricas para un producto"""
         if df.empty:
             return None
-            
-        df_prod = df[df['producto'] == producto_nombre].copy()
-        if df_prod.empty:
-            return None
-        
-        # Estadísticas generales (últimos 30 registros para ser más relevante)
-        df_prod = df_prod.sort_values('fecha').tail(30)
-        
-        total_cargado = df_prod['cantidad_cargada'].sum()
-        total_devoluciones = df_prod['devoluciones'].sum()
-        total_vencidas = df_prod['vencidas'].sum()
-        
-        tasa_retorno = 0
-        if total_cargado > 0:
-            tasa_retorno = (total_devoluciones + total_vencidas) / total_cargado
-            
-        promedio_venta = df_prod['venta'].mean()
-        promedio_solicitado = df_prod['cantidad_cargada'].mean()
-        
-        return {
-            'tasa_retorno_pct': round(tasa_retorno * 100, 1),
-            'promedio_venta_diaria': round(promedio_venta, 1),
-            'promedio_solicitado_diario': round(promedio_solicitado, 1),
-            'tendencia': 'Estable' # Simplificado por ahora
-        }
+        return estadisticas_por_producto(df[df['producto'] == producto_nombre]).get(producto_nombre)
 
     def predecir_produccion(self, fecha_objetivo, datos_contextuales=None):
         """
@@ -103,8 +46,9 @@ class IAService:
         2. Si no, usa Gemini 1.5 Flash (LLM).
         """
         resultados_finales = []
+        datos_contextuales = datos_contextuales or {}
         
-        # 1. 🧠 Intentar predicción Neuronal
+        # 1. 🧠 Intentar predicción Neuronal (un solo modelo, todos los productos)
         try:
             predicciones_nn = self.nn_service.predecir(fecha_objetivo, datos_contextuales)
             if predicciones_nn:
@@ -131,6 +75,9 @@ class IAService:
         except:
             df = pd.DataFrame()
 
+        # Estadísticas de todos los productos en una sola pasada
+        estadisticas = estadisticas_por_producto(df)
+
         productos_analisis_gemini = []
         for producto, datos in productos_restantes.items():
             solicitado = datos.get('solicitadas', 0)
@@ -140,7 +87,7 @@ class IAService:
             if solicitado == 0 and pedidos == 0 and stock >= 0:
                 continue
 
-            stats = self.calcular_estadisticas_producto(df, producto) if not df.empty else None
+            stats = estadisticas.get(producto)
             
             productos_analisis_gemini.append({
                 "producto": producto,
@@ -179,4 +126,8 @@ class IAService:
         return resultados_finales
 
     def entrenar_todos_los_modelos(self):
-         pass
+        """
+        Entrena el modelo de pronóstico con todo el histórico de
+        ReportePlaneacion. Retorna el resumen o None si no hay datos suficientes.
+        """
+        return self.nn_service.entrenar()
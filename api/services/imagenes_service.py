@@ -0,0 +1,349 @@
+"""
+Imágenes direccionadas por contenido con variantes generadas fuera del request.
+
+Las fotos de vencidos y evidencias llegan del teléfono a resolución completa
+(multipart o base64 dentro del JSON de sincronización) y se servían tal cual
+a la web. Ahora:
+
+- AlmacenamientoImagenes (storage de los ImageField de evidencias) guarda el
+  original en media/imagenes/<aa>/<sha256>.<ext> calculando el hash mientras
+  copia por bloques. Si el contenido ya existe (reintentos de la app offline,
+  la misma foto en varios productos) no se escribe de nuevo.
+- archivo_desde_base64() decodifica el base64 por bloques a un archivo
+  temporal en vez de armar el binario completo en memoria.
+- Cada contenido nuevo crea un ImagenContenido PENDIENTE; un pool de hilos
+  acotado (misma mecánica de cola que exportaciones_service, sin broker)
+  genera las variantes `miniatura` y `mediana` en WebP (JPEG si Pillow no
+  trae WebP). El request solo paga el hash y la copia.
+- url_variante() da la URL de la variante si ya existe y, si no, la del
+  original: los listados nunca apuntan a un archivo que aún no está.
+
+Los archivos de media/imagenes/ son inmutables (el nombre es el hash), así
+que nginx los sirve con caché larga. Como un mismo archivo puede estar
+referenciado por varias filas, AlmacenamientoImagenes.delete() no borra.
+
+Configuración (settings, opcionales):
+    IMAGENES_MAX_CONCURRENCIA  imágenes procesadas a la vez por proceso (1)
+    IMAGENES_TRABAJO_TIMEOUT   segundos para dar por muerto un EN_PROCESO (300)
+
+Pendientes atrasados o imágenes anteriores: python manage.py procesar_imagenes
+"""
+import base64
+import binascii
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+logger = logging.getLogger(__name__)
+
+SUBDIRECTORIO = 'imagenes'
+MAX_INTENTOS = 3
+# Lado mayor en píxeles; nunca se amplía una imagen más chica
+VARIANTES = {
+    'mediana': 1280,
+    'miniatura': 320,
+}
+CALIDAD = 80
+EXTENSIONES = {
+    'jpeg': 'jpg', 'jpg': 'jpg', 'pjpeg': 'jpg',
+    'png': 'png', 'webp': 'webp', 'gif': 'gif',
+    'heic': 'heic', 'heif': 'heif', 'bmp': 'bmp',
+}
+BLOQUE_BASE64 = 256 * 1024  # múltiplo de 4
+MAX_EN_MEMORIA = 1024 * 1024  # SpooledTemporaryFile pasa a disco por encima de 1MB
+
+
+def _max_concurrencia():
+    return max(int(getattr(settings, 'IMAGENES_MAX_CONCURRENCIA', 1)), 1)
+
+
+def _timeout_trabajo():
+    return int(getattr(settings, 'IMAGENES_TRABAJO_TIMEOUT', 300))
+
+
+def extension(nombre_o_mime):
+    """'foto.JPEG', 'image/jpeg' o 'jpeg' -> 'jpg' (fotos del teléfono: 'jpg' si no se reconoce)."""
+    valor = str(nombre_o_mime or '').lower().rsplit('/', 1)[-1].rsplit('.', 1)[-1]
+    return EXTENSIONES.get(valor.split(';')[0].strip(), 'jpg')
+
+
+def es_direccionada(nombre):
+    return str(nombre or '').replace('\\', '/').startswith(f'{SUBDIRECTORIO}/')
+
+
+def _formato_variantes():
+    from PIL import features
+    return ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg')
+
+
+def nombre_variante(archivo, variante):
+    """imagenes/ab/<sha>.jpg -> imagenes/ab/<sha>_miniatura.webp"""
+    base = archivo.rsplit('.', 1)[0]
+    return f'{base}_{variante}.{_formato_variantes()[1]}'
+
+
+# ---------------------------------------------------------------------------
+# Entrada: base64 por bloques
+# ---------------------------------------------------------------------------
+
+def archivo_desde_base64(data_url, nombre='imagen'):
+    """
+    'data:image/jpeg;base64,...' (o solo el base64) -> File sobre un temporal,
+    decodificado por bloques. `nombre` sin extensión; se toma del mime.
+    ValueError si el base64 no es válido.
+    """
+    if not isinstance(data_url, str) or not data_url:
+        raise ValueError('Imagen vacía')
+    mime, datos = '', data_url
+    if data_url.startswith('data:') and ';base64,' in data_url[:100]:
+        mime, datos = data_url[5:].split(';base64,', 1)
+
+    destino = tempfile.SpooledTemporaryFile(max_size=MAX_EN_MEMORIA)
+    resto = ''
+    try:
+        for inicio in range(0, len(datos), BLOQUE_BASE64):
+            # El base64 de algunos teléfonos trae saltos de línea: se descartan
+            trozo = resto + ''.join(datos[inicio:inicio + BLOQUE_BASE64].split())
+            corte = len(trozo) - len(trozo) % 4
+            destino.write(base64.b64decode(trozo[:corte], validate=True))
+            resto = trozo[corte:]
+        if resto:
+            raise ValueError('Base64 incompleto')
+    except (ValueError, binascii.Error) as e:
+        destino.close()
+        raise ValueError(f'Imagen base64 inválida: {e}')
+    if not destino.tell():
+        destino.close()
+        raise ValueError('Imagen vacía')
+
+    destino.seek(0)
+    return File(destino, name=f'{nombre}.{extension(mime or "jpg")}')
+
+
+# ---------------------------------------------------------------------------
+# Almacenamiento
+# ---------------------------------------------------------------------------
+
+def guardar_contenido(contenido, nombre=''):
+    """
+    Copia `contenido` (File/UploadedFile) a media/imagenes/ por bloques
+    calculando su SHA-256. Retorna la ruta relativa a MEDIA_ROOT; si el
+    contenido ya estaba guardado retorna la existente sin escribir nada.
+    """
+    from api.models import ImagenContenido
+
+    os.makedirs(os.path.join(settings.MEDIA_ROOT, SUBDIRECTORIO), exist_ok=True)
+    huella = hashlib.sha256()
+    tamano = 0
+    if hasattr(contenido, 'seek'):
+        contenido.seek(0)
+    with tempfile.NamedTemporaryFile(
+        dir=os.path.join(settings.MEDIA_ROOT, SUBDIRECTORIO), suffix='.tmp', delete=False
+    ) as temporal:
+        for bloque in contenido.chunks():
+            huella.update(bloque)
+            temporal.write(bloque)
+            tamano += len(bloque)
+
+    sha = huella.hexdigest()
+    archivo = f'{SUBDIRECTORIO}/{sha[:2]}/{sha}.{extension(nombre)}'
+    ruta = os.path.join(settings.MEDIA_ROOT, archivo)
+    existente = ImagenContenido.objects.filter(sha256=sha).values_list('archivo', flat=True).first()
+    if existente and os.path.exists(os.path.join(settings.MEDIA_ROOT, existente)):
+        os.remove(temporal.name)
+        return existente
+
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    os.replace(temporal.name, ruta)
+    os.chmod(ruta, 0o644)
+    if existente:
+        # La fila quedó pero el archivo no (restauración parcial de media/): regenerar
+        ImagenContenido.objects.filter(sha256=sha).update(
+            archivo=archivo, estado='PENDIENTE', intentos=0, variantes={}, error=''
+        )
+    else:
+        try:
+            with transaction.atomic():
+                ImagenContenido.objects.create(sha256=sha, archivo=archivo, tamano=tamano)
+        except IntegrityError:
+            # Otra petición subió la misma foto al mismo tiempo
+            return ImagenContenido.objects.get(sha256=sha).archivo
+    transaction.on_commit(despachar)
+    return archivo
+
+
+@deconstructible
+class AlmacenamientoImagenes(FileSystemStorage):
+    """
+    FileSystemStorage sobre MEDIA_ROOT que ignora el nombre propuesto (y el
+    upload_to) y guarda por contenido con guardar_contenido().
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # El nombre final lo decide _save() a partir del hash
+        return name
+
+    def _save(self, name, content):
+        return guardar_contenido(content, name)
+
+    def delete(self, name):
+        # El mismo archivo puede estar referenciado por varias filas
+        if es_direccionada(name):
+            return
+        super().delete(name)
+
+
+almacenamiento_imagenes = AlmacenamientoImagenes()
+
+
+def url_variante(archivo, variante='miniatura', request=None):
+    """
+    URL de la variante de un FieldFile o ruta relativa si ya fue generada;
+    si no (pendiente, imagen anterior a este esquema) la del original.
+    """
+    nombre = getattr(archivo, 'name', archivo)
+    if not nombre:
+        return None
+    if es_direccionada(nombre):
+        candidata = nombre_variante(nombre, variante)
+        if os.path.exists(os.path.join(settings.MEDIA_ROOT, candidata)):
+            nombre = candidata
+    url = almacenamiento_imagenes.url(nombre)
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+# ---------------------------------------------------------------------------
+# Variantes
+# ---------------------------------------------------------------------------
+
+def generar_variantes(imagen):
+    """Escribe las variantes de un ImagenContenido. Retorna (ancho, alto, {variante: ruta})."""
+    from PIL import Image, ImageOps
+
+    formato, _ = _formato_variantes()
+    origen = os.path.join(settings.MEDIA_ROOT, imagen.archivo)
+    generadas = {}
+    with Image.open(origen) as img:
+        ancho, alto = img.size
+        lado_max = max(VARIANTES.values())
+        # JPEG: decodificar ya reducido (escalado DCT) cuando la foto es mucho mayor
+        img.draft('RGB', (lado_max, lado_max))
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+        if formato == 'JPEG' and img.mode == 'RGBA':
+            img = img.convert('RGB')
+
+        # De mayor a menor: cada variante parte de la anterior
+        for variante, lado in sorted(VARIANTES.items(), key=lambda v: -v[1]):
+            img.thumbnail((lado, lado), Image.LANCZOS)
+            archivo = nombre_variante(imagen.archivo, variante)
+            ruta = os.path.join(settings.MEDIA_ROOT, archivo)
+            temporal = f'{ruta}.tmp'
+            if formato == 'WEBP':
+                img.save(temporal, formato, quality=CALIDAD, method=4)
+            else:
+                img.save(temporal, formato, quality=CALIDAD, optimize=True, progressive=True)
+            os.replace(temporal, ruta)
+            generadas[variante] = archivo
+    return ancho, alto, generadas
+
+
+# ---------------------------------------------------------------------------
+# Cola
+# ---------------------------------------------------------------------------
+
+_ejecutor = None
+_ejecutor_lock = threading.Lock()
+
+
+def _obtener_ejecutor():
+    global _ejecutor
+    with _ejecutor_lock:
+        if _ejecutor is None:
+            _ejecutor = ThreadPoolExecutor(
+                max_workers=_max_concurrencia(),
+                thread_name_prefix='imagenes',
+            )
+        return _ejecutor
+
+
+def despachar():
+    """Pide al pool que procese lo pendiente (no bloquea)."""
+    _obtener_ejecutor().submit(_procesar_en_hilo)
+
+
+def _recuperar_colgados(limite):
+    from api.models import ImagenContenido
+
+    colgados = ImagenContenido.objects.filter(estado='EN_PROCESO', fecha_inicio__lt=limite)
+    colgados.filter(intentos__lt=MAX_INTENTOS).update(estado='PENDIENTE')
+    colgados.update(estado='ERROR', error='Tiempo de procesamiento agotado', fecha_fin=timezone.now())
+
+
+def reclamar_siguiente():
+    """Marca EN_PROCESO la imagen pendiente más antigua. Retorna la fila o None."""
+    from api.models import ImagenContenido
+
+    with transaction.atomic():
+        ahora = timezone.now()
+        _recuperar_colgados(ahora - timedelta(seconds=_timeout_trabajo()))
+        imagen = (
+            ImagenContenido.objects.select_for_update(skip_locked=True)
+            .filter(estado='PENDIENTE')
+            .order_by('fecha_creacion', 'id')
+            .first()
+        )
+        if imagen is None:
+            return None
+        imagen.estado = 'EN_PROCESO'
+        imagen.fecha_inicio = ahora
+        imagen.intentos += 1
+        imagen.save(update_fields=['estado', 'fecha_inicio', 'intentos'])
+        return imagen
+
+
+def ejecutar(imagen):
+    try:
+        imagen.ancho, imagen.alto, imagen.variantes = generar_variantes(imagen)
+        imagen.estado = 'LISTO'
+        imagen.error = ''
+    except Exception as e:
+        logger.warning(f"No se pudieron generar variantes de {imagen.archivo}: {e}")
+        imagen.estado = 'PENDIENTE' if imagen.intentos < MAX_INTENTOS else 'ERROR'
+        imagen.error = str(e)
+    imagen.fecha_fin = timezone.now()
+    imagen.save(update_fields=['ancho', 'alto', 'variantes', 'estado', 'error', 'fecha_fin'])
+
+
+def procesar_pendientes(limite=None):
+    """Genera variantes mientras haya pendientes. Retorna cuántas imágenes procesó."""
+    procesadas = 0
+    while limite is None or procesadas < limite:
+        imagen = reclamar_siguiente()
+        if imagen is None:
+            break
+        ejecutar(imagen)
+        procesadas += 1
+    return procesadas
+
+
+def _procesar_en_hilo():
+    try:
+        procesar_pendientes()
+    except Exception as e:
+        logger.error(f"Error procesando cola de imágenes: {e}")
+    finally:
+        # Cada hilo del pool abre su propia conexión; no dejarla colgada
+        connection.close()
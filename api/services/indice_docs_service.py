@@ -0,0 +1,322 @@
+"""
+Índice BM25 (NumPy) sobre la documentación markdown del proyecto.
+
+En vez de pegar en cada prompt los primeros miles de caracteres del manual y
+los .md de arquitectura, el asistente y el agente piden solo los fragmentos
+más relevantes para la pregunta (top-k), dentro de un presupuesto de
+caracteres.
+
+Fuentes: AI_CONTEXT.md, .kiro/steering/rag-context.md, MANUAL_CONOCIMIENTO_IA.md,
+RESUMEN_ANALISIS.md, ARQUITECTURA_SISTEMA_CRM.md e IA_SKILLS/**/*.md.
+
+El índice se guarda en ia_models/indice_docs.npz junto con la firma
+(mtime/tamaño) de cada fuente; si alguna cambia se reconstruye solo.
+Reconstrucción manual: python manage.py indexar_documentos_ia
+"""
+import json
+import logging
+import os
+import re
+import threading
+import unicodedata
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+BASE_PATH = Path(settings.BASE_DIR)
+RUTA_INDICE = BASE_PATH / 'ia_models' / 'indice_docs.npz'
+
+DOCUMENTOS = [
+    'AI_CONTEXT.md',
+    '.kiro/steering/rag-context.md',
+    'MANUAL_CONOCIMIENTO_IA.md',
+    'RESUMEN_ANALISIS.md',
+    'ARQUITECTURA_SISTEMA_CRM.md',
+]
+DIRECTORIOS = ['IA_SKILLS']
+
+TAMANO_FRAGMENTO = 900
+VERSION_INDICE = 1
+
+# Parámetros estándar de BM25
+K1 = 1.5
+B = 0.75
+
+STOPWORDS = set("""
+de la el en y a los las del se un una por con para es al lo como mas o pero
+sus le ya fue este esta son entre cuando muy sin sobre ser tiene tambien me
+hasta hay donde quien desde todo nos durante todos uno les ni contra otros
+ese eso ante ellos e esto antes algunos que no si su sea the and of to in is
+for on with
+""".split())
+
+_PALABRA = re.compile(r'[a-z0-9_]{2,}')
+
+
+def tokenizar(texto):
+    texto = unicodedata.normalize('NFKD', texto.lower())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return [t for t in _PALABRA.findall(texto) if t not in STOPWORDS]
+
+
+# ---------------------------------------------------------------------------
+# Fuentes y fragmentos
+# ---------------------------------------------------------------------------
+
+def listar_fuentes():
+    rutas = [BASE_PATH / nombre for nombre in DOCUMENTOS]
+    for directorio in DIRECTORIOS:
+        raiz = BASE_PATH / directorio
+        if raiz.exists():
+            # IA_SKILLS es un enlace simbólico; resolverlo antes de recorrer
+            rutas.extend(sorted(raiz.resolve().rglob('*.md')))
+    return [r for r in rutas if r.is_file()]
+
+
+def _firma_fuentes(rutas):
+    firma = []
+    for ruta in rutas:
+        stat = ruta.stat()
+        firma.append([str(ruta), stat.st_mtime_ns, stat.st_size])
+    return firma
+
+
+def _nombre_fuente(ruta):
+    try:
+        return str(ruta.relative_to(BASE_PATH))
+    except ValueError:
+        return ruta.name
+
+
+def fragmentar(texto, tamano=TAMANO_FRAGMENTO):
+    """
+    Parte el markdown por encabezados y luego por párrafos hasta `tamano`
+    caracteres. Cada fragmento conserva su encabezado como contexto.
+    """
+    fragmentos = []
+    for seccion in re.split(r'\n(?=#{1,4} )', texto):
+        seccion = seccion.strip()
+        if not seccion:
+            continue
+        lineas = seccion.split('\n', 1)
+        titulo = lineas[0] if lineas[0].startswith('#') else ''
+
+        actual = ''
+        for parrafo in re.split(r'\n\s*\n', seccion):
+            parrafo = parrafo.strip()
+            if not parrafo:
+                continue
+            if actual and len(actual) + len(parrafo) + 2 > tamano:
+                fragmentos.append(actual)
+                actual = titulo
+            actual = f'{actual}\n\n{parrafo}' if actual else parrafo
+            # Párrafos gigantes (tablas, bloques de código): cortar en seco
+            while len(actual) > tamano * 2:
+                fragmentos.append(actual[:tamano])
+                actual = actual[tamano:]
+        if actual.strip():
+            fragmentos.append(actual)
+    return fragmentos
+
+
+# ---------------------------------------------------------------------------
+# Índice
+# ---------------------------------------------------------------------------
+
+class IndiceDocs:
+    """
+    Índice invertido en arreglos NumPy (formato CSC: por término, los
+    fragmentos donde aparece y su frecuencia).
+    """
+
+    def __init__(self, fragmentos, fuentes, vocabulario, term_ptr, doc_ids, tfs, longitudes, firma):
+        self.fragmentos = fragmentos
+        self.fuentes = fuentes
+        self.vocabulario = vocabulario
+        self.term_ptr = term_ptr
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.longitudes = longitudes
+        self.firma = firma
+
+        n_docs = len(fragmentos)
+        df = np.diff(term_ptr).astype(np.float32)
+        self.idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        promedio = float(longitudes.mean()) if n_docs else 1.0
+        self.norma = (K1 * (1 - B + B * longitudes / max(promedio, 1.0))).astype(np.float32)
+
+    @classmethod
+    def construir(cls, rutas=None):
+        rutas = listar_fuentes() if rutas is None else rutas
+        fragmentos, fuentes, tokens_por_doc = [], [], []
+        for ruta in rutas:
+            try:
+                texto = ruta.read_text(encoding='utf-8')
+            except Exception as e:
+                logger.warning(f"No se pudo leer {ruta}: {e}")
+                continue
+            nombre = _nombre_fuente(ruta)
+            for fragmento in fragmentar(texto):
+                tokens = tokenizar(fragmento)
+                if tokens:
+                    fragmentos.append(fragmento)
+                    fuentes.append(nombre)
+                    tokens_por_doc.append(tokens)
+
+        vocabulario = {}
+        filas, columnas = [], []
+        for doc_id, tokens in enumerate(tokens_por_doc):
+            for token in tokens:
+                filas.append(vocabulario.setdefault(token, len(vocabulario)))
+                columnas.append(doc_id)
+
+        terminos = np.asarray(filas, dtype=np.int32)
+        docs = np.asarray(columnas, dtype=np.int32)
+        # Contar (término, doc) repetidos -> tf, ordenado por término
+        pares = terminos.astype(np.int64) * max(len(tokens_por_doc), 1) + docs
+        unicos, tfs = np.unique(pares, return_counts=True)
+        n = max(len(tokens_por_doc), 1)
+        term_de_par = (unicos // n).astype(np.int32)
+        doc_ids = (unicos % n).astype(np.int32)
+        term_ptr = np.zeros(len(vocabulario) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_de_par, minlength=len(vocabulario)), out=term_ptr[1:])
+        longitudes = np.asarray([len(t) for t in tokens_por_doc], dtype=np.float32)
+
+        return cls(
+            fragmentos, fuentes, vocabulario, term_ptr, doc_ids,
+            tfs.astype(np.float32), longitudes, _firma_fuentes(rutas),
+        )
+
+    def guardar(self, ruta=RUTA_INDICE):
+        ruta = Path(ruta)
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        meta = {
+            'version': VERSION_INDICE,
+            'fragmentos': self.fragmentos,
+            'fuentes': self.fuentes,
+            'vocabulario': self.vocabulario,
+            'firma': self.firma,
+        }
+        # Archivo temporal por proceso y reemplazo atómico: varios workers pueden reconstruir a la vez
+        temporal = ruta.with_name(f'{ruta.stem}.{os.getpid()}.tmp.npz')
+        np.savez_compressed(
+            temporal,
+            meta=np.frombuffer(json.dumps(meta, ensure_ascii=False).encode('utf-8'), dtype=np.uint8),
+            term_ptr=self.term_ptr,
+            doc_ids=self.doc_ids,
+            tfs=self.tfs,
+            longitudes=self.longitudes,
+        )
+        temporal.replace(ruta)
+
+    @classmethod
+    def cargar(cls, ruta=RUTA_INDICE):
+        with np.load(ruta) as datos:
+            meta = json.loads(datos['meta'].tobytes().decode('utf-8'))
+            if meta.get('version') != VERSION_INDICE:
+                return None
+            return cls(
+                meta['fragmentos'], meta['fuentes'], meta['vocabulario'],
+                datos['term_ptr'], datos['doc_ids'], datos['tfs'], datos['longitudes'],
+                meta['firma'],
+            )
+
+    def vigente(self):
+        try:
+            return self.firma == _firma_fuentes(listar_fuentes())
+        except OSError:
+            return False
+
+    def buscar(self, consulta, k=4):
+        """Retorna [(score, fuente, fragmento)] de los k fragmentos más relevantes."""
+        n_docs = len(self.fragmentos)
+        if not n_docs:
+            return []
+
+        scores = np.zeros(n_docs, dtype=np.float32)
+        for termino in set(tokenizar(consulta)):
+            tid = self.vocabulario.get(termino)
+            if tid is None:
+                continue
+            inicio, fin = self.term_ptr[tid], self.term_ptr[tid + 1]
+            docs = self.doc_ids[inicio:fin]
+            tf = self.tfs[inicio:fin]
+            scores[docs] += self.idf[tid] * tf * (K1 + 1) / (tf + self.norma[docs])
+
+        k = min(k, n_docs)
+        mejores = np.argpartition(-scores, k - 1)[:k]
+        mejores = mejores[np.argsort(-scores[mejores])]
+        return [
+            (float(scores[i]), self.fuentes[i], self.fragmentos[i])
+            for i in mejores if scores[i] > 0
+        ]
+
+
+_indice = None
+_indice_lock = threading.Lock()
+
+
+def _construir_y_guardar():
+    indice = IndiceDocs.construir()
+    try:
+        indice.guardar()
+    except OSError as e:
+        logger.warning(f"No se pudo guardar el índice de documentos: {e}")
+    return indice
+
+
+def reconstruir_indice():
+    """Construye el índice desde las fuentes, lo guarda en disco y lo deja activo."""
+    global _indice
+    with _indice_lock:
+        _indice = _construir_y_guardar()
+        return _indice
+
+
+def obtener_indice():
+    """
+    Índice del proceso. Se carga de disco la primera vez y se reconstruye si
+    alguna fuente cambió.
+    """
+    global _indice
+    with _indice_lock:
+        if _indice is not None and _indice.vigente():
+            return _indice
+
+        if _indice is None and RUTA_INDICE.exists():
+            try:
+                cargado = IndiceDocs.cargar()
+                if cargado is not None and cargado.vigente():
+                    _indice = cargado
+                    return cargado
+            except Exception as e:
+                logger.warning(f"Índice de documentos ilegible, se reconstruye: {e}")
+
+        _indice = _construir_y_guardar()
+        return _indice
+
+
+def contexto_relevante(consulta, max_caracteres=2500, k=6):
+    """
+    Fragmentos de documentación relevantes para `consulta`, concatenados sin
+    pasar de `max_caracteres`. Cadena vacía si no hay nada relevante.
+    """
+    try:
+        resultados = obtener_indice().buscar(consulta, k=k)
+    except Exception as e:
+        logger.warning(f"Búsqueda en documentación falló: {e}")
+        return ''
+
+    partes, usados = [], 0
+    for _, fuente, fragmento in resultados:
+        bloque = f"[{fuente}]\n{fragmento}"
+        if usados + len(bloque) > max_caracteres:
+            if not partes:
+                partes.append(bloque[:max_caracteres])
+            break
+        partes.append(bloque)
+        usados += len(bloque) + 2
+    return "\n\n".join(partes)
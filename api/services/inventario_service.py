@@ -0,0 +1,156 @@
+"""
+Movimientos de inventario en bloque (kárdex de solo inserción).
+
+El camino por instancia (DetalleVenta.save → MovimientoInventario.save →
+Producto.save → Stock.save → Producto.save + señales de Planeación) cuesta
+decenas de consultas por línea. Aquí una venta completa se registra con:
+- bulk_create de DetalleVenta y de MovimientoInventario (el kárdex)
+- un UPDATE ... CASE sobre Stock y otro sobre Producto.stock_total
+- un refresco de Planeación diferido al commit y acumulado por transacción
+"""
+import logging
+import threading
+from collections import defaultdict
+from datetime import date
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from api.models import DetalleVenta, MovimientoInventario, Planeacion, Producto, Stock
+
+logger = logging.getLogger(__name__)
+
+
+def _case_delta(deltas):
+    # Stock usa producto_id como pk, así que el mismo CASE sirve para ambas tablas
+    return Case(
+        *[When(pk=pk, then=Value(cantidad)) for pk, cantidad in deltas.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def aplicar_movimientos_stock(deltas):
+    """
+    Aplica {producto_id: delta} (negativo = salida) con un UPDATE atómico sobre
+    Stock y otro sobre Producto.stock_total. Crea el Stock que falte.
+    """
+    deltas = {pk: cantidad for pk, cantidad in deltas.items() if cantidad}
+    if not deltas:
+        return
+
+    ahora = timezone.now()
+    Producto.objects.filter(pk__in=deltas).update(
+        stock_total=F('stock_total') + _case_delta(deltas),
+        fecha_actualizacion=ahora,
+    )
+    actualizados = Stock.objects.filter(pk__in=deltas).update(
+        cantidad_actual=F('cantidad_actual') + _case_delta(deltas),
+        fecha_actualizacion=ahora,
+    )
+
+    if actualizados < len(deltas):
+        # Productos viejos sin fila de Stock: se crea con el stock_total ya movido
+        con_stock = set(Stock.objects.filter(pk__in=deltas).values_list('pk', flat=True))
+        Stock.objects.bulk_create([
+            Stock(
+                producto_id=producto.pk,
+                producto_nombre=producto.nombre,
+                producto_descripcion=producto.descripcion,
+                cantidad_actual=producto.stock_total,
+            )
+            for producto in Producto.objects.filter(pk__in=set(deltas) - con_stock)
+        ])
+
+
+def refrescar_existencias_planeacion(producto_nombres):
+    """
+    Existencias de la planeación de hoy en adelante = Stock actual, para todos
+    los productos dados en un solo UPDATE.
+    """
+    producto_nombres = {n for n in producto_nombres if n}
+    if not producto_nombres:
+        return 0
+
+    stock_actual = Stock.objects.filter(producto_nombre=OuterRef('producto_nombre')).values('cantidad_actual')[:1]
+    return Planeacion.objects.filter(
+        producto_nombre__in=producto_nombres,
+        fecha__gte=date.today(),
+    ).update(
+        # Sin fila de Stock se conserva el valor actual
+        existencias=Coalesce(Subquery(stock_actual), F('existencias')),
+        fecha_actualizacion=timezone.now(),
+    )
+
+
+_refresco_pendiente = threading.local()
+
+
+def _refrescar_planeacion_seguro(producto_nombres):
+    try:
+        refrescar_existencias_planeacion(producto_nombres)
+    except Exception as e:
+        logger.error(f"Error refrescando existencias de planeación: {e}")
+
+
+def programar_refresco_planeacion(producto_nombres):
+    """
+    Agenda refrescar_existencias_planeacion para después del commit, acumulando
+    los productos de toda la transacción: N movimientos sobre los mismos
+    productos terminan en un único UPDATE. Fuera de una transacción refresca ya.
+    """
+    conexion = transaction.get_connection()
+    if not conexion.in_atomic_block:
+        _refrescar_planeacion_seguro(set(producto_nombres))
+        return
+
+    # Django reemplaza la lista de on_commit al hacer commit/rollback (también de
+    # un savepoint): si cambió, el refresco acumulado ya corrió o se descartó.
+    pendiente = getattr(_refresco_pendiente, 'valor', None)
+    if pendiente is None or pendiente[0] is not conexion.run_on_commit:
+        nombres = set()
+        transaction.on_commit(lambda: _refrescar_planeacion_seguro(nombres))
+        pendiente = _refresco_pendiente.valor = (conexion.run_on_commit, nombres)
+
+    pendiente[1].update(producto_nombres)
+
+
+def registrar_salida_venta(venta, lineas):
+    """
+    Registra las líneas de una venta POS y descuenta el inventario.
+
+    `lineas`: lista de (producto, cantidad, precio_unitario) con Producto ya
+    cargado. Debe llamarse dentro de transaction.atomic(). Retorna los
+    DetalleVenta creados.
+    """
+    detalles = []
+    movimientos = []
+    salidas = defaultdict(int)
+
+    for producto, cantidad, precio_unitario in lineas:
+        detalles.append(DetalleVenta(
+            venta=venta,
+            producto=producto,
+            cantidad=cantidad,
+            precio_unitario=precio_unitario,
+            subtotal=cantidad * precio_unitario,
+        ))
+        movimientos.append(MovimientoInventario(
+            producto=producto,
+            tipo='SALIDA',
+            cantidad=cantidad,
+            usuario=venta.vendedor,
+            nota=f'Venta #{venta.numero_factura}',
+        ))
+        salidas[producto.pk] -= cantidad
+
+    # bulk_create no pasa por DetalleVenta.save ni MovimientoInventario.save:
+    # el stock se mueve una sola vez abajo
+    DetalleVenta.objects.bulk_create(detalles)
+    MovimientoInventario.objects.bulk_create(movimientos)
+    aplicar_movimientos_stock(salidas)
+    programar_refresco_planeacion(producto.nombre for producto, _, _ in lineas)
+
+    return detalles
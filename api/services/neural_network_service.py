@@ -1,151 +1,273 @@
-import pandas as pd
+"""
+Motor de pronóstico de producción (un solo modelo para todos los productos).
+
+Reemplaza el esquema de un MLPRegressor + StandardScaler por producto (dos
+pickles por producto, cargados en cada predicción y guardados en cada
+partial_fit) por:
+
+- Una matriz de features NumPy armada con todo el histórico de
+  ReportePlaneacion: día de la semana (one-hot), día del mes, existencias,
+  solicitadas, pedidos y el producto (one-hot, "embedding" del producto).
+- Un único MLPRegressor entrenado sobre esa matriz y guardado en
+  ia_models/pronostico_produccion.joblib.
+- El modelo se carga una vez por proceso y se memoiza por mtime del archivo;
+  una fecha se predice para todos los productos en una sola llamada.
+
+Entrenamiento completo: python manage.py entrenar_ia
+"""
+import copy
+import logging
+import os
+import threading
+from datetime import datetime
+
+import joblib
 import numpy as np
+from django.utils import timezone
 from sklearn.neural_network import MLPRegressor
 from sklearn.preprocessing import StandardScaler
-from api.models import ReportePlaneacion, CargueID1, CargueID2, CargueID3, CargueID4, CargueID5, CargueID6
-from datetime import datetime, timedelta
-import joblib
-import os
-import logging
+
+from api.models import ReportePlaneacion
 
 logger = logging.getLogger(__name__)
 
+RUTA_MODELO = os.path.join('ia_models', 'pronostico_produccion.joblib')
+VERSION_MODELO = 1
+
+# Columnas numéricas (se escalan); el resto de la matriz es one-hot
+COLUMNAS_NUMERICAS = ('dia_mes', 'existencias', 'solicitadas', 'pedidos')
+
+_cache_lock = threading.Lock()
+_cache_modelo = {'firma': None, 'artefacto': None}
+
+
+def _numero(valor):
+    try:
+        return float(valor or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _filas_reporte(fecha, datos):
+    """(producto, dia_semana, dia_mes, existencias, solicitadas, pedidos, orden) por ítem."""
+    if not isinstance(datos, list):
+        return
+    dia_semana, dia_mes = fecha.weekday(), fecha.day
+    for item in datos:
+        if not isinstance(item, dict):
+            continue
+        producto = item.get('producto_nombre') or item.get('producto')
+        if not producto:
+            continue
+        yield (
+            producto, dia_semana, dia_mes,
+            _numero(item.get('existencias')),
+            _numero(item.get('solicitadas')),
+            _numero(item.get('pedidos')),
+            _numero(item.get('orden')),
+        )
+
+
+def construir_matriz(filas, productos, scaler):
+    """
+    Matriz de features [numéricas escaladas | día semana one-hot | producto one-hot]
+    para `filas` de (producto, dia_semana, dia_mes, existencias, solicitadas, pedidos).
+    Las filas de productos que el modelo no conoce se descartan.
+    Retorna (X, indices_validos).
+    """
+    indice_producto = {p: i for i, p in enumerate(productos)}
+    validas = [i for i, fila in enumerate(filas) if fila[0] in indice_producto]
+    n = len(validas)
+
+    numericas = np.empty((n, len(COLUMNAS_NUMERICAS)), dtype=np.float64)
+    dia_semana = np.zeros((n, 7), dtype=np.float64)
+    producto = np.zeros((n, len(productos)), dtype=np.float64)
+
+    for fila_x, i in enumerate(validas):
+        nombre, dow, dia_mes, existencias, solicitadas, pedidos = filas[i][:6]
+        numericas[fila_x] = (dia_mes, existencias, solicitadas, pedidos)
+        dia_semana[fila_x, dow] = 1.0
+        producto[fila_x, indice_producto[nombre]] = 1.0
+
+    if n:
+        numericas = scaler.transform(numericas)
+    return np.hstack([numericas, dia_semana, producto]), validas
+
+
 class NeuralNetworkService:
     def __init__(self):
-        self.model_path = 'ia_models/'
-        if not os.path.exists(self.model_path):
-            os.makedirs(self.model_path)
-            
-        self.scalers = {}
-        self.models = {}
-        self.min_samples_to_train = 5 # Empezar a entrenar con pocos datos (Online Learning)
-
-    def _get_model_filename(self, producto):
-        return os.path.join(self.model_path, f'mlp_{producto.replace(" ", "_").replace("/", "-")}.pkl')
-
-    def _get_scaler_filename(self, producto):
-        return os.path.join(self.model_path, f'scaler_{producto.replace(" ", "_").replace("/", "-")}.pkl')
-
-    def load_model(self, producto):
-        """Carga modelo y scaler si existen"""
-        model_file = self._get_model_filename(producto)
-        scaler_file = self._get_scaler_filename(producto)
-        
-        if os.path.exists(model_file) and os.path.exists(scaler_file):
-            self.models[producto] = joblib.load(model_file)
-            self.scalers[producto] = joblib.load(scaler_file)
-            return True
-        return False
+        self.model_path = os.path.dirname(RUTA_MODELO)
+        self.min_samples_to_train = 5  # Empezar a entrenar con pocos datos
+
+    # ------------------------------------------------------------------
+    # Persistencia
+    # ------------------------------------------------------------------
+
+    def cargar_modelo(self):
+        """
+        Artefacto {modelo, scaler, productos, ...} memoizado por proceso; se
+        vuelve a leer solo si el archivo cambió (p. ej. otro worker re-entrenó).
+        """
+        try:
+            stat = os.stat(RUTA_MODELO)
+            firma = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+        with _cache_lock:
+            if _cache_modelo['firma'] == firma:
+                return _cache_modelo['artefacto']
+            try:
+                artefacto = joblib.load(RUTA_MODELO)
+            except Exception as e:
+                logger.error(f"❌ No se pudo cargar el modelo de pronóstico: {e}")
+                return None
+            if artefacto.get('version') != VERSION_MODELO:
+                return None
+            _cache_modelo['firma'] = firma
+            _cache_modelo['artefacto'] = artefacto
+            return artefacto
+
+    def _guardar(self, artefacto):
+        os.makedirs(self.model_path, exist_ok=True)
+        temporal = f'{RUTA_MODELO}.{os.getpid()}.tmp'
+        joblib.dump(artefacto, temporal)
+        os.replace(temporal, RUTA_MODELO)
+
+    # ------------------------------------------------------------------
+    # Entrenamiento
+    # ------------------------------------------------------------------
+
+    def cargar_historial(self):
+        """Filas de entrenamiento de todos los ReportePlaneacion."""
+        filas = []
+        reportes = ReportePlaneacion.objects.order_by('fecha_reporte', 'id').values_list('fecha_reporte', 'datos_json')
+        for fecha, datos in reportes.iterator(chunk_size=200):
+            filas.extend(_filas_reporte(fecha, datos))
+        return filas
+
+    def entrenar(self, filas=None):
+        """
+        Entrena el modelo completo desde cero con todo el histórico (o con
+        `filas` dadas). Retorna un dict con el resumen o None si no hay datos
+        suficientes.
+        """
+        filas = self.cargar_historial() if filas is None else filas
+        if len(filas) < self.min_samples_to_train:
+            logger.info(f"🧠 Historial insuficiente para entrenar ({len(filas)} filas)")
+            return None
+
+        productos = sorted({fila[0] for fila in filas})
+        scaler = StandardScaler().fit(np.array([fila[2:6] for fila in filas], dtype=np.float64))
+        X, _ = construir_matriz(filas, productos, scaler)
+        y = np.array([fila[6] for fila in filas], dtype=np.float64)
+
+        modelo = MLPRegressor(
+            hidden_layer_sizes=(64, 32),
+            activation='relu',
+            solver='adam',
+            learning_rate_init=0.01,
+            max_iter=500,
+            random_state=42
+        )
+        modelo.fit(X, y)
+
+        artefacto = {
+            'version': VERSION_MODELO,
+            'modelo': modelo,
+            'scaler': scaler,
+            'productos': productos,
+            'muestras': len(filas),
+            'entrenado_en': timezone.now().isoformat(),
+        }
+        self._guardar(artefacto)
+        logger.info(f"🧠 Modelo de pronóstico entrenado: {len(filas)} filas, {len(productos)} productos")
+        return {
+            'muestras': len(filas),
+            'productos': len(productos),
+            'iteraciones': int(modelo.n_iter_),
+            'perdida': float(modelo.loss_),
+        }
 
     def train_incremental(self, nuevo_reporte):
         """
-        Entrena (partial_fit) con un nuevo reporte diario.
+        Ajusta el modelo con un nuevo reporte diario (un partial_fit por
+        lote y un solo guardado). Si el reporte trae productos que el modelo
+        no conoce, o aún no hay modelo, re-entrena completo.
         Se llama cada vez que el usuario guarda la planeación.
         """
         try:
-            # 1. Extraer datos del reporte
-            fecha = nuevo_reporte.fecha_reporte
-            datos = nuevo_reporte.datos_json if isinstance(nuevo_reporte.datos_json, list) else []
-            
-            # Convertir fecha a features
-            dia_semana = fecha.weekday() # 0-6
-            dia_mes = fecha.day
-            
-            for item in datos:
-                producto = item.get('producto_nombre') or item.get('producto')
-                orden_final = item.get('orden', 0)
-                
-                # Inputs (Features)
-                stock = item.get('existencias', 0)
-                solicitado = item.get('solicitadas', 0)
-                pedidos = item.get('pedidos', 0)
-                
-                # Vector de entrada X
-                X = np.array([[dia_semana, dia_mes, stock, solicitado, pedidos]])
-                y = np.array([orden_final])
-                
-                # Cargar o crear modelo
-                if producto not in self.models:
-                    if not self.load_model(producto):
-                        # Configuración Red Neuronal Ligera (para pocos datos)
-                        self.models[producto] = MLPRegressor(
-                            hidden_layer_sizes=(10, 5), # 2 capas ocultas pequeñas
-                            activation='relu',
-                            solver='adam',
-                            learning_rate_init=0.01,
-                            max_iter=1000,
-                            random_state=42
-                        )
-                        self.scalers[producto] = StandardScaler()
-                        
-                        # Primera vez: necesitamos un buffer para fit inicial o partial_fit con classes (para clasif, aqui regr)
-                        # MLPRegressor soporta partial_fit pero necesita ver datos
-                        # Haremos un ajuste sucio inicial con los datos actuales para inicializar
-                        self.scalers[producto].fit(X)
-                
-                # Escalar
-                # Nota: StandardScaler incremental es partial_fit
-                self.scalers[producto].partial_fit(X)
-                X_scaled = self.scalers[producto].transform(X)
-                
-                # Entrenar
-                self.models[producto].partial_fit(X_scaled, y)
-                
-                # Guardar
-                joblib.dump(self.models[producto], self._get_model_filename(producto))
-                joblib.dump(self.scalers[producto], self._get_scaler_filename(producto))
-                
-            logger.info(f"🧠 Modelos actualizados con reporte del {fecha}")
+            filas = list(_filas_reporte(nuevo_reporte.fecha_reporte, nuevo_reporte.datos_json))
+            if not filas:
+                return False
+
+            artefacto = self.cargar_modelo()
+            if artefacto is None or {f[0] for f in filas} - set(artefacto['productos']):
+                return self.entrenar() is not None
+
+            # Copia para no mutar el artefacto memoizado que otros hilos usan
+            artefacto = dict(artefacto, modelo=copy.deepcopy(artefacto['modelo']))
+            X, _ = construir_matriz(filas, artefacto['productos'], artefacto['scaler'])
+            y = np.array([fila[6] for fila in filas], dtype=np.float64)
+            artefacto['modelo'].partial_fit(X, y)
+            artefacto['muestras'] += len(filas)
+            artefacto['entrenado_en'] = timezone.now().isoformat()
+            self._guardar(artefacto)
+
+            logger.info(f"🧠 Modelo actualizado con reporte del {nuevo_reporte.fecha_reporte}")
             return True
-            
+
         except Exception as e:
-            logger.error(f"❌ Error entrenando modelos: {e}")
+            logger.error(f"❌ Error entrenando modelo: {e}")
             return False
 
+    # ------------------------------------------------------------------
+    # Predicción
+    # ------------------------------------------------------------------
+
     def predecir(self, fecha_objetivo, datos_contextuales):
         """
-        Predice para una lista de productos en una fecha futura.
+        Predice para una lista de productos en una fecha futura, en una sola
+        llamada al modelo.
         Datos contextuales: { "ProdA": { "existencias": 10, "solicitadas": 50... } }
         """
-        predicciones = []
-        
+        artefacto = self.cargar_modelo()
+        if artefacto is None or not datos_contextuales:
+            return []
+
         # Features fecha
         if isinstance(fecha_objetivo, str):
             dt = datetime.strptime(fecha_objetivo, '%Y-%m-%d')
         else:
             dt = fecha_objetivo
-            
-        dia_semana = dt.weekday()
-        dia_mes = dt.day
-        
-        for producto, ctx in datos_contextuales.items():
-            if self.load_model(producto) or producto in self.models:
-                # Preparar vector
-                stock = ctx.get('existencias', 0)
-                solicitado = ctx.get('solicitadas', 0)
-                pedidos = ctx.get('pedidos', 0)
-                
-                X = np.array([[dia_semana, dia_mes, stock, solicitado, pedidos]])
-                
-                # Escalar y Predecir
-                X_scaled = self.scalers[producto].transform(X)
-                prediction = self.models[producto].predict(X_scaled)[0]
-                
-                # Reglas de salida (no negativos, redondear)
-                sugerido = max(0, int(round(prediction)))
-                
-                predicciones.append({
-                    'producto': producto,
-                    'ia_sugerido': sugerido,
-                    'confianza': 'Alta (Aprendizaje)',
-                    'detalle': {
-                        'motivo': 'Basado en histórico neuronal',
-                        'usa_red_neuronal': True
-                    }
-                })
-            else:
-                # No hay modelo => No retornamos nada (fallback a Gemini o cero)
-                pass
-                
-        return predicciones
 
+        productos = list(datos_contextuales.keys())
+        filas = [
+            (
+                producto, dt.weekday(), dt.day,
+                _numero(ctx.get('existencias')),
+                _numero(ctx.get('solicitadas')),
+                _numero(ctx.get('pedidos')),
+            )
+            for producto, ctx in datos_contextuales.items()
+        ]
+        X, validas = construir_matriz(filas, artefacto['productos'], artefacto['scaler'])
+        if not validas:
+            # Ningún producto conocido => fallback a Gemini
+            return []
+
+        # Reglas de salida (no negativos, redondear)
+        sugeridos = np.maximum(np.rint(artefacto['modelo'].predict(X)), 0).astype(int)
+
+        return [
+            {
+                'producto': productos[i],
+                'ia_sugerido': int(sugerido),
+                'confianza': 'Alta (Aprendizaje)',
+                'detalle': {
+                    'motivo': 'Basado en histórico neuronal',
+                    'usa_red_neuronal': True
+                }
+            }
+            for i, sugerido in zip(validas, sugeridos)
+        ]
@@ -1,24 +1,52 @@
 """
 Utilities to load shared RAG context for AI services.
 """
-from functools import lru_cache
+import threading
 from pathlib import Path
 
+BASE_PATH = Path(__file__).resolve().parent.parent.parent
 
-@lru_cache(maxsize=1)
-def load_shared_rag_context() -> str:
+_cache_lock = threading.Lock()
+_file_cache = {}  # path -> (mtime_ns, size, content)
+
+
+def read_text_cached(path) -> str:
     """
-    Loads shared steering context from the repository.
-    Returns an empty string if the file is missing or unreadable.
+    Reads a text file, re-reading it from disk only when its mtime or size
+    changes. Returns an empty string if the file is missing or unreadable.
     """
-    base_path = Path(__file__).resolve().parent.parent.parent
-    rag_path = base_path / ".kiro" / "steering" / "rag-context.md"
+    path = Path(path)
+    try:
+        stat = path.stat()
+    except OSError:
+        with _cache_lock:
+            _file_cache.pop(path, None)
+        return ""
+
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _cache_lock:
+        cached = _file_cache.get(path)
+    if cached and cached[:2] == signature:
+        return cached[2]
 
     try:
-        if rag_path.exists():
-            return rag_path.read_text(encoding="utf-8")
+        content = path.read_text(encoding="utf-8")
     except Exception:
         return ""
 
-    return ""
+    with _cache_lock:
+        _file_cache[path] = (*signature, content)
+    return content
+
+
+def load_shared_rag_context() -> str:
+    """
+    Loads shared steering context from the repository.
+    Returns an empty string if the file is missing or unreadable.
+    """
+    return read_text_cached(BASE_PATH / ".kiro" / "steering" / "rag-context.md")
+
 
+def load_project_doc(name) -> str:
+    """Loads a markdown doc from the repository root (e.g. RESUMEN_ANALISIS.md)."""
+    return read_text_cached(BASE_PATH / name)
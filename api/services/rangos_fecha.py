@@ -0,0 +1,67 @@
+"""
+Filtros de fecha aptos para índice sobre columnas DateTimeField.
+
+`fecha__date=...` y `fecha__date__range=[...]` envuelven la columna en un
+cast de zona horaria ((fecha AT TIME ZONE 'America/Bogota')::date), así que
+PostgreSQL no puede usar un btree sobre `fecha`. Aquí los días se traducen
+a un rango semiabierto [inicio, fin) de timestamps en la zona del proyecto:
+
+    VentaRuta.objects.filter(**filtro_dia('fecha', '2026-04-10'))
+    #  -> fecha >= 2026-04-10 00:00-05:00 AND fecha < 2026-04-11 00:00-05:00
+
+    Venta.objects.filter(**filtro_fechas('fecha', fecha_inicio, fecha_fin))
+    DetalleVenta.objects.filter(**filtro_fechas('venta__fecha', desde, hasta))
+
+El rango semiabierto incluye el último instante del día (a diferencia de
+23:59:59) y no depende de la precisión de la columna. Para columnas
+DateField no hace falta: se filtran directo.
+"""
+from datetime import date, datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+
+def a_fecha(valor):
+    """'2026-04-10', date o datetime -> date. ValueError si no es válida."""
+    if isinstance(valor, datetime):
+        if timezone.is_aware(valor):
+            valor = timezone.localtime(valor)
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    fecha = parse_date(str(valor).strip()) if valor is not None else None
+    if fecha is None:
+        raise ValueError(f'Fecha inválida: {valor!r}. Use YYYY-MM-DD')
+    return fecha
+
+
+def inicio_dia(valor):
+    """00:00 del día en la zona horaria del proyecto (aware)."""
+    return timezone.make_aware(datetime.combine(a_fecha(valor), time.min))
+
+
+def rango_fechas(desde=None, hasta=None):
+    """
+    (inicio, fin) semiabierto que cubre los días `desde`..`hasta` completos
+    (ambos inclusive). Cualquiera de los dos puede ser None (sin límite).
+    """
+    inicio = inicio_dia(desde) if desde is not None else None
+    fin = inicio_dia(a_fecha(hasta) + timedelta(days=1)) if hasta is not None else None
+    return inicio, fin
+
+
+def filtro_fechas(campo, desde=None, hasta=None):
+    """kwargs para .filter(): `campo` entre los días `desde` y `hasta` (inclusive)."""
+    inicio, fin = rango_fechas(desde, hasta)
+    filtro = {}
+    if inicio is not None:
+        filtro[f'{campo}__gte'] = inicio
+    if fin is not None:
+        filtro[f'{campo}__lt'] = fin
+    return filtro
+
+
+def filtro_dia(campo, dia):
+    """kwargs para .filter(): `campo` dentro del día `dia`."""
+    return filtro_fechas(campo, dia, dia)
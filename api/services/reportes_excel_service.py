@@ -0,0 +1,260 @@
+"""
+Reportes Excel que se generan tanto en la petición (GET .../excel/) como
+en segundo plano (POST /api/exportaciones/, ver exportaciones_service.py).
+
+Cada función arma el LibroExcel y retorna (libro, nombre_archivo); quien la
+llama decide si lo envía en la respuesta o lo guarda en media/exports/.
+`progreso`, opcional, recibe el porcentaje de avance (0-100).
+"""
+import calendar
+from datetime import date, timedelta
+
+from django.db.models import Sum
+from openpyxl.styles import Alignment, Font
+
+from api.models import DetalleVenta, Planeacion, ReportePlaneacion
+from api.services.exportacion_excel_service import (
+    BORDE_FINO, CENTRO, TAMANO_LOTE, LibroExcel, estilo, relleno
+)
+from api.services.rangos_fecha import filtro_fechas
+
+
+def _avisar(progreso, porcentaje):
+    if progreso:
+        progreso(int(porcentaje))
+
+
+# ==================== VENTAS PRODUCTOS POS ====================
+
+def libro_ventas_productos_pos(fecha_inicio, fecha_fin, progreso=None):
+    detalles = DetalleVenta.objects.filter(
+        **filtro_fechas('venta__fecha', fecha_inicio, fecha_fin),
+    ).exclude(
+        venta__estado='ANULADA'
+    ).exclude(
+        venta__estado='CANCELADO'
+    ).values(
+        'producto__nombre'
+    ).annotate(
+        cantidad_total=Sum('cantidad'),
+        total_ventas=Sum('subtotal')
+    ).order_by('-cantidad_total')
+
+    # Contar productos solo cuando alguien sigue el avance (una consulta más)
+    n_productos = detalles.count() if progreso else 0
+
+    azul_oscuro = '0C2C53'
+    libro = LibroExcel({
+        'titulo': estilo(font=Font(bold=True, size=14, color=azul_oscuro)),
+        'encabezado': estilo(
+            font=Font(bold=True, color='FFFFFF', size=11),
+            fill=relleno(azul_oscuro),
+            alignment=Alignment(horizontal='center'),
+        ),
+        'fila_par': estilo(fill=relleno('F1F3F5')),
+        'total': estilo(font=Font(bold=True, size=11), fill=relleno('DEE2E6')),
+    })
+    ws = libro.hoja('Ventas POS', anchos=[8, 45, 12, 16])
+
+    ws.fila([f'VENTAS PRODUCTOS POS — {fecha_inicio} → {fecha_fin}'], estilo='titulo')
+    ws.fila([])
+    ws.fila(['#', 'Producto', 'Cantidad', 'Total COP'], estilo='encabezado')
+
+    total_und = 0
+    total_cop = 0
+    for i, d in enumerate(detalles.iterator(chunk_size=TAMANO_LOTE), 1):
+        cant = d['cantidad_total'] or 0
+        tot = round(float(d['total_ventas'] or 0))
+        total_und += cant
+        total_cop += tot
+        ws.fila([i, d['producto__nombre'] or '(Sin nombre)', cant, tot], estilo='fila_par' if i % 2 == 0 else None)
+        if n_productos and i % TAMANO_LOTE == 0:
+            _avisar(progreso, 90 * i / n_productos)
+
+    ws.fila(['', 'TOTAL', total_und, total_cop], estilo='total')
+    _avisar(progreso, 90)
+
+    return libro, f'ventas_pos_{fecha_inicio}_{fecha_fin}.xlsx'
+
+
+# ==================== PLANEACIÓN MENSUAL ====================
+
+def parsear_mes(mes_param):
+    """'2026-04' -> (2026, 4). ValueError si el formato no es válido."""
+    try:
+        partes = mes_param.split('-')
+        anio, mes = int(partes[0]), int(partes[1])
+        date(anio, mes, 1)
+    except Exception:
+        raise ValueError('Formato de mes inválido. Use YYYY-MM')
+    return anio, mes
+
+
+def libro_planeacion_mensual(mes_param, progreso=None):
+    """
+    Una pestaña por día (lunes-sábado). Si existe snapshot guardado muestra
+    datos, si no existe muestra la pestaña como Pendiente.
+    """
+    anio, mes = parsear_mes(mes_param)
+
+    primer_dia = date(anio, mes, 1)
+    ultimo_dia = date(anio, mes, calendar.monthrange(anio, mes)[1])
+    hoy = date.today()
+
+    # Todos los días del mes excepto domingos (weekday==6)
+    dias_mes = []
+    d = primer_dia
+    while d <= ultimo_dia:
+        if d.weekday() != 6:
+            dias_mes.append(d)
+        d += timedelta(days=1)
+
+    # Snapshot más reciente por fecha (solo ids; el JSON se lee día por día)
+    snapshot_ids = {}
+    for fecha_reporte, snap_id in ReportePlaneacion.objects.filter(
+        fecha_reporte__year=anio,
+        fecha_reporte__month=mes
+    ).order_by('fecha_reporte', '-fecha_creacion').values_list('fecha_reporte', 'id'):
+        snapshot_ids.setdefault(fecha_reporte, snap_id)
+
+    nombres_dia = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado']
+
+    COLOR_HEADER   = '1F4E79'
+    COLOR_FILA_PAR = 'EBF3FB'
+    COLOR_TOTAL    = 'BDD7EE'
+    COLOR_OK       = 'E2EFDA'
+    COLOR_SIN      = 'FCE4D6'
+    COLOR_FUTURO   = 'FFF2CC'
+
+    solo_centro = Alignment(horizontal='center')
+    libro = LibroExcel({
+        'titulo_resumen': estilo(font=Font(bold=True, color='FFFFFF', size=13), fill=relleno(COLOR_HEADER), alignment=CENTRO),
+        'titulo_dia': estilo(font=Font(bold=True, color='FFFFFF', size=12), fill=relleno(COLOR_HEADER), alignment=CENTRO),
+        'encabezado': estilo(font=Font(bold=True, color='FFFFFF', size=10), fill=relleno(COLOR_HEADER), alignment=CENTRO, border=BORDE_FINO),
+        'celda': estilo(border=BORDE_FINO),
+        'celda_par': estilo(border=BORDE_FINO, fill=relleno(COLOR_FILA_PAR)),
+        'celda_centro': estilo(border=BORDE_FINO, alignment=solo_centro),
+        'celda_centro_par': estilo(border=BORDE_FINO, alignment=solo_centro, fill=relleno(COLOR_FILA_PAR)),
+        'celda_izq': estilo(border=BORDE_FINO, alignment=Alignment(horizontal='left')),
+        'estado_snapshot': estilo(font=Font(color='375623', bold=True, size=10), fill=relleno(COLOR_OK), alignment=solo_centro, border=BORDE_FINO),
+        'estado_bd': estilo(font=Font(color='1F4E79', bold=True, size=10), fill=relleno('DDEBF7'), alignment=solo_centro, border=BORDE_FINO),
+        'estado_futuro': estilo(font=Font(color='7F6000', bold=True, size=10), fill=relleno(COLOR_FUTURO), alignment=solo_centro, border=BORDE_FINO),
+        'estado_sin_datos': estilo(font=Font(color='C00000', bold=True, size=10), fill=relleno(COLOR_SIN), alignment=solo_centro, border=BORDE_FINO),
+        'fuente_snapshot': estilo(font=Font(italic=True, color='375623', size=9), fill=relleno(COLOR_OK), alignment=solo_centro),
+        'fuente_bd': estilo(font=Font(italic=True, color='1F4E79', size=9), fill=relleno('DDEBF7'), alignment=solo_centro),
+        'aviso_futuro': estilo(font=Font(bold=True, color='FFFFFF', size=11), fill=relleno('BF8F00'), alignment=CENTRO),
+        'aviso_sin_datos': estilo(font=Font(bold=True, color='FFFFFF', size=11), fill=relleno('C00000'), alignment=CENTRO),
+        'total': estilo(font=Font(bold=True, size=10), fill=relleno(COLOR_TOTAL), border=BORDE_FINO, alignment=solo_centro),
+        'total_izq': estilo(font=Font(bold=True, size=10), fill=relleno(COLOR_TOTAL), border=BORDE_FINO, alignment=Alignment(horizontal='left')),
+    })
+
+    COLS = ['PRODUCTO', 'EXISTENCIAS', 'SOLICITADAS', 'PEDIDOS', 'A PRODUCIR', 'IA SUGERIDA']
+    N = len(COLS)
+    LAST_COL = chr(64 + N)  # 'F'
+    ANCHOS_DIA = [32] + [14] * (N - 1)
+
+    # ── Una hoja por día (un día en memoria a la vez) ──
+    resumen_dias = []
+    for n_dia, dia_fecha in enumerate(dias_mes, 1):
+        fecha_display = dia_fecha.strftime('%d/%m/%Y')
+        nombre_dia   = nombres_dia[dia_fecha.weekday()]
+        tab_name     = dia_fecha.strftime('%d-%m')
+        es_futura    = dia_fecha > hoy
+
+        # Determinar fuente de datos: snapshot > BD directa > sin datos
+        snap_id = snapshot_ids.get(dia_fecha)
+        if snap_id:
+            snap = ReportePlaneacion.objects.only('fecha_creacion', 'datos_json').get(pk=snap_id)
+            datos_hoja   = snap.datos_json if isinstance(snap.datos_json, list) else []
+            fuente_label = f'Snapshot guardado: {snap.fecha_creacion.strftime("%d/%m/%Y %H:%M")}  |  {len(datos_hoja)} productos'
+            fuente_estilo = 'fuente_snapshot'
+            estado, estado_estilo = 'Snapshot', 'estado_snapshot'
+        else:
+            # Registros directos de Planeacion para fechas sin snapshot
+            datos_hoja = [
+                {
+                    'nombre':      reg['producto_nombre'],
+                    'existencias': reg['existencias'],
+                    'solicitado':  reg['solicitadas'],
+                    'pedidos':     reg['pedidos'],
+                    'orden':       reg['orden'],
+                    'ia':          reg['ia'],
+                }
+                for reg in Planeacion.objects.filter(fecha=dia_fecha).order_by('producto_nombre').values(
+                    'producto_nombre', 'existencias', 'solicitadas', 'pedidos', 'orden', 'ia'
+                )
+            ]
+            if datos_hoja:
+                fuente_label = f'Datos de BD  |  {len(datos_hoja)} productos'
+                fuente_estilo = 'fuente_bd'
+                estado, estado_estilo = 'BD Directa', 'estado_bd'
+            else:
+                datos_hoja = None
+                if es_futura:
+                    estado, estado_estilo = 'Futuro', 'estado_futuro'
+                else:
+                    estado, estado_estilo = 'Sin Datos', 'estado_sin_datos'
+
+        resumen_dias.append((fecha_display, nombre_dia, estado, estado_estilo, len(datos_hoja or [])))
+
+        ws = libro.hoja(tab_name, anchos=ANCHOS_DIA)
+
+        # Título
+        ws.fila([f'PLANEACIÓN {nombre_dia.upper()} {fecha_display}'], estilo='titulo_dia', alto=22)
+        ws.combinar(f'A1:{LAST_COL}1')
+
+        if datos_hoja is not None:
+            ws.fila([fuente_label], estilo=fuente_estilo)
+            ws.combinar(f'A2:{LAST_COL}2')
+
+            ws.fila(COLS, estilo='encabezado', alto=16)
+
+            total_producir = 0
+            for prod in datos_hoja:
+                nombre      = prod.get('nombre', '')
+                existencias = int(prod.get('existencias', 0) or 0)
+                solicitado  = int(prod.get('solicitado', 0) or prod.get('solicitadas', 0) or 0)
+                pedidos     = int(prod.get('pedidos', 0) or 0)
+                orden       = int(prod.get('orden', 0) or 0)
+                ia          = int(prod.get('ia', 0) or 0)
+
+                total_producir += orden
+                par = '_par' if (ws.fila_actual + 1) % 2 == 0 else ''
+                ws.fila([nombre, existencias, solicitado, pedidos, orden, ia],
+                        estilo=f'celda_centro{par}', estilos={1: 'celda_izq'})
+
+            ws.fila(['TOTAL', None, None, None, total_producir, None], estilo='total', estilos={1: 'total_izq'})
+
+        else:
+            aviso = 'FECHA FUTURA — AÚN NO PLANEADA' if es_futura else 'SIN DATOS DE PLANEACIÓN PARA ESTA FECHA'
+            ws.fila([aviso], estilo='aviso_futuro' if es_futura else 'aviso_sin_datos', alto=20)
+            ws.combinar(f'A2:{LAST_COL}2')
+
+        _avisar(progreso, 90 * n_dia / len(dias_mes))
+
+    # ── Hoja RESUMEN (se arma al final, va de primera) ──
+    ws_res = libro.hoja('Resumen', anchos=[14, 14, 16, 14], indice=0)
+
+    ws_res.fila([f'RESUMEN PLANEACIÓN — {mes_param}'], estilo='titulo_resumen', alto=22)
+    ws_res.combinar('A1:D1')
+    ws_res.fila(['FECHA', 'DÍA', 'ESTADO', 'PRODUCTOS'], estilo='encabezado', alto=18)
+
+    total_guardados = 0
+    total_pendientes = 0
+    for idx, (fecha_display, nombre_dia, estado, estado_estilo, n_prod) in enumerate(resumen_dias):
+        if estado in ('Snapshot', 'BD Directa'):
+            total_guardados += 1
+        else:
+            total_pendientes += 1
+        par = '_par' if idx % 2 == 0 else ''
+        ws_res.fila(
+            [fecha_display, nombre_dia, estado, n_prod if n_prod > 0 else '-'],
+            estilo=f'celda{par}', estilos={3: estado_estilo, 4: f'celda_centro{par}'}
+        )
+
+    ws_res.fila(
+        ['TOTAL', f'{len(dias_mes)} días hábiles', f'Guardados: {total_guardados}', f'Pendientes: {total_pendientes}'],
+        estilo='total'
+    )
+
+    return libro, f'planeacion_{mes_param}.xlsx'
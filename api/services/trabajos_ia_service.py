@@ -0,0 +1,256 @@
+"""
+Cola local de trabajos de IA (Ollama / Gemini), sin broker externo.
+
+Los endpoints de IA crean un TrabajoIA y responden de inmediato con su id; un
+pool de hilos acotado por proceso los ejecuta y el cliente consulta el
+resultado en /api/ai/trabajos/<id>/ (con long-poll opcional).
+
+La tabla es la cola: al reclamar un trabajo se toma un candado de aviso de
+PostgreSQL y se cuentan los EN_PROCESO, así el tope IA_MAX_CONCURRENCIA es
+global entre todos los workers de gunicorn y dos generaciones lentas no dejan
+sin hilos al resto del CRM (ventas de ruta, cargue, etc.).
+
+Configuración (settings, opcionales):
+    IA_MAX_CONCURRENCIA     llamadas simultáneas al LLM (por defecto 2)
+    IA_TRABAJO_TIMEOUT      segundos para dar por muerto un EN_PROCESO (600)
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api.models import Planeacion, TrabajoIA
+
+logger = logging.getLogger(__name__)
+
+# Clave fija del candado de aviso que serializa el reclamo de trabajos
+CANDADO_COLA_IA = 734201
+MAX_INTENTOS = 2
+
+
+def _max_concurrencia():
+    return max(int(getattr(settings, 'IA_MAX_CONCURRENCIA', 2)), 1)
+
+
+def _timeout_trabajo():
+    return int(getattr(settings, 'IA_TRABAJO_TIMEOUT', 600))
+
+
+# ---------------------------------------------------------------------------
+# Tareas
+# ---------------------------------------------------------------------------
+
+def _tarea_chat(parametros):
+    from api.services.ai_assistant_service import obtener_asistente
+    ai = obtener_asistente()
+    answer = ai.ask(parametros['question'], include_docs=parametros.get('include_docs', False))
+    return {'question': parametros['question'], 'answer': answer, 'model': ai.model}
+
+
+def _tarea_analisis(parametros):
+    from api.services.ai_assistant_service import obtener_asistente
+    ai = obtener_asistente()
+    analysis = ai.analyze_data(parametros['data'], parametros['question'])
+    return {'analysis': analysis, 'model': ai.model}
+
+
+def _tarea_agente(parametros):
+    from api.services.ai_agent_service import obtener_agente
+    agent = obtener_agente(model="qwen2.5:3b")
+    return agent.process_command(parametros['command'], session_id=parametros.get('session_id'))
+
+
+def predecir_produccion_contextual(fecha_objetivo):
+    """
+    Predicción de producción para `fecha_objetivo` usando como contexto las
+    existencias, solicitadas y pedidos de la Planeación de ese día (si hay).
+    """
+    from api.services.ia_service import IAService
+
+    datos_contextuales = {}
+    try:
+        for registro in Planeacion.objects.filter(fecha=fecha_objetivo):
+            datos_contextuales[registro.producto_nombre] = {
+                'existencias': registro.existencias or 0,
+                'solicitadas': registro.solicitadas or 0,
+                'pedidos': registro.pedidos or 0
+            }
+        logger.info(f"📊 Datos contextuales cargados para {len(datos_contextuales)} productos")
+    except Exception as e:
+        # Continuar sin datos contextuales (IA usará solo histórico)
+        logger.warning(f"⚠️ No se pudieron cargar datos contextuales: {e}")
+
+    predicciones = IAService().predecir_produccion(
+        fecha_objetivo,
+        datos_contextuales=datos_contextuales if datos_contextuales else None
+    )
+    return {
+        'success': True,
+        'fecha_objetivo': fecha_objetivo,
+        'total_productos_analizados': len(predicciones),
+        'con_datos_contextuales': len(datos_contextuales) > 0,
+        'predicciones': predicciones
+    }
+
+
+def _tarea_prediccion(parametros):
+    return predecir_produccion_contextual(parametros['fecha'])
+
+
+TAREAS = {
+    'CHAT': _tarea_chat,
+    'ANALISIS': _tarea_analisis,
+    'AGENTE': _tarea_agente,
+    'PREDICCION': _tarea_prediccion,
+}
+
+
+# ---------------------------------------------------------------------------
+# Cola
+# ---------------------------------------------------------------------------
+
+_ejecutor = None
+_ejecutor_lock = threading.Lock()
+
+
+def _obtener_ejecutor():
+    global _ejecutor
+    with _ejecutor_lock:
+        if _ejecutor is None:
+            _ejecutor = ThreadPoolExecutor(
+                max_workers=_max_concurrencia(),
+                thread_name_prefix='trabajos-ia',
+            )
+        return _ejecutor
+
+
+def encolar(tipo, parametros):
+    """
+    Crea el TrabajoIA y lo despacha al pool cuando la transacción hace commit.
+    Retorna el trabajo (estado PENDIENTE).
+    """
+    if tipo not in TAREAS:
+        raise ValueError(f'Tipo de trabajo IA desconocido: {tipo}')
+    trabajo = TrabajoIA.objects.create(tipo=tipo, parametros=parametros)
+    transaction.on_commit(despachar)
+    return trabajo
+
+
+def despachar():
+    """Pide al pool que procese lo pendiente (no bloquea)."""
+    _obtener_ejecutor().submit(_procesar_en_hilo)
+
+
+def _recuperar_colgados(limite):
+    """Trabajos EN_PROCESO de un proceso que murió: reintentar o marcar error."""
+    colgados = TrabajoIA.objects.filter(estado='EN_PROCESO', fecha_inicio__lt=limite)
+    colgados.filter(intentos__lt=MAX_INTENTOS).update(estado='PENDIENTE')
+    colgados.update(
+        estado='ERROR',
+        error='Tiempo de ejecución agotado',
+        fecha_fin=timezone.now(),
+    )
+
+
+def reclamar_siguiente():
+    """
+    Marca EN_PROCESO el trabajo pendiente más antiguo si hay cupo bajo
+    IA_MAX_CONCURRENCIA. Retorna el trabajo o None.
+    """
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_xact_lock(%s)', [CANDADO_COLA_IA])
+
+        ahora = timezone.now()
+        _recuperar_colgados(ahora - timedelta(seconds=_timeout_trabajo()))
+
+        if TrabajoIA.objects.filter(estado='EN_PROCESO').count() >= _max_concurrencia():
+            return None
+
+        trabajo = (
+            TrabajoIA.objects.select_for_update(skip_locked=True)
+            .filter(estado='PENDIENTE')
+            .order_by('fecha_creacion', 'id')
+            .first()
+        )
+        if trabajo is None:
+            return None
+
+        trabajo.estado = 'EN_PROCESO'
+        trabajo.fecha_inicio = ahora
+        trabajo.intentos += 1
+        trabajo.save(update_fields=['estado', 'fecha_inicio', 'intentos'])
+        return trabajo
+
+
+def ejecutar(trabajo):
+    try:
+        resultado = TAREAS[trabajo.tipo](trabajo.parametros)
+        trabajo.estado = 'COMPLETADO'
+        trabajo.resultado = resultado
+        trabajo.error = ''
+    except Exception as e:
+        logger.exception(f"Error en trabajo IA #{trabajo.id}")
+        trabajo.estado = 'ERROR'
+        trabajo.error = str(e)
+    trabajo.fecha_fin = timezone.now()
+    try:
+        trabajo.save(update_fields=['estado', 'resultado', 'error', 'fecha_fin'])
+    except (TypeError, ValueError) as e:
+        # Resultado no serializable a JSON: que no quede EN_PROCESO para siempre
+        trabajo.estado = 'ERROR'
+        trabajo.resultado = None
+        trabajo.error = f'Resultado inválido: {e}'
+        trabajo.save(update_fields=['estado', 'resultado', 'error', 'fecha_fin'])
+
+
+def procesar_pendientes():
+    """Ejecuta trabajos mientras haya pendientes y cupo. Retorna cuántos corrió."""
+    procesados = 0
+    while True:
+        trabajo = reclamar_siguiente()
+        if trabajo is None:
+            return procesados
+        ejecutar(trabajo)
+        procesados += 1
+
+
+def _procesar_en_hilo():
+    try:
+        procesar_pendientes()
+    except Exception as e:
+        logger.error(f"Error procesando cola de IA: {e}")
+    finally:
+        # Cada hilo del pool abre su propia conexión; no dejarla colgada
+        connection.close()
+
+
+def esperar(trabajo, segundos):
+    """
+    Espera (consultando la BD) a que el trabajo termine o pasen `segundos`.
+    Retorna el trabajo con su estado más reciente.
+    """
+    fin = time.monotonic() + segundos
+    while trabajo.estado in ('PENDIENTE', 'EN_PROCESO') and time.monotonic() < fin:
+        time.sleep(0.5)
+        trabajo.refresh_from_db(fields=['estado', 'resultado', 'error', 'fecha_inicio', 'fecha_fin'])
+    return trabajo
+
+
+def serializar(trabajo):
+    return {
+        'trabajo_id': trabajo.id,
+        'tipo': trabajo.tipo,
+        'estado': trabajo.estado,
+        'resultado': trabajo.resultado,
+        'error': trabajo.error or None,
+        'fecha_creacion': trabajo.fecha_creacion,
+        'fecha_inicio': trabajo.fecha_inicio,
+        'fecha_fin': trabajo.fecha_fin,
+    }
@@ -1,8 +1,13 @@
 # signals.py - Señales para actualizar Planeación automáticamente
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
-from .models import MovimientoInventario, Planeacion, Stock, Producto, CargueID1, CargueID2, CargueID3, CargueID4, CargueID5, CargueID6
-from datetime import date
+from .models import (
+    MovimientoInventario, Planeacion, Stock, Producto, Categoria, Cargue, LoteMovimiento,
+    MODELOS_CARGUE, sincronizar_lotes_cargue,
+)
+from django.utils import timezone
+from .services.inventario_service import programar_refresco_planeacion
+from .services.hechos_venta_service import programar_refresco_hechos
 
 
 @receiver(post_save, sender=MovimientoInventario)
@@ -10,35 +15,12 @@ def actualizar_existencias_planeacion(sender, instance, created, **kwargs):
     """
     Actualiza las existencias en Planeación cuando hay un movimiento de inventario.
     Funciona como un Kardex: actualiza todas las fechas futuras desde el movimiento.
+    El refresco es un solo UPDATE al commit, acumulado por transacción.
     """
     if not created:
         return  # Solo procesar movimientos nuevos
-    
-    try:
-        # Obtener el stock actual del producto
-        producto_nombre = instance.producto.nombre  # MovimientoInventario usa FK producto
-        stock_actual = Stock.objects.filter(producto_nombre=producto_nombre).first()
-        if not stock_actual:
-            return
-        
-        cantidad_actual = stock_actual.cantidad_actual
-        
-        # Actualizar TODAS las planeaciones futuras desde hoy
-        fecha_hoy = date.today()
-        
-        planeaciones = Planeacion.objects.filter(
-            producto_nombre=producto_nombre,
-            fecha__gte=fecha_hoy
-        ).order_by('fecha')
-        
-        for planeacion in planeaciones:
-            # Actualizar existencias con el stock actual
-            planeacion.existencias = cantidad_actual
-            planeacion.save()
-            print(f"✅ Planeación actualizada: {planeacion.producto_nombre} - {planeacion.fecha} - Existencias: {cantidad_actual}")
-        
-    except Exception as e:
-        print(f"❌ Error actualizando planeación: {e}")
+
+    programar_refresco_planeacion([instance.producto.nombre])  # MovimientoInventario usa FK producto
 
 
 @receiver(post_save, sender=Stock)
@@ -46,24 +28,14 @@ def actualizar_existencias_desde_stock(sender, instance, **kwargs):
     """
     Actualiza las existencias en Planeación cuando cambia el stock directamente.
     """
-    try:
-        # Actualizar TODAS las planeaciones futuras desde hoy
-        fecha_hoy = date.today()
-        
-        planeaciones = Planeacion.objects.filter(
-            producto_nombre=instance.producto_nombre,
-            fecha__gte=fecha_hoy
-        )
-        
-        cantidad_actual = instance.cantidad_actual
-        
-        for planeacion in planeaciones:
-            planeacion.existencias = cantidad_actual
-            planeacion.save()
-            print(f"✅ Planeación actualizada desde Stock: {planeacion.producto_nombre} - {planeacion.fecha} - Existencias: {cantidad_actual}")
-        
-    except Exception as e:
-        print(f"❌ Error actualizando planeación desde stock: {e}")
+    programar_refresco_planeacion([instance.producto_nombre])
+
+
+@receiver(post_save, sender=Categoria)
+def versionar_productos_de_categoria(sender, instance, created, **kwargs):
+    """El catálogo muestra categoria_nombre: renombrar la categoría cambia la versión (ETag) de sus productos."""
+    if not created:
+        Producto.objects.filter(categoria=instance).update(fecha_actualizacion=timezone.now())
 
 
 @receiver(pre_save, sender=Producto)
@@ -92,13 +64,16 @@ def actualizar_nombre_en_cargue(sender, instance, **kwargs):
         
         total_general = 0
         
-        # ========== 1. CARGUE (ID1-ID6) ==========
-        modelos_cargue = [CargueID1, CargueID2, CargueID3, CargueID4, CargueID5, CargueID6]
-        for Modelo in modelos_cargue:
-            count = Modelo.objects.filter(producto=nombre_anterior).update(producto=nombre_nuevo)
-            if count > 0:
-                print(f"   ✅ {Modelo.__name__}: {count} registros")
-                total_general += count
+        # ========== 1. CARGUE (ID1-ID6, tabla unificada) ==========
+        count = Cargue.objects.filter(producto=nombre_anterior).update(producto=nombre_nuevo)
+        if count > 0:
+            print(f"   ✅ Cargue: {count} registros")
+            total_general += count
+        
+        count = LoteMovimiento.objects.filter(producto=nombre_anterior).update(producto=nombre_nuevo)
+        if count > 0:
+            print(f"   ✅ LoteMovimiento: {count} registros")
+            total_general += count
         
         # ========== 2. STOCK ==========
         count = Stock.objects.filter(producto_nombre=nombre_anterior).update(producto_nombre=nombre_nuevo)
@@ -150,3 +125,45 @@ def actualizar_nombre_en_cargue(sender, instance, **kwargs):
         pass
     except Exception as e:
         print(f"❌ Error actualizando nombre: {e}")
+
+
+# ========================================
+# 🆕 TRAZABILIDAD DE LOTES (LoteMovimiento)
+# ========================================
+
+_VENDEDOR_POR_MODELO_CARGUE = {modelo: vendedor_id for vendedor_id, modelo in MODELOS_CARGUE.items()}
+_CAMPOS_LOTES_CARGUE = {'lotes_produccion', 'lotes_vencidos', 'fecha', 'dia', 'producto'}
+
+
+def sincronizar_lotes_al_guardar(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    """
+    Mantiene LoteMovimiento al guardar un registro de cargue. Los guardados
+    parciales (`update_fields`) que no tocan lotes, fecha ni producto se
+    ignoran; un registro nuevo sin lotes no necesita DELETE previo.
+    """
+    if raw:
+        return
+    if update_fields is not None and not (_CAMPOS_LOTES_CARGUE & set(update_fields)):
+        return
+    if created and not (instance.lotes_produccion or instance.lotes_vencidos):
+        return
+    sincronizar_lotes_cargue(instance, _VENDEDOR_POR_MODELO_CARGUE.get(sender))
+
+
+def borrar_lotes_al_eliminar(sender, instance, **kwargs):
+    LoteMovimiento.objects.filter(cargue_id=instance.pk).delete()
+
+
+def refrescar_hechos_al_eliminar(sender, instance, **kwargs):
+    """
+    Un registro de cargue borrado no deja marca en `fecha_actualizacion`, así
+    que el refresco incremental no lo ve: se agenda aquí el de su día.
+    """
+    vendedor_id = getattr(instance, 'vendedor_id', None) or _VENDEDOR_POR_MODELO_CARGUE.get(sender)
+    programar_refresco_hechos(vendedor_id, instance.fecha)
+
+
+for _modelo in (Cargue, *MODELOS_CARGUE.values()):
+    post_save.connect(sincronizar_lotes_al_guardar, sender=_modelo, dispatch_uid=f'lotes_guardar_{_modelo.__name__}')
+    post_delete.connect(borrar_lotes_al_eliminar, sender=_modelo, dispatch_uid=f'lotes_borrar_{_modelo.__name__}')
+    post_delete.connect(refrescar_hechos_al_eliminar, sender=_modelo, dispatch_uid=f'hechos_borrar_{_modelo.__name__}')
@@ -0,0 +1,340 @@
+"""
+Pruebas de rendimiento/consistencia de la API.
+
+Corren en PostgreSQL y en sqlite. Las que usan varios hilos se saltan si la
+base de prueba no se puede compartir entre conexiones (sqlite en memoria).
+
+Uso:
+    python manage.py test api
+"""
+import threading
+from datetime import date, timedelta
+from unittest import mock, skipUnless
+
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api.models import (
+    Cargue, CargueResumen, Consecutivo, HechoVentaDiaria, MovimientoInventario, Pedido, Planeacion,
+    Producto, Stock, Vendedor, VendedorSesionToken, VentaRuta,
+)
+from api.services.hechos_venta_service import refrescar_hechos_cargue_modificado, refrescar_hechos_venta
+from api.services.rangos_fecha import filtro_dia, filtro_fechas, inicio_dia
+
+
+FECHA = date(2026, 4, 6)
+
+
+class ReportesVendedoresConsultasTest(TestCase):
+    """GET /api/reportes/vendedores/ no debe hacer consultas por vendedor."""
+
+    url = '/api/reportes/vendedores/'
+    parametros = {'fecha_inicio': '2026-04-01', 'fecha_fin': '2026-04-30'}
+
+    def _crear_vendedor(self, numero):
+        vendedor_id = f'ID{numero}'
+        nombre = f'VENDEDOR {numero}'
+        Vendedor.objects.create(id_vendedor=vendedor_id, nombre=nombre)
+        CargueResumen.objects.create(vendedor_id=vendedor_id, dia='LUNES', fecha=FECHA, total_despacho=100)
+        Cargue.objects.create(
+            vendedor_id=vendedor_id, dia='LUNES', fecha=FECHA, producto='AREPA',
+            cantidad=10, valor=1000, devoluciones=1, vencidas=2,
+        )
+        Pedido.objects.create(
+            numero_pedido=f'PED-T{numero}', vendedor=nombre, destinatario='CLIENTE',
+            direccion_entrega='CALLE 1', fecha_entrega=FECHA, total=5000,
+        )
+
+    def test_consultas_constantes_con_mas_vendedores(self):
+        for numero in (1, 2):
+            self._crear_vendedor(numero)
+        with CaptureQueriesContext(connection) as base:
+            respuesta = self.client.get(self.url, self.parametros)
+        self.assertEqual(respuesta.status_code, 200)
+
+        for numero in (3, 4, 5, 6):
+            self._crear_vendedor(numero)
+        with self.assertNumQueries(len(base)):
+            respuesta = self.client.get(self.url, self.parametros)
+
+        self.assertEqual(respuesta.status_code, 200)
+        vendedores = {v['id']: v for v in respuesta.json()['vendedores']}
+        self.assertEqual(len(vendedores), 6)
+        self.assertEqual(vendedores['ID6']['monto_pedidos'], 5000.0)
+        self.assertEqual(vendedores['ID6']['vencidas'], 2)
+
+
+class RefrescoPlaneacionConsultasTest(TransactionTestCase):
+    """
+    Los movimientos de inventario refrescan Planeación con un solo UPDATE al
+    commit, sin importar cuántos movimientos ni cuántas fechas futuras haya.
+    TransactionTestCase: el refresco corre en on_commit.
+    """
+
+    def setUp(self):
+        self.producto = Producto.objects.create(nombre='AREPA PLANEACION', precio=100)
+        self.manana = timezone.localdate() + timedelta(days=1)
+
+    def _crear_planeaciones(self, desde, cantidad):
+        Planeacion.objects.bulk_create([
+            Planeacion(fecha=self.manana + timedelta(days=i), producto_nombre=self.producto.nombre)
+            for i in range(desde, desde + cantidad)
+        ])
+
+    def _mover_inventario(self):
+        with transaction.atomic():
+            for _ in range(3):
+                MovimientoInventario.objects.create(
+                    producto=self.producto, tipo='ENTRADA', cantidad=5, usuario='test'
+                )
+
+    def test_un_update_constante_con_mas_fechas(self):
+        self._crear_planeaciones(0, 2)
+        with CaptureQueriesContext(connection) as base:
+            self._mover_inventario()
+        updates = [q for q in base.captured_queries if q['sql'].startswith('UPDATE "api_planeacion"')]
+        self.assertEqual(len(updates), 1)
+
+        self._crear_planeaciones(2, 30)
+        with self.assertNumQueries(len(base)):
+            self._mover_inventario()
+
+        stock = Stock.objects.get(pk=self.producto.pk).cantidad_actual
+        self.assertEqual(stock, 30)
+        self.assertEqual(
+            set(Planeacion.objects.values_list('existencias', flat=True)), {stock}
+        )
+
+
+@skipUnless(
+    connection.features.test_db_allows_multiple_connections,
+    'Requiere una base de datos de prueba compartida entre hilos',
+)
+class ConsecutivoConcurrenteTest(TransactionTestCase):
+    """Pedidos creados a la vez desde varios hilos reciben PED- únicos y sin huecos."""
+
+    HILOS = 8
+    POR_HILO = 5
+
+    def _crear_pedidos(self, barrera, numeros, errores):
+        try:
+            barrera.wait()
+            for _ in range(self.POR_HILO):
+                pedido = Pedido.objects.create(
+                    vendedor='VENDEDOR', destinatario='CLIENTE',
+                    direccion_entrega='CALLE 1', fecha_entrega=FECHA, total=1000,
+                )
+                numeros.append(pedido.numero_pedido)
+            # Un pedido revertido no debe consumir número
+            with transaction.atomic():
+                Pedido.objects.create(
+                    vendedor='VENDEDOR', destinatario='CLIENTE',
+                    direccion_entrega='CALLE 1', fecha_entrega=FECHA, total=1000,
+                )
+                transaction.set_rollback(True)
+        except Exception as e:
+            errores.append(e)
+        finally:
+            connections.close_all()
+
+    def test_numeros_unicos_y_consecutivos(self):
+        barrera = threading.Barrier(self.HILOS)
+        numeros, errores = [], []
+        hilos = [
+            threading.Thread(target=self._crear_pedidos, args=(barrera, numeros, errores))
+            for _ in range(self.HILOS)
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        total = self.HILOS * self.POR_HILO
+        self.assertEqual(len(set(numeros)), total)
+        base = min(int(n.split('-')[1]) for n in numeros)
+        self.assertEqual(
+            sorted(numeros), [f'PED-{n:06d}' for n in range(base, base + total)]
+        )
+        self.assertEqual(Pedido.objects.count(), total)
+
+
+class CrearPedidoConsultasTest(TestCase):
+    """
+    POST /api/pedidos/: la planeación se actualiza con INSERT ... ON CONFLICT
+    + un UPDATE con Case, y el cargue con un UPDATE con F(). El número de
+    consultas no depende de las líneas del pedido ni de las filas del cargue.
+    """
+
+    url = '/api/pedidos/'
+
+    def setUp(self):
+        # La migración 0111 siembra el contador; sin migraciones se crea aquí
+        Consecutivo.objects.get_or_create(clave=Consecutivo.PEDIDO)
+        Vendedor.objects.create(id_vendedor='ID1', nombre='VENDEDOR 1')
+        self.productos = [
+            Producto.objects.create(nombre=f'PRODUCTO {i}', precio=1000) for i in range(5)
+        ]
+        # Fila existente: el upsert debe sumarle, no duplicarla (rama ON CONFLICT)
+        Planeacion.objects.create(
+            fecha=FECHA, producto_nombre='PRODUCTO 0', solicitadas=2, pedidos=3
+        )
+
+    def _crear_cargue(self, productos, venta):
+        for producto in productos:
+            Cargue.objects.create(
+                vendedor_id='ID1', dia='LUNES', fecha=FECHA, producto=producto.nombre,
+                cantidad=10, valor=1000, venta=venta,
+            )
+
+    def _crear_pedido(self, productos):
+        return self.client.post(self.url, {
+            'vendedor': 'VENDEDOR 1', 'destinatario': 'CLIENTE',
+            'direccion_entrega': 'CALLE 1', 'fecha_entrega': FECHA.isoformat(),
+            'total': 1000 * len(productos),
+            'asignado_a_tipo': 'VENDEDOR', 'asignado_a_id': 'ID1',
+            'detalles': [
+                {'producto': p.id, 'producto_nombre': p.nombre, 'cantidad': 1, 'precio_unitario': 1000}
+                for p in productos
+            ],
+        }, content_type='application/json')
+
+    def test_consultas_constantes_con_mas_lineas_y_cargue(self):
+        self._crear_cargue(self.productos[:2], venta=10000)
+        with CaptureQueriesContext(connection) as base:
+            respuesta = self._crear_pedido(self.productos[:2])
+        self.assertEqual(respuesta.status_code, 201, respuesta.content)
+
+        self._crear_cargue(self.productos[2:], venta=0)
+        with self.assertNumQueries(len(base)):
+            respuesta = self._crear_pedido(self.productos)
+        self.assertEqual(respuesta.status_code, 201, respuesta.content)
+
+        planeacion = {p.producto_nombre: p for p in Planeacion.objects.filter(fecha=FECHA)}
+        self.assertEqual(len(planeacion), 5)
+        self.assertEqual(planeacion['PRODUCTO 0'].pedidos, 5)  # 3 + 1 + 1
+        self.assertEqual(planeacion['PRODUCTO 0'].total, 7)
+        self.assertEqual(planeacion['PRODUCTO 4'].pedidos, 1)
+
+        cargue = {c.producto: c for c in Cargue.objects.filter(vendedor_id='ID1', fecha=FECHA)}
+        # Las dos primeras filas recibieron ambos pedidos; con venta se recalcula el efectivo
+        self.assertEqual(cargue['PRODUCTO 0'].total_pedidos, 7000)
+        self.assertEqual(cargue['PRODUCTO 0'].total_efectivo, 3000)
+        self.assertEqual(cargue['PRODUCTO 4'].total_pedidos, 5000)
+        self.assertEqual(cargue['PRODUCTO 4'].total_efectivo, 0)
+
+
+class IndicesRangoFechaTest(TestCase):
+    """
+    Los filtros semiabiertos de rangos_fecha usan los índices compuestos de
+    la migración 0113 (con fecha__date el cast de zona horaria lo impide).
+    """
+
+    def _plan(self, queryset):
+        if connection.vendor == 'postgresql':
+            # Tablas de prueba vacías: sin esto el planner prefiere Seq Scan
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def test_ventaruta_vendedor_dia(self):
+        plan = self._plan(VentaRuta.objects.filter(vendedor_id='ID1', **filtro_dia('fecha', FECHA)))
+        self.assertIn('api_ventaruta_vend_fecha_idx', plan)
+
+    def test_ventaruta_estado_rango(self):
+        plan = self._plan(VentaRuta.objects.filter(
+            estado='ACTIVA', **filtro_fechas('fecha', date(2026, 4, 1), date(2026, 4, 30))
+        ))
+        self.assertIn('api_ventaruta_estado_fecha_idx', plan)
+
+    def test_pedido_entrega_asignado(self):
+        plan = self._plan(Pedido.objects.filter(
+            fecha_entrega__gte=date(2026, 4, 1), fecha_entrega__lte=date(2026, 4, 30),
+            asignado_a_id='ID1',
+        ))
+        self.assertIn('api_pedido_entrega_asig_idx', plan)
+
+
+class HechosVentaClienteVacioTest(TestCase):
+    """Una venta sin nombre de cliente no se mezcla con la fila del cargue."""
+
+    def setUp(self):
+        self.vendedor = Vendedor.objects.create(id_vendedor='ID1', nombre='VENDEDOR 1')
+        self.cargue = Cargue.objects.create(
+            vendedor_id='ID1', dia='LUNES', fecha=FECHA, producto='AREPA',
+            cantidad=10, valor=1000, devoluciones=1,
+        )
+        venta = VentaRuta.objects.create(
+            vendedor=self.vendedor, cliente_nombre='', fecha=inicio_dia(FECHA) + timedelta(hours=9),
+            total=3000, detalles=[{'producto': 'AREPA', 'cantidad': 3, 'precio': 1000, 'subtotal': 3000}],
+        )
+        venta.sincronizar_lineas()
+
+    def _hechos(self):
+        return {h.cliente: h for h in HechoVentaDiaria.objects.filter(vendedor_id='ID1', fecha=FECHA)}
+
+    def test_cargue_y_venta_sin_cliente_separados(self):
+        refrescar_hechos_venta('ID1', FECHA)
+        hechos = self._hechos()
+        self.assertEqual(set(hechos), {None, ''})
+        self.assertEqual((hechos[None].cargado, hechos[None].devoluciones, hechos[None].vendidas), (10, 1, 0))
+        self.assertEqual((hechos[''].cargado, hechos[''].vendidas), (0, 3))
+
+    def test_cargado_se_refresca_al_editar_cargue(self):
+        refrescar_hechos_venta('ID1', FECHA)
+        desde = timezone.now()
+        # En PostgreSQL la marca la pone el trigger de 0109; aquí va explícita
+        Cargue.objects.filter(pk=self.cargue.pk).update(cantidad=15, fecha_actualizacion=timezone.now())
+
+        self.assertEqual(refrescar_hechos_cargue_modificado(desde), [('ID1', FECHA)])
+        self.assertEqual(self._hechos()[None].cargado, 15)
+
+    def test_hechos_se_refrescan_al_borrar_cargue(self):
+        refrescar_hechos_venta('ID1', FECHA)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cargue.delete()
+
+        self.assertEqual(set(self._hechos()), {''})
+
+
+class SyncBatchErrorPorVentaTest(TestCase):
+    """Una venta que falla en sync-batch no tumba el lote: las demás se guardan y reportan."""
+
+    url = '/api/ventas-ruta/sync-batch/'
+
+    def setUp(self):
+        # ID9 no tiene vista CargueIDx: el lote no toca el cargue
+        vendedor = Vendedor.objects.create(id_vendedor='ID9', nombre='VENDEDOR 9')
+        VendedorSesionToken.objects.create(
+            vendedor=vendedor, token='token-sync', expira_en=timezone.now() + timedelta(days=1)
+        )
+
+    def _venta(self, id_local):
+        return {
+            'id_local': id_local, 'fecha': timezone.now().isoformat(), 'cliente_nombre': f'CLIENTE {id_local}',
+            'metodo_pago': 'EFECTIVO',
+            'detalles': [{'nombre': 'AREPA', 'cantidad': 1, 'precio_unitario': 1000}],
+        }
+
+    def test_venta_con_error_no_afecta_las_demas(self):
+        sincronizar_lineas = VentaRuta.sincronizar_lineas
+
+        def _falla_una(venta):
+            if venta.id_local == 'v-2':
+                raise ValueError('fallo simulado')
+            return sincronizar_lineas(venta)
+
+        with mock.patch.object(VentaRuta, 'sincronizar_lineas', _falla_una):
+            respuesta = self.client.post(
+                self.url, [self._venta('v-1'), self._venta('v-2'), self._venta('v-3')],
+                content_type='application/json', HTTP_AUTHORIZATION='Bearer token-sync',
+            )
+
+        self.assertEqual(respuesta.status_code, 200)
+        estados = [r['status'] for r in respuesta.json()['resultados']]
+        self.assertEqual(estados, ['CREADA', 'ERROR', 'CREADA'])
+        self.assertEqual(
+            set(VentaRuta.objects.values_list('id_local', flat=True)), {'v-1', 'v-3'}
+        )
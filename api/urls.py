@@ -5,7 +5,7 @@ from .views import (
     RegistroViewSet, ProductoViewSet, CategoriaViewSet, StockViewSet,
     LoteViewSet, MovimientoInventarioViewSet, RegistroInventarioViewSet,
     VentaViewSet, DetalleVentaViewSet, ClienteViewSet, ProductosFrecuentesViewSet, ListaPrecioViewSet, PrecioProductoViewSet,
-    CargueID1ViewSet, CargueID2ViewSet, CargueID3ViewSet, CargueID4ViewSet, CargueID5ViewSet, CargueID6ViewSet, ProduccionViewSet,
+    CargueID1ViewSet, CargueID2ViewSet, CargueID3ViewSet, CargueID4ViewSet, CargueID5ViewSet, CargueID6ViewSet, CargueViewSet, ProduccionViewSet,
     VendedorViewSet, DomiciliarioViewSet, ProduccionSolicitadaViewSet, PlaneacionViewSet,
     SucursalViewSet, CajeroViewSet, TurnoViewSet, VentaCajeroViewSet, ArqueoCajaViewSet,
     PedidoViewSet, DetallePedidoViewSet, MovimientoCajaViewSet, ConfiguracionImpresionViewSet,
@@ -14,7 +14,7 @@ from .views import (
     RutaViewSet, ClienteRutaViewSet, VentaRutaViewSet, ClienteOcasionalViewSet,
     RegistrosPlaneacionDiaViewSet,
     CarguePagosViewSet, RutaOrdenViewSet, ReportePlaneacionViewSet,
-    obtener_estado_cargue, actualizar_estado_cargue, verificar_actualizaciones,
+    obtener_estado_cargue, actualizar_estado_cargue, verificar_actualizaciones, esperar_cambios, stream_cambios,
     CargueResumenViewSet, TipoNegocioViewSet,
     # 🆕 Endpoints de turno
     verificar_turno_activo, abrir_turno, cerrar_turno_estado,
@@ -23,7 +23,7 @@ from .views import (
     # 🆕 Trazabilidad de lotes
     buscar_lote, lotes_por_fecha, lotes_por_mes,
     # 🤖 Endpoints de IA
-    ai_chat, ai_analyze_data, ai_health, ai_agent_command,
+    ai_chat, ai_analyze_data, ai_health, ai_agent_command, ai_trabajo_estado,
     # 📊 Reportes Avanzados
     reportes_vendedores, reportes_efectividad_vendedores, reportes_analisis_productos,
     reportes_pedidos_ruta, reportes_ventas_pos,
@@ -48,6 +48,8 @@ from .views import (
     exportar_cargue_excel,
     # 📅 Exportar Planeación Mensual Excel
     exportar_planeacion_mensual_excel,
+    # 📤 Exportaciones en segundo plano
+    crear_exportacion, exportacion_estado, exportacion_descargar,
 )
 
 router = DefaultRouter()
@@ -73,6 +75,7 @@ router.register(r'cargue-id3', CargueID3ViewSet, basename='cargue-id3')
 router.register(r'cargue-id4', CargueID4ViewSet, basename='cargue-id4')
 router.register(r'cargue-id5', CargueID5ViewSet, basename='cargue-id5')
 router.register(r'cargue-id6', CargueID6ViewSet, basename='cargue-id6')
+router.register(r'cargue-unificado', CargueViewSet, basename='cargue-unificado')  # 🆕 Tabla única (todos los IDs)
 router.register(r'cargue-pagos', CarguePagosViewSet, basename='cargue-pagos')  # 🆕 Pagos de cargue
 router.register(r'cargue-resumen', CargueResumenViewSet, basename='cargue-resumen')  # 🆕 Resumen y Estado
 
@@ -136,6 +139,10 @@ urlpatterns = router.urls + [
     
     # 🆕 Polling Inteligente
     path('cargue/verificar-actualizaciones/', verificar_actualizaciones, name='verificar-actualizaciones'),
+
+    # 🆕 Feed de cambios (LISTEN/NOTIFY): long-poll y SSE
+    path('cambios/', esperar_cambios, name='esperar-cambios'),
+    path('cambios/stream/', stream_cambios, name='stream-cambios'),
     
     # 🆕 Configuración de producción
     path('configuracion-produccion/', obtener_configuracion_produccion, name='obtener-configuracion-produccion'),
@@ -151,6 +158,7 @@ urlpatterns = router.urls + [
     path('ai/analyze/', ai_analyze_data, name='ai-analyze'),
     path('ai/health/', ai_health, name='ai-health'),
     path('ai/agent/', ai_agent_command, name='ai-agent'),
+    path('ai/trabajos/<int:trabajo_id>/', ai_trabajo_estado, name='ai-trabajo-estado'),
     path('ia/config/', ia_config, name='ia-config'),
     path('ia/retrain/', ia_retrain, name='ia-retrain'),
     path('ia/logs/', ia_logs, name='ia-logs'),
@@ -194,4 +202,9 @@ urlpatterns = router.urls + [
 
     # 📅 Exportar Planeación Mensual Excel
     path('reportes/planeacion-mensual-excel/', exportar_planeacion_mensual_excel, name='planeacion-mensual-excel'),
+
+    # 📤 Exportaciones en segundo plano
+    path('exportaciones/', crear_exportacion, name='crear-exportacion'),
+    path('exportaciones/<int:trabajo_id>/', exportacion_estado, name='exportacion-estado'),
+    path('exportaciones/<int:trabajo_id>/descargar/', exportacion_descargar, name='exportacion-descargar'),
 ]
@@ -6,28 +6,32 @@ from django.conf import settings
 from django.db import transaction, models  # 🆕 Agregar models para Q
 from django.utils import timezone
 from django.http import HttpResponse
+from django.views.decorators.http import require_GET
 import os
-import base64
 import re
 import uuid
 import csv
 import json
 import secrets
-import unicodedata
+import time
 from datetime import timedelta, datetime, date
 from collections import defaultdict
-from api.services.ai_assistant_service import AIAssistant
+from decimal import Decimal, InvalidOperation
+from api.services.hechos_venta_service import programar_refresco_hechos
+from api.services.imagenes_service import archivo_desde_base64, url_variante
+from api.services.rangos_fecha import filtro_dia, filtro_fechas
 from django.utils.dateparse import parse_datetime, parse_date
-from .models import Planeacion, Registro, Producto, Categoria, Stock, Lote, MovimientoInventario, RegistroInventario, Venta, DetalleVenta, Cliente, ProductosFrecuentes, ListaPrecio, PrecioProducto, CargueID1, CargueID2, CargueID3, CargueID4, CargueID5, CargueID6, Produccion, ProduccionSolicitada, Pedido, DetallePedido, Vendedor, VendedorSesionToken, Domiciliario, MovimientoCaja, ArqueoCaja, ConfiguracionImpresion, Ruta, ClienteRuta, VentaRuta, CarguePagos, CargueCumplimiento, RutaOrden, RutaOrdenVendedor, ReportePlaneacion, CargueResumen, TipoNegocio, ClienteOcasional, recalcular_totales_cargue_queryset
+from .models import Planeacion, Registro, Producto, Categoria, Stock, Lote, MovimientoInventario, RegistroInventario, Venta, DetalleVenta, Cliente, ProductosFrecuentes, ListaPrecio, PrecioProducto, CargueID1, CargueID2, CargueID3, CargueID4, CargueID5, CargueID6, Cargue, obtener_modelo_cargue, normalizar_nombre_producto, buscar_producto_por_nombre, Produccion, ProduccionSolicitada, Pedido, DetallePedido, Vendedor, VendedorSesionToken, Domiciliario, MovimientoCaja, ArqueoCaja, ConfiguracionImpresion, Ruta, ClienteRuta, VentaRuta, DetalleVentaRuta, VencidaVentaRuta, CarguePagos, CargueCumplimiento, RutaOrden, RutaOrdenVendedor, ReportePlaneacion, CargueResumen, TipoNegocio, ClienteOcasional, recalcular_totales_cargue_queryset
 from .serializers import (
     PlaneacionSerializer, ReportePlaneacionSerializer,
     RegistroSerializer, ProductoSerializer, CategoriaSerializer, StockSerializer,
     LoteSerializer, MovimientoInventarioSerializer, RegistroInventarioSerializer,
     VentaSerializer, DetalleVentaSerializer, ClienteSerializer, ProductosFrecuentesSerializer, ListaPrecioSerializer, PrecioProductoSerializer,
-    CargueID1Serializer, CargueID2Serializer, CargueID3Serializer, CargueID4Serializer, CargueID5Serializer, CargueID6Serializer, ProduccionSerializer, ProduccionSolicitadaSerializer, PedidoSerializer, DetallePedidoSerializer, VendedorSerializer, DomiciliarioSerializer, MovimientoCajaSerializer, ArqueoCajaSerializer, ConfiguracionImpresionSerializer,
+    CargueID1Serializer, CargueID2Serializer, CargueID3Serializer, CargueID4Serializer, CargueID5Serializer, CargueID6Serializer, CargueSerializer, ProduccionSerializer, ProduccionSolicitadaSerializer, PedidoSerializer, DetallePedidoSerializer, VendedorSerializer, DomiciliarioSerializer, MovimientoCajaSerializer, ArqueoCajaSerializer, ConfiguracionImpresionSerializer,
     RutaSerializer, ClienteRutaSerializer, VentaRutaSerializer, CarguePagosSerializer, RutaOrdenSerializer, CargueResumenSerializer, TipoNegocioSerializer,
     ClienteOcasionalSerializer
 )
+from .pagination import PaginacionCursorOpcional
 
 
 def _extraer_token_request(request):
@@ -71,6 +75,68 @@ def _normalizar_id_vendedor(vendedor_raw):
     return vendedor_id_txt, int(vendedor_num_txt)
 
 
+def _marca_version(queryset):
+    """(MAX(fecha_actualizacion), COUNT(*)) de un queryset, en una sola consulta."""
+    marca = queryset.aggregate(ultima=models.Max('fecha_actualizacion'), filas=models.Count('pk'))
+    return marca['ultima'], marca['filas']
+
+
+def _get_condicional(request, *marcas):
+    """
+    GET condicional (ETag / Last-Modified) a partir de marcas baratas de versión:
+    MAX(fecha_actualizacion) y COUNT(*) de las tablas que arman la respuesta
+    (el COUNT cubre los borrados, que no mueven el MAX).
+
+    Retorna (respuesta_304, validadores): si el cliente ya tiene esta versión
+    `respuesta_304` es el 304 listo para devolver sin construir el payload; si
+    no, es None y `validadores` se aplican a la respuesta con _con_validadores.
+    """
+    import hashlib
+    from django.utils.cache import get_conditional_response, quote_etag
+
+    fechas = [m for m in marcas if isinstance(m, datetime)]
+    ultima = max(fechas) if fechas else None
+    etag = quote_etag(hashlib.md5(repr(marcas).encode()).hexdigest())
+    last_modified = int(ultima.timestamp()) if ultima else None
+
+    respuesta = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    return respuesta, (etag, last_modified)
+
+
+def _con_validadores(response, validadores):
+    from django.utils.http import http_date
+
+    etag, last_modified = validadores
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'no-cache'  # Guardar, pero revalidar siempre
+    return response
+
+
+def _precio_real_cargue():
+    """
+    Expresión SQL del precio unitario de una fila de cargue: `valor` y, si es 0,
+    el precio del catálogo (precio_cargue o, en su defecto, precio).
+    Evita cargar todo Producto en memoria para corregir montos en 0.
+    """
+    from django.db.models.functions import Coalesce, NullIf
+
+    precio = models.DecimalField(max_digits=10, decimal_places=2)
+    producto_catalogo = Producto.objects.filter(nombre=models.OuterRef('producto')).order_by()
+    precio_catalogo = Coalesce(
+        NullIf(models.Subquery(producto_catalogo.values('precio_cargue')[:1]), models.Value(0)),
+        models.Subquery(producto_catalogo.values('precio')[:1]),
+        models.Value(0),
+        output_field=precio
+    )
+    return models.Case(
+        models.When(valor=0, then=precio_catalogo),
+        default=models.F('valor'),
+        output_field=precio
+    )
+
+
 def _obtener_vendedor_sesion_movil(request):
     token = _extraer_token_request(request)
     if not token:
@@ -343,6 +409,114 @@ def verificar_actualizaciones(request):
         return Response({'error': str(e)}, status=500)
 
 
+# 🆕 Feed de cambios (LISTEN/NOTIFY) para reemplazar el polling
+ESPERA_MAXIMA_CAMBIOS = 25  # Segundos; por debajo del timeout de gunicorn y de nginx
+REINTENTO_CAMBIOS_SATURADO = 15  # Retry-After cuando el proceso no tiene cupo de escuchas
+
+
+def _parametros_feed_cambios(params, desde_raw=None):
+    vendedor_id = (params.get('vendedor_id') or params.get('idSheet') or '').strip().upper()
+    fecha = (params.get('fecha') or '').strip()[:10]
+    desde_raw = params.get('desde') or desde_raw
+    desde = parse_datetime(desde_raw) if desde_raw else None
+    if desde and timezone.is_naive(desde):
+        desde = timezone.make_aware(desde, timezone.get_current_timezone())
+    try:
+        espera = int(params.get('espera', ESPERA_MAXIMA_CAMBIOS))
+    except (TypeError, ValueError):
+        espera = ESPERA_MAXIMA_CAMBIOS
+    return vendedor_id, fecha, desde, max(0, min(espera, ESPERA_MAXIMA_CAMBIOS))
+
+
+@api_view(['GET'])
+def esperar_cambios(request):
+    """
+    Long-poll de cambios de cargue/estado/turno.
+    GET /api/cambios/?vendedor_id=ID1&fecha=2026-10-18&desde=<cursor>&espera=25
+
+    Responde apenas hay un cambio para ese vendedor y fecha, o con `eventos`
+    vacío al vencer `espera`. El cliente solo vuelve a pedir cargue/estado/turno
+    cuando hay eventos, y reenvía `cursor` como `desde` para no perder lo que
+    cambió entre una llamada y la siguiente.
+    """
+    from api.services.cambios_service import EscuchaCambios, OyentesAgotados, cambios_desde
+
+    vendedor_id, fecha, desde, espera = _parametros_feed_cambios(request.query_params)
+    if not fecha:
+        return Response({'error': 'Se requiere fecha'}, status=400)
+
+    cursor = timezone.now()
+    try:
+        with EscuchaCambios(vendedor_id, fecha) as escucha:
+            # Con el LISTEN ya activo se revisa lo pendiente: no queda hueco
+            eventos = cambios_desde(vendedor_id, fecha, desde) or escucha.esperar(espera)
+    except OyentesAgotados:
+        return Response(
+            {'error': 'Demasiadas escuchas activas', 'reintentar_en': REINTENTO_CAMBIOS_SATURADO},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={'Retry-After': str(REINTENTO_CAMBIOS_SATURADO)},
+        )
+
+    return Response({'eventos': eventos, 'cursor': cursor})
+
+
+@require_GET
+def stream_cambios(request):
+    """
+    Server-Sent Events de cambios de cargue/estado/turno.
+    GET /api/cambios/stream/?vendedor_id=ID1&fecha=2026-10-18
+
+    Cada conexión dura como máximo ESPERA_MAXIMA_CAMBIOS segundos (los workers
+    de gunicorn no pueden quedar tomados indefinidamente); EventSource reconecta
+    solo y reenvía el último `id` en Last-Event-ID, que se usa como `desde`.
+    """
+    from django.http import StreamingHttpResponse
+    from api.services.cambios_service import EscuchaCambios, OyentesAgotados, cambios_desde
+
+    vendedor_id, fecha, desde, espera = _parametros_feed_cambios(
+        request.GET,
+        desde_raw=request.headers.get('Last-Event-ID'),
+    )
+    if not fecha:
+        return HttpResponse('Se requiere fecha', status=400)
+
+    def _evento_sse(evento, cursor):
+        return f"id: {cursor}\nevent: {evento['tipo']}\ndata: {json.dumps(evento)}\n\n"
+
+    def _stream():
+        # El cupo se toma dentro del generador: si la respuesta nunca se itera
+        # (cliente que se fue, middleware que la reemplaza) no queda reservado
+        escucha = EscuchaCambios(vendedor_id, fecha)
+        try:
+            escucha.abrir()
+        except OyentesAgotados:
+            # Sin cupo: EventSource reconecta solo tras `retry` (un 503 lo cerraría)
+            yield f'retry: {REINTENTO_CAMBIOS_SATURADO * 1000}\nevent: saturado\ndata: {{}}\n\n'
+            return
+
+        try:
+            yield 'retry: 1000\n\n'
+            cursor = timezone.now().isoformat()
+            for evento in cambios_desde(vendedor_id, fecha, desde):
+                yield _evento_sse(evento, cursor)
+
+            fin = time.monotonic() + (espera or ESPERA_MAXIMA_CAMBIOS)
+            while time.monotonic() < fin:
+                cursor = timezone.now().isoformat()
+                eventos = escucha.esperar(min(15, fin - time.monotonic()))
+                if not eventos:
+                    yield ': latido\n\n'
+                for evento in eventos:
+                    yield _evento_sse(evento, cursor)
+        finally:
+            escucha.cerrar()
+
+    respuesta = StreamingHttpResponse(_stream(), content_type='text/event-stream')
+    respuesta['Cache-Control'] = 'no-cache'
+    respuesta['X-Accel-Buffering'] = 'no'  # nginx: entregar cada evento sin acumular
+    return respuesta
+
+
 class RegistroViewSet(viewsets.ModelViewSet):
     queryset = Registro.objects.all()
     serializer_class = RegistroSerializer
@@ -360,24 +534,15 @@ class ProductoViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.AllowAny]
     parser_classes = [parsers.MultiPartParser, parsers.FormParser, parsers.JSONParser]
     
-    def _save_image_to_paths(self, image_data, filename):
-        """Guarda imagen en ambas ubicaciones"""
-        # Crear carpetas
-        frontend_path = os.path.join(settings.BASE_DIR, 'frontend', 'public', 'images', 'productos')
-        media_path = os.path.join(settings.MEDIA_ROOT, 'productos')
-        
-        os.makedirs(frontend_path, exist_ok=True)
-        os.makedirs(media_path, exist_ok=True)
-        
-        # Guardar en ambas ubicaciones
-        for path in [frontend_path, media_path]:
-            filepath = os.path.join(path, filename)
-            with open(filepath, 'wb') as f:
-                f.write(base64.b64decode(image_data))
-    
     @action(detail=False, methods=['post'])
     def save_image(self, request):
-        """Guarda imagen base64 y devuelve URLs"""
+        """
+        Guarda imagen base64 una sola vez en media/imagenes/ (por contenido,
+        ver imagenes_service) y devuelve URLs. La miniatura se genera en
+        segundo plano; mientras tanto `miniaturaUrl` apunta al original.
+        """
+        from .services.imagenes_service import almacenamiento_imagenes
+
         try:
             image_data = request.data.get('image')
             product_id = request.data.get('productId')
@@ -385,23 +550,22 @@ class ProductoViewSet(viewsets.ModelViewSet):
             if not image_data or not image_data.startswith('data:'):
                 return Response({'error': 'Datos de imagen no válidos'}, status=status.HTTP_400_BAD_REQUEST)
             
-            # Extraer datos base64
-            match = re.match(r'data:([^;]+);base64,(.+)', image_data)
-            if not match:
+            try:
+                archivo = archivo_desde_base64(image_data, f"producto_{product_id or uuid.uuid4()}")
+            except ValueError:
                 return Response({'error': 'Formato de imagen no válido'}, status=status.HTTP_400_BAD_REQUEST)
             
-            mime_type, base64_data = match.groups()
-            extension = mime_type.split('/')[-1]
-            filename = f"producto_{product_id or uuid.uuid4()}_{uuid.uuid4().hex[:8]}.{extension}"
-            
-            # Guardar imagen
-            self._save_image_to_paths(base64_data, filename)
+            # Guardar imagen (si ya existía el mismo contenido se reutiliza)
+            nombre = almacenamiento_imagenes.save(archivo.name, archivo)
+            url = almacenamiento_imagenes.url(nombre)
             
             return Response({
                 'success': True,
-                'frontendUrl': f"/images/productos/{filename}",
-                'mediaUrl': f"/media/productos/{filename}",
-                'filename': filename
+                # frontend/public no se publica en producción: ambas URLs sirven desde /media/
+                'frontendUrl': url,
+                'mediaUrl': url,
+                'miniaturaUrl': url_variante(nombre),
+                'filename': os.path.basename(nombre)
             })
             
         except Exception as e:
@@ -467,33 +631,39 @@ class ProductoViewSet(viewsets.ModelViewSet):
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
     # 🆕 ENDPOINTS FILTRADOS POR MÓDULO
+    def _listar_productos_modulo(self, request, **filtros):
+        """Lista de productos de un módulo con GET condicional (304 si el catálogo no cambió)"""
+        productos = Producto.objects.filter(activo=True, **filtros)
+        respuesta_304, validadores = _get_condicional(
+            request,
+            *_marca_version(productos),
+            *_marca_version(Stock.objects.filter(producto__in=productos)),  # stock_actual
+        )
+        if respuesta_304:
+            return respuesta_304
+
+        serializer = self.get_serializer(productos.order_by('orden', 'id'), many=True)
+        return _con_validadores(Response(serializer.data), validadores)
+
     @action(detail=False, methods=['get'], url_path='pos')
     def productos_pos(self, request):
         """Obtener productos disponibles para POS"""
-        productos = Producto.objects.filter(disponible_pos=True, activo=True).order_by('orden', 'id')
-        serializer = self.get_serializer(productos, many=True)
-        return Response(serializer.data)
+        return self._listar_productos_modulo(request, disponible_pos=True)
     
     @action(detail=False, methods=['get'], url_path='cargue')
     def productos_cargue(self, request):
         """Obtener productos disponibles para Cargue"""
-        productos = Producto.objects.filter(disponible_cargue=True, activo=True).order_by('orden', 'id')
-        serializer = self.get_serializer(productos, many=True)
-        return Response(serializer.data)
+        return self._listar_productos_modulo(request, disponible_cargue=True)
     
     @action(detail=False, methods=['get'], url_path='pedidos')
     def productos_pedidos(self, request):
         """Obtener productos disponibles para Pedidos"""
-        productos = Producto.objects.filter(disponible_pedidos=True, activo=True).order_by('orden', 'id')
-        serializer = self.get_serializer(productos, many=True)
-        return Response(serializer.data)
+        return self._listar_productos_modulo(request, disponible_pedidos=True)
     
     @action(detail=False, methods=['get'], url_path='inventario')
     def productos_inventario(self, request):
         """Obtener productos disponibles para Inventario"""
-        productos = Producto.objects.filter(disponible_inventario=True, activo=True).order_by('orden', 'id')
-        serializer = self.get_serializer(productos, many=True)
-        return Response(serializer.data)
+        return self._listar_productos_modulo(request, disponible_inventario=True)
 
 class StockViewSet(viewsets.ModelViewSet):
     """API para gestionar stock de productos"""
@@ -552,6 +722,7 @@ class MovimientoInventarioViewSet(viewsets.ModelViewSet):
     queryset = MovimientoInventario.objects.all()
     serializer_class = MovimientoInventarioSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = PaginacionCursorOpcional
     
     def get_queryset(self):
         queryset = MovimientoInventario.objects.all().order_by('-fecha')
@@ -592,6 +763,7 @@ class VentaViewSet(viewsets.ModelViewSet):
     queryset = Venta.objects.all()
     serializer_class = VentaSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = PaginacionCursorOpcional
     
     def get_queryset(self):
         queryset = Venta.objects.all().order_by('-fecha')
@@ -613,8 +785,67 @@ class VentaViewSet(viewsets.ModelViewSet):
             
         return queryset
     
+    @staticmethod
+    def _id_producto(detalle_data):
+        try:
+            return int(detalle_data.get('producto'))
+        except (AttributeError, TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _sumar_vendidas_cargue(venta_data, lineas):
+        """Suma las unidades vendidas al cargue del vendedor (si la venta trae vendedor_id)."""
+        v_id_raw = str(venta_data.get('vendedor_id', ''))
+        if v_id_raw.isdigit():
+            v_id_str = f"ID{v_id_raw}"
+        elif v_id_raw.upper().startswith('ID'):
+            v_id_str = v_id_raw.upper()
+        else:
+            return
+
+        if not obtener_modelo_cargue(v_id_str):
+            return
+
+        fecha_str = venta_data.get('fecha')
+        if isinstance(fecha_str, str):
+            fecha_dt = parse_datetime(fecha_str)
+            fecha_venta = fecha_dt.date() if fecha_dt else None
+        elif hasattr(fecha_str, 'date'):
+            fecha_venta = fecha_str.date()
+        else:
+            fecha_venta = timezone.now().date()
+        if not fecha_venta:
+            return
+
+        vendidas_por_nombre = defaultdict(int)
+        for producto, cantidad, _ in lineas:
+            vendidas_por_nombre[producto.nombre] += cantidad
+
+        # Primera fila de cargue por producto, igual que el .first() por línea de antes
+        vendidas_por_registro = {}
+        filas = Cargue.objects.filter(
+            vendedor_id=v_id_str,
+            fecha=fecha_venta,
+            producto__in=vendidas_por_nombre
+        ).order_by('id').values_list('pk', 'producto')
+        for pk, nombre in filas:
+            if nombre in vendidas_por_nombre:
+                vendidas_por_registro[pk] = vendidas_por_nombre.pop(nombre)
+
+        if vendidas_por_registro:
+            Cargue.objects.filter(pk__in=vendidas_por_registro).update(
+                vendidas=models.F('vendidas') + models.Case(
+                    *[models.When(pk=pk, then=models.Value(c)) for pk, c in vendidas_por_registro.items()],
+                    default=models.Value(0),
+                    output_field=models.IntegerField(),
+                )
+            )
+            print(f"✅ Stock actualizado Cargue{v_id_str}: {len(vendidas_por_registro)} productos")
+
     def create(self, request, *args, **kwargs):
         """Crear venta con sus detalles"""
+        from api.services.inventario_service import registrar_salida_venta
+
         try:
             venta_data = request.data.copy()
             detalles_data = venta_data.pop('detalles', [])
@@ -641,81 +872,50 @@ class VentaViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            # Crear la venta
-            venta_serializer = self.get_serializer(data=venta_data)
-            if not venta_serializer.is_valid():
-                print("❌ Errores en venta:", venta_serializer.errors)
-                return Response(venta_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-            
-            venta = venta_serializer.save()
-
-            
-            # Crear los detalles directamente
+            # Resolver todos los productos del ticket en una sola consulta (antes de guardar nada)
+            ids_productos = {self._id_producto(d) for d in detalles_data}
+            productos = Producto.objects.in_bulk([pk for pk in ids_productos if pk is not None])
+            lineas = []
             for detalle_data in detalles_data:
-                try:
-                    producto = Producto.objects.get(id=detalle_data['producto'])
-                    DetalleVenta.objects.create(
-                        venta=venta,
-                        producto=producto,
-                        cantidad=detalle_data['cantidad'],
-                        precio_unitario=float(detalle_data['precio_unitario'])
-                    )
-                    print(f"✅ Detalle creado: {producto.nombre} x{detalle_data['cantidad']}")
-                    
-                    # 🆕 ACTUALIZAR INVENTARIO (CargueIDx)
-                    try:
-                        v_id_raw = str(venta_data.get('vendedor_id', ''))
-                        if v_id_raw.isdigit():
-                            v_id_str = f"ID{v_id_raw}"
-                        elif v_id_raw.upper().startswith('ID'):
-                            v_id_str = v_id_raw.upper()
-                        else:
-                            v_id_str = None
-                        
-                        if v_id_str:
-                            modelos = {
-                                'ID1': CargueID1, 'ID2': CargueID2, 'ID3': CargueID3,
-                                'ID4': CargueID4, 'ID5': CargueID5, 'ID6': CargueID6
-                            }
-                            Modelo = modelos.get(v_id_str)
-                            
-                            if Modelo:
-                                from django.utils.dateparse import parse_datetime
-                                fecha_str = venta_data.get('fecha')
-                                if isinstance(fecha_str, str):
-                                    fecha_dt = parse_datetime(fecha_str)
-                                    fecha_venta = fecha_dt.date() if fecha_dt else None
-                                elif hasattr(fecha_str, 'date'):
-                                    fecha_venta = fecha_str.date()
-                                else:
-                                    from django.utils import timezone
-                                    fecha_venta = timezone.now().date()
-                                
-                                if fecha_venta:
-                                    cargue_item = Modelo.objects.filter(
-                                        fecha=fecha_venta, 
-                                        producto=producto
-                                    ).first()
-                                    
-                                    if cargue_item:
-                                        cargue_item.vendidas = (cargue_item.vendidas or 0) + detalle_data['cantidad']
-                                        cargue_item.save()
-                                        print(f"✅ Stock actualizado Cargue{v_id_str}: {producto.nombre} (+{detalle_data['cantidad']}) -> Total Vendidas: {cargue_item.vendidas}")
-                    except Exception as e_inv:
-                        print(f"⚠️ Error actualizando inventario en venta: {e_inv}")
-
-                except Producto.DoesNotExist:
-                    print(f"❌ Producto no encontrado: {detalle_data['producto']}")
+                producto = productos.get(self._id_producto(detalle_data))
+                if not producto:
+                    print(f"❌ Producto no encontrado: {detalle_data.get('producto')}")
                     return Response(
-                        {'error': f'Producto {detalle_data["producto"]} no encontrado'}, 
+                        {'error': f'Producto {detalle_data.get("producto")} no encontrado'}, 
                         status=status.HTTP_400_BAD_REQUEST
                     )
-                except Exception as e:
+                try:
+                    lineas.append((
+                        producto,
+                        int(detalle_data['cantidad']),
+                        Decimal(str(detalle_data['precio_unitario'])),
+                    ))
+                except (KeyError, TypeError, ValueError, InvalidOperation) as e:
                     print(f"❌ Error creando detalle: {str(e)}")
                     return Response(
                         {'error': f'Error creando detalle: {str(e)}'}, 
                         status=status.HTTP_400_BAD_REQUEST
                     )
+
+            # Crear la venta
+            venta_serializer = self.get_serializer(data=venta_data)
+            if not venta_serializer.is_valid():
+                print("❌ Errores en venta:", venta_serializer.errors)
+                return Response(venta_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+            with transaction.atomic():
+                venta = venta_serializer.save()
+
+                # 📒 Detalles + kárdex + stock en bloque (ver inventario_service)
+                registrar_salida_venta(venta, lineas)
+                print(f"✅ Venta {venta.numero_factura}: {len(lineas)} detalles registrados")
+
+                # 🆕 ACTUALIZAR INVENTARIO (CargueIDx)
+                try:
+                    with transaction.atomic():
+                        self._sumar_vendidas_cargue(venta_data, lineas)
+                except Exception as e_inv:
+                    print(f"⚠️ Error actualizando inventario en venta: {e_inv}")
             
             # Retornar venta completa con detalles
             venta_completa = VentaSerializer(venta)
@@ -745,6 +945,8 @@ class ClienteViewSet(viewsets.ModelViewSet):
     queryset = Cliente.objects.all()
     serializer_class = ClienteSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = PaginacionCursorOpcional
+    orden_paginacion = ('-fecha_creacion', '-id')
     
     def get_queryset(self):
         queryset = Cliente.objects.all().order_by('-fecha_creacion')
@@ -988,6 +1190,7 @@ class CargueID1ViewSet(viewsets.ModelViewSet):
     queryset = CargueID1.objects.all()
     serializer_class = CargueID1Serializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = PaginacionCursorOpcional
     
     def get_queryset(self):
         import re
@@ -1037,6 +1240,7 @@ class CargueID2ViewSet(viewsets.ModelViewSet):
     queryset = CargueID2.objects.all()
     serializer_class = CargueID2Serializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = PaginacionCursorOpcional
     
     def get_queryset(self):
         import re
@@ -1065,6 +1269,7 @@ class CargueID3ViewSet(viewsets.ModelViewSet):
     queryset = CargueID3.objects.all()
     serializer_class = CargueID3Serializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = PaginacionCursorOpcional
     
     def get_queryset(self):
         import re
@@ -1093,6 +1298,7 @@ class CargueID4ViewSet(viewsets.ModelViewSet):
     queryset = CargueID4.objects.all()
     serializer_class = CargueID4Serializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = PaginacionCursorOpcional
     
     def get_queryset(self):
         import re
@@ -1121,6 +1327,7 @@ class CargueID5ViewSet(viewsets.ModelViewSet):
     queryset = CargueID5.objects.all()
     serializer_class = CargueID5Serializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = PaginacionCursorOpcional
     
     def get_queryset(self):
         import re
@@ -1149,6 +1356,7 @@ class CargueID6ViewSet(viewsets.ModelViewSet):
     queryset = CargueID6.objects.all()
     serializer_class = CargueID6Serializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = PaginacionCursorOpcional
     
     def get_queryset(self):
         import re
@@ -1172,6 +1380,44 @@ class CargueID6ViewSet(viewsets.ModelViewSet):
             
         return queryset
 
+class CargueViewSet(viewsets.ModelViewSet):
+    """
+    API de la tabla unificada de cargue (todos los vendedores).
+    Filtrar con ?vendedor_id=ID7 para una ruta; una ruta nueva no necesita
+    modelo, migración ni ViewSet propios.
+    """
+    queryset = Cargue.objects.all()
+    serializer_class = CargueSerializer
+    permission_classes = [permissions.AllowAny]
+
+    def get_queryset(self):
+        queryset = Cargue.objects.all().order_by('-fecha', '-fecha_actualizacion')
+
+        # Filtros opcionales
+        vendedor_id = self.request.query_params.get('vendedor_id')
+        dia = self.request.query_params.get('dia')
+        fecha = self.request.query_params.get('fecha')
+        fecha_inicio = self.request.query_params.get('fecha_inicio')
+        fecha_fin = self.request.query_params.get('fecha_fin')
+        producto = self.request.query_params.get('producto')
+        activo = self.request.query_params.get('activo')
+
+        if vendedor_id:
+            queryset = queryset.filter(vendedor_id=vendedor_id.upper())
+        if dia:
+            queryset = queryset.filter(dia=dia.upper())
+        if fecha:
+            queryset = queryset.filter(fecha=fecha)
+        if fecha_inicio and fecha_fin:
+            queryset = queryset.filter(fecha__range=[fecha_inicio, fecha_fin])
+        if producto:
+            producto_normalizado = re.sub(r'\s+', ' ', producto).strip()
+            queryset = queryset.filter(producto=producto_normalizado)
+        if activo is not None:
+            queryset = queryset.filter(activo=activo.lower() == 'true')
+
+        return queryset
+
 class ProduccionViewSet(viewsets.ModelViewSet):
     """API para Producción con función de congelado"""
     queryset = Produccion.objects.all()
@@ -1964,6 +2210,8 @@ class PedidoViewSet(viewsets.ModelViewSet):
     queryset = Pedido.objects.all().order_by('-fecha_creacion')
     serializer_class = PedidoSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = PaginacionCursorOpcional
+    orden_paginacion = ('-fecha_creacion', '-id')
     
     def get_queryset(self):
         queryset = Pedido.objects.all().prefetch_related('detalles__producto', 'evidencias').order_by('-fecha_creacion')
@@ -1988,10 +2236,8 @@ class PedidoViewSet(viewsets.ModelViewSet):
                 Q(vendedor__icontains=search)
             )
         else:
-            if fecha_desde:
-                queryset = queryset.filter(fecha__date__gte=fecha_desde)
-            if fecha_hasta:
-                queryset = queryset.filter(fecha__date__lte=fecha_hasta)
+            if fecha_desde or fecha_hasta:
+                queryset = queryset.filter(**filtro_fechas('fecha', fecha_desde or None, fecha_hasta or None))
         if fecha_entrega: # 🆕 Aplicar filtro
             queryset = queryset.filter(fecha_entrega=fecha_entrega)
         if transportadora:
@@ -2008,8 +2254,8 @@ class PedidoViewSet(viewsets.ModelViewSet):
                 serializer.is_valid(raise_exception=True)
                 pedido = serializer.save()
                 
-                # Recargar con detalles
-                pedido.refresh_from_db()
+                # Recargar con detalles (prefetch: sin una consulta por línea)
+                pedido = Pedido.objects.prefetch_related('detalles__producto', 'evidencias').get(pk=pedido.pk)
                 response_serializer = self.get_serializer(pedido)
                 
                 return Response(response_serializer.data, status=status.HTTP_201_CREATED)
@@ -3225,6 +3471,7 @@ class PrediccionIAView(viewsets.ViewSet):
         """
         Genera una predicción de producción CONTEXTUAL para una fecha específica.
         Uso: GET /api/prediccion-ia/?fecha=2025-05-24
+             GET /api/prediccion-ia/?fecha=2025-05-24&async=1  -> 202 {trabajo_id}
         
         La IA considera:
         - Histórico de ventas
@@ -3241,40 +3488,8 @@ class PrediccionIAView(viewsets.ViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # 📊 Obtener datos contextuales de la Planeación (si existen)
-            from api.models import Planeacion
-            datos_contextuales = {}
-            
-            try:
-                planeacion_registros = Planeacion.objects.filter(fecha=fecha_objetivo)
-                for registro in planeacion_registros:
-                    datos_contextuales[registro.producto_nombre] = {
-                        'existencias': registro.existencias or 0,
-                        'solicitadas': registro.solicitadas or 0,
-                        'pedidos': registro.pedidos or 0
-                    }
-                print(f"📊 Datos contextuales cargados para {len(datos_contextuales)} productos")
-            except Exception as e:
-                print(f"⚠️ No se pudieron cargar datos contextuales: {e}")
-                # Continuar sin datos contextuales (IA usará solo histórico)
-            
-            # Importar el servicio aquí para evitar ciclos de importación
-            from api.services.ia_service import IAService
-            
-            # Instanciar servicio y generar predicción con contexto
-            ia_service = IAService()
-            predicciones = ia_service.predecir_produccion(
-                fecha_objetivo,
-                datos_contextuales=datos_contextuales if datos_contextuales else None
-            )
-            
-            return Response({
-                'success': True,
-                'fecha_objetivo': fecha_objetivo,
-                'total_productos_analizados': len(predicciones),
-                'con_datos_contextuales': len(datos_contextuales) > 0,
-                'predicciones': predicciones
-            })
+            # 🤖 Pasa por la cola de IA (tope de llamadas simultáneas al LLM)
+            return _responder_trabajo_ia(request, 'PREDICCION', {'fecha': fecha_objetivo})
             
         except Exception as e:
             print(f"❌ Error en PrediccionIAView: {str(e)}")
@@ -3332,19 +3547,11 @@ def guardar_sugerido(request):
         productos = data.get('productos', []) # Lista de {nombre, cantidad}
         print(f"📱 Recibiendo Sugerido App: {vendedor_id} - {dia} (raw: {dia_raw}) - {fecha}")
 
-        # Mapeo de ID a Modelo
-        modelos = {
-            'ID1': CargueID1,
-            'ID2': CargueID2,
-            'ID3': CargueID3,
-            'ID4': CargueID4,
-            'ID5': CargueID5,
-            'ID6': CargueID6,
-        }
-
-        Modelo = modelos.get(vendedor_id)
-        if not Modelo:
-            return Response({'error': f'Vendedor no válido: {vendedor_id}'}, status=400)
+        # Tabla unificada: cualquier ID de vendedor válido (ID1, ID2, ..., IDn)
+        vendedor_id_raw = vendedor_id
+        vendedor_id, _ = _normalizar_id_vendedor(vendedor_id)
+        if not vendedor_id:
+            return Response({'error': f'Vendedor no válido: {vendedor_id_raw}'}, status=400)
 
         if not fecha:
             return Response({'error': 'La fecha es requerida'}, status=400)
@@ -3352,7 +3559,7 @@ def guardar_sugerido(request):
         # ✅ VALIDACIÓN: Verificar si ya existe sugerido para este día/fecha/vendedor
         # Solo bloquear si hay al menos un producto con cantidad > 0
         # (Si todos están en 0, fue un envío fallido y se permite reenviar)
-        registros_existentes = Modelo.objects.filter(dia=dia, fecha=fecha)
+        registros_existentes = Cargue.objects.filter(vendedor_id=vendedor_id, dia=dia, fecha=fecha)
         registros_con_cantidad = registros_existentes.filter(cantidad__gt=0)
         if registros_con_cantidad.exists():
             total_existente = registros_existentes.count()
@@ -3382,7 +3589,7 @@ def guardar_sugerido(request):
         productos_nombres = [prod.get('nombre') for prod in productos if prod.get('nombre')]
         registros_existentes = {
             reg.producto: reg
-            for reg in Modelo.objects.filter(dia=dia, fecha=fecha, producto__in=productos_nombres)
+            for reg in Cargue.objects.filter(vendedor_id=vendedor_id, dia=dia, fecha=fecha, producto__in=productos_nombres)
         }
         
         # Listas para bulk operations
@@ -3433,7 +3640,8 @@ def guardar_sugerido(request):
                     productos_actualizar.append(registro_existente)
                 else:
                     # Crear nuevo
-                    productos_crear.append(Modelo(
+                    productos_crear.append(Cargue(
+                        vendedor_id=vendedor_id,
                         dia=dia,
                         fecha=fecha,
                         producto=nombre,
@@ -3448,7 +3656,7 @@ def guardar_sugerido(request):
         
         # 🚀 Ejecutar bulk operations (solo 2 queries en total)
         if productos_actualizar:
-            Modelo.objects.bulk_update(
+            Cargue.objects.bulk_update(
                 productos_actualizar,
                 ['cantidad', 'total', 'responsable', 'usuario', 'v'],
                 batch_size=100
@@ -3456,7 +3664,7 @@ def guardar_sugerido(request):
             print(f"  ✅ Actualizados {len(productos_actualizar)} productos en bulk")
         
         if productos_crear:
-            Modelo.objects.bulk_create(productos_crear, batch_size=100)
+            Cargue.objects.bulk_create(productos_crear, batch_size=100)
             print(f"  ✅ Creados {len(productos_crear)} productos en bulk")
         
         print(f"✅ Sugerido guardado: {count} productos actualizados para {vendedor_id}")
@@ -3671,19 +3879,11 @@ def obtener_cargue(request):
 
         print(f"📱 Solicitando Cargue App: {vendedor_id} - {dia} (raw: {dia_raw}) - {fecha}")
 
-        # Mapeo de ID a Modelo
-        modelos = {
-            'ID1': CargueID1,
-            'ID2': CargueID2,
-            'ID3': CargueID3,
-            'ID4': CargueID4,
-            'ID5': CargueID5,
-            'ID6': CargueID6,
-        }
-
-        Modelo = modelos.get(vendedor_id)
-        if not Modelo:
-            return Response({'error': f'Vendedor no válido: {vendedor_id}'}, status=400)
+        # Tabla unificada: cualquier ID de vendedor válido (ID1, ID2, ..., IDn)
+        vendedor_id_raw = vendedor_id
+        vendedor_id, _ = _normalizar_id_vendedor(vendedor_id)
+        if not vendedor_id:
+            return Response({'error': f'Vendedor no válido: {vendedor_id_raw}'}, status=400)
 
         # Construir filtro - buscar con y sin tilde
         from django.db.models import Q
@@ -3699,13 +3899,31 @@ def obtener_cargue(request):
             filtros_q &= Q(fecha=fecha)
         
         # Obtener registros
-        registros = Modelo.objects.filter(filtros_q)
+        registros = Cargue.objects.filter(filtros_q, vendedor_id=vendedor_id)
+
+        pagos_qs = CarguePagos.objects.filter(vendedor_id=vendedor_id, activo=True)
+        if fecha:
+            pagos_qs = pagos_qs.filter(fecha=fecha)
+        elif dia:
+            pagos_qs = pagos_qs.filter(dia__in=dias_variantes)
+
+        # 🆕 GET condicional: el teléfono consulta seguido y casi nunca cambia nada;
+        # si la versión coincide se responde 304 sin armar el diccionario de productos
+        respuesta_304, validadores = _get_condicional(
+            request,
+            *_marca_version(registros),
+            *_marca_version(CargueResumen.objects.filter(vendedor_id='ID1', fecha=fecha)),
+            *_marca_version(pagos_qs),
+            *_marca_version(PrecioProducto.objects.all()),
+            *_marca_version(Producto.objects.all()),  # nombres usados por precios_alternos
+        )
+        if respuesta_304:
+            return respuesta_304
         
         # Formatear respuesta para la App
         data = {}
         
         # 🆕 Obtener estado del cargue desde CargueResumen
-        from .models import CargueResumen
         estado_cargue_valor = 'DESCONOCIDO'
         
         try:
@@ -3727,7 +3945,6 @@ def obtener_cargue(request):
         # 🆕 Precargar diccionario de Precios Alternos (Listas de Precio)
         precios_alternos = {}
         try:
-            from .models import PrecioProducto
             # Consultar solo precios activos y relacionar
             pp_qs = PrecioProducto.objects.select_related('producto', 'lista_precio').filter(activo=True)
             for p in pp_qs:
@@ -3797,17 +4014,7 @@ def obtener_cargue(request):
 
         # Agregar totales de CarguePagos como clave especial __pagos__
         try:
-            from .models import CarguePagos
             from django.db.models import Sum
-            pagos_qs = CarguePagos.objects.filter(
-                vendedor_id=vendedor_id,
-                activo=True
-            )
-            if fecha:
-                pagos_qs = pagos_qs.filter(fecha=fecha)
-            elif dia:
-                pagos_qs = pagos_qs.filter(dia__in=dias_variantes)
-
             pagos_totales = pagos_qs.aggregate(
                 total_nequi=Sum('nequi'),
                 total_daviplata=Sum('daviplata'),
@@ -3823,7 +4030,7 @@ def obtener_cargue(request):
             print(f"⚠️ Error obteniendo CarguePagos: {ep}")
             data['__pagos__'] = {'nequi': 0, 'daviplata': 0, 'descuentos': 0}
 
-        return Response(data)
+        return _con_validadores(Response(data), validadores)
 
     except Exception as e:
         print(f"❌ Error obteniendo cargue: {str(e)}")
@@ -3842,42 +4049,21 @@ def obtener_rendimiento_cargue(request):
     if not dia or not fecha:
         return Response({'error': 'Faltan parámetros: dia, fecha'}, status=400)
     
-    # Mapear todos los modelos de cargue
-    modelos = {
-        'ID1': CargueID1,
-        'ID2': CargueID2,
-        'ID3': CargueID3,
-        'ID4': CargueID4,
-        'ID5': CargueID5,
-        'ID6': CargueID6
-    }
-    
     try:
-        # Consolidar datos de todos los IDs
-        productos_consolidados = {}
-        
-        for id_name, modelo in modelos.items():
-            registros = modelo.objects.filter(dia=dia, fecha=fecha)
-            
-            for registro in registros:
-                producto_nombre = registro.producto
-                
-                if producto_nombre not in productos_consolidados:
-                    productos_consolidados[producto_nombre] = {
-                        'producto': producto_nombre,
-                        'vencidas': 0,
-                        'devoluciones': 0,
-                        'total': 0
-                    }
-                
-                # Sumar los valores de todos los IDs
-                productos_consolidados[producto_nombre]['vencidas'] += registro.vencidas or 0
-                productos_consolidados[producto_nombre]['devoluciones'] += registro.devoluciones or 0
-                productos_consolidados[producto_nombre]['total'] += registro.total or 0
-        
-        # Convertir a lista y ordenar por nombre de producto
-        data = list(productos_consolidados.values())
-        data.sort(key=lambda x: x['producto'])
+        from django.db.models import Sum
+        from django.db.models.functions import Coalesce
+
+        # Consolidar todos los IDs en una sola consulta agregada sobre la tabla unificada
+        data = list(
+            Cargue.objects.filter(dia=dia, fecha=fecha)
+            .values('producto')
+            .annotate(
+                vencidas=Coalesce(Sum('vencidas'), 0),
+                devoluciones=Coalesce(Sum('devoluciones'), 0),
+                total=Coalesce(Sum('total'), 0),
+            )
+            .order_by('producto')
+        )
         
         return Response({
             'success': True,
@@ -4237,6 +4423,7 @@ class VentaRutaViewSet(viewsets.ModelViewSet):
     queryset = VentaRuta.objects.select_related('vendedor', 'ruta', 'cliente').all()  # 🔥 Optimización: Reducir consultas N+1
     serializer_class = VentaRutaSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = PaginacionCursorOpcional
     
     def get_queryset(self):
         queryset = VentaRuta.objects.select_related('vendedor', 'ruta', 'cliente').all()  # 🔥 Optimización
@@ -4250,10 +4437,10 @@ class VentaRutaViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(vendedor__id_vendedor=vendedor_id)
         
         if fecha_inicio and fecha_fin:
-             queryset = queryset.filter(fecha__date__range=[fecha_inicio, fecha_fin])
+             queryset = queryset.filter(**filtro_fechas('fecha', fecha_inicio, fecha_fin))
         elif fecha:
-            # Filtrar por fecha (solo la parte de la fecha, ignorando la hora)
-            queryset = queryset.filter(fecha__date=fecha)
+            # Filtrar por fecha (rango [00:00, 00:00 del día siguiente) para usar el índice)
+            queryset = queryset.filter(**filtro_dia('fecha', fecha))
             
         cliente_id = self.request.query_params.get('cliente_id', None)
         if cliente_id:
@@ -4313,23 +4500,7 @@ class VentaRutaViewSet(viewsets.ModelViewSet):
 
     @staticmethod
     def _normalizar_nombre_producto_cargue(nombre_producto):
-        texto = str(nombre_producto or '').strip()
-        if not texto:
-            return ''
-
-        texto = unicodedata.normalize('NFD', texto)
-        texto = ''.join(ch for ch in texto if unicodedata.category(ch) != 'Mn')
-        texto = texto.upper()
-        texto = re.sub(r'[^A-Z0-9#]+', ' ', texto)
-        texto = re.sub(r'\s+', ' ', texto).strip()
-
-        tokens = []
-        for token in texto.split():
-            if len(token) > 3 and token.endswith('S'):
-                token = token[:-1]
-            tokens.append(token)
-
-        return ' '.join(tokens)
+        return normalizar_nombre_producto(nombre_producto)
 
     def _resolver_registro_cargue(self, ModeloCargue, fecha_venta, nombre_producto):
         if not ModeloCargue or not fecha_venta or not nombre_producto:
@@ -4346,7 +4517,15 @@ class VentaRutaViewSet(viewsets.ModelViewSet):
         if not nombre_norm:
             return None
 
-        # Fallback tolerante: diferencias menores de nombre (plural, espacios, tildes)
+        # Diferencias menores de nombre (plural, espacios, tildes): el cargue usa el
+        # nombre del catálogo, así que se resuelve por el índice de Producto.nombre_normalizado
+        producto = buscar_producto_por_nombre(nombre_producto)
+        if producto:
+            registro = queryset.filter(producto__iexact=producto.nombre).first()
+            if registro:
+                return registro
+
+        # Último recurso: filas de cargue con nombres fuera del catálogo
         for candidato in queryset.only('id', 'producto'):
             if self._normalizar_nombre_producto_cargue(candidato.producto) == nombre_norm:
                 return candidato
@@ -4390,15 +4569,7 @@ class VentaRutaViewSet(viewsets.ModelViewSet):
 
     @staticmethod
     def _obtener_modelo_cargue_por_vendedor(id_vendedor):
-        modelo_map = {
-            'ID1': CargueID1,
-            'ID2': CargueID2,
-            'ID3': CargueID3,
-            'ID4': CargueID4,
-            'ID5': CargueID5,
-            'ID6': CargueID6,
-        }
-        return modelo_map.get((id_vendedor or '').strip().upper())
+        return obtener_modelo_cargue(id_vendedor)
 
     def _construir_mapa_detalles_cargue(self, ModeloCargue, fecha_venta, detalles):
         detalles_por_registro = {}
@@ -4471,6 +4642,10 @@ class VentaRutaViewSet(viewsets.ModelViewSet):
                     'disponible': disponible,
                 })
 
+        return self._respuesta_error_stock(productos_sin_cargue, excedidos)
+
+    @staticmethod
+    def _respuesta_error_stock(productos_sin_cargue, excedidos):
         if not productos_sin_cargue and not excedidos:
             return None
 
@@ -4507,15 +4682,7 @@ class VentaRutaViewSet(viewsets.ModelViewSet):
         if producto:
             return producto
 
-        nombre_norm = self._normalizar_nombre_producto_cargue(nombre_producto)
-        if not nombre_norm:
-            return None
-
-        for candidato in Producto.objects.only('id', 'nombre', 'precio', 'precio_cargue'):
-            if self._normalizar_nombre_producto_cargue(candidato.nombre) == nombre_norm:
-                return candidato
-
-        return None
+        return buscar_producto_por_nombre(nombre_producto)
 
     def _crear_registro_cargue_on_the_fly(self, ModeloCargue, fecha_venta, nombre_producto, *, vendidas=0, vencidas=0):
         ref_cargue = ModeloCargue.objects.filter(fecha=fecha_venta, activo=True).first()
@@ -4528,19 +4695,22 @@ class VentaRutaViewSet(viewsets.ModelViewSet):
         if prod_obj:
             precio_prod = prod_obj.precio_cargue or prod_obj.precio or 0
 
-        return ModeloCargue.objects.create(
-            fecha=fecha_venta,
-            dia=ref_cargue.dia,
-            responsable=ref_cargue.responsable,
-            usuario='Sistema',
-            ruta=ref_cargue.ruta if hasattr(ref_cargue, 'ruta') else '',
-            producto=nombre_real,
-            valor=precio_prod,
-            cantidad=0,
-            vendidas=vendidas,
-            vencidas=vencidas,
-            activo=True
-        )
+        # Savepoint propio: si el INSERT falla dentro de un atomic externo
+        # (sync-batch), no deja abortada la transacción de todo el lote
+        with transaction.atomic():
+            return ModeloCargue.objects.create(
+                fecha=fecha_venta,
+                dia=ref_cargue.dia,
+                responsable=ref_cargue.responsable,
+                usuario='Sistema',
+                ruta=ref_cargue.ruta if hasattr(ref_cargue, 'ruta') else '',
+                producto=nombre_real,
+                valor=precio_prod,
+                cantidad=0,
+                vendidas=vendidas,
+                vencidas=vencidas,
+                activo=True
+            )
 
     def _normalizar_detalles(self, detalles_raw):
         if isinstance(detalles_raw, str):
@@ -4619,23 +4789,146 @@ class VentaRutaViewSet(viewsets.ModelViewSet):
 
         return normalizados
     
-    # ===== 🆕 ACTION: ANULAR VENTA RUTA =====
-    @action(detail=True, methods=['post'])
-    def anular(self, request, pk=None):
-        """
-        Anula una VentaRuta:
-        1. Verifica que no esté ya anulada
-        2. Verifica límite de anulaciones (máximo 1)
-        3. Descuenta las 'vendidas' del CargueIDx por cada producto
-        4. Marca estado = 'ANULADA' e incrementa contador
-        """
-        try:
-            vendedor_auth = self._validar_sesion_movil(request)
-            if not vendedor_auth:
-                return Response({'error': 'No autorizado. Inicia sesión nuevamente.'}, status=401)
+    @staticmethod
+    def _huella_detalles(detalles):
+        if not isinstance(detalles, list):
+            return '[]'
 
-            venta = self.get_object()
-            if venta.vendedor_id != vendedor_auth.id_vendedor:
+        detalles_norm = []
+        for item in detalles:
+            if not isinstance(item, dict):
+                continue
+            detalles_norm.append({
+                'producto': str(item.get('producto') or item.get('nombre') or '').strip().upper(),
+                'cantidad': int(item.get('cantidad') or 0),
+                'precio': float(item.get('precio') or item.get('precio_unitario') or item.get('valor_unitario') or 0),
+            })
+
+        detalles_norm.sort(key=lambda x: (x['producto'], x['cantidad'], x['precio']))
+        return json.dumps(detalles_norm, ensure_ascii=False, sort_keys=True)
+
+    @staticmethod
+    def _huella_vencidas(vencidas):
+        if not isinstance(vencidas, list):
+            return '[]'
+
+        vencidas_norm = []
+        for item in vencidas:
+            if not isinstance(item, dict):
+                continue
+            vencidas_norm.append({
+                'producto': str(item.get('producto') or item.get('nombre') or '').strip().upper(),
+                'cantidad': int(item.get('cantidad') or 0),
+                'motivo': str(item.get('motivo') or '').strip().upper(),
+            })
+
+        vencidas_norm.sort(key=lambda x: (x['producto'], x['cantidad'], x['motivo']))
+        return json.dumps(vencidas_norm, ensure_ascii=False, sort_keys=True)
+
+    def _asignar_cliente_ocasional(self, data, vendedor_auth):
+        """
+        La app envía cliente_ocasional con un ID temporal: se reemplaza por el
+        ClienteOcasional real (existente o nuevo) del vendedor. Muta `data`.
+        """
+        if 'cliente_ocasional' in data and data['cliente_ocasional']:
+            try:
+                # Extraer datos del cliente desde los campos de la venta
+                nombre_cliente = data.get('cliente_nombre', '').strip()
+                nombre_negocio = data.get('nombre_negocio', '').strip()
+                
+                # Usar nombre_negocio si existe, sino usar cliente_nombre
+                nombre_final = nombre_negocio if nombre_negocio else nombre_cliente
+                
+                if nombre_final:
+                    # Buscar si ya existe un ClienteOcasional con ese nombre para este vendedor
+                    cliente_ocasional_existente = ClienteOcasional.objects.filter(
+                        vendedor=vendedor_auth,
+                        nombre__iexact=nombre_final,
+                        activo=True
+                    ).first()
+                    
+                    if cliente_ocasional_existente:
+                        # Ya existe, usar ese ID
+                        data['cliente_ocasional'] = cliente_ocasional_existente.id
+                        print(f"✅ Cliente ocasional existente encontrado: {cliente_ocasional_existente.id} - {nombre_final}")
+                    else:
+                        # No existe, crear uno nuevo
+                        nuevo_cliente_ocasional = ClienteOcasional.objects.create(
+                            vendedor=vendedor_auth,
+                            nombre=nombre_final,
+                            telefono='',  # La app no envía teléfono en ventas ocasionales
+                            direccion='',  # La app no envía dirección en ventas ocasionales
+                            tope_venta=60000,  # Tope por defecto
+                            activo=True
+                        )
+                        data['cliente_ocasional'] = nuevo_cliente_ocasional.id
+                        print(f"✅ Cliente ocasional creado: {nuevo_cliente_ocasional.id} - {nombre_final} para {vendedor_auth.id_vendedor}")
+                else:
+                    # No hay nombre, quitar el campo para evitar error
+                    data.pop('cliente_ocasional', None)
+                    print(f"⚠️ No se pudo crear cliente ocasional: sin nombre")
+            except Exception as e:
+                print(f"❌ Error creando cliente ocasional: {e}")
+                # Si falla, quitar el campo para que la venta se guarde sin cliente ocasional
+                data.pop('cliente_ocasional', None)
+
+    @staticmethod
+    def _foto_vencidos_desde_payload(foto_vencidos_data):
+        """
+        Convierte la primera imagen base64 encontrada en `foto_vencidos` (string,
+        JSON, lista o dict legacy/offline) a archivo. None si no hay ninguna válida.
+        """
+        import uuid
+
+        def _iterar_posibles_imagenes(raw):
+            if isinstance(raw, str):
+                yield raw
+                return
+            if isinstance(raw, list):
+                for item in raw:
+                    yield from _iterar_posibles_imagenes(item)
+                return
+            if isinstance(raw, dict):
+                for value in raw.values():
+                    yield from _iterar_posibles_imagenes(value)
+                return
+
+        if isinstance(foto_vencidos_data, str):
+            try:
+                foto_vencidos_data = json.loads(foto_vencidos_data)
+            except Exception:
+                # Si llega string no JSON/base64, no debe romper creación.
+                pass
+
+        for candidata in _iterar_posibles_imagenes(foto_vencidos_data):
+            if not isinstance(candidata, str):
+                continue
+            if ';base64,' not in candidata:
+                continue
+            try:
+                return archivo_desde_base64(candidata, f'vencidas_{uuid.uuid4().hex[:8]}')
+            except Exception as e:
+                print(f"⚠️ Foto vencidos inválida ignorada: {e}")
+
+        return None
+
+    # ===== 🆕 ACTION: ANULAR VENTA RUTA =====
+    @action(detail=True, methods=['post'])
+    def anular(self, request, pk=None):
+        """
+        Anula una VentaRuta:
+        1. Verifica que no esté ya anulada
+        2. Verifica límite de anulaciones (máximo 1)
+        3. Descuenta las 'vendidas' del CargueIDx por cada producto
+        4. Marca estado = 'ANULADA' e incrementa contador
+        """
+        try:
+            vendedor_auth = self._validar_sesion_movil(request)
+            if not vendedor_auth:
+                return Response({'error': 'No autorizado. Inicia sesión nuevamente.'}, status=401)
+
+            venta = self.get_object()
+            if venta.vendedor_id != vendedor_auth.id_vendedor:
                 return Response({'error': 'No autorizado para anular esta venta.'}, status=403)
 
             if venta.estado == 'ANULADA':
@@ -4713,6 +5006,9 @@ class VentaRutaViewSet(viewsets.ModelViewSet):
             venta.intentos_anulacion = (getattr(venta, 'intentos_anulacion', 0) or 0) + 1
             venta.save()
 
+            # 📊 Refrescar hechos de reportes
+            programar_refresco_hechos(id_vendedor, fecha_venta)
+
             return Response({
                 'success': True,
                 'mensaje': f'Venta #{venta.id} anulada correctamente',
@@ -4997,14 +5293,19 @@ class VentaRutaViewSet(viewsets.ModelViewSet):
             if actualizar_detalles or actualizar_vencidas:
                 venta.editada = True
                 venta.fecha_ultima_edicion = timezone.now()
-            venta.save()
+            with transaction.atomic():
+                venta.save()
+                if actualizar_detalles or actualizar_vencidas:
+                    venta.sincronizar_lineas()  # DetalleVentaRuta / VencidaVentaRuta
+
+            # 📊 Refrescar hechos de reportes
+            if actualizar_detalles or actualizar_vencidas:
+                programar_refresco_hechos(id_vendedor, fecha_venta)
 
             evidencias_creadas = 0
             if foto_vencidos_base64 and isinstance(foto_vencidos_base64, dict):
                 from .models import EvidenciaVenta
-                import base64
                 import uuid
-                from django.core.files.base import ContentFile
 
                 primera_guardada = False
                 for prod_id_key, pics in foto_vencidos_base64.items():
@@ -5017,21 +5318,17 @@ class VentaRutaViewSet(viewsets.ModelViewSet):
                             continue
 
                         try:
-                            formato, imgstr = pic_base64.split(';base64,')
-                            ext = formato.split('/')[-1]
-                            contenido = base64.b64decode(imgstr)
-                            nombre_archivo = f"venta_{venta.id}_{uuid.uuid4().hex[:6]}.{ext}"
-
-                            if not primera_guardada:
-                                venta.foto_vencidos.save(nombre_archivo, ContentFile(contenido), save=False)
-                                primera_guardada = True
-
-                            EvidenciaVenta.objects.create(
+                            evidencia = EvidenciaVenta.objects.create(
                                 venta=venta,
                                 producto_id=producto_id,
-                                imagen=ContentFile(contenido, name=nombre_archivo),
+                                imagen=archivo_desde_base64(pic_base64, f"venta_{venta.id}_{uuid.uuid4().hex[:6]}"),
                             )
                             evidencias_creadas += 1
+
+                            # Mismo contenido: la foto principal apunta al archivo ya guardado
+                            if not primera_guardada:
+                                venta.foto_vencidos.name = evidencia.imagen.name
+                                primera_guardada = True
                         except Exception:
                             continue
 
@@ -5053,11 +5350,13 @@ class VentaRutaViewSet(viewsets.ModelViewSet):
                 'metodo_pago_cambiado': venta.metodo_pago_cambiado,
                 'productos_vencidos': venta.productos_vencidos,
                 'foto_vencidos': request.build_absolute_uri(venta.foto_vencidos.url) if venta.foto_vencidos else None,
+                'foto_vencidos_miniatura': url_variante(venta.foto_vencidos, request=request) if venta.foto_vencidos else None,
                 'evidencias': [
                     {
                         'id': ev.id,
                         'producto_id': ev.producto_id,
                         'imagen': request.build_absolute_uri(ev.imagen.url) if ev.imagen else None,
+                        'miniatura': url_variante(ev.imagen, request=request) if ev.imagen else None,
                     }
                     for ev in venta.evidencias.all().order_by('id')
                 ],
@@ -5106,7 +5405,7 @@ class VentaRutaViewSet(viewsets.ModelViewSet):
             fecha_fin = fecha_fin or str(hoy)
         
         # Filtrar ventas
-        queryset = VentaRuta.objects.filter(fecha__date__gte=fecha_inicio, fecha__date__lte=fecha_fin)
+        queryset = VentaRuta.objects.filter(**filtro_fechas('fecha', fecha_inicio, fecha_fin))
         if vendedor_id:
             queryset = queryset.filter(vendedor__id_vendedor=vendedor_id)
         
@@ -5163,26 +5462,26 @@ class VentaRutaViewSet(viewsets.ModelViewSet):
             'ventas_por_dia': list(ventas_por_dia)
         })
 
+    @staticmethod
+    def _get_client_ip(request):
+        """🆕 Obtener IP del cliente (primera de X-Forwarded-For o REMOTE_ADDR)"""
+        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+        if x_forwarded_for:
+            ip = x_forwarded_for.split(',')[0]
+        else:
+            ip = request.META.get('REMOTE_ADDR')
+        return ip
+
     def create(self, request, *args, **kwargs):
         from .models import Vendedor, EvidenciaVenta, SyncLog
         from rest_framework import status
         from django.http import QueryDict
         from django.db import transaction, IntegrityError
-        import json as json_lib
 
         vendedor_auth = self._validar_sesion_movil(request)
         if not vendedor_auth:
             return Response({'error': 'No autorizado. Inicia sesión nuevamente.'}, status=status.HTTP_401_UNAUTHORIZED)
         
-        # 🆕 Obtener IP del cliente
-        def _get_client_ip(request):
-            x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-            if x_forwarded_for:
-                ip = x_forwarded_for.split(',')[0]
-            else:
-                ip = request.META.get('REMOTE_ADDR')
-            return ip
-        
         # 🆕 Logging de sincronización
         def _log_sync(accion, exito=True, error_mensaje='', id_local='', registro_id=0):
             try:
@@ -5193,7 +5492,7 @@ class VentaRutaViewSet(viewsets.ModelViewSet):
                     id_local=id_local,
                     vendedor_id=request.data.get('vendedor_id', ''),
                     dispositivo_id=request.data.get('dispositivo_id', ''),
-                    ip_origen=_get_client_ip(request),
+                    ip_origen=self._get_client_ip(request),
                     user_agent=request.META.get('HTTP_USER_AGENT', ''),
                     exito=exito,
                     error_mensaje=error_mensaje
@@ -5201,40 +5500,6 @@ class VentaRutaViewSet(viewsets.ModelViewSet):
             except Exception as e:
                 print(f"⚠️ Error logging: {e}")
 
-        def _huella_detalles(detalles):
-            if not isinstance(detalles, list):
-                return '[]'
-
-            detalles_norm = []
-            for item in detalles:
-                if not isinstance(item, dict):
-                    continue
-                detalles_norm.append({
-                    'producto': str(item.get('producto') or item.get('nombre') or '').strip().upper(),
-                    'cantidad': int(item.get('cantidad') or 0),
-                    'precio': float(item.get('precio') or item.get('precio_unitario') or item.get('valor_unitario') or 0),
-                })
-
-            detalles_norm.sort(key=lambda x: (x['producto'], x['cantidad'], x['precio']))
-            return json_lib.dumps(detalles_norm, ensure_ascii=False, sort_keys=True)
-
-        def _huella_vencidas(vencidas):
-            if not isinstance(vencidas, list):
-                return '[]'
-
-            vencidas_norm = []
-            for item in vencidas:
-                if not isinstance(item, dict):
-                    continue
-                vencidas_norm.append({
-                    'producto': str(item.get('producto') or item.get('nombre') or '').strip().upper(),
-                    'cantidad': int(item.get('cantidad') or 0),
-                    'motivo': str(item.get('motivo') or '').strip().upper(),
-                })
-
-            vencidas_norm.sort(key=lambda x: (x['producto'], x['cantidad'], x['motivo']))
-            return json_lib.dumps(vencidas_norm, ensure_ascii=False, sort_keys=True)
-        
         # 🆕 Verificar duplicados por id_local
         id_local = request.data.get('id_local')
         dispositivo_id = request.data.get('dispositivo_id', '')
@@ -5319,48 +5584,7 @@ class VentaRutaViewSet(viewsets.ModelViewSet):
         data['vendedor'] = vendedor_auth.id_vendedor
 
         # 🆕 CREAR CLIENTE OCASIONAL AUTOMÁTICAMENTE si viene en los datos
-        # La app envía cliente_ocasional con un ID temporal, pero necesitamos crear el registro real
-        if 'cliente_ocasional' in data and data['cliente_ocasional']:
-            try:
-                # Extraer datos del cliente desde los campos de la venta
-                nombre_cliente = data.get('cliente_nombre', '').strip()
-                nombre_negocio = data.get('nombre_negocio', '').strip()
-                
-                # Usar nombre_negocio si existe, sino usar cliente_nombre
-                nombre_final = nombre_negocio if nombre_negocio else nombre_cliente
-                
-                if nombre_final:
-                    # Buscar si ya existe un ClienteOcasional con ese nombre para este vendedor
-                    cliente_ocasional_existente = ClienteOcasional.objects.filter(
-                        vendedor=vendedor_auth,
-                        nombre__iexact=nombre_final,
-                        activo=True
-                    ).first()
-                    
-                    if cliente_ocasional_existente:
-                        # Ya existe, usar ese ID
-                        data['cliente_ocasional'] = cliente_ocasional_existente.id
-                        print(f"✅ Cliente ocasional existente encontrado: {cliente_ocasional_existente.id} - {nombre_final}")
-                    else:
-                        # No existe, crear uno nuevo
-                        nuevo_cliente_ocasional = ClienteOcasional.objects.create(
-                            vendedor=vendedor_auth,
-                            nombre=nombre_final,
-                            telefono='',  # La app no envía teléfono en ventas ocasionales
-                            direccion='',  # La app no envía dirección en ventas ocasionales
-                            tope_venta=60000,  # Tope por defecto
-                            activo=True
-                        )
-                        data['cliente_ocasional'] = nuevo_cliente_ocasional.id
-                        print(f"✅ Cliente ocasional creado: {nuevo_cliente_ocasional.id} - {nombre_final} para {vendedor_auth.id_vendedor}")
-                else:
-                    # No hay nombre, quitar el campo para evitar error
-                    data.pop('cliente_ocasional', None)
-                    print(f"⚠️ No se pudo crear cliente ocasional: sin nombre")
-            except Exception as e:
-                print(f"❌ Error creando cliente ocasional: {e}")
-                # Si falla, quitar el campo para que la venta se guarde sin cliente ocasional
-                data.pop('cliente_ocasional', None)
+        self._asignar_cliente_ocasional(data, vendedor_auth)
 
         # 🔒 Validar vendedor activo
         vendedor_ref = data.get('vendedor')
@@ -5418,8 +5642,8 @@ class VentaRutaViewSet(viewsets.ModelViewSet):
             nombre_negocio_norm = str(data.get('nombre_negocio') or '').strip()
             cliente_nombre_norm = str(data.get('cliente_nombre') or '').strip()
             total_norm = float(data.get('total') or 0)
-            detalles_huella = _huella_detalles(detalles_normalizados)
-            vencidas_huella = _huella_vencidas(productos_vencidos_normalizados)
+            detalles_huella = self._huella_detalles(detalles_normalizados)
+            vencidas_huella = self._huella_vencidas(productos_vencidos_normalizados)
 
             candidatos = VentaRuta.objects.filter(
                 vendedor_id=vendedor_auth.id_vendedor,
@@ -5433,7 +5657,7 @@ class VentaRutaViewSet(viewsets.ModelViewSet):
             ).order_by('fecha')
 
             for candidato in candidatos:
-                if _huella_detalles(candidato.detalles) == detalles_huella and _huella_vencidas(candidato.productos_vencidos) == vencidas_huella:
+                if self._huella_detalles(candidato.detalles) == detalles_huella and self._huella_vencidas(candidato.productos_vencidos) == vencidas_huella:
                     print(f"⚠️ DUPLICADO SOSPECHOSO DETECTADO: nuevo id_local={id_local} ~ venta existente {candidato.id}")
                     _log_sync(
                         accion='CREATE_DUPLICADO_SOSPECHOSO',
@@ -5482,27 +5706,7 @@ class VentaRutaViewSet(viewsets.ModelViewSet):
         
         # 🆕 Hotfix transitorio: tolerar foto_vencidos legacy/offline para no bloquear sincronización.
         # Si no podemos convertir a archivo válido, simplemente se ignora la foto y se guarda la venta.
-        def _iterar_posibles_imagenes(raw):
-            if isinstance(raw, str):
-                yield raw
-                return
-            if isinstance(raw, list):
-                for item in raw:
-                    yield from _iterar_posibles_imagenes(item)
-                return
-            if isinstance(raw, dict):
-                for value in raw.values():
-                    yield from _iterar_posibles_imagenes(value)
-                return
-
         foto_vencidos_data = data.get('foto_vencidos')
-        if isinstance(foto_vencidos_data, str):
-            import json
-            try:
-                foto_vencidos_data = json.loads(foto_vencidos_data)
-            except Exception:
-                # Si llega string no JSON/base64, no debe romper creación.
-                pass
 
         # Limpiar siempre el campo para evitar que llegue valor no-file al serializer.
         data.pop('foto_vencidos', None)
@@ -5513,26 +5717,10 @@ class VentaRutaViewSet(viewsets.ModelViewSet):
             data['foto_vencidos'] = foto_file
         else:
             # 2) Intentar convertir primer base64 encontrado dentro de estructuras legacy.
-            import base64
-            import uuid
-            from django.core.files.base import ContentFile
+            foto_base64 = self._foto_vencidos_desde_payload(foto_vencidos_data)
+            if foto_base64:
+                data['foto_vencidos'] = foto_base64
 
-            for candidata in _iterar_posibles_imagenes(foto_vencidos_data):
-                if not isinstance(candidata, str):
-                    continue
-                if ';base64,' not in candidata:
-                    continue
-                try:
-                    formato, imgstr = candidata.split(';base64,', 1)
-                    ext = formato.split('/')[-1].split(';')[0] or 'jpg'
-                    data['foto_vencidos'] = ContentFile(
-                        base64.b64decode(imgstr),
-                        name=f'vencidas_{uuid.uuid4().hex[:8]}.{ext}'
-                    )
-                    break
-                except Exception as e:
-                    print(f"⚠️ Foto vencidos inválida ignorada: {e}")
-            
         serializer = self.get_serializer(data=data)
         
         if not serializer.is_valid():
@@ -5555,8 +5743,9 @@ class VentaRutaViewSet(viewsets.ModelViewSet):
                 # Guardar con metadatos
                 venta = serializer.save(
                     dispositivo_id=dispositivo_id,
-                    ip_origen=_get_client_ip(request)
+                    ip_origen=self._get_client_ip(request)
                 )
+                venta.sincronizar_lineas()  # DetalleVentaRuta / VencidaVentaRuta
                 
                 print(f"✅ VENTA CREADA: ID={venta.id}, id_local={venta.id_local}")
                 print(f"   Dispositivo: {venta.dispositivo_id}")
@@ -5793,9 +5982,453 @@ class VentaRutaViewSet(viewsets.ModelViewSet):
         except Exception as e:
             print(f"❌ Error sincronizando pagos: {str(e)}")
         
+        # 📊 Refrescar hechos de reportes (vendedor + día de la venta)
+        programar_refresco_hechos(
+            venta.vendedor_id,
+            self._resolver_fecha_operativa(venta.fecha, fallback=timezone.now())
+        )
+        
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
+    # Máximo de ventas por llamada a sync-batch (la app envía su cola offline por tandas)
+    SYNC_BATCH_MAX_VENTAS = 200
+
+    @action(detail=False, methods=['post'], url_path='sync-batch')
+    def sync_batch(self, request):
+        """
+        🆕 SINCRONIZACIÓN POR LOTES DE VENTAS OFFLINE
+        POST /api/ventas-ruta/sync-batch/
+        Body: [venta, ...] o {"ventas": [venta, ...]}, cada venta con el mismo formato de create (JSON).
+
+        Aplica las mismas reglas de create pero hace una sola vez el trabajo repetido:
+        - Duplicados por id_local con un único IN
+        - Cargue de los días del lote leído una vez y resuelto en memoria
+        - vendidas/vencidas con un solo UPDATE ... CASE sobre el cargue
+        - SyncLog y CarguePagos con bulk_create
+        Retorna un resultado por venta (mismo orden): CREADA, DUPLICADA,
+        DUPLICADO_SOSPECHOSO, IGNORADA o ERROR.
+        """
+        from .models import SyncLog, TurnoVendedor
+        from django.db import IntegrityError
+        from django.db.models import Case, When, F, Value, IntegerField
+
+        vendedor_auth = self._validar_sesion_movil(request)
+        if not vendedor_auth:
+            return Response({'error': 'No autorizado. Inicia sesión nuevamente.'}, status=status.HTTP_401_UNAUTHORIZED)
+
+        # 🔒 Validar vendedor activo (igual que create)
+        if not Vendedor.objects.filter(pk=vendedor_auth.id_vendedor, activo=True).exists():
+            return Response({'error': 'Vendedor inválido o inactivo'}, status=status.HTTP_403_FORBIDDEN)
+
+        ventas_raw = request.data.get('ventas') if isinstance(request.data, dict) else request.data
+        if not isinstance(ventas_raw, list):
+            return Response({'error': 'Se espera una lista de ventas'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ventas_raw) > self.SYNC_BATCH_MAX_VENTAS:
+            return Response(
+                {
+                    'error': f'Máximo {self.SYNC_BATCH_MAX_VENTAS} ventas por lote',
+                    'codigo': 'LOTE_DEMASIADO_GRANDE',
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        id_vendedor = vendedor_auth.id_vendedor
+        ModeloCargue = self._obtener_modelo_cargue_por_vendedor(id_vendedor)
+        ip_origen = self._get_client_ip(request)
+        user_agent = request.META.get('HTTP_USER_AGENT', '')
+
+        resultados = [None] * len(ventas_raw)
+        logs = []
+
+        def _log_sync(accion, exito=True, error_mensaje='', id_local='', registro_id=0, dispositivo_id=''):
+            logs.append(SyncLog(
+                accion=accion,
+                modelo='VentaRuta',
+                registro_id=registro_id,
+                id_local=id_local or '',
+                vendedor_id=id_vendedor,
+                dispositivo_id=dispositivo_id or '',
+                ip_origen=ip_origen,
+                user_agent=user_agent,
+                exito=exito,
+                error_mensaje=error_mensaje
+            ))
+
+        def _resultado(indice, id_local, estado, **extra):
+            resultados[indice] = {'id_local': id_local, 'status': estado, **extra}
+
+        # ─── 1. Duplicados por id_local: un solo IN para todo el lote ───
+        ids_locales = {
+            str(item['id_local']) for item in ventas_raw
+            if isinstance(item, dict) and item.get('id_local')
+        }
+        existentes = {
+            venta.id_local: venta
+            for venta in VentaRuta.objects.filter(id_local__in=ids_locales).only('id', 'id_local', 'dispositivo_id', 'fecha')
+        }
+
+        # ─── 2. Normalizar cada venta igual que create ───
+        pendientes = []
+        vistos = set()
+        for indice, item in enumerate(ventas_raw):
+            if not isinstance(item, dict):
+                _resultado(indice, None, 'ERROR', error='Formato de venta inválido')
+                continue
+
+            id_local = str(item.get('id_local') or '') or None
+            dispositivo_id = item.get('dispositivo_id', '') or ''
+
+            if id_local and id_local in existentes:
+                venta_existente = existentes[id_local]
+                _log_sync('CREATE_DUPLICADO', False, f'Venta ya existe (ID: {venta_existente.id})', id_local, dispositivo_id=dispositivo_id)
+                _resultado(
+                    indice, id_local, 'DUPLICADA',
+                    id=venta_existente.id,
+                    dispositivo_original=venta_existente.dispositivo_id,
+                    timestamp=venta_existente.fecha
+                )
+                continue
+            if id_local and id_local in vistos:
+                _resultado(indice, id_local, 'DUPLICADA', id=None, mensaje='id_local repetido dentro del lote')
+                continue
+            if id_local:
+                vistos.add(id_local)
+
+            data = dict(item)
+            fue_editada_offline = data.get('fecha_ultima_edicion') is not None
+            for campo_bloqueado in ('sincronizado', 'ip_origen', 'editada'):
+                data.pop(campo_bloqueado, None)
+            if fue_editada_offline:
+                data['editada'] = True
+            data['estado'] = 'ACTIVA'
+            data['vendedor'] = id_vendedor
+
+            detalles_normalizados, total_calculado = self._normalizar_detalles(data.get('detalles', []))
+            vencidas_normalizadas = self._normalizar_productos_vencidos(data.get('productos_vencidos', []))
+            if not detalles_normalizados and not vencidas_normalizadas:
+                _resultado(indice, id_local, 'ERROR', error='La venta debe incluir al menos un producto válido')
+                continue
+            data['detalles'] = detalles_normalizados
+            data['total'] = total_calculado if detalles_normalizados else 0
+            data['productos_vencidos'] = vencidas_normalizadas
+
+            foto_vencidos = self._foto_vencidos_desde_payload(data.pop('foto_vencidos', None))
+            if foto_vencidos:
+                data['foto_vencidos'] = foto_vencidos
+
+            fecha_referencia = parse_datetime(str(data.get('fecha'))) if data.get('fecha') else None
+            if fecha_referencia is None:
+                fecha_referencia = timezone.now()
+            if timezone.is_naive(fecha_referencia):
+                fecha_referencia = timezone.make_aware(fecha_referencia, timezone.get_current_timezone())
+
+            pendientes.append({
+                'indice': indice,
+                'id_local': id_local,
+                'dispositivo_id': dispositivo_id,
+                'data': data,
+                'fecha_operativa': self._resolver_fecha_operativa(data.get('fecha'), fallback=timezone.now()),
+                'fecha_referencia': fecha_referencia,
+            })
+
+        def _respuesta():
+            try:
+                SyncLog.objects.bulk_create(logs)
+            except Exception as e:
+                print(f"⚠️ Error logging: {e}")
+
+            resumen = defaultdict(int)
+            for resultado in resultados:
+                resumen[resultado['status']] += 1
+            print(f"✅ SYNC-BATCH {id_vendedor}: {dict(resumen)}")
+            return Response({'resultados': resultados, 'resumen': dict(resumen)}, status=status.HTTP_200_OK)
+
+        if not pendientes:
+            return _respuesta()
+
+        fechas_lote = {p['fecha_operativa'] for p in pendientes if p['fecha_operativa']}
+
+        # ─── 3. Turnos cerrados de las fechas del lote (una consulta) ───
+        vid_turno = self._to_int(str(id_vendedor).replace('ID', ''), 0)
+        fechas_cerradas = set(TurnoVendedor.objects.filter(
+            vendedor_id=vid_turno,
+            fecha__in=fechas_lote,
+            estado='CERRADO'
+        ).values_list('fecha', flat=True))
+
+        # ─── 4. Candidatos a duplicado sospechoso: una ventana para todo el lote ───
+        referencias = [p['fecha_referencia'] for p in pendientes]
+        candidatos = [
+            {
+                'id': c.id,
+                'dispositivo_id': c.dispositivo_id or '',
+                'fecha': c.fecha,
+                'total': float(c.total or 0),
+                'cliente_nombre': c.cliente_nombre or '',
+                'nombre_negocio': c.nombre_negocio or '',
+                'detalles': self._huella_detalles(c.detalles),
+                'vencidas': self._huella_vencidas(c.productos_vencidos),
+            }
+            for c in VentaRuta.objects.filter(
+                vendedor_id=id_vendedor,
+                estado='ACTIVA',
+                dispositivo_id__in={p['dispositivo_id'] for p in pendientes},
+                fecha__gte=min(referencias) - timedelta(seconds=15),
+                fecha__lte=max(referencias) + timedelta(seconds=15),
+            ).only(
+                'id', 'dispositivo_id', 'fecha', 'total', 'cliente_nombre',
+                'nombre_negocio', 'detalles', 'productos_vencidos'
+            ).order_by('fecha')
+        ]
+
+        def _duplicado_sospechoso(pendiente, huella):
+            for candidato in candidatos:
+                if (
+                    candidato['dispositivo_id'] == pendiente['dispositivo_id']
+                    and abs(candidato['fecha'] - pendiente['fecha_referencia']) <= timedelta(seconds=15)
+                    and all(candidato[campo] == valor for campo, valor in huella.items())
+                ):
+                    return candidato
+            return None
+
+        # ─── 5. Cargue de los días del lote, indexado en memoria ───
+        cargue_por_fecha = defaultdict(lambda: {'exacto': {}, 'normalizado': {}, 'dia': None})
+        if ModeloCargue:
+            for fila in Cargue.objects.filter(
+                vendedor_id=id_vendedor,
+                fecha__in=fechas_lote,
+                activo=True
+            ).only('id', 'fecha', 'dia', 'producto', 'total', 'vendidas').order_by('id'):
+                indice_dia = cargue_por_fecha[fila.fecha]
+                indice_dia['dia'] = indice_dia['dia'] or fila.dia
+                indice_dia['exacto'].setdefault((fila.producto or '').strip().upper(), fila)
+                indice_dia['normalizado'].setdefault(self._normalizar_nombre_producto_cargue(fila.producto), fila)
+
+        def _resolver_en_memoria(fecha, nombre_producto):
+            """Mismo orden que _resolver_registro_cargue, sin consultar el cargue."""
+            indice_dia = cargue_por_fecha[fecha]
+            nombre = (nombre_producto or '').strip()
+            registro = indice_dia['exacto'].get(nombre.upper())
+            if registro:
+                return registro
+            producto = buscar_producto_por_nombre(nombre)
+            if producto:
+                registro = indice_dia['exacto'].get(producto.nombre.strip().upper())
+                if registro:
+                    return registro
+            return indice_dia['normalizado'].get(self._normalizar_nombre_producto_cargue(nombre))
+
+        def _indexar_registro(registro):
+            indice_dia = cargue_por_fecha[registro.fecha]
+            indice_dia['dia'] = indice_dia['dia'] or registro.dia
+            indice_dia['exacto'].setdefault(registro.producto.strip().upper(), registro)
+            indice_dia['normalizado'].setdefault(self._normalizar_nombre_producto_cargue(registro.producto), registro)
+
+        # ─── 6. Validar y guardar cada venta (savepoint por venta) ───
+        vendidas_delta = defaultdict(int)
+        vencidas_delta = defaultdict(int)
+        fechas_cargue = set()
+        pagos = []
+        fechas_creadas = set()
+
+        with transaction.atomic():
+            for pendiente in pendientes:
+                indice = pendiente['indice']
+                id_local = pendiente['id_local']
+                dispositivo_id = pendiente['dispositivo_id']
+                data = pendiente['data']
+                fecha_operativa = pendiente['fecha_operativa']
+                detalles = data['detalles']
+                vencidas = data['productos_vencidos']
+
+                # 🔒 Vencidas sin venta después del cierre: OK silencioso igual que create
+                if not detalles and vencidas and fecha_operativa in fechas_cerradas:
+                    _resultado(indice, id_local, 'IGNORADA', id=0, mensaje='Registro procesado')
+                    continue
+
+                # 🔒 Stock del cargue, descontando lo ya reservado por ventas previas del lote
+                if ModeloCargue and fecha_operativa:
+                    solicitado = defaultdict(int)
+                    registros = {}
+                    productos_sin_cargue = []
+                    for item in detalles:
+                        registro = _resolver_en_memoria(fecha_operativa, item['nombre'])
+                        if not registro:
+                            productos_sin_cargue.append({
+                                'producto': item['nombre'],
+                                'solicitado': item['cantidad'],
+                                'motivo': 'PRODUCTO_NO_EN_CARGUE',
+                            })
+                            continue
+                        registros[registro.pk] = registro
+                        solicitado[registro.pk] += item['cantidad']
+
+                    excedidos = []
+                    for pk_registro, cantidad in solicitado.items():
+                        registro = registros[pk_registro]
+                        disponible = max(0, (
+                            self._to_int(registro.total, 0)
+                            - self._to_int(registro.vendidas, 0)
+                            - vendidas_delta[pk_registro]
+                        ))
+                        if cantidad > disponible:
+                            excedidos.append({
+                                'producto': registro.producto,
+                                'solicitado': cantidad,
+                                'incremento': cantidad,
+                                'disponible': disponible,
+                            })
+
+                    error_stock = self._respuesta_error_stock(productos_sin_cargue, excedidos)
+                    if error_stock:
+                        _log_sync('CREATE_STOCK_INVALIDO', False, str(error_stock['detalle']), id_local, dispositivo_id=dispositivo_id)
+                        _resultado(indice, id_local, 'ERROR', **error_stock)
+                        continue
+
+                # 🆕 Duplicado sospechoso (doble envío casi instantáneo)
+                duplicado = _duplicado_sospechoso(pendiente, {
+                    'total': float(data.get('total') or 0),
+                    'cliente_nombre': str(data.get('cliente_nombre') or '').strip(),
+                    'nombre_negocio': str(data.get('nombre_negocio') or '').strip(),
+                    'detalles': self._huella_detalles(detalles),
+                    'vencidas': self._huella_vencidas(vencidas),
+                })
+                if duplicado:
+                    _log_sync(
+                        'CREATE_DUPLICADO_SOSPECHOSO', False,
+                        f"Venta sospechosamente duplicada (ID: {duplicado['id']})",
+                        id_local, dispositivo_id=dispositivo_id
+                    )
+                    _resultado(
+                        indice, id_local, 'DUPLICADO_SOSPECHOSO',
+                        id=duplicado['id'],
+                        duplicado_de=duplicado['id'],
+                        timestamp=duplicado['fecha']
+                    )
+                    continue
+
+                try:
+                    with transaction.atomic():
+                        self._asignar_cliente_ocasional(data, vendedor_auth)
+                        serializer = self.get_serializer(data=data)
+                        if not serializer.is_valid():
+                            _log_sync('CREATE_VENTA', False, f'Errores de validación: {serializer.errors}', id_local, dispositivo_id=dispositivo_id)
+                            _resultado(indice, id_local, 'ERROR', error='Errores de validación', detalle=serializer.errors)
+                            continue
+
+                        venta = serializer.save(dispositivo_id=dispositivo_id, ip_origen=ip_origen)
+                        venta.sincronizar_lineas()  # DetalleVentaRuta / VencidaVentaRuta
+                except IntegrityError as e:
+                    _log_sync('CONFLICT', False, f'IntegrityError: {str(e)}', id_local, dispositivo_id=dispositivo_id)
+                    _resultado(indice, id_local, 'ERROR', error='Conflicto de sincronización', codigo='CONFLICT')
+                    continue
+                except Exception as e:
+                    # El savepoint ya revirtió esta venta; las demás del lote siguen y
+                    # el cliente recibe el resultado de las que sí se guardaron
+                    print(f"❌ SYNC-BATCH {id_vendedor} venta {id_local}: {e}")
+                    _log_sync('CREATE_VENTA', False, f'Error: {str(e)}', id_local, dispositivo_id=dispositivo_id)
+                    _resultado(indice, id_local, 'ERROR', error='Error guardando la venta')
+                    continue
+
+                fecha_venta = self._resolver_fecha_operativa(venta.fecha, fallback=timezone.now())
+                fechas_creadas.add(fecha_venta)
+                _log_sync('CREATE_VENTA', True, '', venta.id_local, venta.id, dispositivo_id=dispositivo_id)
+                _resultado(indice, id_local, 'CREADA', id=venta.id)
+
+                candidatos.append({
+                    'id': venta.id,
+                    'dispositivo_id': dispositivo_id,
+                    'fecha': pendiente['fecha_referencia'],
+                    'total': float(data.get('total') or 0),
+                    'cliente_nombre': str(data.get('cliente_nombre') or '').strip(),
+                    'nombre_negocio': str(data.get('nombre_negocio') or '').strip(),
+                    'detalles': self._huella_detalles(detalles),
+                    'vencidas': self._huella_vencidas(vencidas),
+                })
+
+                # Acumular movimientos del cargue; se aplican juntos al final
+                if ModeloCargue:
+                    for campo, items, deltas in (
+                        ('vendidas', detalles, vendidas_delta),
+                        ('vencidas', vencidas, vencidas_delta),
+                    ):
+                        for item in items:
+                            nombre_producto = item.get('nombre') or item.get('producto') or ''
+                            registro = _resolver_en_memoria(fecha_venta, nombre_producto)
+                            if registro:
+                                deltas[registro.pk] += item['cantidad']
+                                fechas_cargue.add(registro.fecha)
+                                continue
+                            try:
+                                registro = self._crear_registro_cargue_on_the_fly(
+                                    ModeloCargue,
+                                    fecha_venta,
+                                    nombre_producto,
+                                    **{campo: item['cantidad']}
+                                )
+                                if registro:
+                                    _indexar_registro(registro)
+                                    print(f"   ✨ Registro de cargue creado en lote: {registro.producto}")
+                            except Exception as create_error:
+                                print(f"   ❌ Error creando registro on-the-fly: {create_error}")
+
+                metodo_pago = str(data.get('metodo_pago', 'EFECTIVO')).upper()
+                es_nequi = 'NEQUI' in metodo_pago
+                es_daviplata = 'DAVIPLATA' in metodo_pago
+                if es_nequi or es_daviplata:
+                    total_venta = float(data.get('total', 0))
+                    pagos.append(CarguePagos(
+                        vendedor_id=id_vendedor,
+                        dia=cargue_por_fecha[fecha_venta]['dia'] or 'LUNES',
+                        fecha=fecha_venta,
+                        concepto=f"Venta: {data.get('cliente_nombre', 'Cliente Final')}",
+                        nequi=total_venta if es_nequi else 0,
+                        daviplata=total_venta if es_daviplata else 0,
+                        descuentos=0,
+                        usuario='App Movil'
+                    ))
+
+            # ─── 7. Un solo UPDATE ... CASE con todos los movimientos del lote ───
+            pks_cargue = set(vendidas_delta) | set(vencidas_delta)
+            if pks_cargue:
+                def _case(deltas):
+                    return Case(
+                        *[When(pk=pk, then=Value(cantidad)) for pk, cantidad in deltas.items()],
+                        default=Value(0),
+                        output_field=IntegerField(),
+                    )
+
+                # fecha__in poda las particiones mensuales de api_cargue.
+                # Si falla no se traga: se revierte el lote entero y el móvil
+                # lo reintenta (mismos id_local), en vez de dejar ventas
+                # creadas sin descontar del cargue.
+                try:
+                    Cargue.objects.filter(pk__in=pks_cargue, fecha__in=fechas_cargue).update(
+                        vendidas=F('vendidas') + _case(vendidas_delta),
+                        vencidas=F('vencidas') + _case(vencidas_delta),
+                    )
+                    if vencidas_delta:
+                        recalcular_totales_cargue_queryset(
+                            Cargue.objects.filter(pk__in=list(vencidas_delta), fecha__in=fechas_cargue)
+                        )
+                except Exception as e:
+                    print(f"❌ Error sincronizando cargue del lote {id_vendedor}: {str(e)}")
+                    raise
+
+            if pagos:
+                try:
+                    with transaction.atomic():
+                        CarguePagos.objects.bulk_create(pagos)
+                except Exception as e:
+                    print(f"❌ Error sincronizando pagos del lote: {str(e)}")
+
+            # 📊 Refrescar hechos de reportes una vez por día tocado
+            for fecha_venta in fechas_creadas:
+                programar_refresco_hechos(id_vendedor, fecha_venta)
+
+        return _respuesta()
+
     def update(self, request, *args, **kwargs):
         """
         🆕 EDICIÓN DE VENTA RUTA
@@ -5866,7 +6499,9 @@ class VentaRutaViewSet(viewsets.ModelViewSet):
         partial = kwargs.pop('partial', False)
         serializer = self.get_serializer(instancia_anterior, data=request.data, partial=partial)
         serializer.is_valid(raise_exception=True)
-        venta_actualizada = serializer.save(editada=True)
+        with transaction.atomic():
+            venta_actualizada = serializer.save(editada=True)
+            venta_actualizada.sincronizar_lineas()  # DetalleVentaRuta / VencidaVentaRuta
         
         print(f"✅ Venta actualizada: ID={venta_actualizada.id}, Total={venta_actualizada.total}, Método={venta_actualizada.metodo_pago}")
         print(f"   Detalles: {len(venta_actualizada.detalles or [])} productos")
@@ -6030,6 +6665,12 @@ class VentaRutaViewSet(viewsets.ModelViewSet):
             import traceback
             traceback.print_exc()
 
+        # 📊 Refrescar hechos de reportes (día anterior y nuevo si cambió la fecha)
+        fecha_hechos = self._resolver_fecha_operativa(venta_actualizada.fecha, fallback=timezone.now())
+        programar_refresco_hechos(venta_actualizada.vendedor_id, fecha_hechos)
+        if fecha_venta_anterior and fecha_venta_anterior != fecha_hechos:
+            programar_refresco_hechos(venta_actualizada.vendedor_id, fecha_venta_anterior)
+
         # Retornar la venta actualizada con flag editada=True
         data = serializer.data
         data_con_flag = dict(data)
@@ -6183,27 +6824,17 @@ def calcular_devoluciones_automaticas(request, id_vendedor, fecha):
     try:
         from django.db.models import Sum
         
-        # Mapeo de ID a Modelo
-        modelo_map = {
-            'ID1': CargueID1,
-            'ID2': CargueID2,
-            'ID3': CargueID3,
-            'ID4': CargueID4,
-            'ID5': CargueID5,
-            'ID6': CargueID6,
-        }
-        
-        ModeloCargue = modelo_map.get(id_vendedor)
-        if not ModeloCargue:
+        if not obtener_modelo_cargue(id_vendedor):
             return Response({'error': 'ID de vendedor inválido'}, status=400)
         
-        # Obtener cargue del día
-        cargues = ModeloCargue.objects.filter(
+        # Obtener cargue del día (tabla unificada)
+        cargues = list(Cargue.objects.filter(
+            vendedor_id=id_vendedor,
             fecha=fecha,
             activo=True
-        )
+        ).values('producto', 'cantidad', 'dctos', 'adicional', 'vencidas'))
         
-        if not cargues.exists():
+        if not cargues:
             return Response({
                 'id_vendedor': id_vendedor,
                 'fecha': fecha,
@@ -6211,35 +6842,36 @@ def calcular_devoluciones_automaticas(request, id_vendedor, fecha):
                 'productos': []
             })
         
+        # 🚀 Una sola pasada por las ventas del día: producto normalizado -> cantidad vendida
+        # (misma clave que usa VentaRutaViewSet para descontar vendidas del cargue)
+        vendidas_por_producto = defaultdict(int)
+        lineas = DetalleVentaRuta.objects.filter(
+            venta__vendedor_id=id_vendedor,
+            **filtro_dia('venta__fecha', fecha)
+        ).values('producto_nombre').annotate(cantidad=Sum('cantidad')).order_by()
+        
+        for linea in lineas:
+            clave = normalizar_nombre_producto(linea['producto_nombre'])
+            if clave:
+                vendidas_por_producto[clave] += linea['cantidad'] or 0
+        
         resultado = []
         
         for cargue in cargues:
             # Cantidad inicial con la que salió (cantidad - dctos + adicional)
-            cantidad_inicial = cargue.cantidad - cargue.dctos + cargue.adicional
-            
-            # Ventas registradas en app (buscar por vendedor_id que viene del modelo Vendedor)
-            ventas_app = VentaRuta.objects.filter(
-                vendedor__id_vendedor=id_vendedor,
-                fecha__date=fecha
-            )
+            cantidad_inicial = cargue['cantidad'] - cargue['dctos'] + cargue['adicional']
             
-            # Sumar cantidades vendidas por producto (del campo JSON 'detalles')
-            cantidad_vendida = 0
-            for venta in ventas_app:
-                detalles = venta.detalles or []
-                for detalle in detalles:
-                    nombre_detalle = detalle.get('nombre', '') or detalle.get('producto', '')
-                    if nombre_detalle.upper() == cargue.producto.upper():
-                        cantidad_vendida += detalle.get('cantidad', 0)
+            # Ventas registradas en app para este producto
+            cantidad_vendida = vendidas_por_producto.get(normalizar_nombre_producto(cargue['producto']), 0)
             
             # Vencidas (registradas manualmente en cargue)
-            vencidas = cargue.vencidas or 0
+            vencidas = cargue['vencidas'] or 0
             
             # Calcular devoluciones (no puede ser negativo)
             devoluciones = max(0, cantidad_inicial - cantidad_vendida - vencidas)
             
             resultado.append({
-                'producto': cargue.producto,
+                'producto': cargue['producto'],
                 'cantidad_inicial': cantidad_inicial,
                 'cantidad_vendida': cantidad_vendida,
                 'vencidas': vencidas,
@@ -6389,7 +7021,7 @@ def ventas_tiempo_real(request, id_vendedor, fecha):
         # Obtener ventas del día para el vendedor
         ventas = VentaRuta.objects.filter(
             vendedor__id_vendedor=id_vendedor,
-            fecha__date=fecha
+            **filtro_dia('fecha', fecha)
         )
         
         if not ventas.exists():
@@ -6406,8 +7038,7 @@ def ventas_tiempo_real(request, id_vendedor, fecha):
                 }
             })
         
-        # Agrupar por producto (procesar JSON 'detalles')
-        ventas_por_producto = {}
+        # Totales por método de pago (GROUP BY en SQL)
         total_dinero = 0
         ventas_por_metodo = {
             'EFECTIVO': 0,
@@ -6416,27 +7047,19 @@ def ventas_tiempo_real(request, id_vendedor, fecha):
             'TRANSFERENCIA': 0
         }
         
-        for venta in ventas:
-            # Acumular totales
-            total_dinero += float(venta.total or 0)
-            metodo = venta.metodo_pago or 'EFECTIVO'
-            ventas_por_metodo[metodo] = ventas_por_metodo.get(metodo, 0) + float(venta.total or 0)
-            
-            # Procesar productos del JSON 'detalles'
-            detalles = venta.detalles or []
-            for detalle in detalles:
-                nombre = detalle.get('nombre', '') or detalle.get('producto', 'Sin nombre')
-                cantidad = detalle.get('cantidad', 0)
-                
-                if nombre in ventas_por_producto:
-                    ventas_por_producto[nombre] += cantidad
-                else:
-                    ventas_por_producto[nombre] = cantidad
+        for fila in ventas.values('metodo_pago').annotate(total=Sum('total')).order_by():
+            total = float(fila['total'] or 0)
+            metodo = fila['metodo_pago'] or 'EFECTIVO'
+            total_dinero += total
+            ventas_por_metodo[metodo] = ventas_por_metodo.get(metodo, 0) + total
         
-        # Convertir a lista
+        # Agrupar por producto desde las líneas de la venta
         productos_vendidos = [
-            {'producto': k, 'cantidad': v}
-            for k, v in sorted(ventas_por_producto.items(), key=lambda x: x[1], reverse=True)
+            {'producto': fila['producto_nombre'], 'cantidad': fila['cantidad']}
+            for fila in DetalleVentaRuta.objects.filter(venta__in=ventas)
+            .values('producto_nombre')
+            .annotate(cantidad=Sum('cantidad'))
+            .order_by('-cantidad')
         ]
         
         return Response({
@@ -6637,6 +7260,9 @@ def cerrar_turno_vendedor(request):
 
             print(f"✅ Turno cerrado exitosamente para {id_vendedor}. Rollback no necesario.")
             
+            # 📊 Refrescar hechos de reportes (cargado/devoluciones del cierre), tras el commit
+            programar_refresco_hechos(id_vendedor, fecha)
+            
             # 🆕 Agregar novedad si hay diferencia por precios especiales
             novedad = None
             if diferencia_precios > 0:
@@ -7010,16 +7636,33 @@ def guardar_configuracion_produccion(request):
 # 🆕 TRAZABILIDAD DE LOTES
 # ========================================
 
+def _cargues_de_movimientos(movimientos):
+    """
+    Cantidades y responsable actuales de los cargues referenciados por
+    LoteMovimiento, en una sola consulta. Se filtra también por fecha para
+    que PostgreSQL solo abra las particiones de esos meses.
+    """
+    ids = {m.cargue_id for m in movimientos}
+    if not ids:
+        return {}
+    fechas = {m.fecha for m in movimientos}
+    return {
+        c['id']: c
+        for c in Cargue.objects.filter(pk__in=ids, fecha__in=fechas).values('id', 'cantidad', 'vencidas', 'responsable')
+    }
+
+
 @api_view(['GET'])
 def buscar_lote(request):
     """
     Busca un lote específico en todas las tablas de cargue.
     Retorna: producción, despachos y vencidas.
+    Con ?prefijo=true busca todos los lotes que empiezan por el texto dado.
     """
-    import json
-    from .models import CargueID1, CargueID2, CargueID3, CargueID4, CargueID5, CargueID6, Lote
+    from .models import Lote, LoteMovimiento, normalizar_lote
     
-    lote_numero = request.query_params.get('lote', '').upper().strip()
+    lote_numero = normalizar_lote(request.query_params.get('lote', ''))
+    por_prefijo = request.query_params.get('prefijo', '').lower() in ('1', 'true', 'si')
     
     if not lote_numero:
         return Response({'error': 'Debe proporcionar un número de lote'}, status=400)
@@ -7044,68 +7687,53 @@ def buscar_lote(request):
     except Exception as e:
         print(f"Error buscando en Lote: {e}")
     
-    # 2. Buscar en tablas CargueIDx (lotes_produccion y lotes_vencidos)
-    cargue_models = [CargueID1, CargueID2, CargueID3, CargueID4, CargueID5, CargueID6]
-    vendedor_ids = ['ID1', 'ID2', 'ID3', 'ID4', 'ID5', 'ID6']
-    
-    for idx, CargueModel in enumerate(cargue_models):
-        vendedor_id = vendedor_ids[idx]
-        
-        try:
-            # Buscar registros con lotes_produccion o lotes_vencidos que contengan este lote
-            registros = CargueModel.objects.filter(
-                models.Q(lotes_produccion__icontains=lote_numero) |
-                models.Q(lotes_vencidos__icontains=lote_numero)
-            )
-            
-            for reg in registros:
-                # Procesar lotes_produccion
-                if reg.lotes_produccion and lote_numero in reg.lotes_produccion:
-                    try:
-                        lotes_prod = json.loads(reg.lotes_produccion) if reg.lotes_produccion else []
-                        if lote_numero in lotes_prod:
-                            resultado['despachos'].append({
-                                'fecha': str(reg.fecha),
-                                'dia': reg.dia,
-                                'vendedor_id': vendedor_id,
-                                'responsable': reg.responsable,
-                                'producto': reg.producto,
-                                'cantidad': reg.cantidad,
-                                'lotes': lotes_prod
-                            })
-                    except json.JSONDecodeError:
-                        # Si no es JSON válido, verificar si es el texto directamente
-                        if lote_numero in str(reg.lotes_produccion):
-                            resultado['despachos'].append({
-                                'fecha': str(reg.fecha),
-                                'dia': reg.dia,
-                                'vendedor_id': vendedor_id,
-                                'responsable': reg.responsable,
-                                'producto': reg.producto,
-                                'cantidad': reg.cantidad,
-                                'lotes': [reg.lotes_produccion]
-                            })
-                
-                # Procesar lotes_vencidos
-                if reg.lotes_vencidos and lote_numero in reg.lotes_vencidos:
-                    try:
-                        lotes_venc = json.loads(reg.lotes_vencidos) if reg.lotes_vencidos else []
-                        for lv in lotes_venc:
-                            if isinstance(lv, dict) and lv.get('lote', '').upper() == lote_numero:
-                                resultado['vencidas'].append({
-                                    'fecha': str(reg.fecha),
-                                    'dia': reg.dia,
-                                    'vendedor_id': vendedor_id,
-                                    'responsable': reg.responsable,
-                                    'producto': reg.producto,
-                                    'cantidad': reg.vencidas,
-                                    'motivo': lv.get('motivo', 'N/A'),
-                                    'lote': lv.get('lote', lote_numero)
-                                })
-                    except json.JSONDecodeError:
-                        pass
-        except Exception as e:
-            print(f"Error buscando en {CargueModel.__name__}: {e}")
+    # 2. Buscar en el índice de trazabilidad (lotes_produccion y lotes_vencidos de cargue)
+    try:
+        movimientos = LoteMovimiento.objects.filter(
+            **({'lote__startswith': lote_numero} if por_prefijo else {'lote': lote_numero})
+        ).order_by('fecha', 'vendedor_id', 'id')
+        if por_prefijo:
+            movimientos = movimientos[:500]
+        movimientos = list(movimientos)
+        cargues = _cargues_de_movimientos(movimientos)
+        
+        # Lista completa de lotes de producción de cada despacho encontrado
+        ids_despacho = {m.cargue_id for m in movimientos if m.tipo == LoteMovimiento.PRODUCCION}
+        lotes_por_cargue = {}
+        for cargue_id, lote in LoteMovimiento.objects.filter(
+            cargue_id__in=ids_despacho, tipo=LoteMovimiento.PRODUCCION
+        ).order_by('id').values_list('cargue_id', 'lote'):
+            lotes_por_cargue.setdefault(cargue_id, []).append(lote)
+        
+        despachos_vistos = set()
+        for mov in movimientos:
+            reg = cargues.get(mov.cargue_id, {})
+            base = {
+                'fecha': str(mov.fecha),
+                'dia': mov.dia,
+                'vendedor_id': mov.vendedor_id,
+                'responsable': reg.get('responsable', ''),
+                'producto': mov.producto,
+            }
+            if mov.tipo == LoteMovimiento.PRODUCCION:
+                if (mov.cargue_id, mov.lote) in despachos_vistos:
+                    continue
+                despachos_vistos.add((mov.cargue_id, mov.lote))
+                resultado['despachos'].append({
+                    **base,
+                    'cantidad': reg.get('cantidad', 0),
+                    'lote': mov.lote,
+                    'lotes': lotes_por_cargue.get(mov.cargue_id, [mov.lote])
+                })
+            else:
+                resultado['vencidas'].append({
+                    **base,
+                    'cantidad': mov.cantidad if mov.cantidad is not None else reg.get('vencidas', 0),
+                    'motivo': mov.motivo or 'N/A',
+                    'lote': mov.lote
+                })
+    except Exception as e:
+        print(f"Error buscando en Cargue: {e}")
     
     return Response(resultado)
 
@@ -7115,8 +7743,7 @@ def lotes_por_fecha(request):
     """
     Obtiene todos los lotes de producción para una fecha específica.
     """
-    import json
-    from .models import CargueID1, CargueID2, CargueID3, CargueID4, CargueID5, CargueID6, Lote
+    from .models import Lote, LoteMovimiento
     
     fecha = request.query_params.get('fecha', '')
     
@@ -7139,51 +7766,31 @@ def lotes_por_fecha(request):
     except Exception as e:
         print(f"Error buscando lotes por fecha: {e}")
     
-    # 2. Buscar lotes en tablas CargueIDx
-    cargue_models = [CargueID1, CargueID2, CargueID3, CargueID4, CargueID5, CargueID6]
-    vendedor_ids = ['ID1', 'ID2', 'ID3', 'ID4', 'ID5', 'ID6']
-    
+    # 2. Buscar lotes de cargue en el índice de trazabilidad
     lotes_encontrados = set()  # Para evitar duplicados
     
-    for idx, CargueModel in enumerate(cargue_models):
-        vendedor_id = vendedor_ids[idx]
+    try:
+        movimientos = list(LoteMovimiento.objects.filter(
+            tipo=LoteMovimiento.PRODUCCION, fecha=fecha
+        ).order_by('id'))
+        cargues = _cargues_de_movimientos(movimientos)
         
-        try:
-            registros = CargueModel.objects.filter(
-                fecha=fecha,
-                lotes_produccion__isnull=False
-            ).exclude(lotes_produccion='')
-            
-            for reg in registros:
-                try:
-                    lotes_prod = json.loads(reg.lotes_produccion) if reg.lotes_produccion else []
-                    for lote_num in lotes_prod:
-                        if lote_num and lote_num not in lotes_encontrados:
-                            lotes_encontrados.add(lote_num)
-                            lotes.append({
-                                'lote': lote_num,
-                                'fecha': str(reg.fecha),
-                                'vendedor_id': vendedor_id,
-                                'responsable': reg.responsable,
-                                'producto': reg.producto,
-                                'cantidad': reg.cantidad,
-                                'origen': f'Cargue {vendedor_id}'
-                            })
-                except json.JSONDecodeError:
-                    # Si no es JSON, tratar como texto
-                    if reg.lotes_produccion and reg.lotes_produccion not in lotes_encontrados:
-                        lotes_encontrados.add(reg.lotes_produccion)
-                        lotes.append({
-                            'lote': reg.lotes_produccion,
-                            'fecha': str(reg.fecha),
-                            'vendedor_id': vendedor_id,
-                            'responsable': reg.responsable,
-                            'producto': reg.producto,
-                            'cantidad': reg.cantidad,
-                            'origen': f'Cargue {vendedor_id}'
-                        })
-        except Exception as e:
-            print(f"Error buscando lotes en {CargueModel.__name__}: {e}")
+        for mov in movimientos:
+            if mov.lote in lotes_encontrados:
+                continue
+            lotes_encontrados.add(mov.lote)
+            reg = cargues.get(mov.cargue_id, {})
+            lotes.append({
+                'lote': mov.lote,
+                'fecha': str(mov.fecha),
+                'vendedor_id': mov.vendedor_id,
+                'responsable': reg.get('responsable', ''),
+                'producto': mov.producto,
+                'cantidad': reg.get('cantidad', 0),
+                'origen': f'Cargue {mov.vendedor_id}'
+            })
+    except Exception as e:
+        print(f"Error buscando lotes en Cargue: {e}")
     
     return Response({
         'fecha': fecha,
@@ -7197,9 +7804,8 @@ def lotes_por_mes(request):
     """
     Obtiene todos los lotes de producción para un mes específico.
     """
-    import json
-    from datetime import datetime
-    from .models import CargueID1, CargueID2, CargueID3, CargueID4, CargueID5, CargueID6, Lote
+    from datetime import date
+    from .models import Lote, LoteMovimiento
     
     mes = request.query_params.get('mes', '')  # Formato: YYYY-MM
     
@@ -7210,17 +7816,18 @@ def lotes_por_mes(request):
         year, month = mes.split('-')
         year = int(year)
         month = int(month)
+        inicio_mes = date(year, month, 1)
+        fin_mes = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
     except:
         return Response({'error': 'Formato de mes inválido. Use YYYY-MM'}, status=400)
     
-    lotes = []
     lotes_por_fecha = {}
     
     # 1. Buscar en tabla Lote
     try:
         lotes_obj = Lote.objects.filter(
-            fecha_produccion__year=year,
-            fecha_produccion__month=month
+            fecha_produccion__gte=inicio_mes,
+            fecha_produccion__lt=fin_mes
         )
         for lote in lotes_obj:
             fecha_str = str(lote.fecha_produccion)
@@ -7236,41 +7843,27 @@ def lotes_por_mes(request):
     except Exception as e:
         print(f"Error buscando lotes del mes: {e}")
     
-    # 2. Buscar en tablas CargueIDx
-    cargue_models = [CargueID1, CargueID2, CargueID3, CargueID4, CargueID5, CargueID6]
-    vendedor_ids = ['ID1', 'ID2', 'ID3', 'ID4', 'ID5', 'ID6']
-    
-    for idx, CargueModel in enumerate(cargue_models):
-        vendedor_id = vendedor_ids[idx]
-        
-        try:
-            registros = CargueModel.objects.filter(
-                fecha__year=year,
-                fecha__month=month,
-                lotes_produccion__isnull=False
-            ).exclude(lotes_produccion='')
-            
-            for reg in registros:
-                try:
-                    lotes_prod = json.loads(reg.lotes_produccion) if reg.lotes_produccion else []
-                    for lote_num in lotes_prod:
-                        if lote_num:
-                            fecha_str = str(reg.fecha)
-                            if fecha_str not in lotes_por_fecha:
-                                lotes_por_fecha[fecha_str] = []
-                            
-                            lotes_por_fecha[fecha_str].append({
-                                'lote': lote_num,
-                                'vendedor_id': vendedor_id,
-                                'responsable': reg.responsable,
-                                'producto': reg.producto,
-                                'cantidad': reg.cantidad,
-                                'origen': f'Cargue {vendedor_id}'
-                            })
-                except json.JSONDecodeError:
-                    pass
-        except Exception as e:
-            print(f"Error: {e}")
+    # 2. Buscar lotes de cargue en el índice de trazabilidad (índice tipo+fecha)
+    try:
+        movimientos = list(LoteMovimiento.objects.filter(
+            tipo=LoteMovimiento.PRODUCCION,
+            fecha__gte=inicio_mes,
+            fecha__lt=fin_mes
+        ).order_by('fecha', 'id'))
+        cargues = _cargues_de_movimientos(movimientos)
+        
+        for mov in movimientos:
+            reg = cargues.get(mov.cargue_id, {})
+            lotes_por_fecha.setdefault(str(mov.fecha), []).append({
+                'lote': mov.lote,
+                'vendedor_id': mov.vendedor_id,
+                'responsable': reg.get('responsable', ''),
+                'producto': mov.producto,
+                'cantidad': reg.get('cantidad', 0),
+                'origen': f'Cargue {mov.vendedor_id}'
+            })
+    except Exception as e:
+        print(f"Error: {e}")
     
     # Convertir a lista ordenada por fecha
     resultado = []
@@ -7576,6 +8169,69 @@ class ClienteOcasionalViewSet(viewsets.ModelViewSet):
 # 🤖 ENDPOINTS DE IA LOCAL (Ollama)
 # ============================================================================
 
+# Debajo del timeout de gunicorn (120s en Dockerfile.prod)
+ESPERA_SINCRONA_IA = 90
+
+
+def _pide_asincrono(request):
+    valor = request.query_params.get('async')
+    if valor is None and hasattr(request.data, 'get'):
+        valor = request.data.get('async')
+    return str(valor).lower() in ('1', 'true', 'si', 'sí')
+
+
+def _responder_trabajo_ia(request, tipo, parametros, prefijo_error=''):
+    """
+    Encola la petición de IA. Con `async=1` responde 202 con el trabajo_id de
+    inmediato; si no, espera el resultado (compatibilidad) hasta
+    ESPERA_SINCRONA_IA y, si no alcanza, también responde 202.
+    """
+    from api.services import trabajos_ia_service
+
+    trabajo = trabajos_ia_service.encolar(tipo, parametros)
+    if _pide_asincrono(request):
+        return Response(trabajos_ia_service.serializar(trabajo), status=status.HTTP_202_ACCEPTED)
+
+    trabajo = trabajos_ia_service.esperar(trabajo, ESPERA_SINCRONA_IA)
+    if trabajo.estado == 'COMPLETADO':
+        return Response(trabajo.resultado)
+    if trabajo.estado == 'ERROR':
+        return Response({
+            'error': f'{prefijo_error}{trabajo.error}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return Response(trabajos_ia_service.serializar(trabajo), status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+def ai_trabajo_estado(request, trabajo_id):
+    """
+    Estado / resultado de un trabajo de IA encolado
+    
+    GET /api/ai/trabajos/<id>/
+    GET /api/ai/trabajos/<id>/?esperar=25   // long-poll hasta que termine
+    """
+    from api.services import trabajos_ia_service
+    from .models import TrabajoIA
+
+    try:
+        trabajo = TrabajoIA.objects.get(pk=trabajo_id)
+    except TrabajoIA.DoesNotExist:
+        return Response({'error': 'Trabajo no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+
+    if trabajo.estado == 'PENDIENTE':
+        # Por si el proceso que lo encoló se reinició antes de despacharlo o no había cupo
+        trabajos_ia_service.despachar()
+
+    try:
+        espera = min(max(float(request.query_params.get('esperar', 0)), 0), ESPERA_MAXIMA_CAMBIOS)
+    except (TypeError, ValueError):
+        espera = 0
+    if espera:
+        trabajo = trabajos_ia_service.esperar(trabajo, espera)
+
+    return Response(trabajos_ia_service.serializar(trabajo))
+
+
 @api_view(['POST'])
 def ai_chat(request):
     """
@@ -7584,31 +8240,24 @@ def ai_chat(request):
     POST /api/ai/chat/
     Body: {
         "question": "¿Cómo cierro el turno?",
-        "include_docs": true  // opcional, default true
+        "include_docs": true,  // opcional, default true
+        "async": true          // opcional: responde 202 con trabajo_id
     }
     """
     
     question = request.data.get('question')
     if not question:
         return Response({
-            'error': 'Se requiere campo "question"'
-        }, status=status.HTTP_400_BAD_REQUEST)
-    
-    include_docs = request.data.get('include_docs', False)  # OPTIMIZADO: False por defecto para velocidad
-    
-    try:
-        ai = AIAssistant()
-        answer = ai.ask(question, include_docs=include_docs)
-        
-        return Response({
-            'question': question,
-            'answer': answer,
-            'model': ai.model
-        })
-    except Exception as e:
-        return Response({
-            'error': f'Error consultando IA: {str(e)}'
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            'error': 'Se requiere campo "question"'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    include_docs = request.data.get('include_docs', False)  # OPTIMIZADO: False por defecto para velocidad
+    
+    return _responder_trabajo_ia(
+        request, 'CHAT',
+        {'question': question, 'include_docs': include_docs},
+        prefijo_error='Error consultando IA: '
+    )
 
 
 @api_view(['POST'])
@@ -7619,11 +8268,10 @@ def ai_analyze_data(request):
     POST /api/ai/analyze/
     Body: {
         "data": {...},  // datos a analizar
-        "question": "¿Qué tendencia ves?"
+        "question": "¿Qué tendencia ves?",
+        "async": true  // opcional
     }
     """
-    from api.services.ai_assistant_service import AIAssistant
-    
     data = request.data.get('data')
     question = request.data.get('question')
     
@@ -7632,18 +8280,11 @@ def ai_analyze_data(request):
             'error': 'Se requieren campos "data" y "question"'
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    try:
-        ai = AIAssistant()
-        analysis = ai.analyze_data(data, question)
-        
-        return Response({
-            'analysis': analysis,
-            'model': ai.model
-        })
-    except Exception as e:
-        return Response({
-            'error': f'Error analizando: {str(e)}'
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return _responder_trabajo_ia(
+        request, 'ANALISIS',
+        {'data': data, 'question': question},
+        prefijo_error='Error analizando: '
+    )
 
 
 @api_view(['GET'])
@@ -7654,8 +8295,8 @@ def ai_health(request):
     GET /api/ai/health/
     """
     try:
-        from api.services.ai_assistant_service import AIAssistant
-        ai = AIAssistant()
+        from api.services.ai_assistant_service import obtener_asistente
+        ai = obtener_asistente()
         health_status = ai.check_health()
         return Response(health_status)
     except Exception as e:
@@ -7672,11 +8313,10 @@ def ai_agent_command(request):
     
     POST /api/ai/agent/
     Body: {
-        "command": "Crea un cliente llamado Juan con teléfono 123456"
+        "command": "Crea un cliente llamado Juan con teléfono 123456",
+        "async": true  // opcional
     }
     """
-    from api.services.ai_agent_service import AIAgentService
-    
     command = request.data.get('command')
     session_id = request.data.get('session_id')  # Capturar session_id
     
@@ -7685,16 +8325,11 @@ def ai_agent_command(request):
             'error': 'Se requiere campo "command"'
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    try:
-        from api.services.ai_agent_service import AIAgentService
-        agent = AIAgentService(model="qwen2.5:3b")
-        result = agent.process_command(command, session_id=session_id)
-        
-        return Response(result)
-    except Exception as e:
-        return Response({
-            'error': f'Error procesando comando: {str(e)}'
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return _responder_trabajo_ia(
+        request, 'AGENTE',
+        {'command': command, 'session_id': session_id},
+        prefijo_error='Error procesando comando: '
+    )
 
 class ReportePlaneacionViewSet(viewsets.ModelViewSet):
     """API para gestionar snapshots de reportes de planeación"""
@@ -7736,8 +8371,8 @@ def reportes_vendedores(request):
     GET /api/reportes/vendedores/?periodo=mes&fecha_inicio=2026-01-01&fecha_fin=2026-01-31
     """
     try:
-        from django.db.models import Sum, Count, Q
-        from datetime import datetime
+        from django.db.models import Sum, Max, Q, F, DecimalField
+        from .models import MODELOS_CARGUE
         
         periodo = request.GET.get('periodo', 'mes')
         fecha_inicio = request.GET.get('fecha_inicio')
@@ -7755,22 +8390,50 @@ def reportes_vendedores(request):
                 return nombres_reales[identificador]
             return identificador
 
-        # Cargar mapa de precios reales para corrección de montos en 0
-        precios_productos = {}
-        try:
-            from .models import Producto
-            productos_qs = Producto.objects.all()
-            for p in productos_qs:
-                precios_productos[p.nombre] = float(p.precio_cargue or p.precio or 0)
-        except:
-            print("No se pudo cargar tabla Productos para precios")
-
         # Obtener datos de CargueResumen
         resumenes = CargueResumen.objects.filter(
             fecha__gte=fecha_inicio,
             fecha__lte=fecha_fin
         )
 
+        # 🚀 Agregados del rango en una consulta por tabla (agrupados por vendedor en SQL)
+        # en vez de re-consultar cargue y pedidos por cada CargueResumen.
+        cargue_por_vendedor = {}
+        filas_cargue = (
+            Cargue.objects.filter(
+                fecha__gte=fecha_inicio,
+                fecha__lte=fecha_fin,
+                vendedor_id__in=list(MODELOS_CARGUE)
+            )
+            .values('vendedor_id')
+            .annotate(
+                calc_ruta=Sum(
+                    F('cantidad') * _precio_real_cargue(),
+                    filter=Q(cantidad__gt=0),
+                    output_field=DecimalField(max_digits=14, decimal_places=2)
+                ),
+                calc_pedidos_bdd=Max('total_pedidos'),
+                devoluciones=Sum('devoluciones', filter=Q(devoluciones__gt=0)),
+                vencidas=Sum('vencidas', filter=Q(vencidas__gt=0)),
+            )
+            .order_by()
+        )
+        for fila in filas_cargue:
+            cargue_por_vendedor[fila['vendedor_id']] = {
+                'calc_ruta': float(fila['calc_ruta'] or 0),
+                'calc_pedidos_bdd': max(float(fila['calc_pedidos_bdd'] or 0), 0.0),
+                'devoluciones': fila['devoluciones'] or 0,
+                'vencidas': fila['vencidas'] or 0,
+            }
+        
+        pedidos_por_vendedor = {
+            fila['vendedor']: float(fila['total'] or 0)
+            for fila in Pedido.objects.filter(
+                fecha_entrega__gte=fecha_inicio,
+                fecha_entrega__lte=fecha_fin
+            ).exclude(estado='ANULADA').values('vendedor').annotate(total=Sum('total')).order_by()
+        }
+
         vendedores_data = {}
 
         # Pre-poblar con todos los vendedores activos
@@ -7823,7 +8486,7 @@ def reportes_vendedores(request):
             devoluciones_cnt = 0
             vencidas_cnt = 0
             
-            # Intentar obtener el modelo específico CargueIDx para recalcular si es 0
+            # Recalcular con los agregados del cargue del vendedor si el resumen viene en 0
             try:
                 id_num = ''.join(filter(str.isdigit, str(vendedor_raw)))
                 if not id_num and nombre_real in nombres_reales.values():
@@ -7832,69 +8495,28 @@ def reportes_vendedores(request):
                             id_num = k
                             break
                 
-                if id_num:
-                    try:
-                        from django.apps import apps
-                        CargueModel = apps.get_model('api', f"CargueID{id_num}")
-                    except LookupError:
-                        CargueModel = None
+                clave_cargue = f"ID{id_num}" if id_num else None
+                agregado = None
+                if clave_cargue in MODELOS_CARGUE:
+                    agregado = cargue_por_vendedor.get(clave_cargue, {
+                        'calc_ruta': 0.0, 'calc_pedidos_bdd': 0.0, 'devoluciones': 0, 'vencidas': 0
+                    })
+                if agregado is not None:
+                    devoluciones_cnt = agregado['devoluciones']
+                    vencidas_cnt = agregado['vencidas']
                     
-                    if CargueModel:
-                        items_cargue = CargueModel.objects.filter(
-                            fecha__gte=fecha_inicio,
-                            fecha__lte=fecha_fin
-                        )
-                        
-                        calc_ruta = 0.0
-                        calc_pedidos_bdd = 0.0
-                        
-                        for item in items_cargue:
-                            # RUTAS: Recalcular con precio catalogo
-                            precio = float(item.valor)
-                            if precio == 0 and item.producto in precios_productos:
-                                precio = precios_productos[item.producto]
-                            
-                            if item.cantidad > 0:
-                                calc_ruta += (item.cantidad * precio)
-                            
-                            # Intentar leer total_pedidos global guardado en la fila
-                            val_p = getattr(item, 'total_pedidos', 0)
-                            if val_p and float(val_p) > calc_pedidos_bdd:
-                                calc_pedidos_bdd = float(val_p)
-
-                            # Sumar devoluciones y vencidas (unidades)
-                            if item.devoluciones > 0:
-                                devoluciones_cnt += item.devoluciones
-                            
-                            if item.vencidas > 0:
-                                vencidas_cnt += item.vencidas
-
-                        # Si el cálculo da más que el resumen, usémoslo
-                        if calc_ruta > venta_ruta:
-                            venta_ruta = calc_ruta
-                        
-                        # Si encontramos valor en BD cargue, usarlo
-                        if calc_pedidos_bdd > venta_pedidos:
-                            venta_pedidos = calc_pedidos_bdd
-                            
-                        # PEDIDOS: Consultar tabla Pedido directamente (Fuente de verdad)
-                        try:
-                            from .models import Pedido
-                            # Buscar pedidos entregados/pendientes para esa fecha y vendedor
-                            pedidos_qs = Pedido.objects.filter(
-                                vendedor=nombre_real,
-                                fecha_entrega__date__gte=fecha_inicio,
-                                fecha_entrega__date__lte=fecha_fin
-                            ).exclude(estado='ANULADA')
-                            
-                            calc_pedidos = 0.0
-                            for p in pedidos_qs:
-                                calc_pedidos += float(p.total or 0)
-                                
-                            if calc_pedidos > venta_pedidos:
-                                venta_pedidos = calc_pedidos
-                        except Exception as e:
-                            print(f"Error consultando pedidos para {nombre_real}: {e}")
+                    # Si el cálculo da más que el resumen, usémoslo
+                    if agregado['calc_ruta'] > venta_ruta:
+                        venta_ruta = agregado['calc_ruta']
+                    
+                    # Si encontramos valor en BD cargue, usarlo
+                    if agregado['calc_pedidos_bdd'] > venta_pedidos:
+                        venta_pedidos = agregado['calc_pedidos_bdd']
+                    
+                    # PEDIDOS: tabla Pedido (fuente de verdad), ya agregada por vendedor
+                    calc_pedidos = pedidos_por_vendedor.get(nombre_real, 0.0)
+                    if calc_pedidos > venta_pedidos:
+                        venta_pedidos = calc_pedidos
                             
             except Exception as e:
                 print(f"Error recalculando montos para {nombre_real}: {e}")
@@ -7963,36 +8585,33 @@ def reportes_efectividad_vendedores(request):
         # Obtener todos los vendedores activos
         vendedores = Vendedor.objects.filter(activo=True)
         
+        # 📊 Totales pre-agregados desde la tabla de hechos (una sola consulta)
+        from .models import HechoVentaDiaria
+        hechos = {
+            h['vendedor_id']: h
+            for h in HechoVentaDiaria.objects.filter(
+                fecha__gte=fecha_inicio,
+                fecha__lte=fecha_fin
+            ).values('vendedor_id').annotate(
+                vendio=Sum('vendidas'),
+                devolvio=Sum('devoluciones'),
+                vencidas=Sum('vencidas')
+            ).order_by()
+        }
+        
         resultado = []
         
         for vendedor in vendedores:
-            # Obtener todas las ventas del vendedor en el período
-            ventas_ruta = VentaRuta.objects.filter(
-                vendedor=vendedor,
-                fecha__date__gte=fecha_inicio,
-                fecha__date__lte=fecha_fin
-            )
+            hecho = hechos.get(vendedor.id_vendedor, {})
+            
+            # VENDIÓ: Total de productos vendidos en ruta
+            vendio = hecho.get('vendio') or 0
+            
+            # DEVOLVIÓ: Devoluciones calculadas al cerrar turno
+            devolvio = hecho.get('devolvio') or 0
             
-            # VENDIÓ: Total de productos que llevó (cantidad en cada venta)
-            vendio = 0
-            for venta in ventas_ruta:
-                if venta.detalle_productos:  # JSON con los productos de la venta
-                    for producto in venta.detalle_productos:
-                        vendio += producto.get('cantidad', 0)
-            
-            # DEVOLVIÓ: Productos devueltos
-            devolvio = 0
-            for venta in ventas_ruta:
-                if venta.productos_devueltos:  # JSON con productos devueltos
-                    for producto in venta.productos_devueltos:
-                        devolvio += producto.get('cantidad', 0)
-            
-            # VENCIDAS: Productos vencidos
-            vencidas = 0
-            for venta in ventas_ruta:
-                if venta.productos_vencidos:  # JSON con productos vencidos
-                    for producto in venta.productos_vencidos:
-                        vencidas += producto.get('cantidad', 0)
+            # VENCIDAS: Productos vencidos reportados en las ventas
+            vencidas = hecho.get('vencidas') or 0
             
             # VENTAS REALES: Vendió - (Devolvió + Vencidas)
             ventas_reales = vendio - (devolvio + vencidas)
@@ -8045,8 +8664,7 @@ def reportes_analisis_productos(request):
     tipo: vendidos | devueltos | vencidos
     """
     try:
-        from django.db.models import Sum
-        from django.apps import apps
+        from django.db.models import Sum, Count
         from collections import Counter
         
         tipo = request.GET.get('tipo', 'vendidos')
@@ -8062,42 +8680,39 @@ def reportes_analisis_productos(request):
         productos_conteo = Counter()
         vendedores_por_producto = {}
         
-        # 1. Consultar las 6 tablas de CargueIDx
-        for id_num in range(1, 7):
+        # 1. Consultar la tabla unificada de cargue (una sola consulta agregada)
+        campos_por_tipo = {
+            'vendidos': 'cantidad',  # Solo cantidad (lo realmente despachado/vendido)
+            'devueltos': 'devoluciones',
+            'vencidos': 'vencidas',
+        }
+        campo = campos_por_tipo.get(tipo)
+        if campo:
             try:
-                CargueModel = apps.get_model('api', f'CargueID{id_num}')
-                
-                items = CargueModel.objects.filter(
-                    fecha__gte=fecha_inicio,
-                    fecha__lte=fecha_fin
+                filas = (
+                    Cargue.objects.filter(
+                        fecha__gte=fecha_inicio,
+                        fecha__lte=fecha_fin,
+                        **{f'{campo}__gt': 0}
+                    )
+                    .values('producto')
+                    .annotate(
+                        total=Sum(campo),
+                        vendedores=Count('vendedor_id', distinct=True),
+                    )
                 )
-                
-                for item in items:
-                    nombre_producto = item.producto or 'Desconocido'
-                    
-                    # Seleccionar campo según tipo
-                    if tipo == 'vendidos':
-                        # Solo cantidad (lo realmente despachado/vendido)
-                        cantidad = item.cantidad or 0
-                    elif tipo == 'devueltos':
-                        cantidad = item.devoluciones or 0
-                    elif tipo == 'vencidos':
-                        cantidad = item.vencidas or 0
-                    else:
-                        cantidad = 0
-                    
-                    if cantidad > 0:
-                        productos_conteo[nombre_producto] += cantidad
-                        
-                        # Contar vendedores únicos por producto
-                        if tipo in ['devueltos', 'vencidos']:
-                            if nombre_producto not in vendedores_por_producto:
-                                vendedores_por_producto[nombre_producto] = set()
-                            vendedores_por_producto[nombre_producto].add(f'ID{id_num}')
-                            
+
+                for fila in filas:
+                    nombre_producto = fila['producto'] or 'Desconocido'
+                    productos_conteo[nombre_producto] += fila['total'] or 0
+
+                    # Contar vendedores únicos por producto
+                    if tipo in ['devueltos', 'vencidos']:
+                        vendedores_por_producto[nombre_producto] = (
+                            vendedores_por_producto.get(nombre_producto, 0) + fila['vendedores']
+                        )
             except Exception as e:
-                print(f"Error consultando CargueID{id_num}: {e}")
-                continue
+                print(f"Error consultando Cargue: {e}")
         
         # 2. Si es tipo "vendidos", también sumar productos de la tabla Pedido
         if tipo == 'vendidos':
@@ -8135,7 +8750,7 @@ def reportes_analisis_productos(request):
             
             # Agregar conteo de vendedores para devueltos/vencidos
             if tipo in ['devueltos', 'vencidos']:
-                item['vendedores'] = len(vendedores_por_producto.get(nombre, set()))
+                item['vendedores'] = vendedores_por_producto.get(nombre, 0)
             
             resultado.append(item)
         
@@ -8181,8 +8796,7 @@ def reportes_pedidos_ruta(request):
         
         # Query base
         pedidos = Pedido.objects.filter(
-            fecha__date__gte=fecha_inicio,
-            fecha__date__lte=fecha_fin
+            **filtro_fechas('fecha', fecha_inicio, fecha_fin)
         ).select_related('usuario')
         
         # Filtros opcionales
@@ -8226,8 +8840,10 @@ def dashboard_ejecutivo(request):
     GET /api/dashboard-ejecutivo/?periodo=dia&fecha_inicio=2026-01-24&fecha_fin=2026-01-24
     """
     try:
-        from django.db.models import Sum, Count, Q
-        from collections import Counter, defaultdict
+        from django.db.models import (
+            Sum, Q, F, Value, Case, When, CharField, DecimalField, IntegerField,
+        )
+        from django.db.models.functions import Coalesce
         
         periodo = request.GET.get('periodo', 'dia')
         fecha_inicio = request.GET.get('fecha_inicio')
@@ -8291,41 +8907,50 @@ def dashboard_ejecutivo(request):
             
             vendedores_data[nombre_real]['ventas_monto'] += monto_venta
         
-        # OBTENER PRODUCTOS (vendidas, devoluciones, vencidas) desde los 6 modelos
-        todos_cargues = []
-        for modelo in [CargueID1, CargueID2, CargueID3, CargueID4, CargueID5, CargueID6]:
-            cargues = modelo.objects.filter(
-                fecha__gte=fecha_inicio,
-                fecha__lte=fecha_fin,
-                activo=True
+        # OBTENER PRODUCTOS (vendidas, devoluciones, vencidas) desde la tabla unificada
+        # 🚀 Todo se agrega en SQL: solo viajan filas de resumen (por vendedor / top
+        # productos), así la memoria no crece con la longitud del rango de fechas.
+        cargues = Cargue.objects.filter(
+            fecha__gte=fecha_inicio,
+            fecha__lte=fecha_fin,
+            activo=True
+        )
+        
+        # Precio real: si cargue.valor es 0, usar catálogo (precio_cargue o precio)
+        precio_real = _precio_real_cargue()
+        
+        def suma_positivos(campo, precio=None):
+            """SUM(campo [* precio]) contando solo filas con campo > 0"""
+            valor = F(campo) * precio if precio is not None else F(campo)
+            salida = DecimalField(max_digits=14, decimal_places=2) if precio is not None else IntegerField()
+            return Coalesce(
+                Sum(valor, filter=Q(**{f'{campo}__gt': 0}), output_field=salida),
+                Value(0),
+                output_field=salida
             )
-            todos_cargues.extend(list(cargues))
         
-        # Cargar mapa de precios reales para corrección de montos en 0
-        precios_productos = {}
-        try:
-            from .models import Producto
-            productos_qs = Producto.objects.all()
-            for p in productos_qs:
-                precios_productos[p.nombre] = float(p.precio_cargue or p.precio or 0)
-        except:
-            print("No se pudo cargar tabla Productos para precios")
-
-        # Contadores de productos
-        productos_vendidos = Counter()
-        productos_devueltos = Counter()
-        productos_vencidos = Counter()
-        
-        for cargue in todos_cargues:
-            # Obtener nombre normalizado
-            if hasattr(cargue, 'responsable') and cargue.responsable:
-                 vendedor_raw = cargue.responsable
-                 vendedor_nombre = get_nombre_vendedor(vendedor_raw)
-            else:
-                 modelo_name = cargue.__class__.__name__
-                 id_suffix = modelo_name.replace('Cargue', '')
-                 vendedor_nombre = get_nombre_vendedor(id_suffix)
-
+        # Vendedor: responsable si está diligenciado, si no el ID del cargue
+        por_vendedor = (
+            cargues
+            .annotate(vendedor_clave=Case(
+                When(responsable='', then=F('vendedor_id')),
+                default=F('responsable'),
+                output_field=CharField()
+            ))
+            .values('vendedor_clave')
+            .annotate(
+                ventas_count=suma_positivos('vendidas'),
+                devueltas_count=suma_positivos('devoluciones'),
+                vencidas_count=suma_positivos('vencidas'),
+                devueltas_monto=suma_positivos('devoluciones', precio_real),
+                vencidas_monto=suma_positivos('vencidas', precio_real),
+            )
+            .order_by()
+        )
+        
+        for fila in por_vendedor:
+            vendedor_nombre = get_nombre_vendedor(fila['vendedor_clave'])
+            
             if vendedor_nombre not in vendedores_data:
                 vendedores_data[vendedor_nombre] = {
                     'nombre': vendedor_nombre,
@@ -8337,27 +8962,23 @@ def dashboard_ejecutivo(request):
                     'vencidas_monto': 0
                 }
             
-            # Obtener precio real (si cargue.valor es 0, usar catalogo)
-            precio_real = float(cargue.valor)
-            if precio_real == 0 and cargue.producto in precios_productos:
-                precio_real = precios_productos[cargue.producto]
-            
-            # VENTAS (unidades)
-            if cargue.vendidas > 0:
-                vendedores_data[vendedor_nombre]['ventas_count'] += cargue.vendidas
-                productos_vendidos[cargue.producto] += cargue.vendidas
-            
-            # DEVOLUCIONES (unidades + monto)
-            if cargue.devoluciones > 0:
-                vendedores_data[vendedor_nombre]['devueltas_count'] += cargue.devoluciones
-                vendedores_data[vendedor_nombre]['devueltas_monto'] += float(cargue.devoluciones * precio_real)
-                productos_devueltos[cargue.producto] += cargue.devoluciones
-            
-            # VENCIDAS (unidades + monto)
-            if cargue.vencidas > 0:
-                vendedores_data[vendedor_nombre]['vencidas_count'] += cargue.vencidas
-                vendedores_data[vendedor_nombre]['vencidas_monto'] += float(cargue.vencidas * precio_real)
-                productos_vencidos[cargue.producto] += cargue.vencidas
+            v_data = vendedores_data[vendedor_nombre]
+            v_data['ventas_count'] += fila['ventas_count']
+            v_data['devueltas_count'] += fila['devueltas_count']
+            v_data['devueltas_monto'] += float(fila['devueltas_monto'])
+            v_data['vencidas_count'] += fila['vencidas_count']
+            v_data['vencidas_monto'] += float(fila['vencidas_monto'])
+        
+        def top_productos(campo, limite=10):
+            """Top N productos por SUM(campo) resuelto con ORDER BY + LIMIT en SQL"""
+            filas = (
+                cargues
+                .filter(**{f'{campo}__gt': 0})
+                .values('producto')
+                .annotate(cantidad=Sum(campo))
+                .order_by('-cantidad', 'producto')[:limite]
+            )
+            return [{'nombre': f['producto'], 'cantidad': f['cantidad']} for f in filas]
         
         # Calcular porcentajes
         vendedores_list = []
@@ -8377,9 +8998,9 @@ def dashboard_ejecutivo(request):
         vendedores_list.sort(key=lambda x: x['ventas_monto'], reverse=True)
         
         # Top 10 productos
-        top_vendidos = [{'nombre': n, 'cantidad': c} for n, c in productos_vendidos.most_common(10)]
-        top_devueltos = [{'nombre': n, 'cantidad': c} for n, c in productos_devueltos.most_common(10)]
-        top_vencidos = [{'nombre': n, 'cantidad': c} for n, c in productos_vencidos.most_common(10)]
+        top_vendidos = top_productos('vendidas')
+        top_devueltos = top_productos('devoluciones')
+        top_vencidos = top_productos('vencidas')
         
         # TOTALES
         totales = {
@@ -8431,7 +9052,7 @@ def reportes_ventas_pos(request):
             return Response({'error': 'Faltan parámetros de fecha'}, status=400)
             
         # Construir consulta base
-        query = Q(fecha__date__gte=fecha_inicio) & Q(fecha__date__lte=fecha_fin)
+        query = Q(**filtro_fechas('fecha', fecha_inicio, fecha_fin))
         
         # Filtro: Excluir anuladas (Solo ventas válidas)
         query &= ~Q(estado='ANULADA')
@@ -8515,8 +9136,7 @@ def test_dashboard_data(request):
         fecha_fin = request.GET.get('fecha_fin', '2026-01-24')
         
         ventas = VentaRuta.objects.filter(
-            fecha__date__gte=fecha_inicio,
-            fecha__date__lte=fecha_fin
+            **filtro_fechas('fecha', fecha_inicio, fecha_fin)
         ).select_related('vendedor')
         
         resultado = {
@@ -8619,7 +9239,8 @@ def subir_evidencia_pedido(request):
                 'pedido': pedido.numero_pedido,
                 'producto_nombre': evidencia.producto_nombre,
                 'motivo': evidencia.motivo,
-                'imagen': request.build_absolute_uri(evidencia.imagen.url) if evidencia.imagen else None
+                'imagen': request.build_absolute_uri(evidencia.imagen.url) if evidencia.imagen else None,
+                'miniatura': url_variante(evidencia.imagen, request=request) if evidencia.imagen else None
             }
         }, status=201)
         
@@ -8656,6 +9277,7 @@ def obtener_evidencias_pedido(request, pedido_id):
                 'producto_nombre': ev.producto_nombre,
                 'motivo': ev.motivo,
                 'imagen': request.build_absolute_uri(ev.imagen.url) if ev.imagen else None,
+                'miniatura': url_variante(ev.imagen, request=request) if ev.imagen else None,
                 'fecha_creacion': ev.fecha_creacion.isoformat()
             })
         
@@ -8942,17 +9564,14 @@ def ia_retrain(request):
     """
     try:
         from api.services.neural_network_service import NeuralNetworkService
-        from api.models import ReportePlaneacion
-        
-        nn_service = NeuralNetworkService()
         
-        # Obtener todos los reportes ordenados por fecha
-        reportes = ReportePlaneacion.objects.all().order_by('fecha_reporte')
-        count = 0
-        
-        for reporte in reportes:
-            if nn_service.train_incremental(reporte):
-                count += 1
+        # Un solo entrenamiento completo sobre todo el histórico
+        resumen = NeuralNetworkService().entrenar()
+        if not resumen:
+            return Response({
+                'success': False,
+                'message': 'No hay suficientes reportes de planeación para entrenar.'
+            })
                 
         # Actualizar fecha de último entrenamiento
         import json
@@ -8976,7 +9595,8 @@ def ia_retrain(request):
         
         return Response({
             'success': True,
-            'message': f'Re-entrenamiento completado con {count} reportes históricos.'
+            'message': f"Re-entrenamiento completado con {resumen['muestras']} registros de {resumen['productos']} productos.",
+            'resumen': resumen
         })
     except Exception as e:
         return Response({'error': str(e)}, status=500)
@@ -9216,123 +9836,72 @@ def exportar_clientes_rutas_excel(request):
     Exporta todos los clientes de ruta a Excel, agrupados por ID de vendedor.
     GET /api/reportes/clientes-rutas-excel/
     """
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-    from openpyxl.utils import get_column_letter
-    from django.http import HttpResponse
-    import io
+    from itertools import groupby
+    from openpyxl.styles import Font
+    from api.services.exportacion_excel_service import LibroExcel, TAMANO_LOTE, CENTRO, estilo, relleno
 
     try:
         clientes_ruta = ClienteRuta.objects.filter(
             activo=True, ruta__activo=True
-        ).select_related('ruta', 'ruta__vendedor').order_by(
+        ).order_by(
             'ruta__vendedor__id_vendedor', 'ruta__nombre', 'orden'
+        ).values_list(
+            'ruta__vendedor__id_vendedor', 'ruta__vendedor__nombre', 'ruta__nombre',
+            'nombre_negocio', 'nombre_contacto', 'telefono', 'tipo_negocio',
+            'dia_visita', 'direccion', 'nota',
         )
 
-        # Agrupar por vendedor
-        por_vendedor = {}
-        for c in clientes_ruta:
-            vid = c.ruta.vendedor.id_vendedor if c.ruta.vendedor else 'SIN_ID'
-            vnombre = c.ruta.vendedor.nombre if c.ruta.vendedor else ''
-            if vid not in por_vendedor:
-                por_vendedor[vid] = {'nombre': vnombre, 'clientes': []}
-            origen = 'PEDIDO' if (c.tipo_negocio and 'PEDIDOS' in c.tipo_negocio.upper()) else 'RUTA'
-            por_vendedor[vid]['clientes'].append({
-                'ruta': c.ruta.nombre,
-                'negocio': c.nombre_negocio,
-                'contacto': c.nombre_contacto or '',
-                'telefono': c.telefono or '',
-                'tipo_negocio': c.tipo_negocio or '',
-                'origen': origen,
-                'dias': c.dia_visita or '',
-                'direccion': c.direccion or '',
-                'nota': c.nota or '',
-            })
-
         # ── Estilos ─────────────────────────────────────────────────
         azul = '0C2C53'
-        verde = '198754'
-        blanco = 'FFFFFF'
-        gris = 'F1F3F5'
-        amarillo = 'FFF3CD'
-
-        header_font = Font(bold=True, color=blanco, size=11)
-        header_fill = PatternFill('solid', fgColor=azul)
-        total_fill = PatternFill('solid', fgColor='DEE2E6')
-        center = Alignment(horizontal='center', vertical='center')
-
-        def autofit(ws):
-            for col in ws.columns:
-                max_len = max((len(str(c.value)) for c in col if c.value), default=8)
-                ws.column_dimensions[get_column_letter(col[0].column)].width = min(max_len + 4, 50)
-
-        wb = Workbook()
-        wb.remove(wb.active)
-
-        # ── Hoja Resumen ────────────────────────────────────────────
-        ws_res = wb.create_sheet('Resumen', 0)
-        ws_res.append([f'CLIENTES DE RUTAS — {__import__("datetime").date.today()}'])
-        ws_res['A1'].font = Font(bold=True, size=14, color=azul)
-        ws_res.append([])
-        ws_res.append(['ID Vendedor', 'Nombre Vendedor', 'Total Clientes', 'RUTA', 'PEDIDO'])
-        for cell in ws_res[3]:
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = center
-
-        for vid in sorted(por_vendedor.keys()):
-            g = por_vendedor[vid]
-            total_ruta = sum(1 for c in g['clientes'] if c['origen'] == 'RUTA')
-            total_ped = sum(1 for c in g['clientes'] if c['origen'] == 'PEDIDO')
-            ws_res.append([vid, g['nombre'], len(g['clientes']), total_ruta, total_ped])
-
-        ws_res.append(['TOTAL', '', sum(len(g['clientes']) for g in por_vendedor.values()), '', ''])
-        for cell in ws_res[ws_res.max_row]:
-            cell.font = Font(bold=True)
-            cell.fill = total_fill
-        autofit(ws_res)
+        libro = LibroExcel({
+            'titulo': estilo(font=Font(bold=True, size=14, color=azul)),
+            'titulo_id': estilo(font=Font(bold=True, size=13, color=azul)),
+            'encabezado': estilo(font=Font(bold=True, color='FFFFFF', size=11), fill=relleno(azul), alignment=CENTRO),
+            'total': estilo(font=Font(bold=True), fill=relleno('DEE2E6')),
+            'fila_par': estilo(fill=relleno('F1F3F5')),
+            'fila_pedido': estilo(fill=relleno('FFF3CD')),
+        })
 
-        # ── Hoja por ID ─────────────────────────────────────────────
+        # ── Hoja por ID (un vendedor a la vez, en el orden de la consulta) ──
         COLS = ['Ruta', 'Negocio', 'Contacto', 'Teléfono', 'Tipo Negocio', 'Origen', 'Días Visita', 'Dirección', 'Nota']
-        for vid in sorted(por_vendedor.keys()):
-            g = por_vendedor[vid]
-            ws = wb.create_sheet(vid[:31])
-            ws.append([f'{vid} — {g["nombre"]}'])
-            ws.merge_cells('A1:I1')
-            ws['A1'].font = Font(bold=True, size=13, color=azul)
-            ws.append([])
-            ws.append(COLS)
-            for cell in ws[3]:
-                cell.font = header_font
-                cell.fill = header_fill
-                cell.alignment = center
-
-            for i, c in enumerate(g['clientes']):
-                ws.append([
-                    c['ruta'], c['negocio'], c['contacto'], c['telefono'],
-                    c['tipo_negocio'], c['origen'], c['dias'], c['direccion'], c['nota']
-                ])
-                if c['origen'] == 'PEDIDO':
-                    for cell in ws[ws.max_row]:
-                        cell.fill = PatternFill('solid', fgColor='FFF3CD')
-                elif i % 2 == 0:
-                    for cell in ws[ws.max_row]:
-                        cell.fill = PatternFill('solid', fgColor=gris)
-
-            autofit(ws)
-
-        buffer = io.BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-
-        from datetime import date
-        nombre_archivo = f'clientes_rutas_{date.today()}.xlsx'
-        response = HttpResponse(
-            buffer.getvalue(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
-        return response
+        resumen = []
+        filas = clientes_ruta.iterator(chunk_size=TAMANO_LOTE)
+        for vid, grupo in groupby(filas, key=lambda fila: fila[0] or 'SIN_ID'):
+            ws = None
+            total_ruta = total_ped = 0
+            for i, (_, vnombre, ruta, negocio, contacto, telefono, tipo_negocio, dias, direccion, nota) in enumerate(grupo):
+                if ws is None:
+                    nombre_vendedor = vnombre or ''
+                    ws = libro.hoja(vid, anchos=[20, 32, 26, 14, 24, 10, 22, 40, 40])
+                    ws.fila([f'{vid} — {nombre_vendedor}'], estilo='titulo_id')
+                    ws.combinar('A1:I1')
+                    ws.fila([])
+                    ws.fila(COLS, estilo='encabezado')
+
+                origen = 'PEDIDO' if (tipo_negocio and 'PEDIDOS' in tipo_negocio.upper()) else 'RUTA'
+                if origen == 'PEDIDO':
+                    total_ped += 1
+                    estilo_fila = 'fila_pedido'
+                else:
+                    total_ruta += 1
+                    estilo_fila = 'fila_par' if i % 2 == 0 else None
+                ws.fila([
+                    ruta, negocio, contacto or '', telefono or '',
+                    tipo_negocio or '', origen, dias or '', direccion or '', nota or ''
+                ], estilo=estilo_fila)
+
+            resumen.append([vid, nombre_vendedor, total_ruta + total_ped, total_ruta, total_ped])
+
+        # ── Hoja Resumen (se arma al final, va de primera) ──────────
+        ws_res = libro.hoja('Resumen', anchos=[14, 30, 14, 10, 10], indice=0)
+        ws_res.fila([f'CLIENTES DE RUTAS — {date.today()}'], estilo='titulo')
+        ws_res.fila([])
+        ws_res.fila(['ID Vendedor', 'Nombre Vendedor', 'Total Clientes', 'RUTA', 'PEDIDO'], estilo='encabezado')
+        for fila in resumen:
+            ws_res.fila(fila)
+        ws_res.fila(['TOTAL', '', sum(fila[2] for fila in resumen), '', ''], estilo='total')
+
+        return libro.respuesta(f'clientes_rutas_{date.today()}.xlsx')
 
     except Exception as e:
         import traceback
@@ -9358,8 +9927,7 @@ def ventas_productos_pos(request):
         from django.db.models import Sum
 
         detalles = DetalleVenta.objects.filter(
-            venta__fecha__date__gte=fecha_inicio,
-            venta__fecha__date__lte=fecha_fin,
+            **filtro_fechas('venta__fecha', fecha_inicio, fecha_fin),
         ).exclude(
             venta__estado='ANULADA'
         ).exclude(
@@ -9399,13 +9967,9 @@ def exportar_ventas_productos_pos_excel(request):
     """
     Exporta ventas de productos POS a Excel.
     GET /api/reportes/ventas-productos-pos/excel/?fecha_inicio=X&fecha_fin=Y
+    Para rangos amplios: POST /api/exportaciones/ (en segundo plano).
     """
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-    from openpyxl.utils import get_column_letter
-    from django.http import HttpResponse
-    from django.db.models import Sum
-    import io
+    from api.services.reportes_excel_service import libro_ventas_productos_pos
 
     fecha_inicio = request.GET.get('fecha_inicio')
     fecha_fin = request.GET.get('fecha_fin')
@@ -9414,74 +9978,8 @@ def exportar_ventas_productos_pos_excel(request):
         return Response({'error': 'fecha_inicio y fecha_fin son requeridos'}, status=400)
 
     try:
-        detalles = DetalleVenta.objects.filter(
-            venta__fecha__date__gte=fecha_inicio,
-            venta__fecha__date__lte=fecha_fin,
-        ).exclude(
-            venta__estado='ANULADA'
-        ).exclude(
-            venta__estado='CANCELADO'
-        ).values(
-            'producto__nombre'
-        ).annotate(
-            cantidad_total=Sum('cantidad'),
-            total_ventas=Sum('subtotal')
-        ).order_by('-cantidad_total')
-
-        azul_oscuro = '0C2C53'
-        blanco = 'FFFFFF'
-        gris = 'F1F3F5'
-        total_fill = PatternFill('solid', fgColor='DEE2E6')
-        header_font = Font(bold=True, color=blanco, size=11)
-        header_fill = PatternFill('solid', fgColor=azul_oscuro)
-        center = Alignment(horizontal='center')
-
-        wb = Workbook()
-        ws = wb.active
-        ws.title = 'Ventas POS'
-
-        ws.append([f'VENTAS PRODUCTOS POS — {fecha_inicio} → {fecha_fin}'])
-        ws['A1'].font = Font(bold=True, size=14, color=azul_oscuro)
-        ws.append([])
-
-        ws.append(['#', 'Producto', 'Cantidad', 'Total COP'])
-        for cell in ws[3]:
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = center
-
-        total_und = 0
-        total_cop = 0
-        for i, d in enumerate(detalles, 1):
-            cant = d['cantidad_total'] or 0
-            tot = round(float(d['total_ventas'] or 0))
-            total_und += cant
-            total_cop += tot
-            ws.append([i, d['producto__nombre'] or '(Sin nombre)', cant, tot])
-            if i % 2 == 0:
-                for cell in ws[ws.max_row]:
-                    cell.fill = PatternFill('solid', fgColor=gris)
-
-        ws.append(['', 'TOTAL', total_und, total_cop])
-        for cell in ws[ws.max_row]:
-            cell.font = Font(bold=True, size=11)
-            cell.fill = total_fill
-
-        for col in ws.columns:
-            max_len = max((len(str(c.value)) for c in col if c.value), default=10)
-            ws.column_dimensions[get_column_letter(col[0].column)].width = min(max_len + 4, 50)
-
-        buffer = io.BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-
-        nombre_archivo = f'ventas_pos_{fecha_inicio}_{fecha_fin}.xlsx'
-        response = HttpResponse(
-            buffer.getvalue(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
-        return response
+        libro, nombre_archivo = libro_ventas_productos_pos(fecha_inicio, fecha_fin)
+        return libro.respuesta(nombre_archivo)
 
     except Exception as e:
         import traceback
@@ -9491,6 +9989,44 @@ def exportar_ventas_productos_pos_excel(request):
 
 # ==================== HISTORIAL DE CLIENTES ====================
 
+def _acumular_lineas_ventas_ruta(ventas_qs, clientes_map):
+    """
+    Suma productos y vencidas de `ventas_qs` en `clientes_map` (clave (cliente, vendedor))
+    con un GROUP BY sobre DetalleVentaRuta / VencidaVentaRuta en vez de recorrer el JSON.
+    """
+    from django.db.models import Sum
+
+    campos = ('venta__cliente_id', 'venta__nombre_negocio', 'venta__cliente_nombre', 'venta__vendedor_id', 'producto_nombre')
+
+    def _entry(fila):
+        cid = (
+            str(fila['venta__cliente_id']) if fila['venta__cliente_id']
+            else f"__occ_{fila['venta__nombre_negocio'] or fila['venta__cliente_nombre']}"
+        )
+        return clientes_map.get((cid, fila['venta__vendedor_id'] or 'SIN_ID'))
+
+    lineas = DetalleVentaRuta.objects.filter(venta__in=ventas_qs).values(*campos).annotate(
+        cantidad=Sum('cantidad'), total=Sum('subtotal')
+    ).order_by()
+    for fila in lineas:
+        entry = _entry(fila)
+        if entry is None:
+            continue
+        producto = entry['productos'].setdefault(fila['producto_nombre'], {'cantidad': 0, 'total': 0})
+        producto['cantidad'] += fila['cantidad'] or 0
+        producto['total'] += float(fila['total'] or 0)
+
+    vencidas = VencidaVentaRuta.objects.filter(venta__in=ventas_qs).values(*campos).annotate(
+        cantidad=Sum('cantidad')
+    ).order_by()
+    for fila in vencidas:
+        entry = _entry(fila)
+        if entry is None:
+            continue
+        vencida = entry['vencidas'].setdefault(fila['producto_nombre'], {'cantidad': 0})
+        vencida['cantidad'] += fila['cantidad'] or 0
+
+
 @api_view(['GET'])
 def historial_clientes(request):
     """
@@ -9508,10 +10044,9 @@ def historial_clientes(request):
     try:
         # ── Ventas de Ruta (App Móvil) ──────────────────────────────
         ventas_qs = VentaRuta.objects.filter(
-            fecha__date__gte=fecha_inicio,
-            fecha__date__lte=fecha_fin,
+            **filtro_fechas('fecha', fecha_inicio, fecha_fin),
             estado='ACTIVA'
-        ).select_related('vendedor', 'cliente')
+        ).select_related('vendedor', 'cliente').defer('detalles', 'productos_vencidos')
 
         if vendedor_id:
             ventas_qs = ventas_qs.filter(vendedor__id_vendedor=vendedor_id)
@@ -9541,30 +10076,12 @@ def historial_clientes(request):
             entry['total_ventas'] += float(venta.total or 0)
             entry['num_ventas'] += 1
 
-            for det in (venta.detalles or []):
-                nombre = det.get('producto', '').strip()
-                if not nombre:
-                    continue
-                if nombre not in entry['productos']:
-                    entry['productos'][nombre] = {'cantidad': 0, 'total': 0}
-                entry['productos'][nombre]['cantidad'] += int(det.get('cantidad', 0))
-                entry['productos'][nombre]['total'] += float(det.get('subtotal', 0))
-
-            for vec in (venta.productos_vencidos or []):
-                nombre = vec.get('producto', '').strip()
-                if not nombre:
-                    continue
-                cant = int(vec.get('cantidad', 0))
-                if cant <= 0:
-                    continue
-                if nombre not in entry['vencidas']:
-                    entry['vencidas'][nombre] = {'cantidad': 0}
-                entry['vencidas'][nombre]['cantidad'] += cant
+        # Productos y vencidas por cliente: GROUP BY sobre las líneas de las ventas
+        _acumular_lineas_ventas_ruta(ventas_qs, clientes_map)
 
         # ── Pedidos entregados ──────────────────────────────────────
         pedidos_qs = Pedido.objects.filter(
-            fecha__date__gte=fecha_inicio,
-            fecha__date__lte=fecha_fin,
+            **filtro_fechas('fecha', fecha_inicio, fecha_fin),
             estado='ENTREGADA'
         ).prefetch_related('detalles__producto')
 
@@ -9641,11 +10158,8 @@ def exportar_historial_clientes_excel(request):
     Exporta el historial de clientes a Excel con una hoja por ID de vendedor.
     GET /api/reportes/historial-clientes/excel/?fecha_inicio=2026-04-01&fecha_fin=2026-04-30
     """
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-    from openpyxl.utils import get_column_letter
-    from django.http import HttpResponse
-    import io
+    from openpyxl.styles import Font, Border, Side
+    from api.services.exportacion_excel_service import LibroExcel, TAMANO_LOTE, CENTRO, estilo, relleno
 
     fecha_inicio = request.GET.get('fecha_inicio')
     fecha_fin = request.GET.get('fecha_fin')
@@ -9657,16 +10171,15 @@ def exportar_historial_clientes_excel(request):
     try:
         # Reusar lógica de historial_clientes para obtener datos
         ventas_qs = VentaRuta.objects.filter(
-            fecha__date__gte=fecha_inicio,
-            fecha__date__lte=fecha_fin,
+            **filtro_fechas('fecha', fecha_inicio, fecha_fin),
             estado='ACTIVA'
-        ).select_related('vendedor', 'cliente')
+        ).select_related('vendedor', 'cliente').defer('detalles', 'productos_vencidos')
         if vendedor_id:
             ventas_qs = ventas_qs.filter(vendedor__id_vendedor=vendedor_id)
 
         clientes_map = {}
 
-        for venta in ventas_qs:
+        for venta in ventas_qs.iterator(chunk_size=TAMANO_LOTE):
             vid = venta.vendedor.id_vendedor if venta.vendedor else 'SIN_ID'
             cid = str(venta.cliente_id) if venta.cliente_id else f'__occ_{venta.nombre_negocio or venta.cliente_nombre}'
             key = (cid, vid)
@@ -9683,32 +10196,17 @@ def exportar_historial_clientes_excel(request):
                 }
             entry = clientes_map[key]
             entry['total_ventas'] += float(venta.total or 0)
-            for det in (venta.detalles or []):
-                nombre = det.get('producto', '').strip()
-                if not nombre:
-                    continue
-                if nombre not in entry['productos']:
-                    entry['productos'][nombre] = {'cantidad': 0, 'total': 0}
-                entry['productos'][nombre]['cantidad'] += int(det.get('cantidad', 0))
-                entry['productos'][nombre]['total'] += float(det.get('subtotal', 0))
-            for vec in (venta.productos_vencidos or []):
-                nombre = vec.get('producto', '').strip()
-                cant = int(vec.get('cantidad', 0))
-                if not nombre or cant <= 0:
-                    continue
-                if nombre not in entry['vencidas']:
-                    entry['vencidas'][nombre] = {'cantidad': 0}
-                entry['vencidas'][nombre]['cantidad'] += cant
+
+        _acumular_lineas_ventas_ruta(ventas_qs, clientes_map)
 
         pedidos_qs = Pedido.objects.filter(
-            fecha__date__gte=fecha_inicio,
-            fecha__date__lte=fecha_fin,
+            **filtro_fechas('fecha', fecha_inicio, fecha_fin),
             estado='ENTREGADA'
         ).prefetch_related('detalles__producto')
         if vendedor_id:
             pedidos_qs = pedidos_qs.filter(asignado_a_id=vendedor_id)
 
-        for pedido in pedidos_qs:
+        for pedido in pedidos_qs.iterator(chunk_size=TAMANO_LOTE):
             vid = pedido.asignado_a_id or 'SIN_ID'
             key = (f'__ped_{pedido.destinatario}_{vid}', vid)
             if key not in clientes_map:
@@ -9743,44 +10241,24 @@ def exportar_historial_clientes_excel(request):
 
         # ── Estilos ─────────────────────────────────────────────────
         azul_oscuro = '0C2C53'
-        verde = '198754'
-        amarillo = 'FFC107'
-        gris_claro = 'F1F3F5'
-        blanco = 'FFFFFF'
-
-        header_font = Font(bold=True, color=blanco, size=11)
-        header_fill_azul = PatternFill('solid', fgColor=azul_oscuro)
-        header_fill_verde = PatternFill('solid', fgColor=verde)
-        header_fill_amarillo = PatternFill('solid', fgColor='856404')
-        fila_gris = PatternFill('solid', fgColor=gris_claro)
-        fila_total = PatternFill('solid', fgColor='DEE2E6')
-        borde = Border(
-            bottom=Side(style='thin', color='DEE2E6')
-        )
-        center = Alignment(horizontal='center', vertical='center')
-
-        def autofit(ws):
-            for col in ws.columns:
-                max_len = 0
-                col_letter = get_column_letter(col[0].column)
-                for cell in col:
-                    if cell.value:
-                        max_len = max(max_len, len(str(cell.value)))
-                ws.column_dimensions[col_letter].width = min(max_len + 4, 50)
-
-        wb = Workbook()
-        wb.remove(wb.active)  # quitar hoja default
+        borde = Border(bottom=Side(style='thin', color='DEE2E6'))
+        libro = LibroExcel({
+            'titulo': estilo(font=Font(bold=True, size=14, color=azul_oscuro)),
+            'titulo_id': estilo(font=Font(bold=True, size=13, color=azul_oscuro)),
+            'encabezado': estilo(font=Font(bold=True, color='FFFFFF', size=11), fill=relleno(azul_oscuro), alignment=CENTRO),
+            'total': estilo(font=Font(bold=True, size=11), fill=relleno('DEE2E6')),
+            'cliente': estilo(font=Font(bold=True, color=azul_oscuro)),
+            'compra': estilo(border=borde),
+            'total_compras': estilo(font=Font(bold=True), fill=relleno('DEE2E6')),
+            'vencida': estilo(border=borde, fill=relleno('FFF3CD')),
+            'total_vencidas': estilo(font=Font(bold=True, color='856404'), fill=relleno('FFE69C')),
+        })
 
         # ── Hoja Resumen ────────────────────────────────────────────
-        ws_res = wb.create_sheet('Resumen', 0)
-        ws_res.append(['HISTORIAL DE CLIENTES', f'{fecha_inicio} → {fecha_fin}'])
-        ws_res['A1'].font = Font(bold=True, size=14, color=azul_oscuro)
-        ws_res.append([])
-        ws_res.append(['ID Vendedor', 'Nombre Vendedor', 'Clientes', 'Total Ventas', 'Registros Vencidas'])
-        for cell in ws_res[3]:
-            cell.font = header_font
-            cell.fill = header_fill_azul
-            cell.alignment = center
+        ws_res = libro.hoja('Resumen', anchos=[16, 30, 10, 16, 20])
+        ws_res.fila(['HISTORIAL DE CLIENTES', f'{fecha_inicio} → {fecha_fin}'], estilos={1: 'titulo'})
+        ws_res.fila([])
+        ws_res.fila(['ID Vendedor', 'Nombre Vendedor', 'Clientes', 'Total Ventas', 'Registros Vencidas'], estilo='encabezado')
 
         total_general = 0
         for vid in sorted(por_vendedor.keys()):
@@ -9788,34 +10266,29 @@ def exportar_historial_clientes_excel(request):
             total_v = sum(c['total_ventas'] for c in g['clientes'])
             venc_count = sum(sum(v['cantidad'] for v in c['vencidas'].values()) for c in g['clientes'])
             total_general += total_v
-            ws_res.append([vid, g['vendedor_nombre'], len(g['clientes']), round(total_v), venc_count])
+            ws_res.fila([vid, g['vendedor_nombre'], len(g['clientes']), round(total_v), venc_count])
 
-        ws_res.append(['TOTAL GENERAL', '', sum(len(g['clientes']) for g in por_vendedor.values()), round(total_general), ''])
-        last = ws_res.max_row
-        for cell in ws_res[last]:
-            cell.font = Font(bold=True, size=11)
-            cell.fill = fila_total
-        autofit(ws_res)
+        ws_res.fila(
+            ['TOTAL GENERAL', '', sum(len(g['clientes']) for g in por_vendedor.values()), round(total_general), ''],
+            estilo='total'
+        )
 
         # ── Hoja por ID ─────────────────────────────────────────────
         COLS = ['Vendedor ID', 'Vendedor', 'Cliente', 'Contacto', 'Origen', 'Tipo', 'Producto', 'Cantidad', 'Total COP']
         for vid in sorted(por_vendedor.keys()):
             g = por_vendedor[vid]
-            nombre_hoja = f'{vid}'[:31]
-            ws = wb.create_sheet(nombre_hoja)
+            ws = libro.hoja(f'{vid}', anchos=[12, 24, 34, 24, 10, 16, 34, 10, 24])
 
             # Título
-            ws.append([f'Historial — {vid} — {g["vendedor_nombre"]}', '', '', '', '', '', '', '', f'{fecha_inicio} → {fecha_fin}'])
-            ws.merge_cells('A1:H1')
-            ws['A1'].font = Font(bold=True, size=13, color=azul_oscuro)
-            ws.append([])
+            ws.fila(
+                [f'Historial — {vid} — {g["vendedor_nombre"]}', '', '', '', '', '', '', '', f'{fecha_inicio} → {fecha_fin}'],
+                estilos={1: 'titulo_id'}
+            )
+            ws.combinar('A1:H1')
+            ws.fila([])
 
             # Encabezados
-            ws.append(COLS)
-            for cell in ws[3]:
-                cell.font = header_font
-                cell.fill = header_fill_azul
-                cell.alignment = center
+            ws.fila(COLS, estilo='encabezado')
 
             clientes_sorted = sorted(g['clientes'], key=lambda c: c['nombre_negocio'].lower())
             for cliente in clientes_sorted:
@@ -9824,72 +10297,40 @@ def exportar_historial_clientes_excel(request):
 
                 # Filas de compras
                 if productos:
-                    ws.append([])
-                    sub_h = ws.max_row
-                    ws[f'C{sub_h}'] = f'▶ {cliente["nombre_negocio"]}'
-                    ws[f'C{sub_h}'].font = Font(bold=True, color=azul_oscuro)
-
-                for nombre, vals in productos:
-                    ws.append([
-                        vid, g['vendedor_nombre'],
-                        cliente['nombre_negocio'], cliente['nombre_contacto'],
-                        cliente['origen'], 'COMPRA',
-                        nombre, vals['cantidad'], round(vals['total'])
-                    ])
-                    row = ws.max_row
-                    for cell in ws[row]:
-                        cell.border = borde
-
-                # Total cliente compras
-                if productos:
-                    ws.append([
+                    ws.fila(['', '', f'▶ {cliente["nombre_negocio"]}'], estilos={3: 'cliente'})
+
+                    for nombre, vals in productos:
+                        ws.fila([
+                            vid, g['vendedor_nombre'],
+                            cliente['nombre_negocio'], cliente['nombre_contacto'],
+                            cliente['origen'], 'COMPRA',
+                            nombre, vals['cantidad'], round(vals['total'])
+                        ], estilo='compra')
+
+                    # Total cliente compras
+                    ws.fila([
                         '', '', cliente['nombre_negocio'], '', '', 'TOTAL COMPRAS', '',
                         sum(v['cantidad'] for _, v in productos),
                         round(cliente['total_ventas'])
-                    ])
-                    row = ws.max_row
-                    for cell in ws[row]:
-                        cell.font = Font(bold=True)
-                        cell.fill = fila_total
+                    ], estilo='total_compras')
 
                 # Filas de vencidas
                 if vencidas:
-                    ws.append([])
+                    ws.fila([])
                     for nombre, vals in vencidas:
-                        ws.append([
+                        ws.fila([
                             vid, g['vendedor_nombre'],
                             cliente['nombre_negocio'], cliente['nombre_contacto'],
                             cliente['origen'], 'VENCIDA',
                             nombre, vals['cantidad'], 0
-                        ])
-                        row = ws.max_row
-                        for cell in ws[row]:
-                            cell.border = borde
-                            cell.fill = PatternFill('solid', fgColor='FFF3CD')
+                        ], estilo='vencida')
 
-                    ws.append([
+                    ws.fila([
                         '', '', cliente['nombre_negocio'], '', '', 'TOTAL VENCIDAS', '',
                         sum(v['cantidad'] for _, v in vencidas), ''
-                    ])
-                    row = ws.max_row
-                    for cell in ws[row]:
-                        cell.font = Font(bold=True, color='856404')
-                        cell.fill = PatternFill('solid', fgColor='FFE69C')
-
-            autofit(ws)
-
-        # ── Retornar archivo ────────────────────────────────────────
-        buffer = io.BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-
-        nombre_archivo = f'historial_clientes_{fecha_inicio}_{fecha_fin}.xlsx'
-        response = HttpResponse(
-            buffer.getvalue(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
-        return response
+                    ], estilo='total_vencidas')
+
+        return libro.respuesta(f'historial_clientes_{fecha_inicio}_{fecha_fin}.xlsx')
 
     except Exception as e:
         import traceback
@@ -9908,10 +10349,12 @@ def exportar_cargue_excel(request):
     Una hoja por ID (productos + pagos + cumplimiento) + hoja Resumen.
     Params: fecha=YYYY-MM-DD  dia=LUNES|MARTES|...
     """
-    import io
+    from itertools import chain
     try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+        from openpyxl.styles import Font, Alignment
+        from api.services.exportacion_excel_service import (
+            LibroExcel, TAMANO_LOTE, BORDE_FINO, IZQUIERDA, DERECHA, estilo, relleno
+        )
     except ImportError:
         return Response({'error': 'openpyxl no instalado'}, status=500)
 
@@ -9932,28 +10375,37 @@ def exportar_cargue_excel(request):
     gris = 'F8F9FA'
 
     header_font = Font(bold=True, color='FFFFFF', size=10)
-    header_fill_azul = PatternFill('solid', fgColor=azul)
-    header_fill_verde = PatternFill('solid', fgColor=verde)
     center = Alignment(horizontal='center', vertical='center', wrap_text=True)
-    left = Alignment(horizontal='left', vertical='center')
-    borde = Border(
-        left=Side(style='thin'), right=Side(style='thin'),
-        top=Side(style='thin'), bottom=Side(style='thin')
-    )
-    fila_total = PatternFill('solid', fgColor=azul_claro)
-    fila_par = PatternFill('solid', fgColor=gris)
-
-    def autofit(ws, min_w=8, max_w=40):
-        for col in ws.columns:
-            width = min_w
-            col_letter = None
-            for cell in col:
-                if hasattr(cell, 'column_letter'):
-                    col_letter = cell.column_letter
-                    if cell.value:
-                        width = max(width, min(max_w, len(str(cell.value)) + 2))
-            if col_letter:
-                ws.column_dimensions[col_letter].width = width
+    seccion_font = Font(bold=True, color='FFFFFF', size=11)
+
+    # Estilos con nombre, precalculados una vez por libro
+    estilos = {
+        'titulo': estilo(font=Font(bold=True, size=13, color=azul), alignment=IZQUIERDA),
+        'titulo_fecha': estilo(font=Font(bold=True, size=11, color='555555'), alignment=center),
+        'titulo_resumen': estilo(font=Font(bold=True, size=14, color=azul), alignment=center),
+        'encabezado': estilo(font=header_font, fill=relleno(azul), alignment=center, border=BORDE_FINO),
+        'encabezado_verde': estilo(font=header_font, fill=relleno(verde), alignment=center, border=BORDE_FINO),
+        'seccion': estilo(font=seccion_font, fill=relleno(azul), alignment=center),
+        'subseccion': estilo(font=Font(bold=True, size=10), fill=relleno(azul_claro), alignment=center),
+        'dato': estilo(alignment=center, border=BORDE_FINO),
+        'dato_par': estilo(alignment=center, border=BORDE_FINO, fill=relleno(gris)),
+        'dato_izq': estilo(alignment=IZQUIERDA, border=BORDE_FINO),
+        'dato_par_izq': estilo(alignment=IZQUIERDA, border=BORDE_FINO, fill=relleno(gris)),
+        'dato_der': estilo(alignment=DERECHA, border=BORDE_FINO),
+        'borde': estilo(border=BORDE_FINO),
+        'total': estilo(font=Font(bold=True), fill=relleno(azul_claro), border=BORDE_FINO),
+        'total_izq': estilo(font=Font(bold=True), fill=relleno(azul_claro), border=BORDE_FINO, alignment=IZQUIERDA),
+        'total_pagos': estilo(font=Font(bold=True), fill=relleno('D4EDDA'), border=BORDE_FINO),
+        'cumple': estilo(font=Font(bold=True, color='1D6A3A'), fill=relleno('D4EDDA'), border=BORDE_FINO),
+        'no_cumple': estilo(font=Font(bold=True, color='721C24'), fill=relleno('F8D7DA'), border=BORDE_FINO),
+        'leyenda_c': estilo(font=Font(bold=True, color='1D6A3A', italic=True)),
+        'leyenda_nc': estilo(font=Font(bold=True, color='721C24', italic=True)),
+        'res_label': estilo(font=Font(bold=True), border=BORDE_FINO),
+        'res_valor': estilo(alignment=DERECHA, border=BORDE_FINO),
+    }
+    for color in ('EBF5FB', 'FFF0E8', 'E8F5E9'):
+        estilos[f'res_label_{color}'] = estilo(font=Font(bold=True), border=BORDE_FINO, fill=relleno(color))
+        estilos[f'res_valor_{color}'] = estilo(alignment=DERECHA, border=BORDE_FINO, fill=relleno(color))
 
     def formato_cop(val):
         try:
@@ -9971,8 +10423,7 @@ def exportar_cargue_excel(request):
     ]
 
     try:
-        wb = Workbook()
-        wb.remove(wb.active)
+        libro = LibroExcel(estilos)
 
         resumen_rows = []
 
@@ -9985,41 +10436,38 @@ def exportar_cargue_excel(request):
 
         for id_label, Modelo in MODELOS_ID:
             # Orden por id (igual que la web - orden de inserción)
-            registros = list(Modelo.objects.filter(fecha=fecha_obj, dia=dia, activo=True).order_by('id'))
-            if not registros:
+            registros = Modelo.objects.filter(fecha=fecha_obj, dia=dia, activo=True).order_by('id').iterator(chunk_size=TAMANO_LOTE)
+            primer = next(registros, None)
+            if primer is None:
                 continue
 
-            primer = registros[0]
             responsable = getattr(primer, 'responsable', id_label)
             ruta = getattr(primer, 'ruta', '')
 
-            ws = wb.create_sheet(id_label)
+            ws = libro.hoja(id_label, anchos=[4, 4, 30, 11, 9, 11, 14, 10, 18, 9, 11, 20])
 
             # ── FILA 1: TÍTULO ──────────────────────────────────────
-            ws.append([f'CARGUE {id_label} — {responsable}', '', '', '', '', '', '', '', '', '', '', f'{dia}  {fecha_str}'])
-            ws.merge_cells('A1:K1')
-            ws['A1'].font = Font(bold=True, size=13, color=azul)
-            ws['A1'].alignment = left
-            ws['L1'].font = Font(bold=True, size=11, color='555555')
-            ws['L1'].alignment = center
-            ws.row_dimensions[1].height = 22
+            ws.fila(
+                [f'CARGUE {id_label} — {responsable}', '', '', '', '', '', '', '', '', '', '', f'{dia}  {fecha_str}'],
+                estilos={1: 'titulo', 12: 'titulo_fecha'},
+                alto=22
+            )
+            ws.combinar('A1:K1')
 
-            ws.append([])  # fila 2 vacía
+            ws.fila([])  # fila 2 vacía
 
             # ── FILA 3: ENCABEZADOS TABLA PRODUCTOS ─────────────────
             PROD_COLS = ['V', 'D', 'PRODUCTOS', 'CANTIDAD', 'DCTOS.', 'ADICIONAL', 'DEVOLUCIONES', 'VENCIDAS', 'LOTES VENCIDOS', 'TOTAL', 'VALOR', 'NETO']
-            ws.append(PROD_COLS)
-            hdr_row = ws.max_row  # = 3
-            for cell in ws[hdr_row]:
-                cell.font = header_font
-                cell.fill = header_fill_azul
-                cell.alignment = center
-                cell.border = borde
+            ws.fila(PROD_COLS, estilo='encabezado')
 
             # ── FILAS 4..n+3: DATOS ──────────────────────────────────
-            data_start = ws.max_row + 1
-            for i, r in enumerate(registros):
-                rn = ws.max_row + 1
+            # Una sola pasada: filas, total despacho y lotes del día
+            data_start = ws.fila_actual + 1
+            total_despacho_calc = 0
+            n_productos = 0
+            lotes_dia = []
+            for i, r in enumerate(chain([primer], registros)):
+                rn = ws.fila_actual + 1
                 v_val = 'V' if getattr(r, 'v', False) else ''
                 d_val = 'D' if getattr(r, 'd', False) else ''
                 try:
@@ -10036,72 +10484,58 @@ def exportar_cargue_excel(request):
                 if precio == 0:
                     precio = precios_lookup.get(r.producto, 0)
 
-                ws.append([v_val, d_val, r.producto,
-                           r.cantidad, r.dctos, r.adicional, r.devoluciones, r.vencidas,
-                           lotes_str, None, precio, None])
                 # Formulas TOTAL y NETO
-                ws[f'J{rn}'] = f'=D{rn}-E{rn}+F{rn}-G{rn}-H{rn}'
-                ws[f'L{rn}'] = f'=J{rn}*K{rn}'
-
-                fill = fila_par if i % 2 == 1 else PatternFill()
-                for cell in ws[rn]:
-                    cell.border = borde
-                    cell.alignment = center
-                    if fill.fill_type:
-                        cell.fill = fill
-                ws[f'C{rn}'].alignment = left
+                par = '_par' if i % 2 == 1 else ''
+                ws.fila([v_val, d_val, r.producto,
+                         r.cantidad, r.dctos, r.adicional, r.devoluciones, r.vencidas,
+                         lotes_str, f'=D{rn}-E{rn}+F{rn}-G{rn}-H{rn}', precio, f'=J{rn}*K{rn}'],
+                        estilo=f'dato{par}', estilos={3: f'dato{par}_izq'})
+
+                total_despacho_calc += precio * (r.cantidad - r.dctos + r.adicional - r.devoluciones - r.vencidas)
+                n_productos += 1
+                try:
+                    lp = json.loads(r.lotes_produccion) if r.lotes_produccion else []
+                    if isinstance(lp, list):
+                        lotes_dia.extend(lp)
+                except Exception:
+                    pass
 
-            data_end = ws.max_row
+            data_end = ws.fila_actual
 
             # ── FILA TOTALES ─────────────────────────────────────────
-            ws.append(['', '', 'TOTALES',
-                       f'=SUM(D{data_start}:D{data_end})', '', '',
-                       f'=SUM(G{data_start}:G{data_end})',
-                       f'=SUM(H{data_start}:H{data_end})', '',
-                       f'=SUM(J{data_start}:J{data_end})', '',
-                       f'=SUM(L{data_start}:L{data_end})'])
-            tot_row = ws.max_row
-            for cell in ws[tot_row]:
-                cell.font = Font(bold=True)
-                cell.fill = fila_total
-                cell.border = borde
-            ws[f'C{tot_row}'].alignment = left
-
-            ws.append([])  # blank
+            ws.fila(['', '', 'TOTALES',
+                     f'=SUM(D{data_start}:D{data_end})', '', '',
+                     f'=SUM(G{data_start}:G{data_end})',
+                     f'=SUM(H{data_start}:H{data_end})', '',
+                     f'=SUM(J{data_start}:J{data_end})', '',
+                     f'=SUM(L{data_start}:L{data_end})'],
+                    estilo='total', estilos={3: 'total_izq'})
+
+            ws.fila([])  # blank
 
             # ── PAGOS ────────────────────────────────────────────────
-            pagos = list(CarguePagos.objects.filter(vendedor_id=id_label, fecha=fecha_obj, dia=dia, activo=True))
-
-            ws.append(['CONCEPTO', 'DESCUENTOS', 'NEQUI', 'DAVIPLATA'])
-            pago_hdr_r = ws.max_row
-            for cell in ws[pago_hdr_r]:
-                cell.font = header_font
-                cell.fill = header_fill_verde
-                cell.alignment = center
-                cell.border = borde
-
-            pago_data_start = ws.max_row + 1
-            for p in pagos:
-                ws.append([p.concepto, float(p.descuentos or 0), float(p.nequi or 0), float(p.daviplata or 0)])
-                rp = ws.max_row
-                for cell in ws[rp]:
-                    cell.border = borde
-                    cell.alignment = Alignment(horizontal='right')
-                ws[f'A{rp}'].alignment = left
-            pago_data_end = ws.max_row
+            pagos = CarguePagos.objects.filter(
+                vendedor_id=id_label, fecha=fecha_obj, dia=dia, activo=True
+            ).values_list('concepto', 'descuentos', 'nequi', 'daviplata')
+
+            ws.fila(['CONCEPTO', 'DESCUENTOS', 'NEQUI', 'DAVIPLATA'], estilo='encabezado_verde')
+
+            pago_data_start = ws.fila_actual + 1
+            total_nequi_calc = total_daviplata_calc = 0
+            for concepto, descuentos, nequi, daviplata in pagos.iterator(chunk_size=TAMANO_LOTE):
+                ws.fila([concepto, float(descuentos or 0), float(nequi or 0), float(daviplata or 0)],
+                        estilo='dato_der', estilos={1: 'dato_izq'})
+                total_nequi_calc += float(nequi or 0)
+                total_daviplata_calc += float(daviplata or 0)
+            pago_data_end = ws.fila_actual
 
             # Fila TOTAL pagos con fórmulas
-            if pagos:
-                ws.append(['TOTAL', '', f'=SUM(C{pago_data_start}:C{pago_data_end})', f'=SUM(D{pago_data_start}:D{pago_data_end})'])
+            if pago_data_end >= pago_data_start:
+                pago_tot_row = ws.fila(['TOTAL', '', f'=SUM(C{pago_data_start}:C{pago_data_end})', f'=SUM(D{pago_data_start}:D{pago_data_end})'], estilo='total_pagos')
             else:
-                ws.append(['TOTAL', '', 0, 0])
-            pago_tot_row = ws.max_row
-            for cell in ws[pago_tot_row]:
-                cell.font = Font(bold=True)
-                cell.fill = PatternFill('solid', fgColor='D4EDDA')
-                cell.border = borde
+                pago_tot_row = ws.fila(['TOTAL', '', 0, 0], estilo='total_pagos')
 
-            ws.append([])  # blank
+            ws.fila([])  # blank
 
             # ── RESUMEN FINANCIERO ───────────────────────────────────
             try:
@@ -10114,24 +10548,12 @@ def exportar_cargue_excel(request):
             total_dctos_val = float(resumen_obj.total_dctos or 0) if resumen_obj else 0
 
             # Header resumen
-            ws.append(['RESUMEN FINANCIERO', ''])
-            res_hdr_r = ws.max_row
-            ws.merge_cells(f'A{res_hdr_r}:B{res_hdr_r}')
-            ws[f'A{res_hdr_r}'].font = Font(bold=True, color='FFFFFF', size=11)
-            ws[f'A{res_hdr_r}'].fill = header_fill_azul
-            ws[f'A{res_hdr_r}'].alignment = center
+            res_hdr_r = ws.fila(['RESUMEN FINANCIERO', ''], estilos={1: 'seccion'})
+            ws.combinar(f'A{res_hdr_r}:B{res_hdr_r}')
 
             def _res_row(ws, label, value, hl=None):
-                ws.append([label, value])
-                r = ws.max_row
-                ws[f'A{r}'].font = Font(bold=True)
-                ws[f'B{r}'].alignment = Alignment(horizontal='right')
-                for col in ('A', 'B'):
-                    ws[f'{col}{r}'].border = borde
-                if hl:
-                    for col in ('A', 'B'):
-                        ws[f'{col}{r}'].fill = PatternFill('solid', fgColor=hl)
-                return r
+                sufijo = f'_{hl}' if hl else ''
+                return ws.fila([label, value], estilos={1: f'res_label{sufijo}', 2: f'res_valor{sufijo}'})
 
             _res_row(ws, 'BASE CAJA', base_caja_val)
             td_r = _res_row(ws, 'TOTAL DESPACHO:', f'=SUM(L{data_start}:L{data_end})', hl='EBF5FB')
@@ -10142,191 +10564,94 @@ def exportar_cargue_excel(request):
             _res_row(ws, 'VENCIDAS FVTO:', f'=SUMPRODUCT(H{data_start}:H{data_end},K{data_start}:K{data_end})')
 
             # Calcular para hoja Resumen general
-            total_nequi_calc = sum(float(p.nequi or 0) for p in pagos)
-            total_daviplata_calc = sum(float(p.daviplata or 0) for p in pagos)
-            total_despacho_calc = sum(
-                (float(r.valor or 0) if float(r.valor or 0) > 0 else precios_lookup.get(r.producto, 0))
-                * (r.cantidad - r.dctos + r.adicional - r.devoluciones - r.vencidas)
-                for r in registros
-            )
             venta_calc = total_despacho_calc + total_pedidos_val - total_dctos_val
             efectivo_calc = venta_calc - total_nequi_calc - total_daviplata_calc
 
-            ws.append([])  # blank
+            ws.fila([])  # blank
 
             # ── CONTROL DE CUMPLIMIENTO ──────────────────────────────
             try:
                 cumpl = CargueCumplimiento.objects.get(vendedor_id=id_label, fecha=fecha_obj, dia=dia, activo=True)
 
-                ws.append(['CONTROL DE CUMPLIMIENTO', ''])
-                cc_hdr = ws.max_row
-                ws.merge_cells(f'A{cc_hdr}:B{cc_hdr}')
-                ws[f'A{cc_hdr}'].font = Font(bold=True, color='FFFFFF', size=11)
-                ws[f'A{cc_hdr}'].fill = header_fill_azul
-                ws[f'A{cc_hdr}'].alignment = center
-
-                # MANIPULADOR
-                ws.append(['MANIPULADOR', ''])
-                m_hdr = ws.max_row
-                ws.merge_cells(f'A{m_hdr}:B{m_hdr}')
-                ws[f'A{m_hdr}'].font = Font(bold=True, size=10)
-                ws[f'A{m_hdr}'].fill = PatternFill('solid', fgColor='D6E4F0')
-                ws[f'A{m_hdr}'].alignment = center
-
-                for campo, val in [
-                    ('Licencia de transporte', cumpl.licencia_transporte),
-                    ('SOAT', cumpl.soat),
-                    ('Uniforme', cumpl.uniforme),
-                    ('No loción', cumpl.no_locion),
-                    ('No accesorios', cumpl.no_accesorios),
-                    ('Capacitación/Carnet', cumpl.capacitacion_carnet),
-                ]:
-                    ws.append([campo, val or '-'])
-                    rc = ws.max_row
-                    ws[f'A{rc}'].border = borde
-                    ws[f'B{rc}'].border = borde
-                    if val == 'C':
-                        ws[f'B{rc}'].fill = PatternFill('solid', fgColor='D4EDDA')
-                        ws[f'B{rc}'].font = Font(bold=True, color='1D6A3A')
-                    elif val == 'NC':
-                        ws[f'B{rc}'].fill = PatternFill('solid', fgColor='F8D7DA')
-                        ws[f'B{rc}'].font = Font(bold=True, color='721C24')
-
-                # FURGÓN
-                ws.append(['FURGÓN', ''])
-                f_hdr = ws.max_row
-                ws.merge_cells(f'A{f_hdr}:B{f_hdr}')
-                ws[f'A{f_hdr}'].font = Font(bold=True, size=10)
-                ws[f'A{f_hdr}'].fill = PatternFill('solid', fgColor='D6E4F0')
-                ws[f'A{f_hdr}'].alignment = center
-
-                for campo, val in [
-                    ('Higiene', cumpl.higiene),
-                    ('Estibas', cumpl.estibas),
-                    ('Desinfección', cumpl.desinfeccion),
-                ]:
-                    ws.append([campo, val or '-'])
-                    rc = ws.max_row
-                    ws[f'A{rc}'].border = borde
-                    ws[f'B{rc}'].border = borde
-                    if val == 'C':
-                        ws[f'B{rc}'].fill = PatternFill('solid', fgColor='D4EDDA')
-                        ws[f'B{rc}'].font = Font(bold=True, color='1D6A3A')
-                    elif val == 'NC':
-                        ws[f'B{rc}'].fill = PatternFill('solid', fgColor='F8D7DA')
-                        ws[f'B{rc}'].font = Font(bold=True, color='721C24')
+                cc_hdr = ws.fila(['CONTROL DE CUMPLIMIENTO', ''], estilos={1: 'seccion'})
+                ws.combinar(f'A{cc_hdr}:B{cc_hdr}')
+
+                estilo_cumplimiento = {'C': 'cumple', 'NC': 'no_cumple'}
+                grupos = [
+                    ('MANIPULADOR', [
+                        ('Licencia de transporte', cumpl.licencia_transporte),
+                        ('SOAT', cumpl.soat),
+                        ('Uniforme', cumpl.uniforme),
+                        ('No loción', cumpl.no_locion),
+                        ('No accesorios', cumpl.no_accesorios),
+                        ('Capacitación/Carnet', cumpl.capacitacion_carnet),
+                    ]),
+                    ('FURGÓN', [
+                        ('Higiene', cumpl.higiene),
+                        ('Estibas', cumpl.estibas),
+                        ('Desinfección', cumpl.desinfeccion),
+                    ]),
+                ]
+                for titulo_grupo, campos in grupos:
+                    g_hdr = ws.fila([titulo_grupo, ''], estilos={1: 'subseccion'})
+                    ws.combinar(f'A{g_hdr}:B{g_hdr}')
+                    for campo, val in campos:
+                        ws.fila([campo, val or '-'], estilo='borde', estilos={2: estilo_cumplimiento.get(val, 'borde')})
 
                 # Leyenda
-                ws.append(['CUMPLE: C', 'NO CUMPLE: NC'])
-                ley_r = ws.max_row
-                ws[f'A{ley_r}'].font = Font(bold=True, color='1D6A3A', italic=True)
-                ws[f'B{ley_r}'].font = Font(bold=True, color='721C24', italic=True)
+                ws.fila(['CUMPLE: C', 'NO CUMPLE: NC'], estilos={1: 'leyenda_c', 2: 'leyenda_nc'})
 
             except CargueCumplimiento.DoesNotExist:
                 pass
 
-            ws.append([])  # blank
+            ws.fila([])  # blank
 
             # ── REGISTRO DE LOTES ────────────────────────────────────
-            lotes_dia = []
-            for r in registros:
-                try:
-                    lp = json.loads(r.lotes_produccion) if r.lotes_produccion else []
-                    if isinstance(lp, list):
-                        lotes_dia.extend(lp)
-                except Exception:
-                    pass
-
             if lotes_dia:
-                ws.append(['REGISTRO DE LOTES', ''])
-                rl_hdr = ws.max_row
-                ws.merge_cells(f'A{rl_hdr}:B{rl_hdr}')
-                ws[f'A{rl_hdr}'].font = Font(bold=True, color='FFFFFF', size=11)
-                ws[f'A{rl_hdr}'].fill = header_fill_azul
-                ws[f'A{rl_hdr}'].alignment = center
-
-                ws.append(['LOTE', 'INFO'])
-                for cell in ws[ws.max_row]:
-                    cell.font = header_font
-                    cell.fill = header_fill_azul
-                    cell.alignment = center
-                    cell.border = borde
+                rl_hdr = ws.fila(['REGISTRO DE LOTES', ''], estilos={1: 'seccion'})
+                ws.combinar(f'A{rl_hdr}:B{rl_hdr}')
+
+                ws.fila(['LOTE', 'INFO'], estilo='encabezado')
 
                 for lote in lotes_dia:
                     if isinstance(lote, dict):
-                        ws.append([lote.get('lote', ''), lote.get('info', '') or lote.get('fecha', '')])
+                        ws.fila([lote.get('lote', ''), lote.get('info', '') or lote.get('fecha', '')], estilo='borde')
                     else:
-                        ws.append([str(lote), ''])
-                    for cell in ws[ws.max_row]:
-                        cell.border = borde
-
-            autofit(ws)
-            ws.column_dimensions['A'].width = 4   # V
-            ws.column_dimensions['B'].width = 4   # D
-            ws.column_dimensions['C'].width = 30  # PRODUCTOS
-            ws.column_dimensions['I'].width = 18  # LOTES VENCIDOS
+                        ws.fila([str(lote), ''], estilo='borde')
 
             resumen_rows.append({
                 'id': id_label,
                 'responsable': responsable,
                 'ruta': ruta,
-                'productos': len(registros),
+                'productos': n_productos,
                 'venta': venta_calc,
                 'total_efectivo': efectivo_calc,
             })
 
-        # Hoja Resumen (primera)
+        # Hoja Resumen (se arma al final, va de primera)
         if resumen_rows:
-            ws_res = wb.create_sheet('Resumen', 0)
-            ws_res.append([f'RESUMEN CARGUE — {dia}  {fecha_str}', '', '', '', '', ''])
-            ws_res.merge_cells('A1:F1')
-            ws_res['A1'].font = Font(bold=True, size=14, color=azul)
-            ws_res['A1'].alignment = center
-            ws_res.row_dimensions[1].height = 24
-            ws_res.append([])
-
-            ws_res.append(['ID', 'Responsable', 'Ruta', 'Productos', 'Venta', 'Efectivo'])
-            for cell in ws_res[3]:
-                cell.font = header_font
-                cell.fill = header_fill_azul
-                cell.alignment = center
-                cell.border = borde
+            ws_res = libro.hoja('Resumen', anchos=[8, 26, 18, 11, 16, 16], indice=0)
+            ws_res.fila([f'RESUMEN CARGUE — {dia}  {fecha_str}', '', '', '', '', ''], estilos={1: 'titulo_resumen'}, alto=24)
+            ws_res.combinar('A1:F1')
+            ws_res.fila([])
+
+            ws_res.fila(['ID', 'Responsable', 'Ruta', 'Productos', 'Venta', 'Efectivo'], estilo='encabezado')
 
             total_venta = total_efectivo = 0.0
             for i, row in enumerate(resumen_rows):
-                ws_res.append([row['id'], row['responsable'], row['ruta'], row['productos'], formato_cop(row['venta']), formato_cop(row['total_efectivo'])])
-                data_row = ws_res.max_row
-                fill = fila_par if i % 2 == 1 else PatternFill()
-                for cell in ws_res[data_row]:
-                    cell.border = borde
-                    cell.alignment = left
-                    if fill.fill_type:
-                        cell.fill = fill
+                ws_res.fila(
+                    [row['id'], row['responsable'], row['ruta'], row['productos'], formato_cop(row['venta']), formato_cop(row['total_efectivo'])],
+                    estilo='dato_par_izq' if i % 2 == 1 else 'dato_izq'
+                )
                 total_venta += float(row['venta'] or 0)
                 total_efectivo += float(row['total_efectivo'] or 0)
 
-            ws_res.append(['TOTAL', '', '', '', formato_cop(total_venta), formato_cop(total_efectivo)])
-            for cell in ws_res[ws_res.max_row]:
-                cell.font = Font(bold=True)
-                cell.fill = fila_total
-                cell.border = borde
+            ws_res.fila(['TOTAL', '', '', '', formato_cop(total_venta), formato_cop(total_efectivo)], estilo='total')
 
-            autofit(ws_res)
-
-        if not wb.sheetnames:
+        if libro.vacio:
             return Response({'error': f'No hay datos de cargue para {dia} {fecha_str}'}, status=404)
 
-        buffer = io.BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-
-        nombre_archivo = f'cargue_{dia}_{fecha_str}.xlsx'
-        response_xl = HttpResponse(
-            buffer.getvalue(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response_xl['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
-        return response_xl
+        return libro.respuesta(f'cargue_{dia}_{fecha_str}.xlsx')
 
     except Exception as e:
         import traceback
@@ -10343,284 +10668,111 @@ def exportar_planeacion_mensual_excel(request):
     Una pestaña por día (lunes-sábado). Si existe snapshot guardado muestra datos,
     si no existe muestra la pestaña como Pendiente.
     GET /api/reportes/planeacion-mensual-excel/?mes=2026-04
+    Para no ocupar el worker: POST /api/exportaciones/ (en segundo plano).
     """
+    from api.services.reportes_excel_service import libro_planeacion_mensual, parsear_mes
+
     try:
         mes_param = request.GET.get('mes')
         if not mes_param:
             return Response({'error': 'Parámetro mes requerido (formato: YYYY-MM)'}, status=400)
 
         try:
-            partes = mes_param.split('-')
-            anio, mes = int(partes[0]), int(partes[1])
-        except Exception:
-            return Response({'error': 'Formato de mes inválido. Use YYYY-MM'}, status=400)
-
-        import calendar
-        from datetime import date, timedelta
-
-        primer_dia = date(anio, mes, 1)
-        ultimo_dia = date(anio, mes, calendar.monthrange(anio, mes)[1])
-        hoy = date.today()
-
-        # Todos los días del mes excepto domingos (weekday==6)
-        dias_mes = []
-        d = primer_dia
-        while d <= ultimo_dia:
-            if d.weekday() != 6:
-                dias_mes.append(d)
-            d += timedelta(days=1)
-
-        # Cargar snapshots del mes (uno por fecha, el más reciente)
-        snapshots = ReportePlaneacion.objects.filter(
-            fecha_reporte__year=anio,
-            fecha_reporte__month=mes
-        ).order_by('fecha_reporte', '-fecha_creacion')
-
-        snapshot_map = {}
-        for snap in snapshots:
-            fecha_key = snap.fecha_reporte.strftime('%Y-%m-%d')
-            if fecha_key not in snapshot_map:
-                snapshot_map[fecha_key] = snap
-
-        # Cargar registros directos de Planeacion para fechas sin snapshot
-        planeacion_directa = Planeacion.objects.filter(
-            fecha__year=anio,
-            fecha__month=mes
-        ).order_by('fecha', 'producto_nombre')
-
-        planeacion_directa_map = {}
-        for reg in planeacion_directa:
-            fecha_key = reg.fecha.strftime('%Y-%m-%d')
-            if fecha_key not in planeacion_directa_map:
-                planeacion_directa_map[fecha_key] = []
-            planeacion_directa_map[fecha_key].append({
-                'nombre':      reg.producto_nombre,
-                'existencias': reg.existencias,
-                'solicitado':  reg.solicitadas,
-                'pedidos':     reg.pedidos,
-                'orden':       reg.orden,
-                'ia':          reg.ia,
-            })
+            parsear_mes(mes_param)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
 
-        nombres_dia = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado']
+        libro, nombre_archivo = libro_planeacion_mensual(mes_param)
+        return libro.respuesta(nombre_archivo)
 
-        import io
-        import openpyxl
-        from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return Response({'error': str(e)}, status=500)
 
-        COLOR_HEADER   = '1F4E79'
-        COLOR_FILA_PAR = 'EBF3FB'
-        COLOR_TOTAL    = 'BDD7EE'
-        COLOR_OK       = 'E2EFDA'
-        COLOR_SIN      = 'FCE4D6'
-        COLOR_FUTURO   = 'FFF2CC'
 
-        borde = Border(
-            left=Side(style='thin'), right=Side(style='thin'),
-            top=Side(style='thin'), bottom=Side(style='thin')
-        )
+# ==================== EXPORTACIONES EN SEGUNDO PLANO ====================
 
-        def set_header_row(ws, fila, etiquetas, color=COLOR_HEADER):
-            for ci, label in enumerate(etiquetas, 1):
-                c = ws.cell(fila, ci, label)
-                c.font = Font(bold=True, color='FFFFFF', size=10)
-                c.fill = PatternFill('solid', fgColor=color)
-                c.alignment = Alignment(horizontal='center', vertical='center')
-                c.border = borde
-
-        def set_borde_fila(ws, fila, n_cols):
-            for ci in range(1, n_cols + 1):
-                ws.cell(fila, ci).border = borde
-
-        COLS = ['PRODUCTO', 'EXISTENCIAS', 'SOLICITADAS', 'PEDIDOS', 'A PRODUCIR', 'IA SUGERIDA']
-        N = len(COLS)
-        LAST_COL = chr(64 + N)  # 'F'
-
-        wb = openpyxl.Workbook()
-
-        # ── Hoja RESUMEN ──
-        ws_res = wb.active
-        ws_res.title = 'Resumen'
-
-        ws_res.merge_cells('A1:D1')
-        c = ws_res['A1']
-        c.value = f'RESUMEN PLANEACIÓN — {mes_param}'
-        c.font = Font(bold=True, color='FFFFFF', size=13)
-        c.fill = PatternFill('solid', fgColor=COLOR_HEADER)
-        c.alignment = Alignment(horizontal='center', vertical='center')
-        ws_res.row_dimensions[1].height = 22
-
-        set_header_row(ws_res, 2, ['FECHA', 'DÍA', 'ESTADO', 'PRODUCTOS'])
-        ws_res.row_dimensions[2].height = 18
-
-        total_guardados = 0
-        total_pendientes = 0
-
-        for idx, dia_fecha in enumerate(dias_mes):
-            fecha_key    = dia_fecha.strftime('%Y-%m-%d')
-            fecha_display = dia_fecha.strftime('%d/%m/%Y')
-            nombre_dia   = nombres_dia[dia_fecha.weekday()]
-            snap         = snapshot_map.get(fecha_key)
-            directa      = planeacion_directa_map.get(fecha_key, [])
-            es_futura    = dia_fecha > hoy
-            fila_res     = idx + 3
-
-            if snap:
-                datos      = snap.datos_json if isinstance(snap.datos_json, list) else []
-                estado     = 'Snapshot'
-                n_prod     = len(datos)
-                fill_est   = PatternFill('solid', fgColor=COLOR_OK)
-                font_est   = Font(color='375623', bold=True, size=10)
-                total_guardados += 1
-            elif directa:
-                estado   = 'BD Directa'
-                n_prod   = len(directa)
-                fill_est = PatternFill('solid', fgColor='DDEBF7')
-                font_est = Font(color='1F4E79', bold=True, size=10)
-                total_guardados += 1
-            elif es_futura:
-                estado   = 'Futuro'
-                n_prod   = 0
-                fill_est = PatternFill('solid', fgColor=COLOR_FUTURO)
-                font_est = Font(color='7F6000', bold=True, size=10)
-                total_pendientes += 1
-            else:
-                estado   = 'Sin Datos'
-                n_prod   = 0
-                fill_est = PatternFill('solid', fgColor=COLOR_SIN)
-                font_est = Font(color='C00000', bold=True, size=10)
-                total_pendientes += 1
-
-            ws_res.append([fecha_display, nombre_dia, estado, n_prod if n_prod > 0 else '-'])
-            ws_res.cell(fila_res, 3).fill  = fill_est
-            ws_res.cell(fila_res, 3).font  = font_est
-            ws_res.cell(fila_res, 3).alignment = Alignment(horizontal='center')
-            ws_res.cell(fila_res, 4).alignment = Alignment(horizontal='center')
-            set_borde_fila(ws_res, fila_res, 4)
-            if idx % 2 == 0:
-                for col in [1, 2, 4]:
-                    ws_res.cell(fila_res, col).fill = PatternFill('solid', fgColor=COLOR_FILA_PAR)
-
-        fila_tot_res = len(dias_mes) + 3
-        ws_res.append(['TOTAL', f'{len(dias_mes)} días hábiles', f'Guardados: {total_guardados}', f'Pendientes: {total_pendientes}'])
-        for ci in range(1, 5):
-            c = ws_res.cell(fila_tot_res, ci)
-            c.font = Font(bold=True, size=10)
-            c.fill = PatternFill('solid', fgColor=COLOR_TOTAL)
-            c.border = borde
-            c.alignment = Alignment(horizontal='center')
-
-        ws_res.column_dimensions['A'].width = 14
-        ws_res.column_dimensions['B'].width = 14
-        ws_res.column_dimensions['C'].width = 16
-        ws_res.column_dimensions['D'].width = 14
-
-        # ── Una hoja por día ──
-        for dia_fecha in dias_mes:
-            fecha_key    = dia_fecha.strftime('%Y-%m-%d')
-            fecha_display = dia_fecha.strftime('%d/%m/%Y')
-            nombre_dia   = nombres_dia[dia_fecha.weekday()]
-            tab_name     = dia_fecha.strftime('%d-%m')
-            snap     = snapshot_map.get(fecha_key)
-            directa  = planeacion_directa_map.get(fecha_key, [])
-            es_futura = dia_fecha > hoy
-
-            # Determinar fuente de datos: snapshot > BD directa > sin datos
-            if snap:
-                datos_hoja   = snap.datos_json if isinstance(snap.datos_json, list) else []
-                fuente_label = f'Snapshot guardado: {snap.fecha_creacion.strftime("%d/%m/%Y %H:%M")}  |  {len(datos_hoja)} productos'
-                fuente_color = COLOR_OK
-                fuente_font  = Font(italic=True, color='375623', size=9)
-            elif directa:
-                datos_hoja   = directa
-                fuente_label = f'Datos de BD  |  {len(directa)} productos'
-                fuente_color = 'DDEBF7'
-                fuente_font  = Font(italic=True, color='1F4E79', size=9)
-            else:
-                datos_hoja   = None
+@api_view(['POST'])
+def crear_exportacion(request):
+    """
+    Encola una exportación Excel y responde de inmediato con su trabajo_id.
+    Parámetros idénticos reutilizan el trabajo en curso o el archivo vigente.
 
-            ws = wb.create_sheet(title=tab_name)
+    POST /api/exportaciones/
+    Body: {
+        "tipo": "PLANEACION_MENSUAL",   // o "VENTAS_POS"
+        "parametros": {"mes": "2026-04"},  // VENTAS_POS: fecha_inicio, fecha_fin
+        "forzar": false                 // opcional: no reutilizar un archivo ya generado
+    }
+    """
+    from api.services import exportaciones_service
 
-            # Título
-            ws.merge_cells(f'A1:{LAST_COL}1')
-            t = ws['A1']
-            t.value = f'PLANEACIÓN {nombre_dia.upper()} {fecha_display}'
-            t.font = Font(bold=True, color='FFFFFF', size=12)
-            t.fill = PatternFill('solid', fgColor=COLOR_HEADER)
-            t.alignment = Alignment(horizontal='center', vertical='center')
-            ws.row_dimensions[1].height = 22
-
-            if datos_hoja is not None:
-                ws.merge_cells(f'A2:{LAST_COL}2')
-                s = ws['A2']
-                s.value = fuente_label
-                s.font  = fuente_font
-                s.fill  = PatternFill('solid', fgColor=fuente_color)
-                s.alignment = Alignment(horizontal='center')
-
-                set_header_row(ws, 3, COLS)
-                ws.row_dimensions[3].height = 16
-
-                total_producir = 0
-                for ri, prod in enumerate(datos_hoja, 4):
-                    nombre      = prod.get('nombre', '')
-                    existencias = int(prod.get('existencias', 0) or 0)
-                    solicitado  = int(prod.get('solicitado', 0) or prod.get('solicitadas', 0) or 0)
-                    pedidos     = int(prod.get('pedidos', 0) or 0)
-                    orden       = int(prod.get('orden', 0) or 0)
-                    ia          = int(prod.get('ia', 0) or 0)
-
-                    ws.append([nombre, existencias, solicitado, pedidos, orden, ia])
-                    total_producir += orden
-
-                    fill_fila = PatternFill('solid', fgColor=COLOR_FILA_PAR) if ri % 2 == 0 else PatternFill()
-                    for ci in range(1, N + 1):
-                        c = ws.cell(ri, ci)
-                        c.border = borde
-                        c.alignment = Alignment(horizontal='left' if ci == 1 else 'center')
-                        if ci > 1:
-                            c.fill = fill_fila
-
-                fila_tot_d = len(datos_hoja) + 4
-                ws.cell(fila_tot_d, 1, 'TOTAL')
-                ws.cell(fila_tot_d, 5, total_producir)
-                for ci in range(1, N + 1):
-                    c = ws.cell(fila_tot_d, ci)
-                    c.font = Font(bold=True, size=10)
-                    c.fill = PatternFill('solid', fgColor=COLOR_TOTAL)
-                    c.border = borde
-                    c.alignment = Alignment(horizontal='left' if ci == 1 else 'center')
+    tipo = request.data.get('tipo')
+    parametros = request.data.get('parametros') or {}
+    if not isinstance(parametros, dict):
+        return Response({'error': 'parametros debe ser un objeto'}, status=status.HTTP_400_BAD_REQUEST)
+    forzar = str(request.data.get('forzar', '')).lower() in ('1', 'true', 'si', 'sí')
 
-            else:
-                ws.merge_cells(f'A2:{LAST_COL}2')
-                s = ws['A2']
-                s.value = 'FECHA FUTURA — AÚN NO PLANEADA' if es_futura else 'SIN DATOS DE PLANEACIÓN PARA ESTA FECHA'
-                s.font = Font(bold=True, color='FFFFFF', size=11)
-                s.fill = PatternFill('solid', fgColor='BF8F00' if es_futura else 'C00000')
-                s.alignment = Alignment(horizontal='center', vertical='center')
-                ws.row_dimensions[2].height = 20
-
-            # Anchos de columna
-            ws.column_dimensions['A'].width = 32
-            for ci in range(2, N + 1):
-                ws.column_dimensions[chr(64 + ci)].width = 14
-
-        # Resumen siempre al inicio
-        wb.move_sheet('Resumen', offset=-len(wb.sheetnames))
-
-        buffer = io.BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-
-        nombre_archivo = f'planeacion_{mes_param}.xlsx'
-        response_xl = HttpResponse(
-            buffer.getvalue(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response_xl['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
-        return response_xl
+    try:
+        trabajo, creado = exportaciones_service.encolar(tipo, parametros, forzar=forzar)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        return Response({'error': str(e)}, status=500)
+    datos = exportaciones_service.serializar(trabajo)
+    datos['reutilizado'] = not creado
+    if trabajo.estado == 'COMPLETADO':
+        return Response(datos)
+    return Response(datos, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+def exportacion_estado(request, trabajo_id):
+    """
+    Estado y progreso (0-100) de una exportación encolada.
+
+    GET /api/exportaciones/<id>/
+    """
+    from api.services import exportaciones_service
+    from .models import TrabajoExportacion
+
+    try:
+        trabajo = TrabajoExportacion.objects.get(pk=trabajo_id)
+    except TrabajoExportacion.DoesNotExist:
+        return Response({'error': 'Exportación no encontrada'}, status=status.HTTP_404_NOT_FOUND)
+
+    if trabajo.estado == 'PENDIENTE':
+        # Por si el proceso que la encoló se reinició antes de despacharla
+        exportaciones_service.despachar()
+
+    return Response(exportaciones_service.serializar(trabajo))
+
+
+@api_view(['GET'])
+def exportacion_descargar(request, trabajo_id):
+    """
+    Descarga el archivo de una exportación COMPLETADA (vía nginx
+    X-Accel-Redirect en producción).
+
+    GET /api/exportaciones/<id>/descargar/
+    """
+    import os
+    from django.utils import timezone
+    from api.services import exportaciones_service
+    from .models import TrabajoExportacion
+
+    try:
+        trabajo = TrabajoExportacion.objects.get(pk=trabajo_id)
+    except TrabajoExportacion.DoesNotExist:
+        return Response({'error': 'Exportación no encontrada'}, status=status.HTTP_404_NOT_FOUND)
+
+    if trabajo.estado == 'EXPIRADO' or (
+        trabajo.estado == 'COMPLETADO' and trabajo.expira_en and trabajo.expira_en <= timezone.now()
+    ):
+        return Response({'error': 'La exportación expiró, vuelva a solicitarla'}, status=status.HTTP_410_GONE)
+    if trabajo.estado != 'COMPLETADO':
+        return Response(exportaciones_service.serializar(trabajo), status=status.HTTP_409_CONFLICT)
+    if not os.path.exists(exportaciones_service.ruta_archivo(trabajo)):
+        return Response({'error': 'El archivo de la exportación ya no existe'}, status=status.HTTP_410_GONE)
+
+    return exportaciones_service.respuesta_descarga(trabajo)
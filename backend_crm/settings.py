@@ -152,6 +152,10 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'  # 👈 AGREGADO: Requerido para collects
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# 📤 Exportaciones en segundo plano (media/exports/): detrás de nginx la
+# descarga se delega con X-Accel-Redirect (ver nginx/nginx.conf)
+EXPORTACIONES_X_ACCEL = os.environ.get('EXPORTACIONES_X_ACCEL', 'False') == 'True'
+
 
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
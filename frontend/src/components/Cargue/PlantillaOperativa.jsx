@@ -1926,9 +1926,8 @@ const PlantillaOperativa = ({
             }
         };
 
-        // Intervalo de polling
-        // ⚡ POLLING INTELIGENTE: Check ultrarrápido (4s) para detectar cambios sin saturar
-        const pollingInterval = setInterval(async () => {
+        // ⚡ Check de novedades: compara last_update remoto vs local y recarga si hay cambios
+        const verificarCambiosRemotos = async () => {
             if (mostrarModalVendidas) {
                 // 🛡️ Pausar polling si el modal de auditoría está abierto
                 return;
@@ -1992,13 +1991,53 @@ const PlantillaOperativa = ({
                     console.warn("⚠️ Polling smart check failed:", e);
                 }
             }
-        }, 3000); // Check cada 3 segundos (balance entre velocidad y estabilidad)
+        };
+
+        // 📡 El servidor avisa por SSE cuando cambia el cargue de este ID/fecha (LISTEN/NOTIFY);
+        // solo entonces se consulta. El intervalo queda como respaldo por si se pierde la conexión
+        // o el aviso llegó mientras se editaba.
+        let fechaStream;
+        if (fechaSeleccionada instanceof Date) {
+            const year = fechaSeleccionada.getFullYear();
+            const month = String(fechaSeleccionada.getMonth() + 1).padStart(2, '0');
+            const day = String(fechaSeleccionada.getDate()).padStart(2, '0');
+            fechaStream = `${year}-${month}-${day}`;
+        } else {
+            fechaStream = fechaSeleccionada || new Date().toISOString().split('T')[0];
+        }
+
+        let streamCambios = null;
+        let reaperturaStream = null;
+        const abrirStreamCambios = () => {
+            streamCambios = new EventSource(`${API_URL}/cambios/stream/?vendedor_id=${idSheet}&fecha=${fechaStream}`);
+            streamCambios.addEventListener('cargue', verificarCambiosRemotos);
+            streamCambios.onerror = () => {
+                // Una respuesta no-200 (p. ej. 502 de nginx en un despliegue) cierra el EventSource
+                // sin reintentar: reabrir más tarde; mientras tanto queda el intervalo de respaldo
+                if (streamCambios.readyState === EventSource.CLOSED && !reaperturaStream) {
+                    reaperturaStream = setTimeout(() => {
+                        reaperturaStream = null;
+                        abrirStreamCambios();
+                    }, 15000);
+                }
+            };
+        };
+        if (typeof EventSource !== 'undefined') {
+            abrirStreamCambios();
+        }
+
+        const pollingInterval = setInterval(verificarCambiosRemotos, streamCambios ? 30000 : 3000);
 
         // Listener para cambios de visibilidad
         document.addEventListener('visibilitychange', handleVisibilityChange);
 
         return () => {
             clearInterval(pollingInterval);
+            if (reaperturaStream) clearTimeout(reaperturaStream);
+            if (streamCambios) {
+                streamCambios.onerror = null;
+                streamCambios.close();
+            }
             document.removeEventListener('visibilitychange', handleVisibilityChange);
             console.log(`🛑 ${idSheet} - Polling desactivado`);
         };
@@ -1,6 +1,7 @@
 import React, { useState, useRef, useEffect } from 'react';
 import { Card, Form, Button, Alert, Spinner, Badge, Modal } from 'react-bootstrap';
 import LogoGuerrero from '../../assets/images/icono.png'; // Importar Logo
+import { llamarIA } from '../../services/trabajosIAService';
 
 const API_URL = process.env.REACT_APP_API_URL || '/api';
 
@@ -172,7 +173,8 @@ const ChatIA = ({ onBack }) => { // Recibir onBack
                 ? { command: userInput, session_id: sessionId } // Enviar sessionId
                 : { question: userInput, include_docs: false };
 
-            const response = await fetch(endpoint, {
+            // La IA se encola en el backend; llamarIA espera el trabajo
+            const response = await llamarIA(endpoint, {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -180,7 +182,7 @@ const ChatIA = ({ onBack }) => { // Recibir onBack
                 body: JSON.stringify(payload)
             });
 
-            const data = await response.json();
+            const data = response.data;
 
             if (response.ok) {
                 let aiMessage;
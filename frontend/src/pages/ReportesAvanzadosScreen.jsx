@@ -2,6 +2,7 @@ import React, { useState } from 'react';
 import { useNavigate, useSearchParams } from 'react-router-dom';
 import { Container, Row, Col, Button, Form, Table, Alert, Spinner } from 'react-bootstrap';
 import usePageTitle from '../hooks/usePageTitle';
+import { llamarIA } from '../services/trabajosIAService';
 import './ReportesAvanzadosScreen.css';
 import ReporteVendedores from './ReportesAvanzados/ReporteVendedores';
 import ReporteEfectividadVendedores from './ReportesAvanzados/ReporteEfectividadVendedores';
@@ -73,9 +74,9 @@ const ReportesAvanzadosScreen = () => {
     const fetchPrediccionesIA = async (fecha) => {
         setLoadingIA(true);
         try {
-            const response = await fetch(`${API_URL}/prediccion-ia/?fecha=${fecha}`);
+            const response = await llamarIA(`${API_URL}/prediccion-ia/?fecha=${fecha}`);
             if (response.ok) {
-                const data = await response.json();
+                const data = response.data;
                 // Convertir array a objeto para búsqueda rápida por nombre de producto
                 const mapPredicciones = {};
                 if (data.predicciones) {
@@ -0,0 +1,47 @@
+// Servicio para los endpoints de IA encolados (respuesta 202 + trabajo_id)
+const API_URL = process.env.REACT_APP_API_URL || '/api';
+
+// Long-poll del backend por consulta (máx. 25s del lado del servidor)
+const ESPERA_POR_CONSULTA = 25;
+// Tope total para no quedar esperando para siempre si el LLM se cuelga
+const ESPERA_MAXIMA_MS = 5 * 60 * 1000;
+
+/**
+ * Espera a que termine un trabajo de IA.
+ * Resuelve con { ok, status, data } igual que si la llamada hubiera sido síncrona.
+ */
+export const esperarTrabajoIA = async (trabajoId) => {
+  const limite = Date.now() + ESPERA_MAXIMA_MS;
+
+  while (Date.now() < limite) {
+    const response = await fetch(`${API_URL}/ai/trabajos/${trabajoId}/?esperar=${ESPERA_POR_CONSULTA}`);
+    const trabajo = await response.json();
+
+    if (!response.ok) {
+      return { ok: false, status: response.status, data: trabajo };
+    }
+    if (trabajo.estado === 'COMPLETADO') {
+      return { ok: true, status: 200, data: trabajo.resultado };
+    }
+    if (trabajo.estado === 'ERROR') {
+      return { ok: false, status: 500, data: { error: trabajo.error } };
+    }
+  }
+
+  return { ok: false, status: 504, data: { error: 'La IA tardó demasiado en responder' } };
+};
+
+/**
+ * Llama un endpoint de IA en modo asíncrono (async=1) y espera el resultado
+ * consultando el trabajo, sin dejar la petición HTTP abierta por minutos.
+ */
+export const llamarIA = async (url, opciones = {}) => {
+  const separador = url.includes('?') ? '&' : '?';
+  const response = await fetch(`${url}${separador}async=1`, opciones);
+  const data = await response.json();
+
+  if (response.status === 202 && data.trabajo_id) {
+    return esperarTrabajoIA(data.trabajo_id);
+  }
+  return { ok: response.ok, status: response.status, data };
+};